@@ -1,24 +1,64 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
 import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Tuple
 from database import DatabaseManager
 from nl_to_sql import NLToSQLConverter
+from llm_cache import LLMResponseCache, open_llm_cache
 from query_history import QueryHistoryManager
+from index_advisor import IndexAdvisor
+from ingestion import MultiFileIngester, DirectoryWatcher
+from exporters import QueryExporter, ExportFile, EXPORT_FORMATS
+from pagination import QueryPaginator
+from cost_guard import QueryCostGuard
+from query_linter import QueryLinter
 from visualizations import create_visualizations
-from utils import process_uploaded_file, validate_sql_query
+from streaming_csv import StreamingCsvLoader
+from excel_loader import ExcelWorkbookLoader
+from utils import process_uploaded_file, validate_sql_query, compute_upload_fingerprint, generate_table_name
+
+# DATAINSIGHT_COLUMNAR_MB opts in to the columnar engine with that many MB of table snapshots
+COLUMNAR_MAX_BYTES = int(float(os.getenv("DATAINSIGHT_COLUMNAR_MB", "0")) * 1024 * 1024)
+
+@st.cache_resource
+def get_shared_database(db_path: str) -> DatabaseManager:
+    """Open one file-backed database shared by every session of this server."""
+    return DatabaseManager(db_path, columnar_max_bytes=COLUMNAR_MAX_BYTES)
+
+@st.cache_resource
+def get_llm_cache() -> LLMResponseCache:
+    """Open the LLM response cache shared by every session of this server (in memory if the file can't be opened)."""
+    return open_llm_cache()
 
 # Initialize session state
 if 'db_manager' not in st.session_state:
-    st.session_state.db_manager = DatabaseManager()
+    # DATAINSIGHT_DB_PATH switches to a shared, file-backed WAL database
+    db_path = os.getenv("DATAINSIGHT_DB_PATH")
+    st.session_state.db_manager = get_shared_database(db_path) if db_path else \
+        DatabaseManager(columnar_max_bytes=COLUMNAR_MAX_BYTES)
 if 'nl_converter' not in st.session_state:
-    st.session_state.nl_converter = NLToSQLConverter()
+    st.session_state.nl_converter = NLToSQLConverter(cache=get_llm_cache())
 if 'query_history' not in st.session_state:
     st.session_state.query_history = QueryHistoryManager()
 if 'current_data' not in st.session_state:
     st.session_state.current_data = None
 if 'current_table' not in st.session_state:
     st.session_state.current_table = None
+if 'refine_executor' not in st.session_state:
+    # Runs exact queries behind approximate previews
+    st.session_state.refine_executor = ThreadPoolExecutor(max_workers=1)
+if 'index_advisor' not in st.session_state:
+    st.session_state.index_advisor = IndexAdvisor(
+        st.session_state.db_manager, st.session_state.query_history
+    )
+if 'cost_guard' not in st.session_state:
+    st.session_state.cost_guard = QueryCostGuard(st.session_state.db_manager)
+if 'session_query_prefix' not in st.session_state:
+    # Query ids start with it, so a session can tell its own running queries apart
+    st.session_state.session_query_prefix = f"{uuid.uuid4().hex}:"
 
 st.set_page_config(
     page_title="SQL Data Analysis Tool",
@@ -29,33 +69,473 @@ st.set_page_config(
 st.title("📊 Natural Language to SQL Data Analysis Tool")
 st.markdown("Transform your questions into insights with AI-powered SQL generation")
 
+def new_query_id() -> str:
+    """Create an id for a query run by this session."""
+    return st.session_state.session_query_prefix + uuid.uuid4().hex
+
+def guard_query(sql_query: str) -> str:
+    """Check a query's estimated cost before it reaches the database; returns the SQL to run.
+    
+    Raises QueryCostError when the query is over the cost guard's threshold.
+    """
+    guard = st.session_state.cost_guard
+    decision = guard.enforce(sql_query)
+    if decision['action'] == 'limit':
+        st.info(
+            f"Estimated cost {decision['estimated_cost']:,.0f} is over the limit of {guard.max_cost:,.0f}, "
+            f"so only the first {guard.auto_limit:,} rows are returned (est. cost {decision['limited_cost']:,.0f})."
+        )
+    return decision['query']
+
+def render_lint_findings(sql_query: str) -> None:
+    """Show the performance linter's findings for a query, with rewrites and estimated savings."""
+    try:
+        findings = QueryLinter(st.session_state.db_manager).lint(sql_query)
+    except Exception as e:
+        st.caption(str(e))
+        return
+    if not findings:
+        st.caption("No performance issues found in the query plan.")
+        return
+    for finding in findings:
+        icon = {'high': '🔴', 'medium': '🟠', 'low': '⚪'}[finding['severity']]
+        st.markdown(f"{icon} **{finding['message']}**")
+        st.code(finding['suggestion'], language='sql' if finding['suggestion'].startswith('CREATE') else None)
+        st.caption(f"Estimated saving: {finding['saving_note']}")
+
+def run_streaming_query(sql_query: str, timeout: float, pages_key: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Execute a query, showing the first chunk of results while the rest streams in.
+    
+    Results longer than QueryPaginator.MIN_PAGED_ROWS (including those past
+    the stream's row cap) are shown one page at a time by a paginated view
+    kept under pages_key instead of one large table. Returns the (capped)
+    results together with the stream's execution telemetry.
+    """
+    result_placeholder = st.empty()
+    
+    chunks = []
+    # Closing the stream returns its connection even if rendering fails part-way
+    with st.session_state.db_manager.stream_query(sql_query, timeout=timeout, query_id=new_query_id()) as stream:
+        for chunk in stream:
+            if not chunks and not chunk.empty:
+                with result_placeholder.container():
+                    st.subheader("Query Results:")
+                    st.dataframe(chunk, use_container_width=True)
+            chunks.append(chunk)
+    
+    # Feed the index advisor's workload
+    st.session_state.index_advisor.observe(sql_query)
+    
+    telemetry = stream.get_telemetry()
+    
+    if not chunks:
+        return pd.DataFrame(columns=stream.columns), telemetry
+    
+    result_df = pd.concat(chunks, ignore_index=True)
+    if not stream.truncated and len(result_df) <= QueryPaginator.MIN_PAGED_ROWS:
+        if len(chunks) > 1:
+            with result_placeholder.container():
+                st.subheader("Query Results:")
+                st.dataframe(result_df, use_container_width=True)
+        return result_df, telemetry
+    
+    result_placeholder.empty()
+    if stream.truncated:
+        st.warning(
+            f"The result has {stream.total_rows():,} rows; charts use the first {stream.rows_returned:,}. "
+            "Browse every row page by page below, or add filters or a LIMIT clause to narrow the result."
+        )
+    st.session_state[pages_key] = {
+        'paginator': QueryPaginator(st.session_state.db_manager, sql_query, timeout=timeout),
+        'page': 0
+    }
+    
+    return result_df, telemetry
+
+def render_result_pages(pages_key: str) -> None:
+    """Show one page of a large result at a time, fetched from the database on demand."""
+    pages = st.session_state.get(pages_key)
+    if pages is None:
+        return
+    
+    paginator = pages['paginator']
+    try:
+        total_rows = paginator.total_rows()
+        page_count = paginator.page_count()
+        st.subheader("All Results:")
+        col1, col2, col3 = st.columns([1, 1, 3])
+        with col1:
+            if st.button("◀ Previous", key=f"{pages_key}_previous", disabled=pages['page'] == 0):
+                pages['page'] -= 1
+        with col2:
+            if st.button("Next ▶", key=f"{pages_key}_next", disabled=pages['page'] >= page_count - 1):
+                pages['page'] += 1
+        with col3:
+            pages['page'] = st.number_input(
+                f"Page (of {page_count:,}):", min_value=1, max_value=page_count,
+                value=pages['page'] + 1, key=f"{pages_key}_number_{pages['page']}"
+            ) - 1
+        
+        page_df = paginator.get_page(pages['page'])
+        st.dataframe(page_df, use_container_width=True)
+        page_info = page_df.attrs['page']
+        st.caption(
+            f"Rows {page_info['first_row'] + 1:,}–{page_info['first_row'] + len(page_df):,} of {total_rows:,} "
+            f"({page_info['method']} pagination, {page_info['fetch_ms']:.0f} ms)"
+        )
+    except Exception as e:
+        st.error(str(e))
+
+def run_preview_query(question: str, sql_query: str, timeout: float, preview_key: str) -> bool:
+    """Estimate a query's result from its table's sample and keep it for display.
+    
+    Returns False when the query can't be estimated and must run exactly.
+    """
+    started = time.perf_counter()
+    preview_df = st.session_state.db_manager.execute_approximate_query(sql_query, timeout=timeout)
+    if preview_df is None:
+        return False
+    
+    approximate = preview_df.attrs['approximate']
+    st.session_state.query_history.add_query(question, sql_query, len(preview_df), telemetry={
+        'execution_ms': (time.perf_counter() - started) * 1000,
+        'rows_scanned': approximate['sample_rows'],
+        'rows_returned': len(preview_df),
+        'result_bytes': int(preview_df.memory_usage(deep=True).sum()),
+        'engine': 'sample'
+    })
+    st.session_state[preview_key] = {
+        'question': question,
+        'sql': sql_query,
+        'timeout': timeout,
+        'result': preview_df,
+        'future': None,
+        'recorded': False
+    }
+    return True
+
+def render_preview(preview_key: str) -> None:
+    """Show an approximate result and refine it to the exact one in the background on request."""
+    preview = st.session_state.get(preview_key)
+    if preview is None:
+        return
+    
+    approximate = preview['result'].attrs['approximate']
+    st.subheader("Preview Results (approximate):")
+    st.dataframe(preview['result'], use_container_width=True)
+    st.caption(
+        f"Estimated from a {approximate['sample_rows']:,}-row sample of "
+        f"{approximate['table_rows']:,} rows. Min/max and row-level queries always run exactly."
+    )
+    if approximate['error_bounds']:
+        with st.expander(f"Error bounds ({approximate['confidence']:.0%} confidence)"):
+            st.dataframe(pd.DataFrame({
+                f"± {name}": bounds for name, bounds in approximate['error_bounds'].items()
+            }), use_container_width=True)
+    
+    future = preview['future']
+    if future is None:
+        if st.button("🎯 Refine to exact", key=f"{preview_key}_refine"):
+            try:
+                preview['sql'] = guard_query(preview['sql'])
+            except Exception as e:
+                st.error(str(e))
+                return
+            preview['started'] = time.perf_counter()
+            preview['future'] = st.session_state.refine_executor.submit(
+                st.session_state.db_manager.execute_query, preview['sql'], True, preview['timeout'], new_query_id()
+            )
+            st.rerun()
+        return
+    
+    if not future.done():
+        st.info("Running the exact query in the background...")
+        st.button("🔄 Check for exact result", key=f"{preview_key}_check")
+        return
+    
+    try:
+        exact_df = future.result()
+    except Exception as e:
+        st.error(f"Error executing query: {str(e)}")
+        return
+    
+    st.subheader("Exact Results:")
+    st.dataframe(exact_df, use_container_width=True)
+    if not preview['recorded']:
+        preview['recorded'] = True
+        st.session_state.index_advisor.observe(preview['sql'])
+        st.session_state.query_history.add_query(preview['question'], preview['sql'], len(exact_df), telemetry={
+            'execution_ms': (time.perf_counter() - preview['started']) * 1000,
+            'rows_returned': len(exact_df),
+            'result_bytes': int(exact_df.memory_usage(deep=True).sum())
+        })
+
 # Sidebar for navigation and data management
 with st.sidebar:
     st.header("Data Management")
     
     # File upload section
     uploaded_file = st.file_uploader(
-        "Upload CSV or Excel file",
-        type=['csv', 'xlsx', 'xls'],
+        "Upload CSV, Excel, Parquet or Arrow file",
+        type=['csv', 'xlsx', 'xls', 'parquet', 'feather', 'arrow'],
         help="Upload your data file to start analyzing"
     )
     
+    build_rollups = st.checkbox(
+        "Build rollup tables",
+        value=False,
+        help="Pre-aggregate low-cardinality columns and date buckets at upload so "
+             "matching aggregate questions read a small rollup instead of the whole table"
+    )
+    # Opt-in: drawing the sample costs a full pass over the table at upload
+    build_sample = st.checkbox(
+        "Build preview sample",
+        value=False,
+        help="Draw a stratified ~1% sample of large tables at upload so aggregate "
+             "questions can be answered approximately in fast preview mode"
+    )
+    
+    load_mode = st.radio("Load into", ["New table", "Append to table", "Upsert into table"])
+    target_table = None
+    key_columns = []
+    if load_mode != "New table":
+        target_table = st.selectbox("Target table:", st.session_state.db_manager.get_table_names())
+        key_columns = [col.strip() for col in st.text_input(
+            "Key columns (comma-separated):",
+            help="Rows whose key is already in the table are skipped (append) or updated (upsert); "
+                 "without key columns every row is appended"
+        ).split(",") if col.strip()]
+    
     if uploaded_file is not None:
         try:
-            with st.spinner("Processing file..."):
-                df, table_name = process_uploaded_file(uploaded_file)
-                st.session_state.db_manager.create_table_from_dataframe(df, table_name)
-                st.session_state.current_data = df
-                st.session_state.current_table = table_name
-                st.success(f"✅ File uploaded successfully! Table: `{table_name}`")
-                
-                # Show data preview
-                with st.expander("Data Preview"):
-                    st.dataframe(df.head(10))
+            # Streamlit reruns this script on every interaction; only re-ingest
+            # when the file contents or the ingestion options change
+            ingest_options = {
+                'bulk_load': True, 'build_rollups': build_rollups, 'build_sample': build_sample,
+                'load_mode': load_mode, 'target_table': target_table, 'key_columns': key_columns
+            }
+            fingerprint = compute_upload_fingerprint(uploaded_file, ingest_options)
+            ingestion = st.session_state.get('ingestion')
+            
+            if (ingestion is None or ingestion['fingerprint'] != fingerprint
+                    or ingestion['table_name'] not in st.session_state.db_manager.get_table_names()):
+                with st.spinner("Processing file..."):
+                    # New tables from CSV and .xlsx stream in chunks instead of being read whole
+                    file_extension = uploaded_file.name.rsplit('.', 1)[-1].lower()
+                    streamed = (file_extension in ('csv', 'xlsx')
+                                and (load_mode == "New table" or not target_table))
+                    
+                    load_progress = st.progress(0.0, text="Loading rows into the database...")
+                    
+                    def update_load_progress(rows_loaded, total_rows):
+                        if total_rows:
+                            fraction = min(rows_loaded / total_rows, 1.0)
+                            load_progress.progress(fraction, text=f"Loaded {rows_loaded:,} of {total_rows:,} rows")
+                        else:
+                            # Streaming: the row count is unknown, so show how far into the file we are
+                            fraction = min(uploaded_file.tell() / max(uploaded_file.size, 1), 1.0)
+                            load_progress.progress(fraction, text=f"Loaded {rows_loaded:,} rows")
+                    
+                    if streamed and file_extension == 'xlsx':
+                        # Every sheet becomes its own table, loaded in parallel workers
+                        workbook = ExcelWorkbookLoader(st.session_state.db_manager).load(
+                            uploaded_file, uploaded_file.name,
+                            progress_callback=lambda done, total: load_progress.progress(
+                                done / total, text=f"Loaded {done} of {total} sheets"
+                            ),
+                            build_rollups=ingest_options['build_rollups'],
+                            build_sample=ingest_options['build_sample']
+                        )
+                        if not workbook['tables']:
+                            raise Exception("; ".join(f"{sheet['sheet']}: {sheet['error']}" for sheet in workbook['sheets']))
+                        table_name = workbook['tables'][0]
+                        df = workbook['sample']
+                        rows = sum(sheet['rows'] for sheet in workbook['sheets'] if sheet['error'] is None)
+                        load_stats = {
+                            'table_name': table_name,
+                            'rows': rows,
+                            'seconds': workbook['seconds'],
+                            'rows_per_sec': rows / workbook['seconds'] if workbook['seconds'] > 0 else float(rows),
+                            'sheets': workbook['sheets']
+                        }
+                    elif streamed:
+                        table_name = generate_table_name(uploaded_file.name)
+                        csv_loader = StreamingCsvLoader(st.session_state.db_manager)
+                        csv_schema = csv_loader.infer_schema(uploaded_file)
+                        df = csv_schema['sample']
+                        load_stats = csv_loader.load(
+                            uploaded_file, table_name, schema=csv_schema,
+                            progress_callback=update_load_progress,
+                            build_rollups=ingest_options['build_rollups'],
+                            build_sample=ingest_options['build_sample']
+                        )
+                    elif load_mode == "New table" or not target_table:
+                        df, table_name = process_uploaded_file(uploaded_file)
+                        load_stats = st.session_state.db_manager.create_table_from_dataframe(
+                            df, table_name, bulk_load=ingest_options['bulk_load'],
+                            progress_callback=update_load_progress,
+                            build_rollups=ingest_options['build_rollups'],
+                            build_sample=ingest_options['build_sample']
+                        )
+                    else:
+                        df, _ = process_uploaded_file(uploaded_file)
+                        load_stats = st.session_state.db_manager.append_dataframe(
+                            df, target_table, key_columns=key_columns,
+                            upsert=load_mode == "Upsert into table"
+                        )
+                        table_name = load_stats['table_name']
+                    load_progress.empty()
+                    
+                    st.session_state.current_data = df
+                    st.session_state.current_table = table_name
+                    st.session_state.ingestion = {
+                        'fingerprint': fingerprint,
+                        'table_name': table_name,
+                        'data': df,
+                        'streamed': streamed,
+                        'load_stats': load_stats
+                    }
+            
+            ingestion = st.session_state.ingestion
+            df = ingestion['data']
+            load_stats = ingestion['load_stats']
+            st.success(f"✅ File uploaded successfully! Table: `{ingestion['table_name']}`")
+            st.caption(
+                f"Loaded {load_stats['rows']:,} rows in {load_stats['seconds']:.2f}s "
+                f"({load_stats['rows_per_sec']:,.0f} rows/sec)"
+            )
+            if 'rows_inserted' in load_stats:
+                st.caption(
+                    f"Inserted {load_stats['rows_inserted']:,} rows, updated {load_stats['rows_updated']:,}, "
+                    f"skipped {load_stats['rows_skipped']:,} already present"
+                )
+            if load_stats.get('rollups'):
+                st.caption(
+                    "Rollups: " + ", ".join(f"{rollup['row_count']:,} rows" for rollup in load_stats['rollups'])
+                )
+            if load_stats.get('sample'):
+                st.caption(f"Preview sample: {load_stats['sample']['sample_rows']:,} rows")
+            if load_stats.get('sheets'):
+                st.caption("Sheets: " + ", ".join(
+                    f"{sheet['sheet']} → `{sheet['table']}` ({sheet['rows']:,} rows)" if sheet['error'] is None
+                    else f"{sheet['sheet']} failed: {sheet['error']}"
+                    for sheet in load_stats['sheets']
+                ))
+                for sheet in load_stats['sheets']:
+                    if sheet.get('type_mismatches'):
+                        st.caption(
+                            f"{sheet['sheet']}: stored as text where values didn't match the inferred type: "
+                            + ", ".join(f"{col} ({count:,} values)" for col, count in sheet['type_mismatches'].items())
+                        )
+            if load_stats.get('type_mismatches'):
+                st.caption(
+                    "Stored as text where values didn't match the inferred type: "
+                    + ", ".join(f"{col} ({count:,} values)" for col, count in load_stats['type_mismatches'].items())
+                )
+            type_report = df.attrs.get('type_report')
+            if type_report and not ingestion['streamed']:
+                bytes_saved = sum(entry['bytes_saved'] for entry in type_report)
+                st.caption(
+                    f"Column types optimized: {len(type_report)} columns, "
+                    f"{bytes_saved / 1024:,.0f} KB saved in memory"
+                )
+            
+            # Show data preview
+            with st.expander("Data Preview"):
+                st.dataframe(df.head(10))
+                if ingestion['streamed']:
+                    table_rows = next((sheet['rows'] for sheet in load_stats.get('sheets', [])
+                                       if sheet['table'] == ingestion['table_name']), load_stats['rows'])
+                    st.info(
+                        f"Shape: {table_rows:,} rows × {df.shape[1]} columns "
+                        f"(preview and charts use the first {len(df):,} rows)"
+                    )
+                else:
                     st.info(f"Shape: {df.shape[0]} rows × {df.shape[1]} columns")
+                if type_report:
+                    st.write("**Column type changes:**")
+                    st.dataframe(pd.DataFrame(type_report), hide_index=True)
         except Exception as e:
             st.error(f"Error processing file: {str(e)}")
     
+    # Batches of files (e.g. monthly drops) are parsed in parallel worker processes
+    with st.expander("Upload multiple files or a ZIP"):
+        batch_files = st.file_uploader(
+            "Upload CSV, Excel, Parquet, Arrow or ZIP files",
+            type=['csv', 'xlsx', 'xls', 'parquet', 'feather', 'arrow', 'zip'],
+            accept_multiple_files=True,
+            key="batch_files"
+        )
+        union_files = st.checkbox(
+            "Combine into one table",
+            value=False,
+            help=f"Stack all files into one table with a `{MultiFileIngester.SOURCE_COLUMN}` column"
+        )
+        union_table = st.text_input("Combined table name:", value="combined_data", disabled=not union_files)
+        
+        if batch_files and st.button("📥 Ingest files"):
+            try:
+                parse_progress = st.progress(0.0, text="Parsing files...")
+                
+                def update_parse_progress(files_parsed, total_files):
+                    parse_progress.progress(files_parsed / total_files, text=f"Parsed {files_parsed} of {total_files} files")
+                
+                with st.spinner("Loading files into the database..."):
+                    st.session_state.batch_ingestion = MultiFileIngester(st.session_state.db_manager).ingest(
+                        batch_files, union=union_files, table_name=union_table,
+                        progress_callback=update_parse_progress,
+                        build_rollups=build_rollups, build_sample=build_sample
+                    )
+                parse_progress.empty()
+                if st.session_state.batch_ingestion['tables']:
+                    st.session_state.current_table = st.session_state.batch_ingestion['tables'][0]
+                    st.session_state.current_data = None
+            except Exception as e:
+                st.error(f"Error processing files: {str(e)}")
+        
+        batch_ingestion = st.session_state.get('batch_ingestion')
+        if batch_ingestion:
+            failed = [entry for entry in batch_ingestion['files'] if entry['error']]
+            st.caption(
+                f"Loaded {len(batch_ingestion['tables'])} tables from "
+                f"{len(batch_ingestion['files']) - len(failed)} files in {batch_ingestion['seconds']:.2f}s"
+            )
+            for entry in failed:
+                st.warning(f"{entry['file']}: {entry['error']}")
+            st.dataframe(pd.DataFrame(batch_ingestion['files']).drop(columns=['error']), use_container_width=True)
+    
+    # Files dropped into a folder are appended to a table in the background
+    with st.expander("Watch a folder"):
+        watcher = st.session_state.get('directory_watcher')
+        if watcher is not None and watcher.is_running():
+            st.caption(f"Watching `{watcher.directory}` → `{watcher.table_name}`")
+            if st.button("⏹️ Stop watching"):
+                watcher.stop()
+        else:
+            watch_directory = st.text_input("Folder path:")
+            watch_table = st.text_input("Table name:", value="watched_data")
+            watch_keys = st.text_input("Key columns (comma-separated):", key="watch_keys")
+            watch_upsert = st.checkbox("Update rows whose key already exists", value=False)
+            if watch_directory and st.button("👀 Start watching"):
+                try:
+                    watcher = DirectoryWatcher(
+                        st.session_state.db_manager, watch_directory, watch_table,
+                        key_columns=[col.strip() for col in watch_keys.split(",") if col.strip()],
+                        upsert=watch_upsert
+                    )
+                    watcher.start()
+                    st.session_state.directory_watcher = watcher
+                except Exception as e:
+                    st.error(f"Error watching folder: {str(e)}")
+        
+        if watcher is not None:
+            st.button("🔄 Refresh status", help="Show the latest ingestion events")
+            for event in watcher.get_events()[:10]:
+                if event['error']:
+                    st.warning(f"{event['file']}: {event['error']}")
+                else:
+                    st.caption(f"{event['file']}: {event['rows']:,} new rows")
+    
     # Available tables
     st.header("Available Tables")
     tables = st.session_state.db_manager.get_table_names()
@@ -63,14 +543,95 @@ with st.sidebar:
         selected_table = st.selectbox("Select table:", tables)
         if selected_table:
             st.session_state.current_table = selected_table
-            # Show table info
-            columns = st.session_state.db_manager.get_table_columns(selected_table)
+            # Show table info from the statistics catalog
+            table_info = st.session_state.db_manager.get_table_info(selected_table)
             with st.expander(f"Table Info: {selected_table}"):
+                st.write(f"**Rows:** {table_info['row_count']:,}")
                 st.write("**Columns:**")
-                for col in columns:
-                    st.write(f"- {col}")
+                for col in table_info['columns']:
+                    types = ", ".join(t for t in col['data_types'] if t != 'null') or "null"
+                    st.write(f"- {col['name']} ({types}, {col['null_count']:,} nulls)")
     else:
         st.info("No tables available. Upload a file to get started.")
+    
+    # Queries still executing (e.g. from other sessions on a shared database)
+    running_queries = st.session_state.db_manager.get_running_queries()
+    if running_queries:
+        st.warning(f"{len(running_queries)} queries running")
+        for running in running_queries:
+            st.caption(f"{running['elapsed']:.0f}s — {running['query'][:80]}")
+        # Other sessions' queries are listed but only this session's can be cancelled. Queries run
+        # on the script thread block this session's reruns, so the button only reaches the ones
+        # running in the background ("Refine to exact"); the rest stop at their deadline.
+        own_queries = [
+            running['query_id'] for running in running_queries
+            if running['query_id'].startswith(st.session_state.session_query_prefix)
+        ]
+        if st.button("⏹️ Cancel my background queries", disabled=not own_queries,
+                     help="Stops exact refinements still running for this session. Other queries "
+                          "run until they finish or reach the query timeout."):
+            st.session_state.db_manager.cancel_all_queries(own_queries)
+    
+    cache_stats = st.session_state.db_manager.result_cache.get_stats()
+    if cache_stats['hits'] or cache_stats['misses']:
+        st.caption(
+            f"Result cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+            f"{cache_stats['bytes'] / (1024 * 1024):.1f} MB used"
+        )
+    
+    columnar = st.session_state.db_manager.columnar
+    if columnar is not None:
+        columnar_stats = columnar.get_stats()
+        if columnar_stats['queries_answered']:
+            st.caption(
+                f"Columnar engine: {columnar_stats['queries_answered']} queries answered, "
+                f"{columnar_stats['current_bytes'] / (1024 * 1024):.1f} MB of snapshots"
+            )
+    
+    # Automatic indexes built from the query workload
+    advisor = st.session_state.index_advisor
+    with st.expander("Index Advisor"):
+        if st.button("⚙️ Tune indexes now"):
+            with st.spinner("Analyzing query workload..."):
+                advisor.tune()
+        
+        index_report = advisor.get_report()
+        st.caption(
+            f"{len(index_report)} automatic indexes, "
+            f"{advisor.get_space_used() / (1024 * 1024):.1f} of "
+            f"{advisor.space_budget_bytes / (1024 * 1024):.0f} MB budget"
+        )
+        for index in index_report:
+            st.write(f"**{index['name']}** on `{index['table']}` ({', '.join(index['columns'])})")
+            for query in index['queries']:
+                st.caption(f"{query['sql'][:80]} — est. cost {query['cost_before']:,.0f} → {query['cost_after']:,.0f}")
+
+    # Pre-execution cost checks on every query
+    guard = st.session_state.cost_guard
+    with st.expander("Query Cost Guard"):
+        guard.max_cost = st.number_input(
+            "Max estimated cost (million rows visited):", min_value=0.1,
+            value=guard.max_cost / 1_000_000, step=10.0,
+            help="Estimated from EXPLAIN QUERY PLAN and table row counts before a query runs"
+        ) * 1_000_000
+        guard.on_exceed = 'limit' if st.radio(
+            "Over the limit:", ["Add a LIMIT", "Reject"],
+            index=0 if guard.on_exceed == 'limit' else 1
+        ) == "Add a LIMIT" else 'reject'
+        guard.auto_limit = int(st.number_input("Automatic LIMIT (rows):", min_value=1, value=guard.auto_limit))
+    
+    # Persistent cache of generated SQL, explanations and suggestions
+    llm_cache = st.session_state.nl_converter.cache
+    with st.expander("LLM Response Cache"):
+        cache_stats = llm_cache.get_stats()
+        col1, col2 = st.columns(2)
+        col1.metric("Hit rate", f"{cache_stats['hit_rate']:.0%}", help=f"{cache_stats['hits']} hits, {cache_stats['misses']} misses")
+        col2.metric("API time saved", f"{cache_stats['saved_ms'] / 1000:,.1f} s")
+        st.caption(f"{cache_stats['entries']} entries, {cache_stats['bytes'] / 1024:,.1f} KB "
+                   f"(expire after {llm_cache.ttl_seconds / 86400:g} days)")
+        if st.button("Clear LLM cache"):
+            llm_cache.clear()
+            st.rerun()
 
 # Main content area
 tab1, tab2, tab3, tab4 = st.tabs(["💬 Natural Language Query", "📝 SQL Editor", "📈 Visualizations", "📚 Query History"])
@@ -105,8 +666,16 @@ with tab1:
         col1, col2 = st.columns([1, 4])
         with col1:
             analyze_button = st.button("🔍 Analyze", type="primary")
+        with col2:
+            nl_fast_preview = st.checkbox(
+                "⚡ Fast preview (approximate)", key="nl_fast_preview",
+                help="Estimate aggregates from the table's sample, then refine to the exact answer on demand. "
+                     "Needs a table uploaded with \"Build preview sample\"; other queries run exactly"
+            )
         
         if analyze_button and user_question:
+            st.session_state.pop('nl_preview', None)
+            st.session_state.pop('nl_pages', None)
             try:
                 with st.spinner("Converting your question to SQL..."):
                     # Get table schema for context
@@ -121,30 +690,37 @@ with tab1:
                     
                     st.subheader("Generated SQL Query:")
                     st.code(sql_query, language='sql')
+                    with st.expander("🔎 Performance check"):
+                        render_lint_findings(sql_query)
                     
                     # Execute query
-                    with st.spinner("Executing query..."):
-                        result_df = st.session_state.db_manager.execute_query(sql_query)
-                        
-                        if not result_df.empty:
-                            st.subheader("Query Results:")
-                            st.dataframe(result_df, use_container_width=True)
+                    if not (nl_fast_preview and run_preview_query(
+                            user_question, sql_query, DatabaseManager.NL_QUERY_TIMEOUT, 'nl_preview')):
+                        with st.spinner("Executing query..."):
+                            sql_query = guard_query(sql_query)
+                            result_df, telemetry = run_streaming_query(sql_query, DatabaseManager.NL_QUERY_TIMEOUT, 'nl_pages')
+                            telemetry['llm_latency_ms'] = st.session_state.nl_converter.last_call_stats.get('latency_ms')
+                            telemetry['llm_cached'] = st.session_state.nl_converter.last_call_stats.get('cached', False)
                             
-                            # Save to history
-                            st.session_state.query_history.add_query(
-                                user_question, sql_query, len(result_df)
-                            )
-                            
-                            # Auto-generate visualizations
-                            st.subheader("Visualizations:")
-                            create_visualizations(result_df, user_question)
-                            
-                        else:
-                            st.warning("Query returned no results.")
+                            if not result_df.empty:
+                                # Save to history
+                                st.session_state.query_history.add_query(
+                                    user_question, sql_query, len(result_df), telemetry=telemetry
+                                )
+                                
+                                # Auto-generate visualizations
+                                st.subheader("Visualizations:")
+                                create_visualizations(result_df, user_question)
                             
+                            else:
+                                st.warning("Query returned no results.")
+            
             except Exception as e:
                 st.error(f"Error: {str(e)}")
                 st.info("Try rephrasing your question or check if the table contains the requested data.")
+        
+        render_preview('nl_preview')
+        render_result_pages('nl_pages')
     else:
         st.info("👆 Please upload a data file or select a table from the sidebar to start asking questions.")
 
@@ -160,24 +736,43 @@ with tab2:
             help="Write your SQL query here. Use the table name from the sidebar."
         )
         
-        col1, col2 = st.columns([1, 4])
+        col1, col2, col3 = st.columns([1, 1, 3])
         with col1:
             execute_button = st.button("▶️ Execute", type="primary")
+        with col2:
+            lint_button = st.button("🔎 Check performance")
+        with col3:
+            sql_fast_preview = st.checkbox(
+                "⚡ Fast preview (approximate)", key="sql_fast_preview",
+                help="Estimate aggregates from the table's sample, then refine to the exact answer on demand. "
+                     "Needs a table uploaded with \"Build preview sample\"; other queries run exactly"
+            )
+        
+        if lint_button and sql_query:
+            if not validate_sql_query(sql_query):
+                st.error("Invalid SQL query. Please check your syntax.")
+            else:
+                render_lint_findings(sql_query)
         
         if execute_button and sql_query:
+            st.session_state.pop('sql_preview', None)
+            st.session_state.pop('sql_pages', None)
             try:
                 # Validate query
-                if validate_sql_query(sql_query):
+                if not validate_sql_query(sql_query):
+                    st.error("Invalid SQL query. Please check your syntax.")
+                elif sql_fast_preview and run_preview_query(
+                        "Manual SQL Query", sql_query, DatabaseManager.MANUAL_QUERY_TIMEOUT, 'sql_preview'):
+                    pass
+                else:
                     with st.spinner("Executing query..."):
-                        result_df = st.session_state.db_manager.execute_query(sql_query)
+                        sql_query = guard_query(sql_query)
+                        result_df, telemetry = run_streaming_query(sql_query, DatabaseManager.MANUAL_QUERY_TIMEOUT, 'sql_pages')
                         
                         if not result_df.empty:
-                            st.subheader("Query Results:")
-                            st.dataframe(result_df, use_container_width=True)
-                            
                             # Save to history
                             st.session_state.query_history.add_query(
-                                "Manual SQL Query", sql_query, len(result_df)
+                                "Manual SQL Query", sql_query, len(result_df), telemetry=telemetry
                             )
                             
                             # Option to visualize
@@ -185,10 +780,54 @@ with tab2:
                                 create_visualizations(result_df, "SQL Query Results")
                         else:
                             st.warning("Query returned no results.")
-                else:
-                    st.error("Invalid SQL query. Please check your syntax.")
             except Exception as e:
                 st.error(f"Error executing query: {str(e)}")
+        
+        render_preview('sql_preview')
+        render_result_pages('sql_pages')
+        
+        # Exports stream the full result in chunks instead of the capped on-screen rows
+        with st.expander("📤 Export results"):
+            export_format = st.selectbox("Format:", list(EXPORT_FORMATS), key="export_format")
+            if sql_query and st.button("Prepare export"):
+                try:
+                    if not validate_sql_query(sql_query):
+                        st.error("Invalid SQL query. Please check your syntax.")
+                    else:
+                        export_query = guard_query(sql_query)
+                        # The previous export's temp file goes as soon as it is replaced
+                        previous_export = st.session_state.pop('prepared_export', None)
+                        if previous_export is not None:
+                            previous_export.remove()
+                        with st.spinner("Exporting query results..."):
+                            st.session_state.prepared_export = QueryExporter(st.session_state.db_manager).export_to_file(
+                                export_query, export_format, timeout=DatabaseManager.MANUAL_QUERY_TIMEOUT
+                            )
+                except Exception as e:
+                    st.error(str(e))
+            
+            # Only the temp file's path and stats live in the session; the bytes are read when offered
+            prepared_export = st.session_state.get('prepared_export')
+            if prepared_export:
+                export_info = EXPORT_FORMATS[prepared_export.file_format]
+                export_stats = prepared_export.stats
+                st.caption(
+                    f"Exported {export_stats['rows']:,} rows in {export_stats['seconds']:.2f}s "
+                    f"({export_stats['rows_per_sec']:,.0f} rows/s, {prepared_export.size / (1024 * 1024):.1f} MB)"
+                )
+                if prepared_export.downloadable():
+                    with open(prepared_export.path, 'rb') as export_handle:
+                        st.download_button(
+                            "⬇️ Download",
+                            data=export_handle,
+                            file_name=f"{st.session_state.current_table}_export.{export_info['extension']}",
+                            mime=export_info['mime']
+                        )
+                else:
+                    st.warning(
+                        f"The export is larger than {ExportFile.DOWNLOAD_MAX_BYTES // (1024 * 1024)} MB, too large "
+                        f"to download through the browser. It was written to {prepared_export.path} on the server."
+                    )
     else:
         st.info("👆 Please select a table from the sidebar to start writing SQL queries.")
 
@@ -204,6 +843,30 @@ with tab3:
             st.write("**Numeric Columns Summary:**")
             st.dataframe(st.session_state.current_data[numeric_cols].describe())
         
+        # Whole-table statistics, e.g. when the data above is only a streamed preview
+        with st.expander("Full table summary"):
+            exact_summary = st.checkbox(
+                "Exact statistics", value=False,
+                help="By default distinct counts, most common values, quartiles and duplicate rows "
+                     "are estimated with sketches in one pass; exact statistics load the whole table"
+            )
+            summarizer = st.session_state.db_manager.summaries
+            table_summary = summarizer.get_cached(st.session_state.current_table, exact_summary)
+            if table_summary is None and st.button("📊 Summarize table"):
+                with st.spinner("Summarizing table..."):
+                    table_summary = summarizer.summarize(st.session_state.current_table, exact=exact_summary)
+            if table_summary is not None:
+                summary_rows, summary_columns = table_summary['shape']
+                st.caption(
+                    f"{summary_rows:,} rows × {summary_columns} columns, "
+                    f"{table_summary['duplicate_rows']:,} duplicate rows"
+                    + (" (estimates from sketches)" if table_summary['approximate'] else "")
+                )
+                if table_summary.get('numeric_summary'):
+                    st.dataframe(pd.DataFrame(table_summary['numeric_summary']).T)
+                if table_summary.get('categorical_summary'):
+                    st.dataframe(pd.DataFrame(table_summary['categorical_summary']).T)
+        
         # Create visualizations for the current data
         create_visualizations(st.session_state.current_data, "Data Overview")
         
@@ -216,23 +879,56 @@ with tab4:
     history = st.session_state.query_history.get_history()
     
     if history:
-        st.subheader("Recent Queries")
+        sort_order = st.radio("Sort by", ["Most recent", "Slowest"], horizontal=True)
+        if sort_order == "Slowest":
+            st.subheader("Slowest Queries")
+            shown_queries = st.session_state.query_history.get_slowest_queries(10)
+        else:
+            st.subheader("Recent Queries")
+            shown_queries = list(reversed(history[-10:]))  # Show last 10 queries
         
-        for i, query_info in enumerate(reversed(history[-10:])):  # Show last 10 queries
-            with st.expander(f"Query {len(history)-i}: {query_info['question'][:50]}..."):
+        for i, query_info in enumerate(shown_queries):
+            with st.expander(f"Query {history.index(query_info)+1}: {query_info['question'][:50]}..."):
                 st.write("**Question:**", query_info['question'])
                 st.code(query_info['sql_query'], language='sql')
                 st.write(f"**Results:** {query_info['result_count']} rows")
                 st.write(f"**Timestamp:** {query_info['timestamp']}")
                 
+                telemetry = query_info.get('telemetry')
+                if telemetry:
+                    col1, col2, col3, col4 = st.columns(4)
+                    llm_ms = telemetry.get('llm_latency_ms')
+                    col1.metric("LLM latency", f"{llm_ms:,.0f} ms" if llm_ms is not None else "—")
+                    col2.metric("Execution", f"{telemetry.get('execution_ms', 0):,.1f} ms")
+                    rows_scanned = telemetry.get('rows_scanned')
+                    col3.metric("Rows scanned", f"{rows_scanned:,}" if rows_scanned is not None else "—")
+                    col4.metric("Result size", f"{telemetry.get('result_bytes', 0) / 1024:,.1f} KB")
+                    if telemetry.get('llm_cached'):
+                        st.caption("SQL reused from the LLM response cache")
+                    if telemetry.get('from_cache'):
+                        st.caption("Served from the result cache")
+                    elif telemetry.get('rollup'):
+                        st.caption(f"Answered from rollup table `{telemetry['rollup']}`")
+                    elif telemetry.get('engine') == 'columnar':
+                        st.caption("Answered by the columnar engine")
+                    elif telemetry.get('engine') == 'sample':
+                        st.caption("Approximate preview estimated from the table's sample")
+                    if telemetry.get('query_plan'):
+                        st.write("**Query plan:**")
+                        st.code("\n".join(telemetry['query_plan']), language='text')
+                
                 # Re-run query button
                 if st.button(f"🔄 Re-run Query", key=f"rerun_{i}"):
+                    st.session_state.pop('history_pages', None)
                     try:
-                        result_df = st.session_state.db_manager.execute_query(query_info['sql_query'])
-                        st.dataframe(result_df)
+                        run_streaming_query(
+                            guard_query(query_info['sql_query']), DatabaseManager.MANUAL_QUERY_TIMEOUT, 'history_pages'
+                        )
                     except Exception as e:
                         st.error(f"Error re-running query: {str(e)}")
         
+        render_result_pages('history_pages')
+        
         # Clear history button
         if st.button("🗑️ Clear History", type="secondary"):
             st.session_state.query_history.clear_history()
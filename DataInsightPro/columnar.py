@@ -0,0 +1,636 @@
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+class ColumnarTable:
+    """A snapshot of one SQLite table held as typed NumPy arrays.
+    
+    Integer and real columns are stored as int64/float64 arrays with a
+    validity mask; text columns are dictionary-encoded as int32 codes into a
+    sorted dictionary (-1 for NULL), so comparing codes orders values the way
+    SQLite's BINARY collation does. Columns holding mixed or binary values
+    are kept as unsupported and any query touching them falls back to SQLite.
+    """
+    
+    def __init__(self, name: str, generation: int, columns: List[Dict[str, Any]], row_count: int):
+        self.name = name
+        self.generation = generation
+        self.row_count = row_count
+        self.column_order = [column['name'].lower() for column in columns]
+        self.columns = {column['name'].lower(): column for column in columns}
+        self._group_codes: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.size_bytes = sum(self._column_bytes(column) for column in columns)
+    
+    @classmethod
+    def from_frame(cls, name: str, generation: int, frame: pd.DataFrame,
+                   declared_types: Dict[str, str]) -> 'ColumnarTable':
+        """Build a snapshot from a frame read back from SQLite with SELECT *."""
+        columns = []
+        for col in frame.columns:
+            declared = (declared_types.get(col) or '').upper()
+            columns.append(cls._encode_column(str(col), frame[col], declared))
+        return cls(name, generation, columns, len(frame))
+    
+    @staticmethod
+    def _encode_column(name: str, series: pd.Series, declared: str) -> Dict[str, Any]:
+        """Encode one column, marking it unsupported if its values can't be typed exactly."""
+        null_mask = series.isna().to_numpy()
+        valid = ~null_mask
+        column = {'name': name, 'kind': None, 'declared': declared, 'valid': valid}
+        
+        if pd.api.types.is_integer_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+            column.update(kind='int', values=series.to_numpy(dtype='int64'))
+            return column
+        
+        if pd.api.types.is_float_dtype(series.dtype):
+            # NULLs turn integer columns into floats on the way out of SQLite;
+            # only the declared type tells whether the stored values were reals
+            if 'INT' in declared:
+                values = series.to_numpy(dtype='float64', na_value=0.0)
+                if np.all(np.mod(values, 1) == 0) and np.abs(values).max(initial=0) < 2 ** 53:
+                    column.update(kind='int', values=values.astype('int64'))
+            elif any(affinity in declared for affinity in ('REAL', 'FLOA', 'DOUB')):
+                column.update(kind='float', values=series.to_numpy(dtype='float64', na_value=np.nan))
+            return column
+        
+        if pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty'):
+            codes, dictionary = pd.factorize(series, sort=True, use_na_sentinel=True)
+            column.update(
+                kind='text',
+                values=codes.astype('int32'),
+                dictionary=np.asarray(dictionary, dtype=object)
+            )
+        return column
+    
+    @staticmethod
+    def _column_bytes(column: Dict[str, Any]) -> int:
+        """Approximate the memory held by an encoded column."""
+        size = column['valid'].nbytes
+        if column['kind'] is not None:
+            size += column['values'].nbytes
+        if column['kind'] == 'text':
+            size += sum(len(value) + 49 for value in column['dictionary'])
+        return size
+    
+    def group_codes(self, column_name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Get order-preserving codes (-1 for NULL) and the distinct values they index."""
+        column = self.columns[column_name]
+        if column['kind'] == 'text':
+            return column['values'], column['dictionary']
+        
+        if column_name not in self._group_codes:
+            values = column['values']
+            valid = column['valid']
+            uniques, inverse = np.unique(values[valid], return_inverse=True)
+            codes = np.full(len(values), -1, dtype='int64')
+            codes[valid] = inverse
+            self._group_codes[column_name] = (codes, uniques)
+        return self._group_codes[column_name]
+
+
+class ColumnarTableBuilder:
+    """Builds a ColumnarTable from a table read in chunks, giving up once it outgrows a byte budget.
+    
+    Each chunk is encoded as it arrives, so only one chunk of raw pandas
+    values is alive at a time. Text chunks keep chunk-local dictionaries
+    that build() merges into one sorted dictionary. A column whose chunks
+    encode to different kinds is unsupported, as it would be when encoded
+    whole; an all-NULL chunk fits any kind.
+    """
+    
+    def __init__(self, name: str, generation: int, declared_types: Dict[str, str], max_bytes: int):
+        self.name = name
+        self.generation = generation
+        self.declared_types = declared_types
+        self.max_bytes = max_bytes
+        self.row_count = 0
+        self.size_bytes = 0
+        self._parts: Optional[List[List[Dict[str, Any]]]] = None
+        self._names: List[str] = []
+        # Distinct text values seen per column, to size the merged dictionaries
+        self._distinct: Dict[int, set] = {}
+    
+    def add(self, frame: pd.DataFrame) -> bool:
+        """Encode one chunk; return False once the snapshot no longer fits max_bytes."""
+        if self._parts is None:
+            self._names = [str(col) for col in frame.columns]
+            self._parts = [[] for _ in self._names]
+        for i, col in enumerate(frame.columns):
+            declared = (self.declared_types.get(col) or '').upper()
+            part = ColumnarTable._encode_column(self._names[i], frame[col], declared)
+            if part['kind'] == 'text' and not len(part['dictionary']):
+                part['kind'] = 'empty'
+            self._parts[i].append(part)
+            self.size_bytes += part['valid'].nbytes
+            if part['kind'] in ('int', 'float', 'text'):
+                self.size_bytes += len(frame) * (4 if part['kind'] == 'text' else 8)
+            if part['kind'] == 'text':
+                seen = self._distinct.setdefault(i, set())
+                for value in part['dictionary']:
+                    if value not in seen:
+                        seen.add(value)
+                        self.size_bytes += len(value) + 49
+        self.row_count += len(frame)
+        return self.size_bytes <= self.max_bytes
+    
+    def build(self) -> ColumnarTable:
+        """Merge the encoded chunks into a snapshot."""
+        columns = [self._merge(name, parts) for name, parts in zip(self._names, self._parts or [])]
+        return ColumnarTable(self.name, self.generation, columns, self.row_count)
+    
+    def _merge(self, name: str, parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Concatenate one column's chunk encodings."""
+        valid = np.concatenate([part['valid'] for part in parts]) if parts else np.zeros(0, dtype=bool)
+        kinds = {part['kind'] for part in parts} - {'empty'}
+        column = {'name': name, 'kind': None, 'declared': parts[0]['declared'] if parts else '', 'valid': valid}
+        if not kinds:
+            column.update(kind='text', values=np.full(len(valid), -1, dtype='int32'),
+                          dictionary=np.empty(0, dtype=object))
+            return column
+        if len(kinds) > 1 or None in kinds:
+            return column
+        
+        kind = kinds.pop()
+        if kind == 'text':
+            dictionary = np.asarray(sorted({value for part in parts if part['kind'] == 'text'
+                                            for value in part['dictionary']}), dtype=object)
+            codes = []
+            for part in parts:
+                if part['kind'] == 'empty':
+                    codes.append(np.full(len(part['valid']), -1, dtype='int32'))
+                    continue
+                remap = np.searchsorted(dictionary, part['dictionary']).astype('int32')
+                codes.append(np.where(part['values'] >= 0, remap[np.maximum(part['values'], 0)], -1).astype('int32'))
+            column.update(kind='text', values=np.concatenate(codes), dictionary=dictionary)
+            return column
+        
+        dtype = 'int64' if kind == 'int' else 'float64'
+        filler = 0 if kind == 'int' else np.nan
+        values = [part['values'] if part['kind'] == kind else np.full(len(part['valid']), filler, dtype=dtype)
+                  for part in parts]
+        column.update(kind=kind, values=np.concatenate(values))
+        return column
+
+
+class ColumnarEngine:
+    """Answers simple single-table aggregate and top-N queries with vectorized NumPy.
+    
+    Works on plans from sql_parser.parse_simple_select(). Table snapshots are
+    kept in an LRU bounded by max_bytes and keyed by table generation, so a
+    replaced table is never answered from a stale snapshot. execute()
+    returns None whenever a query needs something the engine does not model
+    exactly, and the caller runs it on SQLite instead.
+    """
+    
+    # Row (non-aggregate) queries must be top-N queries no larger than this
+    MAX_TOP_N = 10000
+    
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        """Initialize an engine holding at most max_bytes of table snapshots."""
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.queries_answered = 0
+        self.queries_declined = 0
+        self._tables: "OrderedDict[str, ColumnarTable]" = OrderedDict()
+        # Generations of tables found too large to hold, so they aren't re-read per query
+        self._oversized: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    def get_table(self, table_name: str, generation: int) -> Optional[ColumnarTable]:
+        """Get the snapshot of a table at the given generation, if one is held."""
+        with self._lock:
+            table = self._tables.get(table_name)
+            if table is None or table.generation != generation:
+                return None
+            self._tables.move_to_end(table_name)
+            return table
+    
+    def put_table(self, table: ColumnarTable) -> bool:
+        """Hold a table snapshot, evicting least recently used ones to stay within budget.
+        
+        Returns False when the snapshot alone is larger than the whole budget.
+        """
+        if table.size_bytes > self.max_bytes:
+            self._oversized[table.name] = table.generation
+            return False
+        
+        with self._lock:
+            self._remove(table.name)
+            while self._tables and self.current_bytes + table.size_bytes > self.max_bytes:
+                self._remove(next(iter(self._tables)))
+            self._tables[table.name] = table
+            self.current_bytes += table.size_bytes
+        return True
+    
+    def reject(self, table_name: str, generation: int) -> None:
+        """Remember that a table generation is too large to hold, so it isn't read again."""
+        with self._lock:
+            self._oversized[table_name] = generation
+    
+    def accepts(self, table_name: str, generation: int) -> bool:
+        """Check whether a snapshot of this table generation could be held at all."""
+        return self._oversized.get(table_name) != generation
+    
+    def invalidate_table(self, table_name: str) -> None:
+        """Drop the snapshot of a table whose contents changed."""
+        with self._lock:
+            self._remove(table_name)
+    
+    def clear(self) -> None:
+        """Drop every snapshot."""
+        with self._lock:
+            self._tables.clear()
+            self._oversized.clear()
+            self.current_bytes = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get snapshot memory use and how many queries were answered or declined."""
+        with self._lock:
+            return {
+                'tables': list(self._tables),
+                'current_bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'queries_answered': self.queries_answered,
+                'queries_declined': self.queries_declined
+            }
+    
+    def _remove(self, table_name: str) -> None:
+        """Drop a snapshot (lock held)."""
+        table = self._tables.pop(table_name, None)
+        if table is not None:
+            self.current_bytes -= table.size_bytes
+    
+    def execute(self, plan: Dict[str, Any], table: ColumnarTable,
+                column_names: List[str]) -> Optional[pd.DataFrame]:
+        """Run a parsed query against a snapshot, or return None if it must go to SQLite.
+        
+        column_names are the result column names SQLite reports for the query.
+        """
+        try:
+            if any(item['bucket'] for item in plan['items']) or \
+                    any(term.get('bucket') for term in plan['group_by'] + plan['order_by']):
+                raise _Unsupported()  # date buckets are left to SQLite's strftime()
+            if plan['group_by'] or any(item['function'] for item in plan['items']):
+                outputs = self._execute_aggregate(plan, table)
+            else:
+                outputs = self._execute_top_n(plan, table)
+        except _Unsupported:
+            outputs = None
+        
+        if outputs is None or len(outputs) != len(column_names):
+            self.queries_declined += 1
+            return None
+        
+        self.queries_answered += 1
+        rows = zip(*(self._to_python(output) for output in outputs))
+        return pd.DataFrame.from_records(list(rows), columns=column_names, coerce_float=True)
+    
+    def _execute_aggregate(self, plan: Dict[str, Any], table: ColumnarTable) -> List[Dict[str, Any]]:
+        """Evaluate GROUP BY/aggregate queries; one output column per select item."""
+        group_columns = []
+        for reference in plan['group_by']:
+            if 'item' in reference:
+                item = plan['items'][reference['item']]
+                if item['function']:
+                    raise _Unsupported()
+                group_columns.append(self._column(table, item['column'])['name'].lower())
+            else:
+                group_columns.append(self._column(table, reference['column'])['name'].lower())
+        
+        rows = self._filter_rows(plan['where'], table)
+        group_ids, group_count, group_values = self._group_rows(table, group_columns, rows)
+        
+        outputs = []
+        for item in plan['items']:
+            if item['column'] == '*':
+                raise _Unsupported()
+            if item['function'] is None:
+                if item['column'] not in group_columns:
+                    raise _Unsupported()  # bare columns take an arbitrary row's value
+                outputs.append(group_values[group_columns.index(item['column'])])
+            else:
+                outputs.append(self._aggregate(item, table, rows, group_ids, group_count))
+        
+        order = self._order(plan['order_by'], outputs, group_columns, group_values, group_count)
+        return [self._take(output, self._page(order, plan)) for output in outputs]
+    
+    def _execute_top_n(self, plan: Dict[str, Any], table: ColumnarTable) -> List[Dict[str, Any]]:
+        """Evaluate SELECT columns ... ORDER BY ... LIMIT n over individual rows."""
+        if not plan['order_by'] or plan['limit'] is None or plan['limit'] > self.MAX_TOP_N:
+            raise _Unsupported()
+        
+        names = []
+        for item in plan['items']:
+            if item['column'] == '*':
+                names.extend(table.column_order)
+            else:
+                names.append(item['column'])
+        outputs = [self._row_output(self._column(table, name)) for name in names]
+        
+        sort_keys = []
+        for term in plan['order_by']:
+            if 'item' in term:
+                if plan['items'][term['item']]['column'] == '*':
+                    raise _Unsupported()
+                column_name = plan['items'][term['item']]['column']
+            else:
+                column_name = term['column']
+            sort_keys.append((self._row_output(self._column(table, column_name)), term['descending']))
+        
+        rows = self._filter_rows(plan['where'], table)
+        if rows is None:
+            rows = np.arange(table.row_count)
+        
+        wanted = plan['offset'] + plan['limit']
+        if len(rows) > 4 * wanted and wanted > 0:
+            # Only rows whose first sort key ties or beats the wanted-th best can make the page
+            first_key = self._sort_key(self._take(sort_keys[0][0], rows), sort_keys[0][1])
+            threshold = np.partition(first_key, wanted - 1)[wanted - 1]
+            rows = rows[first_key <= threshold]
+        
+        order = self._lexsort([(self._take(output, rows), descending) for output, descending in sort_keys])
+        selected = rows[order][plan['offset']:wanted]
+        return [self._take(output, selected) for output in outputs]
+    
+    def _column(self, table: ColumnarTable, column_name: str) -> Dict[str, Any]:
+        """Look up a column the engine can evaluate."""
+        column = table.columns.get(column_name)
+        if column is None or column['kind'] is None:
+            raise _Unsupported()
+        return column
+    
+    def _row_output(self, column: Dict[str, Any]) -> Dict[str, Any]:
+        """Describe a table column as an output column over all rows."""
+        output = {'kind': column['kind'], 'values': column['values'], 'valid': column['valid']}
+        if column['kind'] == 'text':
+            output['dictionary'] = column['dictionary']
+        return output
+    
+    def _filter_rows(self, conditions: List[Dict[str, Any]], table: ColumnarTable) -> Optional[np.ndarray]:
+        """Get the positions of rows passing every WHERE condition, or None for all rows."""
+        if not conditions:
+            return None
+        
+        mask = np.ones(table.row_count, dtype=bool)
+        for condition in conditions:
+            mask &= self._condition_mask(condition, self._column(table, condition['column']))
+        return np.flatnonzero(mask)
+    
+    def _condition_mask(self, condition: Dict[str, Any], column: Dict[str, Any]) -> np.ndarray:
+        """Evaluate one condition; comparisons with NULL are never true, as in SQL."""
+        op = condition['op']
+        valid = column['valid']
+        if op == 'is null':
+            return ~valid
+        if op == 'is not null':
+            return valid.copy()
+        
+        values = condition['values']
+        if column['kind'] == 'text':
+            if not all(isinstance(value, str) for value in values):
+                raise _Unsupported()
+            # Columns with numeric affinity convert number-like literals before comparing
+            if 'TEXT' not in column['declared'] and 'CHAR' not in column['declared'] \
+                    and 'CLOB' not in column['declared'] and any(self._is_number(value) for value in values):
+                raise _Unsupported()
+            return self._text_mask(op, values, column)
+        
+        if not all(isinstance(value, (int, float)) for value in values):
+            raise _Unsupported()
+        data = column['values']
+        if op == 'in':
+            return valid & np.isin(data, values)
+        if op == 'between':
+            return valid & (data >= values[0]) & (data <= values[1])
+        return valid & self._compare(data, op, values[0])
+    
+    def _text_mask(self, op: str, values: List[str], column: Dict[str, Any]) -> np.ndarray:
+        """Evaluate a condition on dictionary codes by locating literals in the sorted dictionary."""
+        codes = column['values']
+        dictionary = column['dictionary']
+        valid = codes >= 0
+        
+        def code_of(value):
+            position = int(np.searchsorted(dictionary, value))
+            found = position < len(dictionary) and dictionary[position] == value
+            return position if found else None
+        
+        if op in ('=', '!=', 'in'):
+            matches = [code for code in map(code_of, values) if code is not None]
+            mask = np.isin(codes, matches)
+            return valid & ~mask if op == '!=' else mask
+        
+        if op == 'between':
+            low = np.searchsorted(dictionary, values[0], side='left')
+            high = np.searchsorted(dictionary, values[1], side='right')
+            return valid & (codes >= low) & (codes < high)
+        
+        # Codes follow the dictionary's sort order, so ranges map to code ranges
+        value = values[0]
+        if op == '<':
+            return valid & (codes < np.searchsorted(dictionary, value, side='left'))
+        if op == '<=':
+            return valid & (codes < np.searchsorted(dictionary, value, side='right'))
+        if op == '>':
+            return codes >= np.searchsorted(dictionary, value, side='right')
+        return codes >= np.searchsorted(dictionary, value, side='left')
+    
+    def _compare(self, data: np.ndarray, op: str, value: Any) -> np.ndarray:
+        """Apply a comparison operator elementwise."""
+        if op == '=':
+            return data == value
+        if op == '!=':
+            return data != value
+        if op == '<':
+            return data < value
+        if op == '<=':
+            return data <= value
+        if op == '>':
+            return data > value
+        return data >= value
+    
+    def _is_number(self, value: str) -> bool:
+        """Check whether a string literal looks numeric to SQLite."""
+        try:
+            float(value)
+            return True
+        except ValueError:
+            return False
+    
+    def _group_rows(self, table: ColumnarTable, group_columns: List[str],
+                    rows: Optional[np.ndarray]) -> Tuple[np.ndarray, int, List[Dict[str, Any]]]:
+        """Assign rows to groups ordered like SQLite's GROUP BY output (NULL keys first).
+        
+        Returns the group id of each selected row, the number of groups and
+        one output column of key values per grouping column.
+        """
+        row_count = table.row_count if rows is None else len(rows)
+        if not group_columns:
+            return np.zeros(row_count, dtype='int64'), 1, []
+        
+        combined = np.zeros(row_count, dtype='int64')
+        radix = 1
+        key_parts = []
+        for column_name in group_columns:
+            codes, uniques = table.group_codes(column_name)
+            if rows is not None:
+                codes = codes[rows]
+            radix *= len(uniques) + 1
+            if radix >= 2 ** 62:
+                raise _Unsupported()
+            combined = combined * (len(uniques) + 1) + (codes.astype('int64') + 1)
+            key_parts.append((column_name, uniques))
+        
+        group_keys, group_ids = np.unique(combined, return_inverse=True)
+        
+        group_values = []
+        remaining = group_keys
+        decoded = []
+        for column_name, uniques in reversed(key_parts):
+            remaining, codes = np.divmod(remaining, len(uniques) + 1)
+            decoded.append((column_name, uniques, codes - 1))
+        for column_name, uniques, codes in reversed(decoded):
+            column = table.columns[column_name]
+            valid = codes >= 0
+            if column['kind'] == 'text':
+                group_values.append({'kind': 'text', 'values': codes, 'valid': valid, 'dictionary': uniques})
+            else:
+                values = np.zeros(len(codes), dtype=uniques.dtype)
+                values[valid] = uniques[codes[valid]]
+                group_values.append({'kind': column['kind'], 'values': values, 'valid': valid})
+        
+        return group_ids.reshape(-1), len(group_keys), group_values
+    
+    def _aggregate(self, item: Dict[str, Any], table: ColumnarTable, rows: Optional[np.ndarray],
+                   group_ids: np.ndarray, group_count: int) -> Dict[str, Any]:
+        """Compute one aggregate per group with SQLite's NULL and typing rules."""
+        function = item['function']
+        all_valid = np.ones(group_count, dtype=bool)
+        
+        if item['column'] is None:  # COUNT(*)
+            return {'kind': 'int', 'values': np.bincount(group_ids, minlength=group_count), 'valid': all_valid}
+        
+        column = self._column(table, item['column'])
+        valid = column['valid'] if rows is None else column['valid'][rows]
+        values = column['values'] if rows is None else column['values'][rows]
+        groups = group_ids[valid]
+        values = values[valid]
+        counts = np.bincount(groups, minlength=group_count)
+        has_values = counts > 0
+        
+        if function == 'count':
+            return {'kind': 'int', 'values': counts, 'valid': all_valid}
+        
+        if function in ('min', 'max'):
+            result = np.zeros(group_count, dtype=values.dtype)
+            if len(values):
+                order = np.argsort(groups, kind='stable')
+                sorted_groups = groups[order]
+                starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+                reducer = np.minimum if function == 'min' else np.maximum
+                result[sorted_groups[starts]] = reducer.reduceat(values[order], starts)
+            output = {'kind': column['kind'], 'values': result, 'valid': has_values}
+            if column['kind'] == 'text':
+                output['dictionary'] = column['dictionary']
+            return output
+        
+        if column['kind'] == 'text':
+            raise _Unsupported()  # SUM/AVG coerce text to numbers
+        
+        sums = self._group_sums(values, groups, group_count, column['kind'])
+        if function == 'avg':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                averages = sums.astype('float64') / np.maximum(counts, 1)
+            return {'kind': 'float', 'values': averages, 'valid': has_values}
+        return {'kind': column['kind'], 'values': sums, 'valid': has_values}
+    
+    def _group_sums(self, values: np.ndarray, groups: np.ndarray, group_count: int, kind: str) -> np.ndarray:
+        """Sum values per group.
+        
+        bincount adds each group's values in row order with a plain double
+        sum for REAL columns. That matches SQLite before 3.43; from 3.43 on
+        SQLite's SUM/AVG use Kahan-Babuska-Neumaier compensated summation,
+        so REAL results can differ from SQLite's in the last few bits.
+        Integer sums stay exact: they go through float64 only when every
+        partial sum fits in 53 bits.
+        """
+        if kind == 'float':
+            return np.bincount(groups, weights=values, minlength=group_count)
+        
+        magnitude = float(np.abs(values.astype('float64')).sum()) if len(values) else 0.0
+        if magnitude < 2 ** 53:
+            return np.rint(np.bincount(groups, weights=values, minlength=group_count)).astype('int64')
+        if magnitude >= 2 ** 63:
+            raise _Unsupported()  # may overflow, which SQLite reports as an error
+        
+        sums = np.zeros(group_count, dtype='int64')
+        order = np.argsort(groups, kind='stable')
+        sorted_groups = groups[order]
+        starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+        sums[sorted_groups[starts]] = np.add.reduceat(values[order], starts)
+        return sums
+    
+    def _order(self, order_by: List[Dict[str, Any]], outputs: List[Dict[str, Any]],
+               group_columns: List[str], group_values: List[Dict[str, Any]],
+               group_count: int) -> np.ndarray:
+        """Get the output row order for an aggregate query's ORDER BY terms."""
+        if not order_by:
+            return np.arange(group_count)
+        
+        keys = []
+        for term in order_by:
+            if 'item' in term:
+                keys.append((outputs[term['item']], term['descending']))
+            elif term['column'] in group_columns:
+                keys.append((group_values[group_columns.index(term['column'])], term['descending']))
+            else:
+                raise _Unsupported()
+        return self._lexsort(keys)
+    
+    def _lexsort(self, keys: List[Tuple[Dict[str, Any], bool]]) -> np.ndarray:
+        """Stable sort by several output columns; NULL sorts before any value, as in SQLite."""
+        sort_arrays = []
+        for output, descending in reversed(keys):
+            values = output['values']
+            null_rank = (~output['valid']).astype('int8')
+            if descending:
+                sort_arrays.extend([-values, null_rank])
+            else:
+                sort_arrays.extend([values, -null_rank])
+        return np.lexsort(sort_arrays)
+    
+    def _sort_key(self, output: Dict[str, Any], descending: bool) -> np.ndarray:
+        """Collapse one output column into a single ascending key, used to prune top-N candidates."""
+        values = output['values'].astype('float64')
+        low = -np.inf
+        if descending:
+            values = -values
+            low = np.inf
+        return np.where(output['valid'], values, low)
+    
+    def _page(self, order: np.ndarray, plan: Dict[str, Any]) -> np.ndarray:
+        """Apply OFFSET and LIMIT to an ordering."""
+        end = None if plan['limit'] is None else plan['offset'] + plan['limit']
+        return order[plan['offset']:end]
+    
+    def _take(self, output: Dict[str, Any], positions: np.ndarray) -> Dict[str, Any]:
+        """Select rows of an output column."""
+        taken = dict(output)
+        taken['values'] = output['values'][positions]
+        taken['valid'] = output['valid'][positions]
+        return taken
+    
+    def _to_python(self, output: Dict[str, Any]) -> List[Any]:
+        """Convert an output column to Python values with None for NULL."""
+        if output['kind'] == 'text':
+            values = output['dictionary'][np.maximum(output['values'], 0)].tolist() if len(output['dictionary']) \
+                else [None] * len(output['values'])
+        else:
+            values = output['values'].tolist()
+        return [value if valid else None for value, valid in zip(values, output['valid'].tolist())]
+
+
+class _Unsupported(Exception):
+    """Raised inside ColumnarEngine when a plan needs behaviour it does not model exactly."""
@@ -0,0 +1,154 @@
+import math
+import re
+from typing import Dict, Any, List, Optional
+from sql_parser import normalize_sql, tokenize_sql, extract_table_aliases
+
+# Functions and keywords whose result needs every input row before the first
+# output row, so a LIMIT doesn't shorten the work
+_AGGREGATES = {'count', 'sum', 'avg', 'min', 'max', 'total', 'group_concat'}
+_BLOCKING_WORDS = {'group', 'distinct', 'over'}
+
+_TRAILING_LIMIT = re.compile(r'\blimit\s+(\d+)(?:\s*(?:offset|,)\s*(\d+))?$')
+
+
+def estimate_limited_cost(query: str, estimate: Dict[str, Any], limit: Optional[int]) -> Optional[float]:
+    """Estimate the cost of a query stopped after limit output rows.
+    
+    estimate is DatabaseManager.estimate_query_cost()'s result. Without
+    blocking steps SQLite streams rows, so the work shrinks in proportion
+    to the share of the output that is read. Sorts, grouping, aggregates
+    and automatic indexes consume all their input first, in which case
+    None is returned.
+    """
+    if limit is None or _needs_all_input(query, estimate):
+        return None
+    fraction = min(1.0, limit / max(estimate['rows'], 1.0))
+    return estimate['cost'] * fraction
+
+
+def _needs_all_input(query: str, estimate: Dict[str, Any]) -> bool:
+    """Check whether the query must read all its input before returning a row."""
+    if estimate['temp_btrees'] or estimate['automatic_indexes']:
+        return True
+    tokens = tokenize_sql(query)
+    for i, (kind, value) in enumerate(tokens):
+        if kind != 'name':
+            continue
+        if value in _BLOCKING_WORDS:
+            return True
+        if value in _AGGREGATES and i + 1 < len(tokens) and tokens[i + 1][1] == '(':
+            return True
+    return False
+
+
+class QueryCostError(Exception):
+    """Raised when a query's estimated cost is over the guard's threshold."""
+
+
+class QueryCostGuard:
+    """Checks a query's estimated cost before it runs and stops runaway queries.
+    
+    The cost comes from DatabaseManager.estimate_query_cost(): SQLite's
+    EXPLAIN QUERY PLAN combined with the tables' row counts, so full scans,
+    nested-loop joins, temp B-tree sorts and correlated subqueries are
+    priced by the sizes of the tables they touch (the plan already shows
+    which indexes SQLite can use). A query over max_cost is rejected, or
+    with on_exceed='limit' gets a LIMIT of auto_limit rows when that brings
+    the estimate under the threshold.
+    """
+    
+    # Estimated rows visited; a full scan of a 50M-row table takes seconds
+    MAX_COST = 50_000_000
+    AUTO_LIMIT = 10000
+    
+    def __init__(self, db_manager, max_cost: float = MAX_COST, on_exceed: str = 'limit',
+                 auto_limit: int = AUTO_LIMIT):
+        """Initialize with the database, the cost threshold and what to do above it ('limit' or 'reject')."""
+        if on_exceed not in ('limit', 'reject'):
+            raise ValueError(f"Unknown on_exceed action: {on_exceed}")
+        self.db_manager = db_manager
+        self.max_cost = max_cost
+        self.on_exceed = on_exceed
+        self.auto_limit = auto_limit
+    
+    def check(self, query: str) -> Dict[str, Any]:
+        """Estimate a query's cost and decide whether it may run.
+        
+        Returns {'action': 'run' | 'limit' | 'reject', 'query': the SQL to
+        run (with the added LIMIT for 'limit'), 'estimated_cost',
+        'limited_cost' (None if a LIMIT can't shorten the query),
+        'rows_scanned' and 'reasons' (the plan steps behind the cost)}.
+        """
+        estimate = self.db_manager.estimate_query_cost(query)
+        limited_cost = estimate_limited_cost(query, estimate, self._own_limit(query))
+        cost = estimate['cost'] if limited_cost is None else limited_cost
+        decision = {
+            'action': 'run',
+            'query': query,
+            'estimated_cost': cost,
+            'limited_cost': None,
+            'rows_scanned': int(estimate['rows_scanned']),
+            'reasons': self._reasons(query, estimate)
+        }
+        if cost <= self.max_cost:
+            return decision
+        
+        decision['action'] = 'reject'
+        if self.on_exceed == 'limit' and self._own_limit(query) is None:
+            auto_limited_cost = estimate_limited_cost(query, estimate, self.auto_limit)
+            if auto_limited_cost is not None and auto_limited_cost <= self.max_cost:
+                decision.update(
+                    action='limit',
+                    query=f"{self.db_manager._strip_query(query)}\nLIMIT {self.auto_limit}",
+                    limited_cost=auto_limited_cost
+                )
+        return decision
+    
+    def enforce(self, query: str) -> Dict[str, Any]:
+        """Check a query like check(), raising QueryCostError if it must not run."""
+        decision = self.check(query)
+        if decision['action'] == 'reject':
+            raise QueryCostError(
+                f"Query rejected before execution: estimated cost {decision['estimated_cost']:,.0f} "
+                f"is over the limit of {self.max_cost:,.0f} ({'; '.join(decision['reasons'][:3])}). "
+                "Add filters on indexed columns, aggregate, or add a LIMIT."
+            )
+        return decision
+    
+    def _own_limit(self, query: str) -> Optional[int]:
+        """Get the rows a query's trailing LIMIT (plus OFFSET) lets it read, if it has one."""
+        match = _TRAILING_LIMIT.search(normalize_sql(query))
+        if match is None:
+            return None
+        return int(match.group(1)) + int(match.group(2) or 0)
+    
+    def _reasons(self, query: str, estimate: Dict[str, Any]) -> List[str]:
+        """Describe the plan steps that drive the cost, most expensive first."""
+        # Plans name tables by their alias
+        aliases = extract_table_aliases(query, self.db_manager.get_table_names())
+        weighted = []
+        scans: Dict[str, Dict[str, Any]] = {}
+        for scan in estimate['full_scans']:
+            table = aliases.get(scan['table'].lower(), scan['table'])
+            entry = scans.setdefault(table, {'rows': scan['rows'], 'count': 0})
+            entry['count'] += 1
+        for table, entry in scans.items():
+            index_note = 'no usable index' if self._indexes(table) else 'no indexes'
+            repeat = f" ×{entry['count']}" if entry['count'] > 1 else ""
+            weighted.append((entry['rows'] * entry['count'],
+                             f"full scan of {table}{repeat} ({entry['rows']:,.0f} rows, {index_note})"))
+        for btree in estimate['temp_btrees']:
+            weighted.append((btree['rows'] * math.log2(btree['rows'] + 1),
+                             f"{btree['detail'].lower()} over ~{btree['rows']:,.0f} rows"))
+        for index in estimate['automatic_indexes']:
+            weighted.append((float('inf'), f"automatic index built on {aliases.get(index['table'].lower(), index['table'])}"))
+        if estimate['correlated_subqueries']:
+            weighted.append((float('inf'), f"{estimate['correlated_subqueries']} correlated subquery(ies) re-run per outer row"))
+        return [reason for _, reason in sorted(weighted, key=lambda item: -item[0])]
+    
+    def _indexes(self, table: str) -> List[Dict[str, Any]]:
+        """Get a table's indexes, or none for names that aren't tables (e.g. subqueries)."""
+        try:
+            return self.db_manager.get_indexes(table)
+        except Exception:
+            return []
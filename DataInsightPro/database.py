@@ -1,48 +1,924 @@
 import sqlite3
 import pandas as pd
 import os
+import json
 import tempfile
-from typing import List, Dict, Any, Optional
+import time
+import queue
+import threading
+import uuid
+import re
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.request import pathname2url
+from typing import List, Dict, Any, Optional, Callable, Iterable, Iterator, Tuple
+from query_cache import QueryResultCache
+from sql_parser import normalize_sql, referenced_tables, is_deterministic, extract_table_aliases, extract_cte_names, parse_simple_select
+from query_plan import estimate_plan_cost, format_plan
+from columnar import ColumnarEngine, ColumnarTableBuilder
+from rollups import RollupManager
+from sampling import SampleManager
+from sketches import TableSummarizer
+
+class QueryCancelledError(Exception):
+    """Raised when a query is interrupted by its deadline or an explicit cancel."""
+
+
+class QueryResultStream:
+    """Iterates over a query result as DataFrame chunks read from a cursor.
+    
+    Iteration stops once max_rows rows or max_bytes bytes have been produced;
+    `truncated` tells whether rows were left unread and total_rows() reports
+    the true size of the result on request. Complete results are stored in
+    the manager's result cache and later streams of the same query are
+    served from it.
+    
+    While a cursor is open the stream holds a read connection (for an
+    in-memory database, the write lock). Use the stream as a context
+    manager or call close() so a partly read stream gives it back at once.
+    """
+    
+    def __init__(self, db_manager: 'DatabaseManager', query: str, chunk_size: int,
+                 max_rows: Optional[int], max_bytes: Optional[int], use_cache: bool = True,
+                 timeout: Optional[float] = None, query_id: Optional[str] = None):
+        self.db_manager = db_manager
+        self.query = query
+        self.chunk_size = chunk_size
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.use_cache = use_cache
+        self.timeout = timeout
+        self.query_id = query_id or uuid.uuid4().hex
+        self.columns: List[str] = []
+        self.rows_returned = 0
+        self.bytes_returned = 0
+        self.truncated = False
+        self.from_cache = False
+        self.execution_seconds = 0.0
+        self.vm_steps = 0
+        self.engine = 'sqlite'
+        self.rollup = None
+        self.sql = query
+        self._total_rows = None
+        self._iterator = None
+        self._exhausted = False
+    
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        self.close()
+        self._exhausted = False
+        self._iterator = self._iter_chunks()
+        return self._iterator
+    
+    def __enter__(self) -> 'QueryResultStream':
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+    
+    def close(self) -> None:
+        """Stop reading and give back the connection; a stream closed part-way counts as truncated."""
+        if self._iterator is None:
+            return
+        if not self._exhausted:
+            self.truncated = True
+        self._iterator.close()
+        self._iterator = None
+    
+    def _iter_chunks(self) -> Iterator[pd.DataFrame]:
+        """Produce the result's chunks from the cache, the columnar engine or a cursor."""
+        yield from self._read_chunks()
+        self._exhausted = True
+    
+    def _read_chunks(self) -> Iterator[pd.DataFrame]:
+        """Read chunks from wherever the query is answered, caching a complete result."""
+        cache_key = self.db_manager._result_cache_key(self.query) if self.use_cache else None
+        if cache_key is not None:
+            cached = self.db_manager.result_cache.get(cache_key)
+            if cached is not None:
+                self.from_cache = True
+                self._total_rows = len(cached)
+                yield from self._iter_cached(cached)
+                return
+        
+        started = time.perf_counter()
+        route = self.db_manager._route_query(self.query)
+        self.engine = route['engine']
+        self.rollup = route['rollup']
+        self.sql = route['sql']
+        columnar_result = route['result']
+        if columnar_result is not None:
+            self.execution_seconds = time.perf_counter() - started
+            self._total_rows = len(columnar_result)
+            if cache_key is not None:
+                self.db_manager.result_cache.put(cache_key, columnar_result, [table for table, _ in cache_key[1]])
+            yield from self._iter_cached(columnar_result)
+            return
+        
+        chunks = []
+        for chunk in self._iter_cursor():
+            if cache_key is not None:
+                chunks.append(chunk)
+            yield chunk
+        
+        if cache_key is not None and not self.truncated:
+            result = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=self.columns)
+            self.db_manager.result_cache.put(cache_key, result, [table for table, _ in cache_key[1]])
+    
+    def _iter_cursor(self) -> Iterator[pd.DataFrame]:
+        """Fetch chunks from a fresh cursor until the result or a cap is exhausted."""
+        with self.db_manager._read_connection() as connection, \
+                self.db_manager._query_deadline(connection, self.query, self.timeout, self.query_id) as deadline:
+            try:
+                yield from self._fetch_chunks(connection.cursor())
+            finally:
+                self.vm_steps = deadline['progress_calls'] * self.db_manager.PROGRESS_HANDLER_INTERVAL
+    
+    def _fetch_chunks(self, cursor: sqlite3.Cursor) -> Iterator[pd.DataFrame]:
+        """Read chunks from a cursor, closing it when done."""
+        try:
+            started = time.perf_counter()
+            cursor.execute(self.sql)
+            self.columns = [col[0] for col in cursor.description or []]
+            self.execution_seconds += time.perf_counter() - started
+            
+            while True:
+                fetch_size = self._next_fetch_size()
+                if fetch_size <= 0:
+                    self.truncated = cursor.fetchone() is not None
+                    break
+                
+                started = time.perf_counter()
+                rows = cursor.fetchmany(fetch_size)
+                self.execution_seconds += time.perf_counter() - started
+                if not rows:
+                    break
+                
+                chunk = pd.DataFrame.from_records(rows, columns=self.columns, coerce_float=True)
+                yield self._count_chunk(chunk)
+                
+                if self.max_bytes is not None and self.bytes_returned >= self.max_bytes:
+                    self.truncated = cursor.fetchone() is not None
+                    break
+        except Exception as e:
+            raise Exception(f"Error executing query: {str(e)}")
+        finally:
+            cursor.close()
+    
+    def _iter_cached(self, result: pd.DataFrame) -> Iterator[pd.DataFrame]:
+        """Replay a cached result in chunks, applying the same caps as a cursor read."""
+        self.columns = list(result.columns)
+        position = 0
+        while position < len(result):
+            fetch_size = self._next_fetch_size()
+            if fetch_size <= 0:
+                self.truncated = True
+                return
+            
+            yield self._count_chunk(result.iloc[position:position + fetch_size].reset_index(drop=True))
+            position += fetch_size
+            
+            if self.max_bytes is not None and self.bytes_returned >= self.max_bytes:
+                self.truncated = position < len(result)
+                return
+    
+    def _next_fetch_size(self) -> int:
+        """Get how many rows the next chunk may hold under the row cap."""
+        if self.max_rows is None:
+            return self.chunk_size
+        return min(self.chunk_size, self.max_rows - self.rows_returned)
+    
+    def _count_chunk(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Account a chunk against the row and byte caps."""
+        self.rows_returned += len(chunk)
+        self.bytes_returned += int(chunk.memory_usage(deep=True).sum())
+        return chunk
+    
+    def get_telemetry(self) -> Dict[str, Any]:
+        """Describe how the query executed, for recording alongside its history entry.
+        
+        execution_ms counts only time spent inside SQLite, not time the
+        consumer spent between chunks; rows_scanned is estimated from the
+        query plan and table row counts.
+        """
+        telemetry = {
+            'execution_ms': self.execution_seconds * 1000,
+            'rows_returned': self.rows_returned,
+            'result_bytes': self.bytes_returned,
+            'vm_steps': self.vm_steps,
+            'from_cache': self.from_cache,
+            'engine': self.engine,
+            'rollup': self.rollup,
+            'truncated': self.truncated
+        }
+        try:
+            telemetry.update(self.db_manager.analyze_query_plan(self.query))
+        except Exception:
+            telemetry.update({'rows_scanned': None, 'query_plan': []})
+        return telemetry
+    
+    def to_dataframe(self) -> pd.DataFrame:
+        """Consume the stream and return the (possibly capped) result."""
+        chunks = list(self)
+        if not chunks:
+            return pd.DataFrame(columns=self.columns)
+        return pd.concat(chunks, ignore_index=True)
+    
+    def total_rows(self) -> int:
+        """Get the number of rows in the full, uncapped result."""
+        if self._total_rows is None:
+            if self.truncated or self.rows_returned == 0:
+                self._total_rows = self.db_manager.count_query_rows(self.query, timeout=self.timeout)
+            else:
+                self._total_rows = self.rows_returned
+        return self._total_rows
+
 
 class DatabaseManager:
     """Manages SQLite database operations for the data analysis tool."""
     
-    def __init__(self, db_path: str = ":memory:"):
-        """Initialize database manager with in-memory database by default."""
+    # Rows per executemany() batch and rows per committed transaction for bulk loads
+    BULK_CHUNK_SIZE = 10000
+    BULK_TRANSACTION_SIZE = 100000
+    
+    # Load-time pragmas applied while bulk loading and restored afterwards
+    BULK_LOAD_PRAGMAS = {
+        'journal_mode': 'OFF',
+        'synchronous': 'OFF',
+        'cache_size': -262144  # 256 MB
+    }
+    
+    # Defaults for streamed query results
+    STREAM_CHUNK_SIZE = 1000
+    STREAM_MAX_ROWS = 100000
+    STREAM_MAX_BYTES = 256 * 1024 * 1024
+    
+    # Memory budget for cached query results
+    RESULT_CACHE_BYTES = 128 * 1024 * 1024
+    
+    # Row counts of recent queries kept for paging through their results
+    COUNT_CACHE_SIZE = 256
+    
+    # Memory budget for columnar table snapshots. The engine is opt-in: 0
+    # (the default) disables it, e.g. 256 * 1024 * 1024 enables it
+    COLUMNAR_MAX_BYTES = 0
+    COLUMNAR_LOAD_CHUNK_ROWS = 50000
+    
+    # File-backed databases: read-only connections checked out per query and
+    # the memory-mapped I/O size applied to every connection
+    READ_POOL_SIZE = 4
+    MMAP_SIZE = 256 * 1024 * 1024
+    CONNECT_TIMEOUT = 30.0
+    
+    # Query deadlines in seconds. LLM-generated SQL gets a shorter leash than
+    # SQL an analyst wrote on purpose; None disables the deadline
+    DEFAULT_QUERY_TIMEOUT = 60.0
+    NL_QUERY_TIMEOUT = 30.0
+    MANUAL_QUERY_TIMEOUT = 120.0
+    
+    # SQLite virtual machine instructions between deadline/cancellation checks
+    PROGRESS_HANDLER_INTERVAL = 10000
+    
+    # Internal bookkeeping tables start with an underscore, which user tables never do
+    STATS_CATALOG_TABLE = "_di_table_stats"
+    STAGING_TABLE_PREFIX = "_di_load_"
+    
+    # Columns profiled per aggregate scan; each column costs 7 result expressions
+    # and SQLite caps a result row at 2000 columns by default
+    PROFILE_COLUMNS_PER_SCAN = 250
+    PROFILE_SAMPLE_ROWS = 100
+    PROFILE_SAMPLE_VALUES = 3
+    
+    def __init__(self, db_path: str = ":memory:", result_cache_bytes: int = RESULT_CACHE_BYTES,
+                 read_pool_size: int = READ_POOL_SIZE, mmap_size: int = MMAP_SIZE,
+                 columnar_max_bytes: int = COLUMNAR_MAX_BYTES):
+        """Initialize database manager with in-memory database by default.
+        
+        A file path enables file-backed mode: the database is switched to WAL
+        journaling, `connection` becomes the single writer and queries run on
+        a bounded pool of read-only connections, so reads proceed in parallel
+        with each other and with an ongoing upload. In-memory databases share
+        one connection, serialised by a lock.
+        
+        With columnar_max_bytes set, simple single-table aggregate and top-N
+        queries are answered by a columnar engine over NumPy snapshots of
+        the tables they read (see columnar.py), holding at most that many
+        bytes; the default of 0 always uses SQLite.
+        """
         self.db_path = db_path
-        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.file_backed = db_path != ":memory:" and not db_path.startswith("file::memory:")
+        self.mmap_size = mmap_size
+        self.read_pool_size = read_pool_size
+        self._write_lock = threading.RLock()
+        self._read_pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._read_connections: List[sqlite3.Connection] = []
+        self._pool_lock = threading.Lock()
+        self._running_queries: Dict[str, Dict[str, Any]] = {}
+        self._columnar_loads = set()
+        
+        self.connection = sqlite3.connect(db_path, check_same_thread=False, timeout=self.CONNECT_TIMEOUT)
         self.connection.execute("PRAGMA foreign_keys = ON")
+        if self.file_backed:
+            self.connection.execute("PRAGMA journal_mode = WAL")
+            self.connection.execute("PRAGMA synchronous = NORMAL")
+            self.connection.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+        self.last_load_stats = None
+        self.result_cache = QueryResultCache(result_cache_bytes)
+        self._count_cache: "OrderedDict[Tuple, int]" = OrderedDict()
+        self.columnar = ColumnarEngine(columnar_max_bytes) if columnar_max_bytes else None
+        
+        # Per-table column statistics, persisted in the database and cached here
+        self._stats_cache: Dict[str, Dict[str, Any]] = {}
+        
+        # Generation counters bump whenever a table's contents are replaced,
+        # so caches keyed by (table, generation) never serve stale entries
+        self._table_generations: Dict[str, int] = {}
+        self._schema_cache: Dict[str, Dict[str, Any]] = {}
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.STATS_CATALOG_TABLE} ("
+            "table_name TEXT PRIMARY KEY, profile TEXT NOT NULL, profiled_at TEXT NOT NULL)"
+        )
+        self.connection.commit()
+        self.rollups = RollupManager(self)
+        self.samples = SampleManager(self)
+        self.summaries = TableSummarizer(self)
+    
+    def create_table_from_dataframe(self, df: pd.DataFrame, table_name: str,
+                                    bulk_load: bool = False,
+                                    chunk_size: Optional[int] = None,
+                                    progress_callback: Optional[Callable[[int, Optional[int]], None]] = None,
+                                    build_rollups: bool = False,
+                                    build_sample: bool = False) -> Dict[str, Any]:
+        """Create a table from a pandas DataFrame.
+        
+        With bulk_load=True the frame is streamed into SQLite in fixed-size
+        chunks instead of being handed to df.to_sql in one call. With
+        build_rollups=True rollup tables are materialised once the data is
+        loaded (see rollups.py), and with build_sample=True a stratified
+        sample is drawn for approximate queries (see sampling.py). Returns
+        the load statistics (rows, seconds, rows_per_sec, and the rollups
+        and sample built).
+        """
+        if bulk_load:
+            chunk_size = chunk_size or self.BULK_CHUNK_SIZE
+            return self.bulk_load_frames(
+                self._iter_dataframe_chunks(df, chunk_size),
+                table_name,
+                total_rows=len(df),
+                chunk_size=chunk_size,
+                progress_callback=progress_callback,
+                build_rollups=build_rollups,
+                build_sample=build_sample
+            )
         
-    def create_table_from_dataframe(self, df: pd.DataFrame, table_name: str) -> None:
-        """Create a table from a pandas DataFrame."""
         try:
+            start_time = time.perf_counter()
+            
             # Clean table name
             clean_table_name = self._clean_table_name(table_name)
             
-            # Drop table if exists
-            self.connection.execute(f"DROP TABLE IF EXISTS {clean_table_name}")
+            with self._write_lock:
+                # Drop table if exists
+                self.connection.execute(f"DROP TABLE IF EXISTS {clean_table_name}")
+                self._invalidate_table(clean_table_name)
+                
+                # Create table from DataFrame
+                df.to_sql(clean_table_name, self.connection, index=False, if_exists='replace')
+                self.connection.commit()
             
-            # Create table from DataFrame
-            df.to_sql(clean_table_name, self.connection, index=False, if_exists='replace')
-            self.connection.commit()
+            if progress_callback:
+                progress_callback(len(df), len(df))
             
+            load_stats = self._record_load_stats(clean_table_name, len(df), len(df.columns), 1, start_time)
+            if build_rollups:
+                load_stats['rollups'] = self.rollups.build(clean_table_name)
+            if build_sample:
+                load_stats['sample'] = self.samples.build(clean_table_name)
+            return load_stats
+        
         except Exception as e:
             raise Exception(f"Error creating table from DataFrame: {str(e)}")
     
-    def execute_query(self, query: str) -> pd.DataFrame:
-        """Execute a SQL query and return results as DataFrame."""
+    def bulk_load_frames(self, frames: Iterable[pd.DataFrame], table_name: str,
+                         total_rows: Optional[int] = None,
+                         chunk_size: Optional[int] = None,
+                         progress_callback: Optional[Callable[[int, Optional[int]], None]] = None,
+                         build_rollups: bool = False,
+                         build_sample: bool = False,
+                         column_types: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Replace a table with rows streamed from an iterable of DataFrames.
+        
+        The table's columns are taken from the first frame and declared with
+        the SQLite types in column_types, falling back to the types of the
+        first frame's dtypes for columns it doesn't name. Rows are inserted with
+        executemany() in chunks of chunk_size and committed every
+        BULK_TRANSACTION_SIZE rows, with load-time pragmas in effect for the
+        duration of the load. progress_callback(rows_loaded, total_rows) is
+        called after every chunk. build_rollups=True materialises rollup
+        tables after the load and build_sample=True draws a sample for
+        approximate queries.
+        """
+        chunk_size = chunk_size or self.BULK_CHUNK_SIZE
+        clean_table_name = self._clean_table_name(table_name)
+        
+        with self._write_lock:
+            load_stats = self._bulk_load(frames, clean_table_name, total_rows, chunk_size,
+                                         progress_callback, column_types)
+            if build_rollups:
+                load_stats['rollups'] = self.rollups.build(clean_table_name)
+            if build_sample:
+                load_stats['sample'] = self.samples.build(clean_table_name)
+            return load_stats
+    
+    def import_table(self, source_path: str, table_name: str,
+                     build_rollups: bool = False, build_sample: bool = False) -> Dict[str, Any]:
+        """Replace a table with a copy of the same-named table in another SQLite file.
+        
+        The file is ATTACHed and its rows copied with one INSERT ... SELECT,
+        so tables built elsewhere (e.g. by worker processes) load without
+        passing through pandas. The table keeps its declared column types.
+        """
+        clean_table_name = self._clean_table_name(table_name)
+        
+        with self._write_lock:
+            start_time = time.perf_counter()
+            self.connection.commit()
+            self.connection.execute("ATTACH DATABASE ? AS di_import", (source_path,))
+            try:
+                row = self.connection.execute(
+                    "SELECT sql FROM di_import.sqlite_master WHERE type = 'table' AND name = ?",
+                    (clean_table_name,)
+                ).fetchone()
+                if row is None:
+                    raise ValueError(f"Table {clean_table_name} not found in {source_path}")
+                column_count = len(self.connection.execute(
+                    f"PRAGMA di_import.table_info({clean_table_name})"
+                ).fetchall())
+                
+                # Qualified: unqualified names also resolve to the attached file
+                self.connection.execute(f"DROP TABLE IF EXISTS main.{clean_table_name}")
+                self._invalidate_table(clean_table_name)
+                self.connection.execute(row[0])
+                cursor = self.connection.execute(
+                    f"INSERT INTO main.{clean_table_name} SELECT * FROM di_import.{clean_table_name}"
+                )
+                self.connection.commit()
+            except Exception as e:
+                self.connection.rollback()
+                raise Exception(f"Error importing table: {str(e)}")
+            finally:
+                self.connection.execute("DETACH DATABASE di_import")
+            
+            load_stats = self._record_load_stats(clean_table_name, cursor.rowcount, column_count, 1, start_time)
+            if build_rollups:
+                load_stats['rollups'] = self.rollups.build(clean_table_name)
+            if build_sample:
+                load_stats['sample'] = self.samples.build(clean_table_name)
+            return load_stats
+    
+    def _bulk_load(self, frames: Iterable[pd.DataFrame], clean_table_name: str,
+                   total_rows: Optional[int], chunk_size: int,
+                   progress_callback: Optional[Callable[[int, Optional[int]], None]],
+                   column_types: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Run a bulk load on the writer connection (write lock held).
+        
+        Rows go into a staging table that replaces the target only once
+        every row is in. Without a rollback journal a failed load can't be
+        undone, so the staging table is dropped instead and the previous
+        table is left as it was.
+        """
+        start_time = time.perf_counter()
+        staging_name = f"{self.STAGING_TABLE_PREFIX}{clean_table_name}"
+        pragmas = dict(self.BULK_LOAD_PRAGMAS)
+        if self.file_backed:
+            # Leaving WAL would block concurrent readers; keep it for the load
+            pragmas.pop('journal_mode')
+        saved_pragmas = self._apply_pragmas(pragmas)
+        
         try:
-            result_df = pd.read_sql_query(query, self.connection)
-            return result_df
+            rows_loaded = 0
+            rows_since_commit = 0
+            chunk_count = 0
+            column_count = 0
+            insert_sql = None
+            
+            for frame in frames:
+                if insert_sql is None:
+                    column_count = len(frame.columns)
+                    insert_sql = self._create_table_for_frame(staging_name, frame, column_types)
+                
+                for start in range(0, len(frame), chunk_size):
+                    chunk = frame.iloc[start:start + chunk_size]
+                    self.connection.executemany(insert_sql, self._dataframe_rows(chunk))
+                    
+                    rows_loaded += len(chunk)
+                    rows_since_commit += len(chunk)
+                    chunk_count += 1
+                    
+                    if rows_since_commit >= self.BULK_TRANSACTION_SIZE:
+                        self.connection.commit()
+                        rows_since_commit = 0
+                    
+                    if progress_callback:
+                        progress_callback(rows_loaded, total_rows)
+            
+            if insert_sql is None:
+                raise ValueError("No data frames to load")
+            
+            self.connection.execute(f"DROP TABLE IF EXISTS {clean_table_name}")
+            self._invalidate_table(clean_table_name)
+            self.connection.execute(f"ALTER TABLE {staging_name} RENAME TO {clean_table_name}")
+            self.connection.commit()
+            return self._record_load_stats(clean_table_name, rows_loaded, column_count, chunk_count, start_time)
+        
         except Exception as e:
-            raise Exception(f"Error executing query: {str(e)}")
+            self.connection.rollback()
+            self.connection.execute(f"DROP TABLE IF EXISTS {staging_name}")
+            self.connection.commit()
+            raise Exception(f"Error bulk loading table: {str(e)}")
+        finally:
+            self._apply_pragmas(saved_pragmas)
+    
+    def append_dataframe(self, df: pd.DataFrame, table_name: str,
+                         key_columns: Optional[List[str]] = None,
+                         upsert: bool = False,
+                         chunk_size: Optional[int] = None) -> Dict[str, Any]:
+        """Add a frame's rows to an existing table instead of replacing it.
+        
+        The frame's columns must exist in the table with compatible types
+        (columns it lacks are left NULL). With key_columns only rows whose
+        key is not in the table yet are inserted; upsert=True also updates
+        the rows whose key already exists, from the last frame row with that
+        key. Without key_columns every row is appended. A table that doesn't
+        exist yet is created from the frame. Rollups and samples the table
+        had are extended with the new rows, or rebuilt if rows were updated.
+        Returns the load statistics plus rows_inserted, rows_updated and
+        rows_skipped.
+        """
+        clean_table_name = self._clean_table_name(table_name)
+        if clean_table_name not in self.get_table_names():
+            load_stats = self.create_table_from_dataframe(df, clean_table_name, bulk_load=True, chunk_size=chunk_size)
+            load_stats.update(rows_inserted=len(df), rows_updated=0, rows_skipped=0)
+            return load_stats
+        if upsert and not key_columns:
+            raise ValueError("Upserting needs key columns to match rows on")
+        
+        try:
+            start_time = time.perf_counter()
+            chunk_size = chunk_size or self.BULK_CHUNK_SIZE
+            with self._write_lock:
+                columns = self._check_append_schema(clean_table_name, df, key_columns or [])
+                if key_columns:
+                    frame_columns = {str(col).lower(): col for col in df.columns}
+                    key_columns = [frame_columns[col.lower()] for col in key_columns]
+                    # Later rows win when the frame repeats a key
+                    df = df.drop_duplicates(subset=key_columns, keep='last')
+                has_rollups = bool(self.rollups.get_rollups(clean_table_name))
+                has_sample = self.samples.get_sample(clean_table_name) is not None
+                last_rowid = self.connection.execute(f"SELECT MAX(rowid) FROM {clean_table_name}").fetchone()[0] or 0
+                
+                counts = self._merge_rows(clean_table_name, df, columns, key_columns or [], upsert, chunk_size)
+                # Pure appends extend rollups and samples; updated rows force a rebuild
+                appended_only = counts['rows_updated'] == 0
+                self._invalidate_table(clean_table_name, keep_derived=appended_only)
+                if appended_only:
+                    self.rollups.append_rows(clean_table_name, last_rowid)
+                    self.samples.append_rows(clean_table_name, last_rowid)
+                self.connection.commit()
+                
+                load_stats = self._record_load_stats(
+                    clean_table_name, counts['rows_inserted'] + counts['rows_updated'], len(columns),
+                    -(-len(df) // chunk_size), start_time
+                )
+                load_stats.update(counts)
+                if has_rollups:
+                    load_stats['rollups'] = (self.rollups.get_rollups(clean_table_name) if appended_only
+                                             else self.rollups.build(clean_table_name))
+                if has_sample:
+                    load_stats['sample'] = (self.samples.get_sample(clean_table_name) if appended_only
+                                            else self.samples.build(clean_table_name))
+                return load_stats
+        
+        except Exception as e:
+            self.connection.rollback()
+            raise Exception(f"Error appending to table: {str(e)}")
+    
+    def _check_append_schema(self, table_name: str, df: pd.DataFrame, key_columns: List[str]) -> List[str]:
+        """Check a frame can be appended to a table; return the table's names for its columns.
+        
+        Raises ValueError for columns the table doesn't have, and for text,
+        timestamp or fractional values bound for INTEGER/REAL columns.
+        """
+        declared = {col['name'].lower(): col for col in self.get_table_schema(table_name)['columns']}
+        missing = [col for col in list(df.columns) + key_columns if str(col).lower() not in declared]
+        if missing:
+            raise ValueError(f"Columns not in table {table_name}: {', '.join(map(str, missing))}")
+        frame_columns = {str(col).lower() for col in df.columns}
+        absent_keys = [col for col in key_columns if col.lower() not in frame_columns]
+        if absent_keys:
+            raise ValueError(f"Key columns missing from the new data: {', '.join(absent_keys)}")
+        
+        problems = []
+        for col in df.columns:
+            series = df[col].dropna()
+            if series.empty:
+                continue
+            declared_type = declared[str(col).lower()]['type'].upper()
+            frame_type = self._sqlite_type(series.dtype)
+            if declared_type == 'REAL' and frame_type not in ('INTEGER', 'REAL'):
+                problems.append(f"{col} ({frame_type.lower()} values for a REAL column)")
+            elif declared_type == 'INTEGER' and frame_type == 'REAL':
+                if not (series == series.round()).all():
+                    problems.append(f"{col} (fractional values for an INTEGER column)")
+            elif declared_type == 'INTEGER' and frame_type != 'INTEGER':
+                problems.append(f"{col} ({frame_type.lower()} values for an INTEGER column)")
+        if problems:
+            raise ValueError("Incompatible column types: " + "; ".join(problems))
+        return [declared[str(col).lower()]['name'] for col in df.columns]
+    
+    def _merge_rows(self, table_name: str, df: pd.DataFrame, columns: List[str],
+                    key_columns: List[str], upsert: bool, chunk_size: int) -> Dict[str, int]:
+        """Stage a frame in a temp table and merge it into the target (write lock held)."""
+        quoted = [self._quote_identifier(col) for col in columns]
+        column_list = ", ".join(quoted)
+        if not key_columns:
+            insert_sql = f"INSERT INTO {table_name} ({column_list}) VALUES ({', '.join('?' for _ in columns)})"
+            for start in range(0, len(df), chunk_size):
+                self.connection.executemany(insert_sql, self._dataframe_rows(df.iloc[start:start + chunk_size]))
+            return {'rows_inserted': len(df), 'rows_updated': 0, 'rows_skipped': 0}
+        
+        # Staging columns copy the target's declared types, so keys compare with the same affinity
+        declared = {col['name']: col['type'] for col in self.get_table_schema(table_name)['columns']}
+        staging = "temp._di_append_staging"
+        self.connection.execute(f"DROP TABLE IF EXISTS {staging}")
+        self.connection.execute(
+            f"CREATE TABLE {staging} ({', '.join(f'{q} {declared[col]}' for q, col in zip(quoted, columns))})"
+        )
+        try:
+            insert_sql = f"INSERT INTO {staging} VALUES ({', '.join('?' for _ in columns)})"
+            for start in range(0, len(df), chunk_size):
+                self.connection.executemany(insert_sql, self._dataframe_rows(df.iloc[start:start + chunk_size]))
+            
+            key_names = {str(col).lower() for col in key_columns}
+            keys = [self._quote_identifier(col) for col in columns if col.lower() in key_names]
+            # Existing rows are looked up by key for every staged row
+            self.connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {self._quote_identifier(f'di_key_{table_name}_' + '_'.join(key_columns).lower())} "
+                f"ON {table_name} ({', '.join(keys)})"
+            )
+            matches = " AND ".join(f"{table_name}.{key} IS s.{key}" for key in keys)
+            
+            rows_updated = 0
+            if upsert:
+                assignments = ", ".join(f"{q} = s.{q}" for q in quoted if q not in keys)
+                if assignments:
+                    rows_updated = self.connection.execute(
+                        f"UPDATE {table_name} SET {assignments} FROM {staging} AS s WHERE {matches}"
+                    ).rowcount
+            
+            rows_inserted = self.connection.execute(
+                f"INSERT INTO {table_name} ({column_list}) SELECT {column_list} FROM {staging} AS s "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {table_name} WHERE {matches})"
+            ).rowcount
+        finally:
+            self.connection.execute(f"DROP TABLE IF EXISTS {staging}")
+        
+        return {
+            'rows_inserted': rows_inserted,
+            'rows_updated': rows_updated,
+            'rows_skipped': max(len(df) - rows_inserted - rows_updated, 0)
+        }
+    
+    def execute_query(self, query: str, use_cache: bool = True,
+                      timeout: Optional[float] = DEFAULT_QUERY_TIMEOUT,
+                      query_id: Optional[str] = None) -> pd.DataFrame:
+        """Execute a SQL query and return results as DataFrame.
+        
+        Results of deterministic queries over known tables are served from
+        the result cache until one of the referenced tables is replaced.
+        Aggregates a rollup can answer read the rollup instead of the table.
+        The query is interrupted with QueryCancelledError once it runs past
+        timeout seconds or cancel_query(query_id) is called.
+        """
+        cache_key = self._result_cache_key(query) if use_cache else None
+        if cache_key is not None:
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        route = self._route_query(query)
+        result_df = route['result']
+        if result_df is None:
+            try:
+                with self._read_connection() as connection, \
+                        self._query_deadline(connection, query, timeout, query_id):
+                    # Read with a plain cursor: pd.read_sql_query rolls the connection back when
+                    # the statement fails, which would discard a caller's open write transaction
+                    cursor = connection.execute(route['sql'])
+                    try:
+                        result_df = pd.DataFrame.from_records(
+                            cursor.fetchall(), columns=[col[0] for col in cursor.description or []],
+                            coerce_float=True
+                        )
+                    finally:
+                        cursor.close()
+            except QueryCancelledError:
+                raise
+            except Exception as e:
+                raise Exception(f"Error executing query: {str(e)}")
+        
+        if cache_key is not None:
+            self.result_cache.put(cache_key, result_df, [table for table, _ in cache_key[1]])
+        return result_df
+    
+    def execute_approximate_query(self, query: str,
+                                  timeout: Optional[float] = DEFAULT_QUERY_TIMEOUT) -> Optional[pd.DataFrame]:
+        """Estimate an aggregate query's result from the table's sample.
+        
+        Returns None when the query can't be estimated (no sample, or not a
+        COUNT/SUM/AVG aggregate), in which case it should be run exactly.
+        The estimate's attrs['approximate'] holds per-row 95% error bounds.
+        """
+        plan = parse_simple_select(query)
+        if plan is None:
+            return None
+        table_name = {name.lower(): name for name in self.get_table_names()}.get(plan['table'])
+        if table_name is None or self.samples.get_sample(table_name) is None:
+            return None
+        
+        column_names = self._result_column_names(query, plan, table_name)
+        if column_names is None:
+            return None
+        try:
+            return self.samples.estimate(plan, table_name, column_names, timeout)
+        except QueryCancelledError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error executing approximate query: {str(e)}")
+    
+    def stream_query(self, query: str, chunk_size: Optional[int] = None,
+                     max_rows: Optional[int] = STREAM_MAX_ROWS,
+                     max_bytes: Optional[int] = STREAM_MAX_BYTES,
+                     use_cache: bool = True,
+                     timeout: Optional[float] = DEFAULT_QUERY_TIMEOUT,
+                     query_id: Optional[str] = None) -> QueryResultStream:
+        """Execute a SQL query lazily, yielding DataFrame chunks up to a row/byte cap.
+        
+        Pass None for max_rows or max_bytes to lift that cap. The deadline
+        covers the whole iteration, measured from when reading starts.
+        """
+        return QueryResultStream(self, query, chunk_size or self.STREAM_CHUNK_SIZE,
+                                 max_rows, max_bytes, use_cache, timeout, query_id)
+    
+    def count_query_rows(self, query: str, timeout: Optional[float] = DEFAULT_QUERY_TIMEOUT) -> int:
+        """Count the rows a SELECT query returns without materialising them.
+        
+        Counts are cached under the same key as results, so a query is
+        counted once until one of its tables changes.
+        """
+        cache_key = self._result_cache_key(query)
+        if cache_key is not None and cache_key in self._count_cache:
+            self._count_cache.move_to_end(cache_key)
+            return self._count_cache[cache_key]
+        
+        count_sql = f"SELECT COUNT(*) FROM ({self._strip_query(query)})"
+        try:
+            with self._read_connection() as connection, \
+                    self._query_deadline(connection, count_sql, timeout):
+                count = connection.execute(count_sql).fetchone()[0]
+        except QueryCancelledError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error counting query rows: {str(e)}")
+        
+        if cache_key is not None:
+            self._count_cache[cache_key] = count
+            while len(self._count_cache) > self.COUNT_CACHE_SIZE:
+                self._count_cache.popitem(last=False)
+        return count
+    
+    def cancel_query(self, query_id: str) -> bool:
+        """Interrupt a running query; returns False if it is no longer running."""
+        entry = self._running_queries.get(query_id)
+        if entry is None:
+            return False
+        entry['reason'] = "was cancelled"
+        entry['connection'].interrupt()
+        return True
+    
+    def cancel_all_queries(self, query_ids: Optional[Iterable[str]] = None) -> int:
+        """Interrupt every running query, or only those among query_ids; returns how many were cancelled."""
+        running = list(self._running_queries)
+        if query_ids is not None:
+            wanted = set(query_ids)
+            running = [query_id for query_id in running if query_id in wanted]
+        return sum(self.cancel_query(query_id) for query_id in running)
+    
+    def get_running_queries(self) -> List[Dict[str, Any]]:
+        """Get the id, SQL and elapsed seconds of every query currently executing."""
+        now = time.monotonic()
+        return [
+            {'query_id': entry['query_id'], 'query': entry['query'], 'elapsed': now - entry['started']}
+            for entry in list(self._running_queries.values())
+        ]
+    
+    def explain_query_plan(self, query: str) -> List[Dict[str, Any]]:
+        """Get SQLite's EXPLAIN QUERY PLAN rows (id, parent, detail) for a query."""
+        try:
+            with self._read_connection() as connection:
+                rows = connection.execute(f"EXPLAIN QUERY PLAN {self._strip_query(query)}").fetchall()
+            return [{'id': row[0], 'parent': row[1], 'detail': row[3]} for row in rows]
+        except Exception as e:
+            raise Exception(f"Error explaining query: {str(e)}")
+    
+    def estimate_query_cost(self, query: str) -> Dict[str, Any]:
+        """Estimate a query's cost from its plan and the tables' row counts without running it.
+        
+        Returns estimate_plan_cost()'s breakdown (cost, output rows, full
+        scans, searches, temp B-trees, ...) plus 'rows_scanned' and the raw
+        'plan' rows.
+        """
+        plan = self.explain_query_plan(query)
+        table_rows = {
+            name: self.get_table_info(table)['row_count']
+            for name, table in extract_table_aliases(query, self.get_table_names()).items()
+        }
+        subquery_aliases = extract_table_aliases(query, extract_cte_names(query))
+        estimate = estimate_plan_cost(plan, table_rows, subquery_aliases)
+        estimate['rows_scanned'] = sum(step['rows'] for step in estimate['full_scans'] + estimate['searches'])
+        estimate['plan'] = plan
+        return estimate
+    
+    def analyze_query_plan(self, query: str) -> Dict[str, Any]:
+        """Get a query's plan as text lines plus the rows it is estimated to scan."""
+        estimate = self.estimate_query_cost(query)
+        return {
+            'rows_scanned': int(estimate['rows_scanned']),
+            'estimated_cost': estimate['cost'],
+            'query_plan': format_plan(estimate['plan'])
+        }
+    
+    def get_indexes(self, table_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get the named indexes of one table (or all tables) with their columns."""
+        try:
+            with self._read_connection() as connection:
+                sql = "SELECT name, tbl_name FROM sqlite_master WHERE type='index' AND sql IS NOT NULL"
+                params = ()
+                if table_name is not None:
+                    sql += " AND tbl_name = ?"
+                    params = (table_name,)
+                
+                indexes = []
+                for name, table in connection.execute(sql, params).fetchall():
+                    columns = [row[2] for row in connection.execute(
+                        f"PRAGMA index_info({self._quote_identifier(name)})"
+                    ).fetchall()]
+                    indexes.append({'name': name, 'table': table, 'columns': columns})
+            return indexes
+        except Exception as e:
+            raise Exception(f"Error getting indexes: {str(e)}")
+    
+    def create_index(self, table_name: str, columns: List[str], index_name: str) -> None:
+        """Create an index on the given columns of a table."""
+        column_list = ", ".join(self._quote_identifier(col) for col in columns)
+        try:
+            with self._write_lock:
+                self.connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS {self._quote_identifier(index_name)} "
+                    f"ON {table_name} ({column_list})"
+                )
+                self.connection.commit()
+        except Exception as e:
+            raise Exception(f"Error creating index: {str(e)}")
+    
+    def drop_index(self, index_name: str) -> None:
+        """Drop an index if it exists."""
+        try:
+            with self._write_lock:
+                self.connection.execute(f"DROP INDEX IF EXISTS {self._quote_identifier(index_name)}")
+                self.connection.commit()
+        except Exception as e:
+            raise Exception(f"Error dropping index: {str(e)}")
+    
+    def get_index_size(self, index_name: str) -> Optional[int]:
+        """Get the on-disk size of an index in bytes, or None when dbstat is unavailable."""
+        try:
+            with self._read_connection() as connection:
+                row = connection.execute(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name = ?", (index_name,)
+                ).fetchone()
+            return row[0] if row and row[0] is not None else None
+        except sqlite3.Error:
+            return None
     
     def get_table_names(self) -> List[str]:
         """Get list of all table names in the database."""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = [row[0] for row in cursor.fetchall()]
+            with self._read_connection() as connection:
+                cursor = connection.execute(
+                    "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE '\\_%' ESCAPE '\\'"
+                )
+                tables = [row[0] for row in cursor.fetchall()]
             return tables
         except Exception as e:
             raise Exception(f"Error getting table names: {str(e)}")
@@ -50,22 +926,41 @@ class DatabaseManager:
     def get_table_columns(self, table_name: str) -> List[str]:
         """Get column names for a specific table."""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            columns = [row[1] for row in cursor.fetchall()]
+            with self._read_connection() as connection:
+                cursor = connection.execute(f"PRAGMA table_info({table_name})")
+                columns = [row[1] for row in cursor.fetchall()]
             return columns
         except Exception as e:
             raise Exception(f"Error getting table columns: {str(e)}")
     
+    def get_table_generation(self, table_name: str) -> int:
+        """Get the generation counter of a table (bumped each time it is reloaded)."""
+        return self._table_generations.get(table_name, 0)
+    
     def get_table_schema(self, table_name: str) -> Dict[str, Any]:
-        """Get detailed schema information for a table."""
+        """Get detailed schema information for a table.
+        
+        The result is cached until the table's generation changes and carries
+        that generation, so consumers can key their own caches on it.
+        """
+        generation = self.get_table_generation(table_name)
+        cached = self._schema_cache.get(table_name)
+        if cached is not None and cached['generation'] == generation:
+            return cached
+        
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            schema_info = cursor.fetchall()
+            with self._read_connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute(f"PRAGMA table_info({table_name})")
+                schema_info = cursor.fetchall()
+                
+                # Get sample data for context
+                cursor.execute(f"SELECT * FROM {table_name} LIMIT 3")
+                sample_data = cursor.fetchall()
             
             schema = {
                 'table_name': table_name,
+                'generation': generation,
                 'columns': []
             }
             
@@ -78,39 +973,93 @@ class DatabaseManager:
                 }
                 schema['columns'].append(column)
             
-            # Get sample data for context
-            cursor.execute(f"SELECT * FROM {table_name} LIMIT 3")
-            sample_data = cursor.fetchall()
             schema['sample_data'] = sample_data
             
+            self._schema_cache[table_name] = schema
             return schema
         except Exception as e:
             raise Exception(f"Error getting table schema: {str(e)}")
     
     def get_table_info(self, table_name: str) -> Dict[str, Any]:
-        """Get comprehensive information about a table."""
+        """Get comprehensive information about a table.
+        
+        Served from the statistics catalog; the table is profiled on first
+        use and again only after it has been replaced or appended to.
+        """
         try:
-            # Get basic info
-            cursor = self.connection.cursor()
-            cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-            row_count = cursor.fetchone()[0]
+            if table_name in self._stats_cache:
+                return self._stats_cache[table_name]
             
-            # Get column info
+            with self._write_lock:
+                row = self.connection.execute(
+                    f"SELECT profile FROM {self.STATS_CATALOG_TABLE} WHERE table_name = ?",
+                    (table_name,)
+                ).fetchone()
+            if row:
+                profile = json.loads(row[0])
+            else:
+                profile = self.profile_table(table_name)
+                with self._write_lock:
+                    self.connection.execute(
+                        f"INSERT OR REPLACE INTO {self.STATS_CATALOG_TABLE} VALUES (?, ?, ?)",
+                        (table_name, json.dumps(profile, default=str), datetime.now().isoformat())
+                    )
+                    self.connection.commit()
+            
+            self._stats_cache[table_name] = profile
+            return profile
+        except Exception as e:
+            raise Exception(f"Error getting table info: {str(e)}")
+    
+    def profile_table(self, table_name: str) -> Dict[str, Any]:
+        """Compute row count, null counts, type mix, min/max and samples for every column.
+        
+        All columns are aggregated in the same scan (split into several scans
+        only for tables wider than PROFILE_COLUMNS_PER_SCAN), instead of
+        issuing separate queries per column.
+        """
+        try:
             columns = self.get_table_columns(table_name)
+            type_names = ['integer', 'real', 'text', 'blob']
+            
+            with self._read_connection() as connection:
+                cursor = connection.cursor()
+                row_count = 0
+                aggregates = {}
+                for start in range(0, max(len(columns), 1), self.PROFILE_COLUMNS_PER_SCAN):
+                    group = columns[start:start + self.PROFILE_COLUMNS_PER_SCAN]
+                    expressions = ["COUNT(*)"]
+                    for col in group:
+                        quoted = self._quote_identifier(col)
+                        expressions.extend([f"COUNT({quoted})", f"MIN({quoted})", f"MAX({quoted})"])
+                        expressions.extend(f"SUM(typeof({quoted}) = '{name}')" for name in type_names)
+                
+                    cursor.execute(f"SELECT {', '.join(expressions)} FROM {table_name}")
+                    result = cursor.fetchone()
+                    row_count = result[0]
+                    for i, col in enumerate(group):
+                        aggregates[col] = result[1 + i * 7:1 + (i + 1) * 7]
+            
+                # Collect a few non-null sample values per column from the first rows
+                cursor.execute(f"SELECT * FROM {table_name} LIMIT {self.PROFILE_SAMPLE_ROWS}")
+                sample_rows = cursor.fetchall()
             
-            # Get data types and sample values
             column_info = []
-            for col in columns:
-                cursor.execute(f"SELECT DISTINCT typeof({col}) FROM {table_name} LIMIT 5")
-                data_types = [row[0] for row in cursor.fetchall()]
+            for i, col in enumerate(columns):
+                non_null, min_value, max_value = aggregates[col][:3]
+                type_counts = {name: aggregates[col][3 + j] or 0 for j, name in enumerate(type_names)}
+                type_counts['null'] = row_count - non_null
                 
-                cursor.execute(f"SELECT {col} FROM {table_name} WHERE {col} IS NOT NULL LIMIT 3")
-                sample_values = [row[0] for row in cursor.fetchall()]
+                sample_values = [row[i] for row in sample_rows if row[i] is not None]
                 
                 column_info.append({
                     'name': col,
-                    'data_types': data_types,
-                    'sample_values': sample_values
+                    'data_types': [name for name, count in type_counts.items() if count],
+                    'type_counts': type_counts,
+                    'null_count': row_count - non_null,
+                    'min': min_value,
+                    'max': max_value,
+                    'sample_values': sample_values[:self.PROFILE_SAMPLE_VALUES]
                 })
             
             return {
@@ -120,7 +1069,392 @@ class DatabaseManager:
                 'columns': column_info
             }
         except Exception as e:
-            raise Exception(f"Error getting table info: {str(e)}")
+            raise Exception(f"Error profiling table: {str(e)}")
+    
+    def _invalidate_table(self, table_name: str, keep_derived: bool = False) -> None:
+        """Bump a table's generation and discard everything cached about it.
+        
+        keep_derived=True keeps the table's rollups and sample, for callers
+        that bring them up to date themselves.
+        """
+        self._table_generations[table_name] = self.get_table_generation(table_name) + 1
+        self._schema_cache.pop(table_name, None)
+        self._stats_cache.pop(table_name, None)
+        self.result_cache.invalidate_table(table_name)
+        if self.columnar is not None:
+            self.columnar.invalidate_table(table_name)
+        if not keep_derived:
+            self.rollups.drop_table_rollups(table_name)
+            self.samples.drop_table_sample(table_name)
+        self.connection.execute(
+            f"DELETE FROM {self.STATS_CATALOG_TABLE} WHERE table_name = ?", (table_name,)
+        )
+    
+    def _route_query(self, query: str) -> Dict[str, Any]:
+        """Decide how to answer a query: from a rollup, the columnar engine or the table.
+        
+        Returns a dict with 'engine' ('rollup', 'columnar' or 'sqlite'),
+        'sql' (the statement to run on SQLite, rewritten for rollups),
+        'rollup' (the rollup read, if any) and 'result' (the DataFrame, when
+        the columnar engine already answered the query).
+        
+        The first columnar-eligible query against a table starts reading it
+        into a snapshot in the background and runs on SQLite meanwhile.
+        """
+        route = {'engine': 'sqlite', 'sql': query, 'rollup': None, 'result': None}
+        plan = parse_simple_select(query)
+        if plan is None:
+            return route
+        table_name = {name.lower(): name for name in self.get_table_names()}.get(plan['table'])
+        if table_name is None:
+            return route
+        
+        columnar_table = None
+        if self.columnar is not None:
+            columnar_table = self.columnar.get_table(table_name, self.get_table_generation(table_name))
+        if columnar_table is None and not self.rollups.get_rollups(table_name):
+            if self.columnar is not None:
+                self._start_columnar_load(table_name)
+            return route
+        
+        column_names = self._result_column_names(query, plan, table_name)
+        if column_names is None:
+            return route
+        
+        rewritten = self.rollups.rewrite(plan, table_name, column_names)
+        if rewritten is not None:
+            route.update(engine='rollup', sql=rewritten[0], rollup=rewritten[1])
+            return route
+        
+        if columnar_table is None:
+            if self.columnar is not None:
+                self._start_columnar_load(table_name)
+            return route
+        result = self.columnar.execute(plan, columnar_table, column_names)
+        if result is not None:
+            route.update(engine='columnar', result=result)
+        return route
+    
+    def _result_column_names(self, query: str, plan: Dict[str, Any], table_name: str) -> Optional[List[str]]:
+        """Get the names SQLite gives a simple SELECT's result columns.
+        
+        Returns None if SQLite rejects the query, so SQLite reports the error.
+        """
+        try:
+            with self._read_connection() as connection:
+                # Preparing the query nested in a LIMIT 0 wrapper names its columns without running it
+                cursor = connection.execute(f"SELECT * FROM ({self._strip_query(query)}) LIMIT 0")
+                names = [col[0] for col in cursor.description]
+                cursor.close()
+        except Exception:
+            return None
+        
+        # Nesting renames duplicate result columns to "name:N"; leave those to SQLite
+        if any(re.search(r':\d+$', name) for name in names):
+            return None
+        
+        # Outside a subquery a bare column is named after the table column, not as written
+        columns = {col.lower(): col for col in self.get_table_columns(table_name)}
+        position = 0
+        for item in plan['items']:
+            if item['column'] == '*':
+                position += len(columns)
+                continue
+            if item['function'] is None and item['bucket'] is None and item['alias'] is None:
+                names[position] = columns.get(item['column'], names[position])
+            position += 1
+        return names
+    
+    def load_columnar_table(self, table_name: str) -> bool:
+        """Read a table into a columnar snapshot now; return whether the engine holds it.
+        
+        Tables whose snapshot would certainly exceed the engine's budget
+        (estimated from the statistics catalog) are skipped without being
+        read. Otherwise the table is read in COLUMNAR_LOAD_CHUNK_ROWS chunks
+        on a read connection, encoding each chunk as it arrives and giving
+        up as soon as the snapshot outgrows the budget. The write lock is
+        held only while the read starts, so the snapshot matches the
+        generation it is stored under; in-memory databases have a single
+        connection and hold the lock throughout.
+        """
+        if self.columnar is None:
+            return False
+        
+        try:
+            generation = self.get_table_generation(table_name)
+            if self.columnar.get_table(table_name, generation) is not None:
+                return True
+            if not self.columnar.accepts(table_name, generation):
+                return False
+            if self._estimate_columnar_bytes(table_name) > self.columnar.max_bytes:
+                self.columnar.reject(table_name, generation)
+                return False
+            
+            quoted_name = self._quote_identifier(table_name)
+            with self._read_connection() as connection:
+                with self._write_lock:
+                    generation = self.get_table_generation(table_name)
+                    declared_types = {
+                        row[1]: row[2] for row in connection.execute(f"PRAGMA table_info({quoted_name})")
+                    }
+                    # The statement's read snapshot is taken by its first fetch
+                    cursor = connection.execute(f"SELECT * FROM {quoted_name}")
+                    names = [col[0] for col in cursor.description]
+                    rows = cursor.fetchmany(self.COLUMNAR_LOAD_CHUNK_ROWS)
+                
+                builder = ColumnarTableBuilder(table_name, generation, declared_types, self.columnar.max_bytes)
+                try:
+                    fits = builder.add(pd.DataFrame.from_records(rows, columns=names, coerce_float=True))
+                    while fits:
+                        rows = cursor.fetchmany(self.COLUMNAR_LOAD_CHUNK_ROWS)
+                        if not rows:
+                            break
+                        fits = builder.add(pd.DataFrame.from_records(rows, columns=names, coerce_float=True))
+                finally:
+                    cursor.close()
+            
+            if not fits:
+                self.columnar.reject(table_name, generation)
+                return False
+            return self.columnar.put_table(builder.build())
+        except Exception as e:
+            raise Exception(f"Error loading columnar table: {str(e)}")
+    
+    def _estimate_columnar_bytes(self, table_name: str) -> int:
+        """Lower bound on a table's columnar snapshot size from its catalog row count and column types.
+        
+        Numeric columns take 8 bytes per row plus a validity byte and text
+        columns at least 4 bytes of dictionary code per row; columns mixing
+        types are not encoded and cost only their validity mask.
+        """
+        info = self.get_table_info(table_name)
+        per_row = 0
+        for column in info['columns']:
+            counts = column['type_counts']
+            if counts['blob'] or (counts['text'] and counts['integer'] + counts['real']):
+                per_row += 1
+            elif counts['text']:
+                per_row += 5
+            else:
+                per_row += 9
+        return info['row_count'] * per_row
+    
+    def _start_columnar_load(self, table_name: str) -> None:
+        """Load a columnar snapshot on a background thread unless one is already loading."""
+        with self._pool_lock:
+            if table_name in self._columnar_loads:
+                return
+            self._columnar_loads.add(table_name)
+        
+        def load():
+            try:
+                self.load_columnar_table(table_name)
+            except Exception:
+                pass  # queries keep running on SQLite
+            finally:
+                with self._pool_lock:
+                    self._columnar_loads.discard(table_name)
+        
+        threading.Thread(target=load, name=f"columnar-load-{table_name}", daemon=True).start()
+    
+    def _iter_dataframe_chunks(self, df: pd.DataFrame, chunk_size: int) -> Iterator[pd.DataFrame]:
+        """Yield consecutive row slices of a DataFrame (the frame itself if empty)."""
+        if df.empty:
+            yield df
+            return
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+    
+    def _create_table_for_frame(self, table_name: str, frame: pd.DataFrame,
+                                column_types: Optional[Dict[str, str]] = None) -> str:
+        """Drop and recreate a (staging) table matching the frame's columns; return its INSERT statement.
+        
+        Columns are declared with their type in column_types, or the type
+        of their dtype in the frame.
+        """
+        column_types = column_types or {}
+        column_defs = ", ".join(
+            f"{self._quote_identifier(col)} {column_types.get(col, self._sqlite_type(frame[col].dtype))}".rstrip()
+            for col in frame.columns
+        )
+        self.connection.execute(f"DROP TABLE IF EXISTS {table_name}")
+        self.connection.execute(f"CREATE TABLE {table_name} ({column_defs})")
+        
+        placeholders = ", ".join("?" for _ in frame.columns)
+        return f"INSERT INTO {table_name} VALUES ({placeholders})"
+    
+    def _sqlite_type(self, dtype) -> str:
+        """Map a pandas dtype to the SQLite column type df.to_sql would use."""
+        if pd.api.types.is_bool_dtype(dtype):
+            return 'INTEGER'
+        if pd.api.types.is_integer_dtype(dtype):
+            return 'INTEGER'
+        if pd.api.types.is_float_dtype(dtype):
+            return 'REAL'
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            return 'TIMESTAMP'
+        return 'TEXT'
+    
+    def _dataframe_rows(self, chunk: pd.DataFrame) -> Iterator[tuple]:
+        """Convert a DataFrame chunk into tuples of SQLite-compatible Python values."""
+        columns = []
+        for col in chunk.columns:
+            series = chunk[col]
+            null_mask = series.isna().to_numpy()
+            if pd.api.types.is_datetime64_any_dtype(series.dtype):
+                values = self._datetime_to_text(series)
+            else:
+                values = series.to_numpy(dtype=object)
+            if null_mask.any():
+                if not values.flags.writeable:
+                    # Object columns hand out a read-only view of their data
+                    values = values.copy()
+                values[null_mask] = None
+            columns.append(values)
+        return zip(*columns)
+    
+    def _datetime_to_text(self, series: pd.Series):
+        """Render timestamps with the same text representation to_sql stores."""
+        if getattr(series.dtype, 'tz', None) is not None:
+            return pd.Series([str(value) for value in series.dt.to_pydatetime()]).to_numpy(dtype=object)
+        
+        whole_seconds = series.dt.strftime('%Y-%m-%d %H:%M:%S').to_numpy(dtype=object)
+        has_fraction = (series.dt.microsecond != 0).to_numpy()
+        if has_fraction.any():
+            fractional = series.dt.strftime('%Y-%m-%d %H:%M:%S.%f').to_numpy(dtype=object)
+            whole_seconds[has_fraction] = fractional[has_fraction]
+        return whole_seconds
+    
+    def _apply_pragmas(self, pragmas: Dict[str, Any]) -> Dict[str, Any]:
+        """Set connection pragmas and return their previous values."""
+        previous = {}
+        for name, value in pragmas.items():
+            previous[name] = self.connection.execute(f"PRAGMA {name}").fetchone()[0]
+            self.connection.execute(f"PRAGMA {name} = {value}")
+        return previous
+    
+    def _record_load_stats(self, table_name: str, rows: int, columns: int,
+                           chunks: int, start_time: float) -> Dict[str, Any]:
+        """Build ingestion throughput statistics for a completed load."""
+        seconds = time.perf_counter() - start_time
+        self.last_load_stats = {
+            'table_name': table_name,
+            'rows': rows,
+            'columns': columns,
+            'chunks': chunks,
+            'seconds': seconds,
+            'rows_per_sec': rows / seconds if seconds > 0 else float(rows)
+        }
+        return self.last_load_stats
+    
+    def _result_cache_key(self, query: str) -> Optional[Tuple]:
+        """Build the result cache key for a query, or None if it must not be cached.
+        
+        The key combines the normalised SQL text with the generation of every
+        table the query references, so replacing a table changes the key.
+        """
+        if not is_deterministic(query):
+            return None
+        
+        tables = referenced_tables(query, self.get_table_names())
+        if not tables:
+            return None
+        
+        return (normalize_sql(query), tuple((table, self.get_table_generation(table)) for table in tables))
+    
+    @contextmanager
+    def _read_connection(self) -> Iterator[sqlite3.Connection]:
+        """Check out a connection for running a read-only query.
+        
+        File-backed databases hand out a pooled read-only connection; an
+        in-memory database lends its single connection under the write lock.
+        """
+        if not self.file_backed:
+            with self._write_lock:
+                yield self.connection
+            return
+        
+        connection = self._checkout_read_connection()
+        try:
+            yield connection
+        finally:
+            self._read_pool.put(connection)
+    
+    @contextmanager
+    def _query_deadline(self, connection: sqlite3.Connection, query: str,
+                        timeout: Optional[float], query_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Enforce a deadline and make a query cancellable while it runs on a connection.
+        
+        A progress handler aborts the statement once the deadline passes or the
+        query is cancelled, and the resulting error surfaces as
+        QueryCancelledError. The handler is removed and a transaction the
+        query opened is rolled back afterwards, so the connection is healthy
+        for the next query. A transaction that was already open belongs to a
+        caller further up (the write lock is re-entrant) and is left alone.
+        """
+        started = time.monotonic()
+        outer_transaction = connection.in_transaction
+        entry = {
+            'query_id': query_id or uuid.uuid4().hex,
+            'query': query,
+            'connection': connection,
+            'started': started,
+            'reason': None,
+            'progress_calls': 0
+        }
+        
+        def check_progress():
+            entry['progress_calls'] += 1
+            if entry['reason'] is not None:
+                return 1
+            if timeout is not None and time.monotonic() - started > timeout:
+                entry['reason'] = f"exceeded its {timeout:g}s deadline and was stopped"
+                return 1
+            return 0
+        
+        self._running_queries[entry['query_id']] = entry
+        connection.set_progress_handler(check_progress, self.PROGRESS_HANDLER_INTERVAL)
+        try:
+            yield entry
+        except Exception as e:
+            if entry['reason'] is not None:
+                raise QueryCancelledError(f"Query {entry['reason']}") from e
+            raise
+        finally:
+            connection.set_progress_handler(None, 0)
+            self._running_queries.pop(entry['query_id'], None)
+            if connection.in_transaction and not outer_transaction:
+                connection.rollback()
+    
+    def _checkout_read_connection(self) -> sqlite3.Connection:
+        """Take an idle pooled connection, opening one while the pool is below its size."""
+        try:
+            return self._read_pool.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._pool_lock:
+            if len(self._read_connections) < self.read_pool_size:
+                connection = sqlite3.connect(
+                    f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro",
+                    uri=True, check_same_thread=False, timeout=self.CONNECT_TIMEOUT
+                )
+                connection.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+                self._read_connections.append(connection)
+                return connection
+        
+        try:
+            return self._read_pool.get(timeout=self.CONNECT_TIMEOUT)
+        except queue.Empty:
+            raise Exception("Timed out waiting for a free read connection")
+    
+    def _strip_query(self, query: str) -> str:
+        """Remove surrounding whitespace and trailing semicolons so a query can be nested."""
+        return query.strip().rstrip(';').strip()
+    
+    def _quote_identifier(self, name: str) -> str:
+        """Quote an identifier for use in SQL statements."""
+        return '"' + str(name).replace('"', '""') + '"'
     
     def _clean_table_name(self, table_name: str) -> str:
         """Clean table name to be SQL-safe."""
@@ -136,7 +1470,10 @@ class DatabaseManager:
     
     def close(self):
         """Close database connection."""
-        if self.connection:
+        for connection in getattr(self, '_read_connections', []):
+            connection.close()
+        self._read_connections = []
+        if getattr(self, 'connection', None):
             self.connection.close()
     
     def __del__(self):
@@ -0,0 +1,221 @@
+import os
+import time
+import tempfile
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Callable, Iterator, Tuple
+import pandas as pd
+from utils import clean_dataframe, clean_column_name, handle_duplicate_columns, generate_table_name
+from streaming_csv import infer_column_kinds, conform_chunk, column_types_for_kinds
+
+SAMPLE_ROWS = 20000
+CHUNK_SIZE = 50000
+
+def load_sheet(workbook_path: str, sheet_name: str, table_name: str, db_path: str,
+               sample_rows: int = SAMPLE_ROWS, chunk_size: int = CHUNK_SIZE) -> Dict[str, Any]:
+    """Stream one worksheet into a table in its own SQLite file; runs in a worker process.
+    
+    Returns the sheet's load statistics, its cleaned first rows (for
+    previews) and the values per column that didn't fit the inferred type,
+    or the error message instead of raising so one bad sheet doesn't fail
+    the whole workbook.
+    """
+    from openpyxl import load_workbook
+    from database import DatabaseManager
+    
+    started = time.perf_counter()
+    result = {'sheet': sheet_name, 'table_name': table_name, 'db_path': db_path,
+              'rows': 0, 'columns': 0, 'sample': None, 'type_mismatches': {},
+              'parse_seconds': None, 'error': None}
+    workbook = None
+    db_manager = None
+    try:
+        workbook = load_workbook(workbook_path, read_only=True, data_only=True)
+        sample, rows = _read_sample(workbook[sheet_name].iter_rows(values_only=True), sample_rows)
+        kinds = infer_column_kinds(sample)
+        result['sample'] = sample
+        db_manager = DatabaseManager(db_path, columnar_max_bytes=0)
+        load_stats = db_manager.bulk_load_frames(
+            _sheet_chunks(sample, rows, kinds, chunk_size, result['type_mismatches']), table_name,
+            column_types=column_types_for_kinds(kinds)
+        )
+        result.update(rows=load_stats['rows'], columns=load_stats['columns'])
+    except Exception as e:
+        result['error'] = str(e)
+    finally:
+        if db_manager is not None:
+            db_manager.close()
+        if workbook is not None:
+            workbook.close()
+    result['parse_seconds'] = time.perf_counter() - started
+    return result
+
+def _read_sample(rows: Iterator[tuple], sample_rows: int) -> Tuple[pd.DataFrame, Iterator[tuple]]:
+    """Read the header and the first sample_rows rows of a sheet.
+    
+    Returns the sample cleaned with the usual type inference and an
+    iterator over the remaining rows, padded to the header's width.
+    """
+    header = next(rows, None)
+    if header is None:
+        raise ValueError("Sheet is empty")
+    width = len(header)
+    raw_names = [name if name is not None else f"column_{i + 1}" for i, name in enumerate(header)]
+    names = list(handle_duplicate_columns(
+        pd.DataFrame(columns=[clean_column_name(name) for name in raw_names])
+    ).columns)
+    
+    remaining = _padded_rows(rows, width)
+    sample = pd.DataFrame.from_records(list(islice(remaining, sample_rows)), columns=names)
+    return clean_dataframe(sample), remaining
+
+def _padded_rows(rows: Iterator[tuple], width: int) -> Iterator[tuple]:
+    """Yield rows cut or padded to width, skipping rows without values."""
+    for row in rows:
+        # Read-only sheets often report trailing rows that have no values
+        if all(value is None for value in row):
+            continue
+        yield tuple(row[:width]) + (None,) * (width - len(row))
+
+def _sheet_chunks(sample: pd.DataFrame, rows: Iterator[tuple], kinds: Dict[str, Optional[str]],
+                  chunk_size: int, mismatches: Dict[str, int]) -> Iterator[pd.DataFrame]:
+    """Yield the sample, then the remaining rows in chunks converted to the sample's kinds.
+    
+    Values that don't fit are counted in mismatches (see conform_chunk).
+    """
+    yield sample
+    while True:
+        batch = list(islice(rows, chunk_size))
+        if not batch:
+            return
+        yield conform_chunk(pd.DataFrame.from_records(batch, columns=list(sample.columns)), kinds, mismatches)
+
+class ExcelWorkbookLoader:
+    """Loads every sheet of an .xlsx workbook as its own table without building the workbook in memory.
+    
+    Each sheet is streamed row by row with openpyxl's read-only mode in a
+    worker process, which bulk loads it in chunks into a private SQLite
+    file. The calling thread then copies each finished sheet into the
+    database with DatabaseManager.import_table() while other sheets are
+    still being read.
+    """
+    
+    def __init__(self, db_manager, max_workers: Optional[int] = None):
+        """Initialize with the database to load into and the worker process limit."""
+        self.db_manager = db_manager
+        self.max_workers = max_workers or os.cpu_count() or 1
+    
+    def load(self, source, file_name: str,
+             progress_callback: Optional[Callable[[int, int], None]] = None,
+             **load_options) -> Dict[str, Any]:
+        """Load all sheets of a workbook (path or file-like object).
+        
+        Tables are named after the file and sheet. load_options are passed
+        on to import_table (e.g. build_rollups). Returns {'tables': [...],
+        'sheets': [per-sheet report], 'sample': cleaned first rows of the
+        first loaded sheet, 'seconds': total}.
+        """
+        from openpyxl import load_workbook
+        
+        try:
+            started = time.perf_counter()
+            with tempfile.TemporaryDirectory(prefix='di_excel_') as work_dir:
+                workbook_path = self._workbook_path(source, work_dir)
+                workbook = load_workbook(workbook_path, read_only=True)
+                try:
+                    sheet_names = workbook.sheetnames
+                finally:
+                    workbook.close()
+                
+                jobs = [
+                    (workbook_path, sheet, table_name, os.path.join(work_dir, f"sheet_{i}.db"))
+                    for i, (sheet, table_name) in enumerate(zip(sheet_names, self._table_names(file_name, sheet_names)))
+                ]
+                
+                report = []
+                for result in self._run_jobs(jobs, progress_callback):
+                    report.append(self._import_sheet(result, load_options))
+            
+            report.sort(key=lambda entry: sheet_names.index(entry['sheet']))
+            loaded = [entry for entry in report if entry['error'] is None]
+            return {
+                'tables': [entry['table'] for entry in loaded],
+                'sheets': [{key: value for key, value in entry.items() if key != 'sample'} for entry in report],
+                'sample': loaded[0]['sample'] if loaded else None,
+                'seconds': time.perf_counter() - started
+            }
+        except Exception as e:
+            raise Exception(f"Error loading Excel workbook: {str(e)}")
+    
+    def _table_names(self, file_name: str, sheet_names: List[str]) -> List[str]:
+        """Name each sheet's table after the file (and the sheet, for multi-sheet workbooks)."""
+        if len(sheet_names) == 1:
+            return [generate_table_name(file_name)]
+        base_name = file_name.rsplit('.', 1)[0]
+        names = []
+        for sheet in sheet_names:
+            # The suffix keeps dots in sheet names from being taken for an extension
+            name = generate_table_name(f"{base_name}_{sheet}.xlsx")
+            candidate, suffix = name, 2
+            while candidate in names:
+                candidate = f"{name[:46]}_{suffix}"
+                suffix += 1
+            names.append(candidate)
+        return names
+    
+    def _run_jobs(self, jobs: List[Tuple[str, str, str, str]],
+                  progress_callback: Optional[Callable[[int, int], None]]) -> Iterator[Dict[str, Any]]:
+        """Run the sheet loads, yielding each result as it finishes."""
+        done = 0
+        if len(jobs) <= 1 or self.max_workers <= 1:
+            # A pool would only add process start-up cost
+            for job in jobs:
+                done += 1
+                yield load_sheet(*job)
+                if progress_callback:
+                    progress_callback(done, len(jobs))
+            return
+        
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, len(jobs))) as executor:
+            futures = [executor.submit(load_sheet, *job) for job in jobs]
+            for future in as_completed(futures):
+                done += 1
+                yield future.result()
+                if progress_callback:
+                    progress_callback(done, len(jobs))
+    
+    def _import_sheet(self, result: Dict[str, Any], load_options: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy a worker's finished sheet into the database and describe it for the report."""
+        entry = {
+            'sheet': result['sheet'],
+            'rows': result['rows'],
+            'columns': result['columns'],
+            'parse_seconds': result['parse_seconds'],
+            'load_seconds': None,
+            'table': None,
+            'sample': result['sample'],
+            'type_mismatches': result['type_mismatches'],
+            'error': result['error']
+        }
+        if result['error'] is None:
+            try:
+                load_stats = self.db_manager.import_table(result['db_path'], result['table_name'], **load_options)
+                entry.update(table=load_stats['table_name'], load_seconds=load_stats['seconds'])
+            except Exception as e:
+                entry['error'] = str(e)
+        return entry
+    
+    def _workbook_path(self, source, work_dir: str) -> str:
+        """Return a path workers can open, writing uploaded bytes to the work directory."""
+        if isinstance(source, (str, os.PathLike)):
+            return os.fspath(source)
+        path = os.path.join(work_dir, 'workbook.xlsx')
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        with open(path, 'wb') as handle:
+            while True:
+                block = source.read(1024 * 1024)
+                if not block:
+                    break
+                handle.write(block)
+        return path
@@ -0,0 +1,264 @@
+import gzip
+import os
+import tempfile
+import time
+import weakref
+from typing import Dict, Any, Optional, BinaryIO, Iterable
+import pandas as pd
+from utils import require_pyarrow
+
+# Export formats with their file extension and MIME type
+EXPORT_FORMATS = {
+    'csv': {'extension': 'csv', 'mime': 'text/csv'},
+    'csv.gz': {'extension': 'csv.gz', 'mime': 'application/gzip'},
+    'xlsx': {'extension': 'xlsx', 'mime': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'},
+    'parquet': {'extension': 'parquet', 'mime': 'application/vnd.apache.parquet'},
+    'arrow': {'extension': 'arrow', 'mime': 'application/vnd.apache.arrow.file'}
+}
+
+def write_frames(frames: Iterable[pd.DataFrame], destination: BinaryIO,
+                 file_format: str = 'csv') -> Dict[str, Any]:
+    """Write DataFrame chunks to a binary file object one chunk at a time.
+    
+    When frames yields nothing, its 'columns' attribute (as on a query
+    stream) still names the output columns. Returns export statistics
+    (rows, chunks, bytes, seconds, rows_per_sec).
+    """
+    started = time.perf_counter()
+    start_offset = _tell(destination)
+    writer = _create_writer(destination, file_format)
+    
+    rows = 0
+    chunks = 0
+    for chunk in frames:
+        writer.write(chunk)
+        rows += len(chunk)
+        chunks += 1
+    writer.close(list(getattr(frames, 'columns', None) or []))
+    
+    seconds = time.perf_counter() - started
+    end_offset = _tell(destination)
+    return {
+        'rows': rows,
+        'chunks': chunks,
+        'bytes': end_offset - start_offset if start_offset is not None and end_offset is not None else None,
+        'seconds': seconds,
+        'rows_per_sec': rows / seconds if seconds > 0 else float(rows)
+    }
+
+def _create_writer(destination: BinaryIO, file_format: str):
+    """Create the chunk writer for an export format."""
+    if file_format in ('csv', 'csv.gz'):
+        return _CsvChunkWriter(destination, compress=file_format == 'csv.gz')
+    if file_format == 'xlsx':
+        return _ExcelChunkWriter(destination)
+    if file_format in ('parquet', 'arrow'):
+        return _ArrowChunkWriter(destination, file_format)
+    raise ValueError(f"Unsupported export format: {file_format}")
+
+def _tell(destination: BinaryIO) -> Optional[int]:
+    """Current position of a file object, or None for unseekable streams."""
+    try:
+        return destination.tell()
+    except (AttributeError, OSError):
+        return None
+
+class ExportFile:
+    """A finished export kept in a temporary file instead of in memory.
+    
+    The file is deleted by remove(), or when the object is garbage
+    collected (e.g. with the session state holding it) or the process
+    exits, whichever comes first.
+    """
+    
+    # Exports larger than this are not offered as a browser download
+    DOWNLOAD_MAX_BYTES = 200 * 1024 * 1024
+    
+    def __init__(self, file_format: str):
+        """Create an empty temporary file for an export in the given format."""
+        self.file_format = file_format
+        handle, self.path = tempfile.mkstemp(prefix='di_export_', suffix=f".{EXPORT_FORMATS[file_format]['extension']}")
+        os.close(handle)
+        self.stats: Optional[Dict[str, Any]] = None
+        self._finalizer = weakref.finalize(self, _remove_file, self.path)
+    
+    @property
+    def size(self) -> int:
+        """Size of the export in bytes."""
+        return os.path.getsize(self.path)
+    
+    def downloadable(self) -> bool:
+        """Check whether the export is small enough to hand to the browser."""
+        return self.size <= self.DOWNLOAD_MAX_BYTES
+    
+    def remove(self) -> None:
+        """Delete the file now."""
+        self._finalizer()
+
+
+def _remove_file(path: str) -> None:
+    """Delete a file if it still exists."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class QueryExporter:
+    """Streams query results to a file in chunks without materialising the whole result.
+    
+    Rows are fetched from the cursor in batches with
+    DatabaseManager.stream_query() (uncapped and bypassing the result cache)
+    and each chunk is written as it arrives: appended (optionally gzipped)
+    CSV text, rows of a write-only Excel sheet, a Parquet row group or an
+    Arrow IPC record batch. Memory use follows the chunk size, not the
+    result size.
+    """
+    
+    EXPORT_CHUNK_SIZE = 50000
+    
+    def __init__(self, db_manager):
+        """Initialize with the database to export from."""
+        self.db_manager = db_manager
+    
+    def export(self, query: str, destination: BinaryIO, file_format: str = 'csv',
+               chunk_size: Optional[int] = None,
+               timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Write a query's full result to a binary file object.
+        
+        Returns export statistics (see write_frames).
+        """
+        try:
+            with self.db_manager.stream_query(
+                query, chunk_size=chunk_size or self.EXPORT_CHUNK_SIZE,
+                max_rows=None, max_bytes=None, use_cache=False, timeout=timeout
+            ) as stream:
+                return write_frames(stream, destination, file_format)
+        except Exception as e:
+            raise Exception(f"Error exporting query results: {str(e)}")
+    
+    def export_to_file(self, query: str, file_format: str = 'csv',
+                       chunk_size: Optional[int] = None,
+                       timeout: Optional[float] = None) -> ExportFile:
+        """Write a query's full result to a new temporary ExportFile, with its statistics in .stats."""
+        export_file = ExportFile(file_format)
+        try:
+            with open(export_file.path, 'wb') as destination:
+                export_file.stats = self.export(query, destination, file_format, chunk_size, timeout)
+        except Exception:
+            export_file.remove()
+            raise
+        return export_file
+
+
+class _CsvChunkWriter:
+    """Appends chunks to a CSV file (gzip-compressed if asked), writing the header once."""
+    
+    def __init__(self, destination: BinaryIO, compress: bool = False):
+        self.output = gzip.GzipFile(fileobj=destination, mode='wb') if compress else destination
+        self.header_written = False
+    
+    def write(self, chunk: pd.DataFrame) -> None:
+        self.output.write(chunk.to_csv(index=False, header=not self.header_written).encode('utf-8'))
+        self.header_written = True
+    
+    def close(self, columns) -> None:
+        if not self.header_written:
+            self.write(pd.DataFrame(columns=columns))
+        if isinstance(self.output, gzip.GzipFile):
+            # Writes the gzip trailer; the destination itself stays open
+            self.output.close()
+
+
+class _ExcelChunkWriter:
+    """Appends chunks to a write-only openpyxl workbook.
+    
+    Write-only sheets stream rows out instead of keeping cells in memory.
+    Sheets hold at most MAX_SHEET_ROWS data rows (Excel's limit, less the
+    header); longer results continue on further sheets.
+    """
+    
+    MAX_SHEET_ROWS = 1048575
+    
+    def __init__(self, destination: BinaryIO):
+        from openpyxl import Workbook
+        self.destination = destination
+        self.workbook = Workbook(write_only=True)
+        self.sheet = None
+        self.sheet_rows = 0
+        self.columns = None
+    
+    def write(self, chunk: pd.DataFrame) -> None:
+        if self.columns is None:
+            self.columns = [str(col) for col in chunk.columns]
+        # NaN/NaT become empty cells
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            if self.sheet is None or self.sheet_rows >= self.MAX_SHEET_ROWS:
+                self._add_sheet()
+            self.sheet.append(row)
+            self.sheet_rows += 1
+    
+    def close(self, columns) -> None:
+        if self.sheet is None:
+            self.columns = self.columns or [str(col) for col in columns]
+            self._add_sheet()
+        self.workbook.save(self.destination)
+    
+    def _add_sheet(self) -> None:
+        sheet_number = len(self.workbook.worksheets) + 1
+        self.sheet = self.workbook.create_sheet("Data" if sheet_number == 1 else f"Data {sheet_number}")
+        self.sheet.append(self.columns)
+        self.sheet_rows = 0
+
+
+class _ArrowChunkWriter:
+    """Writes chunks as Parquet row groups or Arrow IPC record batches.
+    
+    The file schema comes from the first chunk. Columns that are all NULL
+    there are typed as text, and later chunks are converted to the schema
+    (e.g. integer columns that only meet NULLs later stay integers).
+    """
+    
+    def __init__(self, destination: BinaryIO, file_format: str):
+        self.pa = require_pyarrow()
+        self.destination = destination
+        self.file_format = file_format
+        self.schema = None
+        self.writer = None
+    
+    def write(self, chunk: pd.DataFrame) -> None:
+        pa = self.pa
+        if self.schema is None:
+            inferred = pa.Table.from_pandas(chunk, preserve_index=False).schema
+            self.schema = pa.schema([
+                pa.field(field.name, pa.string()) if pa.types.is_null(field.type) else field
+                for field in inferred
+            ])
+            self._open()
+        
+        chunk = chunk.copy()
+        for field in self.schema:
+            # SQLite columns can mix types; text columns take any value as text
+            if pa.types.is_string(field.type) and not pd.api.types.is_string_dtype(chunk[field.name]):
+                chunk[field.name] = chunk[field.name].map(lambda value: None if pd.isna(value) else str(value))
+        try:
+            table = pa.Table.from_pandas(chunk, schema=self.schema, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            raise ValueError(f"column types change within the result ({str(e)}); export as CSV instead")
+        self.writer.write_table(table)
+    
+    def close(self, columns) -> None:
+        if self.writer is None:
+            # Empty result: write the columns as text
+            self.schema = self.pa.schema([self.pa.field(col, self.pa.string()) for col in columns])
+            self._open()
+        self.writer.close()
+    
+    def _open(self) -> None:
+        if self.file_format == 'parquet':
+            import pyarrow.parquet as pq
+            self.writer = pq.ParquetWriter(self.destination, self.schema)
+        else:
+            import pyarrow.ipc as ipc
+            self.writer = ipc.new_file(self.destination, self.schema)
@@ -0,0 +1,262 @@
+import hashlib
+import re
+import threading
+from collections import deque
+from datetime import datetime
+from typing import List, Dict, Any, Tuple
+from query_plan import estimate_plan_cost, plan_uses_index
+from sql_parser import extract_column_usage, extract_table_aliases, normalize_sql, referenced_tables
+
+class IndexAdvisor:
+    """Creates and drops indexes on uploaded tables based on the observed query workload."""
+    
+    # Indexes managed by the advisor carry this prefix; others are never touched
+    INDEX_PREFIX = "di_auto_"
+    MAX_INDEX_COLUMNS = 3
+    
+    # Tables smaller than this are scanned faster than an index pays for itself
+    MIN_TABLE_ROWS = 1000
+    
+    # Rows sampled per column when estimating the size of an index before building it
+    WIDTH_SAMPLE_ROWS = 10000
+    
+    def __init__(self, db_manager, query_history=None,
+                 space_budget_bytes: int = 256 * 1024 * 1024,
+                 min_improvement: float = 0.2,
+                 workload_size: int = 200,
+                 auto_tune_every: int = 10):
+        """Initialize the advisor.
+        
+        Indexes are kept only if they cut the estimated cost of the queries
+        they target by at least min_improvement (a fraction), and the total
+        size of advisor-managed indexes stays within space_budget_bytes.
+        With auto_tune_every > 0, a background tuning pass runs after every
+        that many observed queries.
+        """
+        self.db_manager = db_manager
+        self.space_budget_bytes = space_budget_bytes
+        self.min_improvement = min_improvement
+        self.auto_tune_every = auto_tune_every
+        self.workload = deque(maxlen=workload_size)
+        self.last_tuned = None
+        self._observed = 0
+        self._index_benefits: Dict[str, Dict[str, Any]] = {}
+        self._tune_lock = threading.Lock()
+        
+        if query_history is not None:
+            self.load_history(query_history)
+    
+    def load_history(self, query_history) -> None:
+        """Seed the workload with the SQL recorded in a QueryHistoryManager."""
+        for entry in query_history.get_history():
+            self.workload.append(entry['sql_query'])
+    
+    def observe(self, query: str) -> None:
+        """Record an executed query, tuning in the background every auto_tune_every queries."""
+        self.workload.append(query)
+        self._observed += 1
+        if self.auto_tune_every and self._observed % self.auto_tune_every == 0:
+            threading.Thread(target=self._tune_in_background, daemon=True).start()
+    
+    def tune(self) -> List[Dict[str, Any]]:
+        """Drop unused advisor indexes, then create the beneficial ones that fit the budget.
+        
+        Returns the report of advisor-managed indexes after tuning.
+        """
+        with self._tune_lock:
+            queries = self._workload_queries()
+            table_rows = self._table_rows(queries)
+            plans = {}
+            for query in queries:
+                try:
+                    plans[query] = self.db_manager.explain_query_plan(query)
+                except Exception:
+                    continue  # e.g. the table it read has since been dropped
+            
+            used_bytes = self._drop_unused_indexes(plans)
+            
+            for candidate in self._candidate_indexes(list(plans)):
+                used_bytes += self._try_candidate(candidate, plans, table_rows, used_bytes)
+            
+            self.last_tuned = datetime.now().isoformat()
+            return self.get_report()
+    
+    def get_report(self) -> List[Dict[str, Any]]:
+        """Describe each advisor-managed index and the queries it sped up."""
+        existing = {index['name'] for index in self.db_manager.get_indexes()}
+        for name in list(self._index_benefits):
+            if name not in existing:
+                # Dropped together with its table when the table was replaced
+                del self._index_benefits[name]
+        return sorted(self._index_benefits.values(), key=lambda item: item['cost_saved'], reverse=True)
+    
+    def get_space_used(self) -> int:
+        """Get the total size in bytes of the advisor-managed indexes."""
+        return sum(item['size_bytes'] for item in self.get_report())
+    
+    def _tune_in_background(self) -> None:
+        """Run a tuning pass unless one is already running; never raise."""
+        if self._tune_lock.locked():
+            return
+        try:
+            self.tune()
+        except Exception:
+            pass
+    
+    def _workload_queries(self) -> List[str]:
+        """Get the distinct SELECT queries in the workload that read known tables."""
+        tables = self.db_manager.get_table_names()
+        queries = {}
+        for query in self.workload:
+            normalized = normalize_sql(query)
+            if not normalized.startswith(('select', 'with')) or normalized in queries:
+                continue
+            if referenced_tables(query, tables):
+                queries[normalized] = query
+        return list(queries.values())
+    
+    def _table_rows(self, queries: List[str]) -> Dict[str, int]:
+        """Get row counts (from the statistics catalog) for the tables the workload reads."""
+        tables = set()
+        known = self.db_manager.get_table_names()
+        for query in queries:
+            tables.update(referenced_tables(query, known))
+        return {table: self.db_manager.get_table_info(table)['row_count'] for table in tables}
+    
+    def _query_cost(self, query: str, plan: List[Dict[str, Any]], table_rows: Dict[str, int]) -> float:
+        """Estimate a query's cost, resolving table aliases to their row counts."""
+        rows_by_name = {
+            alias: table_rows.get(table, 0)
+            for alias, table in extract_table_aliases(query, table_rows).items()
+        }
+        return estimate_plan_cost(plan, rows_by_name)['cost']
+    
+    def _drop_unused_indexes(self, plans: Dict[str, List[Dict[str, Any]]]) -> int:
+        """Drop advisor indexes no workload query uses; return the size of the ones kept."""
+        used_bytes = 0
+        for index in self.db_manager.get_indexes():
+            if not index['name'].startswith(self.INDEX_PREFIX):
+                continue
+            if any(plan_uses_index(plan, index['name']) for plan in plans.values()):
+                used_bytes += self._index_size(index['name'], index['table'], index['columns'])
+            else:
+                self.db_manager.drop_index(index['name'])
+                self._index_benefits.pop(index['name'], None)
+        return used_bytes
+    
+    def _candidate_indexes(self, queries: List[str]) -> List[Dict[str, Any]]:
+        """Derive candidate indexes from the filter, join, group and order columns of queries.
+        
+        Candidates are ranked by how many workload queries could use them.
+        """
+        table_columns = {
+            table: self.db_manager.get_table_columns(table)
+            for table in self.db_manager.get_table_names()
+        }
+        candidates: Dict[Tuple[str, Tuple[str, ...]], List[str]] = {}
+        
+        def add(table, columns, query):
+            columns = tuple(dict.fromkeys(columns))[:self.MAX_INDEX_COLUMNS]
+            queries_for_candidate = candidates.setdefault((table, columns), []) if columns else None
+            if queries_for_candidate is not None and query not in queries_for_candidate:
+                queries_for_candidate.append(query)
+        
+        for query in queries:
+            for table, usage in extract_column_usage(query, table_columns).items():
+                # Equality columns lead the index, then one range/group/order column
+                leading = usage['equality'] + usage['join']
+                trailing = (usage['range'] or usage['group'] or usage['order'])[:1]
+                add(table, leading + trailing, query)
+                
+                for column in usage['join']:
+                    add(table, [column], query)
+                if usage['group']:
+                    add(table, usage['group'], query)
+                if usage['order'] and not leading:
+                    add(table, usage['order'], query)
+        
+        # Wider indexes first among equals, so their prefixes are then already covered
+        ranked = sorted(candidates.items(), key=lambda item: (len(item[1]), len(item[0][1])), reverse=True)
+        return [{'table': table, 'columns': list(columns), 'queries': queries}
+                for (table, columns), queries in ranked]
+    
+    def _try_candidate(self, candidate: Dict[str, Any], plans: Dict[str, List[Dict[str, Any]]],
+                       table_rows: Dict[str, int], used_bytes: int) -> int:
+        """Build a candidate index, keeping it only if it pays off; return the bytes it added."""
+        table, columns = candidate['table'], candidate['columns']
+        if table_rows.get(table, 0) < self.MIN_TABLE_ROWS:
+            return 0
+        for index in self.db_manager.get_indexes(table):
+            if index['columns'][:len(columns)] == columns:
+                return 0  # an existing index already serves these columns
+        
+        estimated_size = self._estimate_index_size(table, columns)
+        if used_bytes + estimated_size > self.space_budget_bytes:
+            return 0
+        
+        # Judge the index on every workload query over the table, not only the ones
+        # it was derived from; a prefix of it may serve others too
+        queries = [query for query in plans if referenced_tables(query, [table])]
+        cost_before = {query: self._query_cost(query, plans[query], table_rows) for query in queries}
+        total_before = sum(cost_before.values())
+        if total_before <= 0:
+            return 0
+        
+        index_name = self._index_name(table, columns)
+        self.db_manager.create_index(table, columns, index_name)
+        
+        new_plans = {query: self.db_manager.explain_query_plan(query) for query in queries}
+        cost_after = {query: self._query_cost(query, new_plans[query], table_rows) for query in queries}
+        total_after = sum(cost_after.values())
+        
+        sped_up = [query for query in queries
+                   if plan_uses_index(new_plans[query], index_name) and cost_after[query] < cost_before[query]]
+        saved = sum(cost_before[query] - cost_after[query] for query in sped_up)
+        targeted = sum(cost_before[query] for query in sped_up)
+        if not sped_up or total_after > total_before or saved / targeted < self.min_improvement:
+            self.db_manager.drop_index(index_name)
+            return 0
+        
+        plans.update(new_plans)
+        size = self._index_size(index_name, table, columns)
+        self._index_benefits[index_name] = {
+            'name': index_name,
+            'table': table,
+            'columns': columns,
+            'size_bytes': size,
+            'created_at': datetime.now().isoformat(),
+            'cost_saved': saved,
+            'queries': [
+                {'sql': query, 'cost_before': cost_before[query], 'cost_after': cost_after[query]}
+                for query in sped_up
+            ]
+        }
+        return size
+    
+    def _index_name(self, table: str, columns: List[str]) -> str:
+        """Build a readable, collision-safe name for an advisor index."""
+        name = f"{self.INDEX_PREFIX}{table}_{'_'.join(columns)}".lower()
+        name = re.sub(r'[^a-z0-9_]', '_', name)
+        if len(name) > 60:
+            digest = hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]
+            name = f"{name[:51]}_{digest}"
+        return name
+    
+    def _index_size(self, index_name: str, table: str, columns: List[str]) -> int:
+        """Get an index's measured size, falling back to an estimate."""
+        size = self.db_manager.get_index_size(index_name)
+        return size if size is not None else self._estimate_index_size(table, columns)
+    
+    def _estimate_index_size(self, table: str, columns: List[str]) -> int:
+        """Estimate index size from the row count and sampled average column widths."""
+        rows = self.db_manager.get_table_info(table)['row_count']
+        widths = ", ".join(
+            f"AVG(LENGTH({self.db_manager._quote_identifier(col)}))" for col in columns
+        )
+        sample = self.db_manager.execute_query(
+            f"SELECT {widths} FROM (SELECT * FROM {table} LIMIT {self.WIDTH_SAMPLE_ROWS})",
+            use_cache=False
+        )
+        average_width = sum(float(value or 0) for value in sample.iloc[0])
+        # Each entry also stores the rowid plus record and page overhead
+        return int(rows * (average_width + 16))
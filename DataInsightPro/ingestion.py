@@ -0,0 +1,368 @@
+import io
+import os
+import time
+import threading
+import collections
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Callable, Tuple
+import pandas as pd
+from utils import read_data_file, clean_dataframe, generate_table_name, TYPED_FILE_EXTENSIONS
+
+SUPPORTED_EXTENSIONS = ('csv', 'xlsx', 'xls') + TYPED_FILE_EXTENSIONS
+
+def parse_file(file_name: str, data: bytes) -> Dict[str, Any]:
+    """Read and clean one data file; runs in a worker process.
+    
+    Returns the cleaned frame with parse timing, or the error message
+    instead of raising so one bad file doesn't fail the whole batch.
+    """
+    started = time.perf_counter()
+    try:
+        file_extension = file_name.rsplit('.', 1)[-1].lower()
+        df = read_data_file(io.BytesIO(data), file_extension)
+        df = clean_dataframe(df, infer_types=file_extension not in TYPED_FILE_EXTENSIONS)
+        return {'file': file_name, 'data': df, 'parse_seconds': time.perf_counter() - started, 'error': None}
+    except Exception as e:
+        return {'file': file_name, 'data': None, 'parse_seconds': time.perf_counter() - started, 'error': str(e)}
+
+class MultiFileIngester:
+    """Ingests batches of CSV/Excel/Parquet/Arrow files, including ZIP archives of them.
+    
+    Files are parsed and cleaned in parallel worker processes, then loaded
+    on the calling thread either as one table per file or unioned into a
+    single table with a column recording each row's source file. Every
+    file gets a report entry with its timings and any error.
+    """
+    
+    SOURCE_COLUMN = "source_file"
+    
+    def __init__(self, db_manager, max_workers: Optional[int] = None):
+        """Initialize with the database to load into and the worker process limit."""
+        self.db_manager = db_manager
+        self.max_workers = max_workers or os.cpu_count() or 1
+    
+    def expand_files(self, uploaded_files: List[Any]) -> Tuple[List[Tuple[str, bytes]], List[Dict[str, Any]]]:
+        """Read uploaded files into (name, bytes) pairs, unpacking ZIP archives.
+        
+        ZIP members are named by their file name, or by their path inside
+        the archive when an earlier file in the batch has the same name.
+        Returns the data files and report entries for anything skipped.
+        """
+        files = []
+        skipped = []
+        seen_names = set()
+        for uploaded_file in uploaded_files:
+            file_name = os.path.basename(uploaded_file.name)
+            data = uploaded_file.getvalue() if hasattr(uploaded_file, 'getvalue') else uploaded_file.read()
+            extension = file_name.rsplit('.', 1)[-1].lower()
+            
+            if extension == 'zip':
+                try:
+                    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                        for member in archive.infolist():
+                            member_name = os.path.basename(member.filename)
+                            # Skip folders and macOS resource-fork entries
+                            if member.is_dir() or not member_name or member.filename.startswith('__MACOSX/'):
+                                continue
+                            if member_name.rsplit('.', 1)[-1].lower() in SUPPORTED_EXTENSIONS:
+                                # a/data.csv and b/data.csv must stay apart in the report and tables
+                                if member_name.lower() in seen_names:
+                                    member_name = member.filename
+                                seen_names.add(member_name.lower())
+                                files.append((member_name, archive.read(member)))
+                            else:
+                                skipped.append(self._error_entry(member_name, "Unsupported file format"))
+                except zipfile.BadZipFile as e:
+                    skipped.append(self._error_entry(file_name, f"Invalid ZIP archive: {str(e)}"))
+            elif extension in SUPPORTED_EXTENSIONS:
+                seen_names.add(file_name.lower())
+                files.append((file_name, data))
+            else:
+                skipped.append(self._error_entry(file_name, f"Unsupported file format: {extension}"))
+        return files, skipped
+    
+    def parse_files(self, files: List[Tuple[str, bytes]],
+                    progress_callback: Optional[Callable[[int, int], None]] = None) -> List[Dict[str, Any]]:
+        """Parse and clean files in parallel, returning results in input order."""
+        if len(files) <= 1 or self.max_workers <= 1:
+            # A pool would only add process start-up cost
+            results = []
+            for file_name, data in files:
+                results.append(parse_file(file_name, data))
+                if progress_callback:
+                    progress_callback(len(results), len(files))
+            return results
+        
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, len(files))) as executor:
+            futures = [executor.submit(parse_file, file_name, data) for file_name, data in files]
+            results = []
+            for future in futures:
+                results.append(future.result())
+                if progress_callback:
+                    progress_callback(len(results), len(files))
+            return results
+    
+    def ingest(self, uploaded_files: List[Any], union: bool = False,
+               table_name: Optional[str] = None,
+               progress_callback: Optional[Callable[[int, int], None]] = None,
+               **load_options) -> Dict[str, Any]:
+        """Parse a batch of files in parallel and load them into the database.
+        
+        With union=False each file becomes its own table named after the
+        file (numbered _2, _3, ... when names repeat in the batch); with
+        union=True all files are stacked into table_name (columns matched
+        by name) with a source_file column. load_options are passed on to
+        create_table_from_dataframe (e.g. build_rollups). Returns
+        {'tables': [...], 'files': [per-file report], 'seconds': total}.
+        """
+        try:
+            started = time.perf_counter()
+            files, report = self.expand_files(uploaded_files)
+            results = self.parse_files(files, progress_callback)
+            
+            tables = []
+            if union:
+                tables = self._load_union(results, table_name, report, load_options)
+            else:
+                for result, name in zip(results, self._table_names([result['file'] for result in results])):
+                    entry = self._report_entry(result)
+                    report.append(entry)
+                    if result['error'] is not None:
+                        continue
+                    try:
+                        load_stats = self.db_manager.create_table_from_dataframe(
+                            result['data'], name, bulk_load=True, **load_options
+                        )
+                    except Exception as e:
+                        entry['error'] = str(e)
+                        continue
+                    entry.update(table=load_stats['table_name'], load_seconds=load_stats['seconds'])
+                    tables.append(load_stats['table_name'])
+            
+            return {'tables': tables, 'files': report, 'seconds': time.perf_counter() - started}
+        except Exception as e:
+            raise Exception(f"Error ingesting files: {str(e)}")
+    
+    def _load_union(self, results: List[Dict[str, Any]], table_name: Optional[str],
+                    report: List[Dict[str, Any]], load_options: Dict[str, Any]) -> List[str]:
+        """Stack the parsed files into one table tagged with each row's source file."""
+        frames = []
+        entries = []
+        for result in results:
+            entry = self._report_entry(result)
+            report.append(entry)
+            if result['error'] is None and self.SOURCE_COLUMN in result['data'].columns:
+                entry['error'] = f"File already has a {self.SOURCE_COLUMN} column"
+            elif result['error'] is None:
+                frame = result['data']
+                frame.insert(0, self.SOURCE_COLUMN, result['file'])
+                frames.append(frame)
+                entries.append(entry)
+        if not frames:
+            return []
+        
+        combined = pd.concat(frames, ignore_index=True, sort=False)
+        load_stats = self.db_manager.create_table_from_dataframe(
+            combined, table_name or 'combined_data', bulk_load=True, **load_options
+        )
+        for entry in entries:
+            entry['table'] = load_stats['table_name']
+            # The files share one load; attribute its time by row share
+            entry['load_seconds'] = load_stats['seconds'] * entry['rows'] / max(len(combined), 1)
+        return [load_stats['table_name']]
+    
+    def _table_names(self, file_names: List[str]) -> List[str]:
+        """Name each file's table after the file, numbering names that repeat within the batch."""
+        names = []
+        for file_name in file_names:
+            name = generate_table_name(file_name)
+            candidate, suffix = name, 2
+            while candidate in names:
+                candidate = f"{name[:46]}_{suffix}"
+                suffix += 1
+            names.append(candidate)
+        return names
+    
+    def _report_entry(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Describe a parsed file for the ingestion report."""
+        df = result['data']
+        return {
+            'file': result['file'],
+            'rows': len(df) if df is not None else 0,
+            'columns': len(df.columns) if df is not None else 0,
+            'parse_seconds': result['parse_seconds'],
+            'load_seconds': None,
+            'table': None,
+            'error': result['error']
+        }
+    
+    def _error_entry(self, file_name: str, error: str) -> Dict[str, Any]:
+        """Describe a file that was skipped before parsing."""
+        return {'file': file_name, 'rows': 0, 'columns': 0, 'parse_seconds': None,
+                'load_seconds': None, 'table': None, 'error': error}
+
+
+class DirectoryWatcher:
+    """Polls a directory in the background and appends new data to one table.
+    
+    New files are ingested whole. A CSV that grew since the last scan only
+    has the lines appended since then read, from the byte offset reached
+    last time. Other files that change are re-read in full, which needs
+    key_columns so rows already loaded are skipped (or updated with
+    upsert=True). What was read from each file is kept in a catalog table,
+    so a new watcher on the same directory and table resumes where the
+    last one stopped.
+    """
+    
+    CATALOG_TABLE = "_di_watched_files"
+    POLL_INTERVAL = 5.0
+    
+    # Files modified more recently than this may still be being written
+    SETTLE_SECONDS = 2.0
+    MAX_EVENTS = 50
+    
+    def __init__(self, db_manager, directory: str, table_name: str,
+                 key_columns: Optional[List[str]] = None, upsert: bool = False,
+                 poll_interval: float = POLL_INTERVAL, add_source_column: bool = True):
+        """Initialize the watcher and load the progress recorded for this directory and table."""
+        self.db_manager = db_manager
+        self.directory = os.path.abspath(directory)
+        self.table_name = table_name
+        self.key_columns = key_columns or None
+        self.upsert = upsert
+        self.poll_interval = poll_interval
+        self.add_source_column = add_source_column
+        self.events = collections.deque(maxlen=self.MAX_EVENTS)
+        self.last_scan = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        
+        with db_manager._write_lock:
+            connection = db_manager.connection
+            connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.CATALOG_TABLE} ("
+                "table_name TEXT NOT NULL, path TEXT NOT NULL, size INTEGER NOT NULL, "
+                "mtime REAL NOT NULL, offset INTEGER NOT NULL, PRIMARY KEY (table_name, path))"
+            )
+            connection.commit()
+            self._files = {
+                path: {'size': size, 'mtime': mtime, 'offset': offset}
+                for path, size, mtime, offset in connection.execute(
+                    f"SELECT path, size, mtime, offset FROM {self.CATALOG_TABLE} WHERE table_name = ?",
+                    (table_name,)
+                )
+            }
+    
+    def start(self) -> None:
+        """Start polling in a background thread."""
+        if self.is_running():
+            return
+        if not os.path.isdir(self.directory):
+            raise ValueError(f"Not a directory: {self.directory}")
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"watch-{self.table_name}", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """Stop polling once the current scan finishes."""
+        self._stop_event.set()
+    
+    def is_running(self) -> bool:
+        """Check whether the background thread is polling."""
+        return self._thread is not None and self._thread.is_alive()
+    
+    def get_events(self) -> List[Dict[str, Any]]:
+        """Get recent ingestion events, newest first."""
+        return list(reversed(self.events))
+    
+    def scan(self) -> List[Dict[str, Any]]:
+        """Ingest whatever is new in the directory once; return the events produced."""
+        events = []
+        now = time.time()
+        for entry in sorted(os.scandir(self.directory), key=lambda entry: entry.name):
+            extension = entry.name.rsplit('.', 1)[-1].lower()
+            if not entry.is_file() or extension not in SUPPORTED_EXTENSIONS:
+                continue
+            stat = entry.stat()
+            state = self._files.get(entry.path)
+            if state and state['size'] == stat.st_size and state['mtime'] == stat.st_mtime:
+                continue
+            if now - stat.st_mtime < self.SETTLE_SECONDS:
+                continue
+            
+            event = self._ingest_file(entry.path, extension, stat, state)
+            event['time'] = now
+            events.append(event)
+            self.events.append(event)
+        self.last_scan = now
+        return events
+    
+    def _run(self) -> None:
+        """Poll until stopped; a failed scan is recorded and retried next time."""
+        while not self._stop_event.is_set():
+            try:
+                self.scan()
+            except Exception as e:
+                self.events.append({'file': self.directory, 'rows': 0, 'error': str(e), 'time': time.time()})
+            self._stop_event.wait(self.poll_interval)
+    
+    def _ingest_file(self, path: str, extension: str, stat: os.stat_result,
+                     state: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Read the new part of one file and append it to the table."""
+        file_name = os.path.basename(path)
+        started = time.perf_counter()
+        event = {'file': file_name, 'rows': 0, 'error': None}
+        try:
+            grown_csv = extension == 'csv' and state is not None and stat.st_size > state['size']
+            if state is not None and not grown_csv and not self.key_columns:
+                raise ValueError("File changed; re-reading it needs key columns to skip rows already loaded")
+            
+            if extension == 'csv':
+                df, offset = self._read_csv_lines(path, state['offset'] if grown_csv else 0)
+            else:
+                df, offset = read_data_file(path, extension), stat.st_size
+            
+            if df is not None and not df.empty:
+                df = clean_dataframe(df, infer_types=extension not in TYPED_FILE_EXTENSIONS)
+                if self.add_source_column:
+                    df.insert(0, MultiFileIngester.SOURCE_COLUMN, file_name)
+                load_stats = self.db_manager.append_dataframe(
+                    df, self.table_name, key_columns=self.key_columns, upsert=self.upsert
+                )
+                event.update(rows=load_stats['rows_inserted'], updated=load_stats.get('rows_updated', 0))
+            self._save_state(path, stat, offset)
+        except Exception as e:
+            event['error'] = str(e)
+            # Don't retry until the file changes again
+            self._save_state(path, stat, state['offset'] if state else 0)
+        event['seconds'] = time.perf_counter() - started
+        return event
+    
+    def _read_csv_lines(self, path: str, offset: int) -> Tuple[Optional[pd.DataFrame], int]:
+        """Read a CSV's complete lines from a byte offset, with the header from the top of the file.
+        
+        Returns the rows (None if there are no new complete lines) and the
+        offset to resume from; a trailing partial line is left for next time.
+        """
+        with open(path, 'rb') as handle:
+            header = handle.readline()
+            if offset == 0:
+                offset = len(header)
+            handle.seek(offset)
+            data = handle.read()
+        
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return None, offset
+        return pd.read_csv(io.BytesIO(header + data[:end])), offset + end
+    
+    def _save_state(self, path: str, stat: os.stat_result, offset: int) -> None:
+        """Record how far a file has been read."""
+        self._files[path] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'offset': offset}
+        with self.db_manager._write_lock:
+            self.db_manager.connection.execute(
+                f"INSERT OR REPLACE INTO {self.CATALOG_TABLE} VALUES (?, ?, ?, ?, ?)",
+                (self.table_name, path, stat.st_size, stat.st_mtime, offset)
+            )
+            self.db_manager.connection.commit()
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional
+
+
+def normalize_question(question: str) -> str:
+    """Normalise a natural language question so trivially different spellings share a cache entry.
+    
+    Case and runs of whitespace are folded and trailing punctuation is
+    dropped, so "Top 10 products?" and "top 10  products" are the same.
+    """
+    return re.sub(r'\s+', ' ', question).strip().rstrip('?.!').strip().lower()
+
+
+def fingerprint(*parts: Any) -> str:
+    """Hash JSON-serialisable parts into a stable hex fingerprint."""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """Persistent on-disk cache of language model responses.
+    
+    Entries live in a small SQLite file so they survive restarts and are
+    shared by every session of the server. Callers build the key with
+    fingerprint() from everything the response depends on (normalised
+    question, table schema, model and its parameters), so a changed
+    schema or prompt simply misses. Entries expire after ttl_seconds and
+    the least recently used ones are evicted once the values stored pass
+    max_bytes. Each entry keeps the latency of the call that produced it,
+    so the stats can report the API time saved by hits.
+    """
+    
+    TTL_SECONDS = 7 * 24 * 3600
+    MAX_BYTES = 20 * 1024 * 1024
+    
+    def __init__(self, cache_path: Optional[str] = None, ttl_seconds: float = TTL_SECONDS,
+                 max_bytes: int = MAX_BYTES):
+        """Initialize the cache file (DATAINSIGHT_LLM_CACHE or llm_cache.db), entry lifetime and size limit."""
+        self.cache_path = cache_path or os.getenv("DATAINSIGHT_LLM_CACHE", "llm_cache.db")
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'saved_ms': 0.0}
+        self.connection = None
+        try:
+            self.connection = sqlite3.connect(self.cache_path, check_same_thread=False, timeout=10)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    latency_ms REAL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used)")
+            self.connection.commit()
+        except Exception as e:
+            if getattr(self, 'connection', None) is not None:
+                self.connection.close()
+            raise Exception(f"Error opening LLM response cache: {str(e)}")
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Get a cached value, or None if it is missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT value, latency_ms, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[2] > self.ttl_seconds:
+                self.connection.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self.connection.commit()
+                self._stats['expired'] += 1
+                row = None
+            if row is None:
+                self._stats['misses'] += 1
+                return None
+            
+            self.connection.execute(
+                "UPDATE llm_cache SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+            self.connection.commit()
+            self._stats['hits'] += 1
+            self._stats['saved_ms'] += row[1] or 0.0
+        return json.loads(row[0])
+    
+    def put(self, key: str, kind: str, value: Any, latency_ms: Optional[float] = None) -> None:
+        """Store a value with the latency of the call that produced it, evicting old entries if needed."""
+        payload = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, kind, value, size, latency_ms, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, payload, len(payload.encode('utf-8')), latency_ms, now, now)
+            )
+            self._evict(now)
+            self.connection.commit()
+    
+    def clear(self) -> None:
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            self.connection.execute("DELETE FROM llm_cache")
+            self.connection.commit()
+            self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'saved_ms': 0.0}
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counts, hit rate, API time saved and the cache's size.
+        
+        Hits and misses count this process's lookups; entries, bytes and
+        entries_by_kind describe the file.
+        """
+        with self._lock:
+            entries, size = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+            ).fetchone()
+            by_kind = dict(self.connection.execute(
+                "SELECT kind, COUNT(*) FROM llm_cache GROUP BY kind"
+            ).fetchall())
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats.update(
+            lookups=lookups,
+            hit_rate=stats['hits'] / lookups if lookups else 0.0,
+            entries=entries,
+            bytes=size,
+            entries_by_kind=by_kind
+        )
+        return stats
+    
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then the least recently used ones until the cache fits max_bytes."""
+        expired = self.connection.execute(
+            "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+        ).rowcount
+        self._stats['expired'] += max(expired, 0)
+        
+        size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if size <= self.max_bytes:
+            return
+        # Walk from the least recently used entry until enough bytes are freed
+        excess = size - self.max_bytes
+        victims = []
+        for key, entry_size in self.connection.execute("SELECT key, size FROM llm_cache ORDER BY last_used"):
+            if excess <= 0:
+                break
+            victims.append((key,))
+            excess -= entry_size
+        self.connection.executemany("DELETE FROM llm_cache WHERE key = ?", victims)
+        self._stats['evictions'] += len(victims)
+
+
+def open_llm_cache(cache_path: Optional[str] = None) -> LLMResponseCache:
+    """Open the on-disk LLM response cache, or an in-memory one if the file can't be opened.
+    
+    A read-only working directory (or an unwritable DATAINSIGHT_LLM_CACHE)
+    then only costs persistence across restarts instead of failing the
+    caller.
+    """
+    try:
+        return LLMResponseCache(cache_path)
+    except Exception:
+        return LLMResponseCache(':memory:')
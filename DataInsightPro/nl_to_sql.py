@@ -1,19 +1,38 @@
 import json
 import os
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Optional, Tuple
 from openai import OpenAI
+from llm_cache import LLMResponseCache, open_llm_cache, normalize_question, fingerprint
+from sql_parser import normalize_sql
 
 class NLToSQLConverter:
-    """Converts natural language questions to SQL queries using OpenAI."""
+    """Converts natural language questions to SQL queries using OpenAI.
     
-    def __init__(self):
-        """Initialize the converter with OpenAI client."""
+    Responses are kept in a persistent LLMResponseCache keyed by the
+    normalised question (or SQL), a fingerprint of the table context sent
+    to the model and the request's model parameters, so a repeated
+    question on an unchanged table skips the API round trip.
+    """
+    
+    # Part of every cache key; bump when a prompt template changes
+    PROMPT_VERSION = 1
+    
+    def __init__(self, cache: Optional[LLMResponseCache] = None):
+        """Initialize the converter with OpenAI client and the response cache (the default cache if None)."""
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         if not self.openai_api_key:
             raise ValueError("OPENAI_API_KEY environment variable is required")
         
         self.client = OpenAI(api_key=self.openai_api_key)
+        self.cache = cache if cache is not None else open_llm_cache()
+        
+        # Rendered table contexts keyed by (table name, table generation)
+        self._context_cache: Dict[Tuple[str, int], str] = {}
         
+        # Latency and token usage of the most recent SQL generation call
+        self.last_call_stats: Dict[str, Any] = {}
+    
     def convert_to_sql(self, question: str, table_name: str, table_schema: Dict[str, Any]) -> str:
         """Convert natural language question to SQL query."""
         try:
@@ -25,9 +44,9 @@ class NLToSQLConverter:
             
             # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
             # do not change this unless explicitly requested by the user
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
+            request = {
+                'model': "gpt-4o",
+                'messages': [
                     {
                         "role": "system",
                         "content": "You are an expert SQL developer. Generate accurate SQL queries based on natural language questions. Always return valid SQLite-compatible SQL queries. Return only the SQL query without any explanation or markdown formatting."
@@ -37,15 +56,31 @@ class NLToSQLConverter:
                         "content": prompt
                     }
                 ],
-                temperature=0.1,
-                max_tokens=500
-            )
+                'temperature': 0.1,
+                'max_tokens': 500
+            }
+            
+            started = time.perf_counter()
+            cache_key = self._cache_key('sql', normalize_question(question), context, request)
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                self.last_call_stats = {
+                    'latency_ms': (time.perf_counter() - started) * 1000,
+                    'prompt_tokens': 0,
+                    'completion_tokens': 0,
+                    'cached': True
+                }
+                return cached
+            
+            response = self.client.chat.completions.create(**request)
+            self.last_call_stats = self._call_stats(response, started)
             
             sql_query = response.choices[0].message.content.strip()
             
             # Clean up the SQL query
             sql_query = self._clean_sql_query(sql_query)
             
+            self._cache_put(cache_key, 'sql', sql_query, self.last_call_stats['latency_ms'])
             return sql_query
             
         except Exception as e:
@@ -66,9 +101,9 @@ class NLToSQLConverter:
             
             # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
             # do not change this unless explicitly requested by the user
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
+            request = {
+                'model': "gpt-4o",
+                'messages': [
                     {
                         "role": "system",
                         "content": "You are a business intelligence expert. Generate practical analytical questions that would provide business insights. Return only a JSON array of question strings."
@@ -78,12 +113,23 @@ class NLToSQLConverter:
                         "content": prompt
                     }
                 ],
-                response_format={"type": "json_object"},
-                temperature=0.3
-            )
+                'response_format': {"type": "json_object"},
+                'temperature': 0.3
+            }
+            
+            cache_key = self._cache_key('suggestions', table_name, context, request)
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                return cached
+            
+            started = time.perf_counter()
+            response = self.client.chat.completions.create(**request)
             
             result = json.loads(response.choices[0].message.content)
-            return result.get('suggestions', [])
+            suggestions = result.get('suggestions', [])
+            if suggestions:
+                self._cache_put(cache_key, 'suggestions', suggestions, (time.perf_counter() - started) * 1000)
+            return suggestions
             
         except Exception as e:
             # Return fallback suggestions if API fails
@@ -96,30 +142,80 @@ class NLToSQLConverter:
             ]
     
     def _prepare_table_context(self, table_name: str, table_schema: Dict[str, Any]) -> str:
-        """Prepare context string describing the table structure."""
-        context = f"Table name: {table_name}\n\n"
-        context += "Columns:\n"
+        """Prepare context string describing the table structure.
+        
+        Schemas that carry a table generation are rendered once per
+        generation and served from the context cache afterwards.
+        """
+        generation = table_schema.get('generation')
+        cache_key = (table_name, generation)
+        if generation is not None and cache_key in self._context_cache:
+            return self._context_cache[cache_key]
+        
+        lines = [f"Table name: {table_name}", "", "Columns:"]
         
         for column in table_schema['columns']:
-            context += f"- {column['name']} ({column['type']})"
+            line = f"- {column['name']} ({column['type']})"
             if column['primary_key']:
-                context += " [PRIMARY KEY]"
+                line += " [PRIMARY KEY]"
             if column['not_null']:
-                context += " [NOT NULL]"
-            context += "\n"
+                line += " [NOT NULL]"
+            lines.append(line)
         
         # Add sample data if available
         if 'sample_data' in table_schema and table_schema['sample_data']:
-            context += "\nSample data (first few rows):\n"
-            column_names = [col['name'] for col in table_schema['columns']]
-            context += " | ".join(column_names) + "\n"
-            context += "-" * (len(" | ".join(column_names))) + "\n"
+            header = " | ".join(col['name'] for col in table_schema['columns'])
+            lines.extend(["", "Sample data (first few rows):", header, "-" * len(header)])
             
             for row in table_schema['sample_data'][:3]:
-                context += " | ".join(str(val) for val in row) + "\n"
+                lines.append(" | ".join(str(val) for val in row))
+        
+        context = "\n".join(lines) + "\n"
+        
+        if generation is not None:
+            # Older generations of this table can never be requested again
+            for key in [key for key in self._context_cache if key[0] == table_name]:
+                del self._context_cache[key]
+            self._context_cache[cache_key] = context
         
         return context
     
+    def _call_stats(self, response, started: float) -> Dict[str, Any]:
+        """Summarise the latency and token usage of a completed API call."""
+        usage = getattr(response, 'usage', None)
+        return {
+            'latency_ms': (time.perf_counter() - started) * 1000,
+            'prompt_tokens': getattr(usage, 'prompt_tokens', None),
+            'completion_tokens': getattr(usage, 'completion_tokens', None),
+            'cached': False
+        }
+    
+    def _cache_key(self, kind: str, text: str, context: Optional[str], request: Dict[str, Any]) -> str:
+        """Build a response cache key from the normalised input, the table context and the model parameters.
+        
+        The user message is left out: it is the prompt template filled in
+        with the raw input, which the normalised text and PROMPT_VERSION
+        already stand for.
+        """
+        params = {name: value for name, value in request.items() if name != 'messages'}
+        system = [message['content'] for message in request['messages'] if message['role'] == 'system']
+        schema = fingerprint(context) if context is not None else None
+        return fingerprint(kind, self.PROMPT_VERSION, text, schema, params, system)
+    
+    def _cache_get(self, key: str) -> Optional[Any]:
+        """Look up a cached response; a cache that can't be read counts as a miss."""
+        try:
+            return self.cache.get(key)
+        except Exception:
+            return None
+    
+    def _cache_put(self, key: str, kind: str, value: Any, latency_ms: float) -> None:
+        """Store a response, ignoring cache write failures so the answer is still returned."""
+        try:
+            self.cache.put(key, kind, value, latency_ms)
+        except Exception:
+            pass
+    
     def _create_sql_prompt(self, question: str, table_context: str) -> str:
         """Create a detailed prompt for SQL generation."""
         prompt = f"""
@@ -180,9 +276,9 @@ class NLToSQLConverter:
             
             # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
             # do not change this unless explicitly requested by the user
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
+            request = {
+                'model': "gpt-4o",
+                'messages': [
                     {
                         "role": "system",
                         "content": "You are a data analyst who explains SQL queries in business terms. Be clear and concise."
@@ -192,11 +288,22 @@ class NLToSQLConverter:
                         "content": prompt
                     }
                 ],
-                temperature=0.2,
-                max_tokens=200
-            )
+                'temperature': 0.2,
+                'max_tokens': 200
+            }
+            
+            # The explanation depends only on the query text
+            cache_key = self._cache_key('explanation', normalize_sql(sql_query), None, request)
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                return cached
+            
+            started = time.perf_counter()
+            response = self.client.chat.completions.create(**request)
             
-            return response.choices[0].message.content.strip()
+            explanation = response.choices[0].message.content.strip()
+            self._cache_put(cache_key, 'explanation', explanation, (time.perf_counter() - started) * 1000)
+            return explanation
             
         except Exception as e:
             return f"Unable to explain query: {str(e)}"
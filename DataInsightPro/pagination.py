@@ -0,0 +1,133 @@
+import re
+import time
+from typing import Dict, Optional
+import pandas as pd
+from sql_parser import parse_simple_select, tokenize_sql
+
+# Column the keyset query adds to carry each row's rowid; dropped from pages
+KEY_COLUMN = "_di_page_key"
+
+_LEADING_SELECT = re.compile(r'^\s*select\b', re.IGNORECASE)
+
+
+class QueryPaginator:
+    """Fetches a query's result one page at a time instead of materialising it.
+    
+    Plain single-table selects (no aggregates, grouping, DISTINCT, ORDER BY or
+    LIMIT) are paged by keyset: the query is wrapped to carry the table's
+    rowid and each page seeks past the last rowid of the page before, so a
+    page costs the same whatever its position. Any other query falls back
+    to LIMIT/OFFSET over the wrapped query, whose cost grows with the
+    offset. The total row count comes from a separate count query, cached
+    by DatabaseManager.count_query_rows().
+    """
+    
+    PAGE_SIZE = 100
+    
+    # Results with more rows than this are shown page by page rather than as one table
+    MIN_PAGED_ROWS = 1000
+    
+    def __init__(self, db_manager, query: str, page_size: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        """Initialize with the database, the query to page through, rows per page and a deadline."""
+        self.db_manager = db_manager
+        self.query = db_manager._strip_query(query)
+        self.page_size = page_size or self.PAGE_SIZE
+        self.timeout = timeout
+        self.keyset = self._supports_keyset()
+        # Keyset bookmarks: page number -> rowid of the last row before that page
+        self._bookmarks: Dict[int, Optional[int]] = {0: None}
+    
+    def total_rows(self) -> int:
+        """Get the number of rows in the full result."""
+        return self.db_manager.count_query_rows(self.query, timeout=self.timeout)
+    
+    def page_count(self) -> int:
+        """Get the number of pages, at least one so an empty result still has a page."""
+        return max(1, -(-self.total_rows() // self.page_size))
+    
+    def get_page(self, page: int) -> pd.DataFrame:
+        """Fetch one page (numbered from 0) of the result.
+        
+        The frame's attrs['page'] records the page number, the position of
+        its first row, the pagination method and the fetch time in ms.
+        """
+        try:
+            started = time.perf_counter()
+            if self.keyset:
+                page_df = self._keyset_page(page)
+            else:
+                page_df = self.db_manager.execute_query(
+                    f"SELECT * FROM ({self.query}) LIMIT {self.page_size} OFFSET {page * self.page_size}",
+                    timeout=self.timeout
+                )
+            page_df.attrs['page'] = {
+                'page': page,
+                'first_row': page * self.page_size,
+                'method': 'keyset' if self.keyset else 'offset',
+                'fetch_ms': (time.perf_counter() - started) * 1000
+            }
+            return page_df
+        except Exception as e:
+            raise Exception(f"Error fetching result page: {str(e)}")
+    
+    def _keyset_page(self, page: int) -> pd.DataFrame:
+        """Fetch a page by seeking past the previous page's last rowid."""
+        after = self._bookmark(page)
+        page_df = self.db_manager.execute_query(
+            self._keyset_sql(f"SELECT * FROM ({{keyed}}){self._after(after)} "
+                             f"ORDER BY {KEY_COLUMN} LIMIT {self.page_size}"),
+            timeout=self.timeout
+        )
+        if len(page_df) == self.page_size:
+            self._bookmarks[page + 1] = int(page_df[KEY_COLUMN].iloc[-1])
+        return page_df.drop(columns=[KEY_COLUMN]).reset_index(drop=True)
+    
+    def _bookmark(self, page: int) -> Optional[int]:
+        """Find the rowid that precedes a page, skipping forward from the nearest known bookmark.
+        
+        Pages reached by next/previous always have a bookmark; jumping ahead
+        reads only the rowids in between.
+        """
+        if page in self._bookmarks:
+            return self._bookmarks[page]
+        known = max(number for number in self._bookmarks if number < page)
+        skip = (page - known) * self.page_size - 1
+        result = self.db_manager.execute_query(
+            self._keyset_sql(f"SELECT {KEY_COLUMN} FROM ({{keyed}}){self._after(self._bookmarks[known])} "
+                             f"ORDER BY {KEY_COLUMN} LIMIT 1 OFFSET {skip}"),
+            timeout=self.timeout
+        )
+        if result.empty:
+            raise ValueError(f"Page {page + 1} is past the end of the result")
+        self._bookmarks[page] = int(result.iloc[0, 0])
+        return self._bookmarks[page]
+    
+    def _keyset_sql(self, template: str) -> str:
+        """Fill {keyed} in a template with the query selecting the rowid as KEY_COLUMN too."""
+        keyed = _LEADING_SELECT.sub(f"SELECT rowid AS {KEY_COLUMN},", self.query, count=1)
+        return template.format(keyed=keyed)
+    
+    def _after(self, key: Optional[int]) -> str:
+        """WHERE clause keeping rows past a rowid, or nothing for the first page."""
+        return "" if key is None else f" WHERE {KEY_COLUMN} > {int(key)}"
+    
+    def _supports_keyset(self) -> bool:
+        """Check whether the query is a plain row-level select over one rowid table."""
+        plan = parse_simple_select(self.query)
+        if plan is None or not _LEADING_SELECT.match(self.query):
+            return False
+        if plan['group_by'] or plan['order_by'] or plan['limit'] is not None:
+            return False
+        if any(item['function'] or item['bucket'] for item in plan['items']):
+            return False
+        if 'distinct' in (value for _, value in tokenize_sql(self.query)):
+            return False
+        
+        tables = {name.lower(): name for name in self.db_manager.get_table_names()}
+        table = tables.get(plan['table'])
+        if table is None:
+            return False
+        # A real column named rowid would shadow the key
+        columns = {col.lower() for col in self.db_manager.get_table_columns(table)}
+        return not columns & {'rowid', '_rowid_', 'oid'}
@@ -0,0 +1,90 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Iterable
+import pandas as pd
+
+class QueryResultCache:
+    """LRU cache of query results bounded by an approximate memory budget."""
+    
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024):
+        """Initialize an empty cache holding at most max_bytes of result data."""
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Tuple) -> Optional[pd.DataFrame]:
+        """Get a copy of a cached result, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            result = entry['result']
+        
+        # Hand out copies so callers formatting the result can't corrupt the cache
+        return result.copy()
+    
+    def put(self, key: Tuple, result: pd.DataFrame, tables: Iterable[str]) -> bool:
+        """Store a result, evicting least recently used entries to stay within budget.
+        
+        Returns False when the result alone is larger than the whole budget.
+        """
+        size = int(result.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return False
+        
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            
+            while self._entries and self.current_bytes + size > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+            
+            self._entries[key] = {
+                'result': result.copy(),
+                'size': size,
+                'tables': frozenset(tables)
+            }
+            self.current_bytes += size
+        return True
+    
+    def invalidate_table(self, table_name: str) -> int:
+        """Drop every cached result that reads from a table; return how many were dropped."""
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if table_name in entry['tables']]
+            for key in stale:
+                self._remove(key)
+        return len(stale)
+    
+    def clear(self) -> None:
+        """Remove all cached results."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and memory usage of the cache."""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+    
+    def _remove(self, key: Tuple) -> None:
+        """Remove an entry and release its bytes from the budget (lock held)."""
+        entry = self._entries.pop(key)
+        self.current_bytes -= entry['size']
@@ -1,7 +1,7 @@
 import json
 import os
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 class QueryHistoryManager:
     """Manages query history for the data analysis tool."""
@@ -11,14 +11,22 @@ class QueryHistoryManager:
         self.history_file = history_file
         self.history = self._load_history()
     
-    def add_query(self, question: str, sql_query: str, result_count: int) -> None:
-        """Add a new query to the history."""
+    def add_query(self, question: str, sql_query: str, result_count: int,
+                  telemetry: Optional[Dict[str, Any]] = None) -> None:
+        """Add a new query to the history.
+        
+        telemetry holds execution measurements such as llm_latency_ms,
+        execution_ms, rows_scanned, rows_returned, result_bytes and the
+        query_plan lines.
+        """
         query_entry = {
             'timestamp': datetime.now().isoformat(),
             'question': question,
             'sql_query': sql_query,
             'result_count': result_count
         }
+        if telemetry is not None:
+            query_entry['telemetry'] = telemetry
         
         self.history.append(query_entry)
         
@@ -36,6 +44,11 @@ class QueryHistoryManager:
         """Get the most recent queries."""
         return self.history[-limit:] if len(self.history) >= limit else self.history
     
+    def get_slowest_queries(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Get the queries with the longest total time (LLM plus execution), slowest first."""
+        timed = [query for query in self.history if query.get('telemetry')]
+        return sorted(timed, key=self._total_time_ms, reverse=True)[:limit]
+    
     def search_history(self, search_term: str) -> List[Dict[str, Any]]:
         """Search through query history."""
         search_term = search_term.lower()
@@ -154,6 +167,11 @@ class QueryHistoryManager:
             'avg_results_per_query': total_results / total_queries if total_queries > 0 else 0
         }
     
+    def _total_time_ms(self, query: Dict[str, Any]) -> float:
+        """Get the LLM latency plus SQLite execution time recorded for a query."""
+        telemetry = query.get('telemetry') or {}
+        return (telemetry.get('llm_latency_ms') or 0) + (telemetry.get('execution_ms') or 0)
+    
     def _load_history(self) -> List[Dict[str, Any]]:
         """Load query history from file."""
         try:
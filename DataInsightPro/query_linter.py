@@ -0,0 +1,638 @@
+import re
+from datetime import date, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+from query_plan import estimate_plan_cost
+from sql_parser import tokenize_sql, extract_table_aliases, extract_column_usage
+from cost_guard import estimate_limited_cost
+
+_COMPARISONS = {'=', '==', '!=', '<>', '<', '<=', '>', '>='}
+_AGGREGATES = {'count', 'sum', 'avg', 'min', 'max', 'total', 'group_concat'}
+_IDENTIFIER = re.compile(r'[a-z_][a-z0-9_]*')
+
+_SEVERITY_ORDER = {'high': 0, 'medium': 1, 'low': 2}
+
+
+class QueryLinter:
+    """Flags slow query patterns from the query text and SQLite's actual plan.
+    
+    Findings cover full scans of large tables, temp B-tree sorts, correlated
+    subqueries, SELECT * over wide tables and non-sargable predicates (an
+    indexed column wrapped in a function or arithmetic, or a leading
+    wildcard LIKE). Each comes with a concrete rewrite and an estimated
+    saving, priced by editing the plan the way the rewrite would (e.g. a
+    SCAN turned into an index SEARCH) and re-running estimate_plan_cost().
+    Without a database, lint_text() applies the rules that only need the
+    query text.
+    """
+    
+    LARGE_TABLE_ROWS = 100000
+    LARGE_SORT_ROWS = 10000
+    WIDE_TABLE_COLUMNS = 20
+    
+    # LIMIT suggested for unfiltered scans that stream their rows
+    SUGGESTED_LIMIT = 1000
+    
+    # Findings whose rewrite saves less than this fraction are left out
+    MIN_SAVING = 0.05
+    
+    def __init__(self, db_manager=None):
+        """Initialize with the database whose plans and statistics are inspected (None for lint_text only)."""
+        self.db_manager = db_manager
+    
+    def lint(self, query: str) -> List[Dict[str, Any]]:
+        """Lint a query without running it.
+        
+        Returns findings ordered by severity and saving, each with 'rule',
+        'severity' ('high', 'medium' or 'low'), 'message', 'suggestion',
+        'estimated_saving' (fraction of the estimated cost, or of the result
+        size for SELECT *; None when it depends on data the linter can't
+        see) and 'saving_note' describing it. Findings saving less than
+        MIN_SAVING are dropped.
+        """
+        try:
+            estimate = self.db_manager.estimate_query_cost(query)
+            context = self._context(query, estimate)
+            
+            findings = self._non_sargable(context)
+            covered = {finding['table'] for finding in findings}
+            findings += self._full_scans(context, covered)
+            findings += self._temp_sorts(context)
+            findings += self._correlated_subqueries(context)
+            findings += self._select_star(context)
+            
+            findings = [
+                finding for finding in findings
+                if finding['estimated_saving'] is None or finding['estimated_saving'] >= self.MIN_SAVING
+            ]
+            findings.sort(key=lambda finding: (
+                _SEVERITY_ORDER[finding['severity']], -(finding['estimated_saving'] or 0.0)
+            ))
+            for finding in findings:
+                finding.pop('table', None)
+            return findings
+        except Exception as e:
+            raise Exception(f"Error linting query: {str(e)}")
+    
+    def lint_text(self, query: str) -> List[Dict[str, Any]]:
+        """Lint a query from its text alone, without a database or plan.
+        
+        Flags SELECT * without a WHERE clause, a missing LIMIT, LIMIT
+        without ORDER BY, and columns wrapped in a function or arithmetic
+        (or matched with a leading wildcard LIKE) in a filter. The linter
+        can't see indexes or row counts here, so findings carry no
+        estimated saving.
+        """
+        try:
+            tokens = tokenize_sql(query)
+            values = [value for _, value in tokens]
+            findings = self._text_predicates(tokens)
+            
+            star = any(value == '*' and values[i - 1] in ('select', ',', '.') for i, value in enumerate(values) if i)
+            aggregate_only = 'group' not in values and any(value in _AGGREGATES for value in values)
+            if star and 'where' not in values:
+                findings.append(self._finding(
+                    'select_star', 'low', None, "SELECT * without a WHERE clause returns every row and column",
+                    "Add a WHERE clause to filter the rows and name only the columns you need",
+                    None, "depends on the table's size"
+                ))
+            if 'limit' not in values and not aggregate_only and values and values[0] in ('select', 'with'):
+                findings.append(self._finding(
+                    'missing_limit', 'low', None, "The query has no LIMIT, so the result set may be large",
+                    f"Add LIMIT {self.SUGGESTED_LIMIT} while exploring",
+                    None, "depends on the number of matching rows"
+                ))
+            elif 'limit' in values and 'order' not in values:
+                findings.append(self._finding(
+                    'limit_without_order', 'low', None, "LIMIT without ORDER BY returns arbitrary rows",
+                    "Add an ORDER BY clause so the rows kept by LIMIT are well defined",
+                    None, "no cost change; makes the result deterministic"
+                ))
+            
+            findings.sort(key=lambda finding: _SEVERITY_ORDER[finding['severity']])
+            for finding in findings:
+                finding.pop('table', None)
+            return findings
+        except Exception as e:
+            raise Exception(f"Error linting query: {str(e)}")
+    
+    def _text_predicates(self, tokens: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """Flag filter predicates that would hide a column from any index on it."""
+        findings = []
+        filter_positions = _filter_positions(tokens)
+        
+        for i, (kind, value) in enumerate(tokens):
+            if i not in filter_positions or kind != 'name':
+                continue
+            
+            # function(... column ...) <op> value
+            if i + 1 < len(tokens) and tokens[i + 1][1] == '(' and value not in _AGGREGATES:
+                end = _closing_paren(tokens, i + 1)
+                comparison = _comparison_after(tokens, end + 1) if end is not None else None
+                column = _bare_column(tokens, i + 2, end) if comparison is not None else None
+                if column is None:
+                    continue
+                rewrite = _rewrite_function(value, tokens[i + 2:end], column, comparison)
+                findings.append(self._text_predicate_finding(tokens[i:end + 1], column, comparison, rewrite))
+                continue
+            
+            if i + 1 < len(tokens) and tokens[i + 1][1] in ('(', '.'):
+                continue
+            following = i + 1
+            
+            # column <+|-> number <op> number
+            if following + 1 < len(tokens) and tokens[following][1] in ('+', '-', '*', '/', '||'):
+                comparison = _comparison_after(tokens, following + 2)
+                if comparison is not None:
+                    rewrite = _rewrite_arithmetic(value, tokens[following][1], tokens[following + 1][1], comparison)
+                    findings.append(self._text_predicate_finding(tokens[i:following + 2], value, comparison, rewrite))
+                continue
+            
+            # column LIKE '%...'
+            if following + 1 < len(tokens) and tokens[following][1] == 'like' \
+                    and tokens[following + 1][0] == 'string' and tokens[following + 1][1].startswith("'%"):
+                findings.append(self._finding(
+                    'non_sargable', 'medium', None,
+                    f"LIKE {tokens[following + 1][1]} on {value} starts with a wildcard, so no index can be used",
+                    "Anchor the pattern at the start (LIKE 'abc%'), or use an FTS5 full-text table "
+                    "for substring search",
+                    None, "depends on whether the column is indexed"
+                ))
+        return findings
+    
+    def _text_predicate_finding(self, expression: List[Tuple[str, str]], column: str,
+                                comparison: Tuple[str, str], rewrite: Optional[Tuple[str, str]]) -> Dict[str, Any]:
+        """Describe a column hidden inside an expression when the schema isn't known."""
+        expression_sql = _render(expression)
+        suggestion = rewrite[0] if rewrite is not None else \
+            f"Compare the bare column {column} so an index on it can be used"
+        return self._finding(
+            'non_sargable', 'medium', None,
+            f"{expression_sql} {comparison[0]} {comparison[1]} wraps column {column}, "
+            "so no index on it can be used",
+            suggestion, None, "depends on whether the column is indexed"
+        )
+    
+    def _context(self, query: str, estimate: Dict[str, Any]) -> Dict[str, Any]:
+        """Gather what the rules share: tokens, tables, aliases, column usage, indexes and row counts."""
+        aliases = extract_table_aliases(query, self.db_manager.get_table_names())
+        tables = sorted(set(aliases.values()))
+        table_columns = {table: self.db_manager.get_table_columns(table) for table in tables}
+        table_rows = {name: self.db_manager.get_table_info(table)['row_count'] for name, table in aliases.items()}
+        indexed = {
+            table: {index['columns'][0].lower() for index in self.db_manager.get_indexes(table) if index['columns']}
+            for table in tables
+        }
+        return {
+            'query': query,
+            'tokens': tokenize_sql(query),
+            'estimate': estimate,
+            'aliases': aliases,
+            'table_columns': table_columns,
+            'table_rows': table_rows,
+            'usage': extract_column_usage(query, table_columns),
+            'indexed': indexed
+        }
+    
+    def _full_scans(self, context: Dict[str, Any], covered: set) -> List[Dict[str, Any]]:
+        """Flag full scans of large tables, suggesting an index on the filter columns or a filter."""
+        findings = []
+        estimate = context['estimate']
+        for scan in estimate['full_scans']:
+            table = context['aliases'].get(scan['table'].lower())
+            if table is None or scan['rows'] < self.LARGE_TABLE_ROWS or table in covered:
+                continue
+            usage = context['usage'].get(table, {})
+            filters = [col for col in usage.get('equality', []) if col.lower() not in context['indexed'][table]]
+            ranges = [col for col in usage.get('range', []) if col.lower() not in context['indexed'][table]]
+            
+            if filters or ranges:
+                columns = filters + ranges[:1]
+                conditions = [f"{col}=?" for col in filters] + [f"{col}>?" for col in ranges[:1]]
+                saving = self._what_if_saving(context, scan['detail'],
+                                              f"SEARCH {scan['table']} USING INDEX what_if ({' AND '.join(conditions)})")
+                findings.append(self._finding(
+                    'full_scan', 'high', table,
+                    f"Full scan of {table} ({scan['rows']:,.0f} rows): no index on the filtered column(s) "
+                    f"{', '.join(columns)}",
+                    f"CREATE INDEX {_index_name(table, columns)} ON {table} ({', '.join(columns)})",
+                    saving, f"~{saving:.0%} of the estimated cost with the index"
+                ))
+                continue
+            
+            limited = estimate_limited_cost(context['query'], estimate, self.SUGGESTED_LIMIT)
+            if limited is not None:
+                saving = 1.0 - limited / estimate['cost'] if estimate['cost'] else 0.0
+                findings.append(self._finding(
+                    'full_scan', 'medium', table,
+                    f"Full scan of {table} ({scan['rows']:,.0f} rows) with no filter",
+                    f"Add a WHERE clause on an indexed column or LIMIT {self.SUGGESTED_LIMIT}",
+                    saving, f"~{saving:.0%} of the estimated cost with LIMIT {self.SUGGESTED_LIMIT}"
+                ))
+            else:
+                findings.append(self._finding(
+                    'full_scan', 'low', table,
+                    f"Full scan of {table} ({scan['rows']:,.0f} rows) with no filter; every row feeds "
+                    "a sort or aggregate",
+                    "Filter on an indexed column; for aggregates, build rollup tables at upload so they "
+                    "read a small pre-aggregated table",
+                    None, "depends on the filter's selectivity or the rollup's size"
+                ))
+        return findings
+    
+    def _temp_sorts(self, context: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Flag large temp B-tree sorts, suggesting an index that delivers rows in order."""
+        findings = []
+        estimate = context['estimate']
+        for btree in estimate['temp_btrees']:
+            if btree['rows'] < self.LARGE_SORT_ROWS:
+                continue
+            purpose = btree['detail'].split(' FOR ', 1)[-1]
+            category = 'group' if 'GROUP BY' in purpose else 'order'
+            saving = self._what_if_saving(context, btree['detail'], None)
+            
+            suggestion = None
+            for table, usage in context['usage'].items():
+                columns = usage.get(category, [])
+                if columns and all(col in context['table_columns'][table] for col in columns):
+                    equality = [col for col in usage.get('equality', []) if col not in columns]
+                    index_columns = equality + columns
+                    suggestion = (f"CREATE INDEX {_index_name(table, index_columns)} ON {table} "
+                                  f"({', '.join(index_columns)}) so rows come out already sorted")
+                    break
+            if suggestion is None:
+                suggestion = ("The sort key is computed (e.g. an aggregate or expression), so it can't come "
+                              "from an index; add a LIMIT so SQLite keeps only the top rows")
+            
+            findings.append(self._finding(
+                'temp_sort', 'medium', None,
+                f"Temp B-tree {purpose.lower()} over ~{btree['rows']:,.0f} rows",
+                suggestion, saving, f"~{saving:.0%} of the estimated cost without the sort"
+            ))
+        return findings
+    
+    def _correlated_subqueries(self, context: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Flag correlated subqueries, suggesting a join against a pre-aggregated derived table."""
+        estimate = context['estimate']
+        if not estimate['correlated_subqueries']:
+            return []
+        
+        plan = [
+            dict(row, detail=row['detail'].replace('CORRELATED ', '', 1))
+            for row in estimate['plan']
+        ]
+        uncorrelated = estimate_plan_cost(plan, context['table_rows'])['cost']
+        saving = max(0.0, 1.0 - uncorrelated / estimate['cost']) if estimate['cost'] else 0.0
+        return [self._finding(
+            'correlated_subquery', 'high', None,
+            f"{estimate['correlated_subqueries']} correlated subquery(ies) re-run for every outer row",
+            self._decorrelate(context),
+            saving, f"~{saving:.0%} of the estimated cost when the subquery runs once"
+        )]
+    
+    def _decorrelate(self, context: Dict[str, Any]) -> str:
+        """Suggest a join for the first subquery correlated on an equality, or general advice."""
+        tokens = context['tokens']
+        for start in range(len(tokens) - 1):
+            if tokens[start][1] != '(' or tokens[start + 1][1] != 'select':
+                continue
+            end = _closing_paren(tokens, start)
+            if end is None:
+                continue
+            inner_tokens = tokens[start + 1:end]
+            inner_aliases = extract_table_aliases(_render(inner_tokens), self.db_manager.get_table_names())
+            if not inner_aliases:
+                continue
+            inner_table = next(iter(inner_aliases.values()))
+            
+            # inner.col = outer.col
+            for j in range(len(inner_tokens) - 6):
+                window = [value for _, value in inner_tokens[j:j + 7]]
+                if window[1] != '.' or window[3] not in ('=', '==') or window[5] != '.':
+                    continue
+                if window[0] in inner_aliases and window[4] not in inner_aliases:
+                    inner_key, outer_ref = window[2], f"{window[4]}.{window[6]}"
+                elif window[4] in inner_aliases and window[0] not in inner_aliases:
+                    inner_key, outer_ref = window[6], f"{window[0]}.{window[2]}"
+                else:
+                    continue
+                values = [value for _, value in inner_tokens]
+                from_index = values.index('from') if 'from' in values else 1
+                where_index = values.index('where') if 'where' in values else len(values)
+                if len(values) - where_index - 1 != 7:
+                    # Other conditions would have to move into the derived table too
+                    break
+                aggregate = _render(inner_tokens[1:from_index])
+                source = _render(inner_tokens[from_index + 1:where_index])
+                return (f"Aggregate once per key and join: LEFT JOIN (SELECT {inner_key}, {aggregate} AS agg "
+                        f"FROM {source} GROUP BY {inner_key}) s ON s.{inner_key} = {outer_ref}, "
+                        "then select s.agg in place of the subquery")
+            else:
+                return (f"The subquery over {inner_table} isn't correlated on an equality, so it can't become "
+                        "a grouped join directly; index its correlated column or express it as a window "
+                        "function (e.g. a running COUNT/SUM ordered by that column)")
+            return (f"Move the subquery over {inner_table} into a derived table grouped by its correlated key "
+                    "(keeping its other conditions) and LEFT JOIN it on that key")
+        return "Rewrite the correlated subquery as a join against a derived table grouped by the correlated key"
+    
+    def _select_star(self, context: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Flag SELECT * (or alias.*) over wide tables."""
+        findings = []
+        tokens = context['tokens']
+        for i, (kind, value) in enumerate(tokens):
+            if value != '*' or i == 0:
+                continue
+            if tokens[i - 1][1] in ('select', ','):
+                tables = sorted(set(context['aliases'].values()))
+            elif tokens[i - 1][1] == '.' and i >= 3 and tokens[i - 3][1] in ('select', ','):
+                table = context['aliases'].get(tokens[i - 2][1])
+                tables = [table] if table else []
+            else:
+                continue
+            
+            columns = [col for table in tables for col in context['table_columns'][table]]
+            if len(columns) < self.WIDE_TABLE_COLUMNS:
+                continue
+            used = {
+                col for table in tables for category in context['usage'].get(table, {}).values() for col in category
+            }
+            keep = max(len(used), 1)
+            saving = 1.0 - keep / len(columns)
+            shown = sorted(used) or columns[:3]
+            findings.append(self._finding(
+                'select_star', 'low', None,
+                f"SELECT * returns all {len(columns)} columns of {', '.join(tables)}",
+                f"Name only the columns you need, e.g. SELECT {', '.join(shown)}, ... instead of *",
+                saving, f"up to ~{saving:.0%} of the result size keeping {keep} of {len(columns)} columns"
+            ))
+        return findings
+    
+    def _non_sargable(self, context: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Flag predicates that hide an indexed column from the index, with a sargable rewrite."""
+        findings = []
+        tokens = context['tokens']
+        filter_positions = _filter_positions(tokens)
+        
+        for i, (kind, value) in enumerate(tokens):
+            if i not in filter_positions or kind != 'name':
+                continue
+            
+            # function(... column ...) <op> value
+            if i + 1 < len(tokens) and tokens[i + 1][1] == '(' and value not in _AGGREGATES:
+                end = _closing_paren(tokens, i + 1)
+                if end is None:
+                    continue
+                column = self._indexed_column(context, tokens, i + 2, end)
+                if column is None:
+                    continue
+                comparison = _comparison_after(tokens, end + 1)
+                if comparison is None:
+                    continue
+                findings.append(self._non_sargable_finding(
+                    context, column, tokens[i:end + 1], comparison,
+                    _rewrite_function(value, tokens[i + 2:end], column[1], comparison)
+                ))
+                continue
+            
+            column = self._indexed_column(context, tokens, i, i + 1)
+            if column is None or (i > 0 and tokens[i - 1][1] == '.'):
+                continue
+            following = i + 1
+            if following + 1 < len(tokens) and tokens[following][1] == '.':
+                continue
+            
+            # column <+|-> number <op> number
+            if following < len(tokens) and tokens[following][1] in ('+', '-', '*', '/', '||'):
+                end = following + 1
+                comparison = _comparison_after(tokens, end + 1)
+                if end < len(tokens) and comparison is not None:
+                    findings.append(self._non_sargable_finding(
+                        context, column, tokens[i:end + 1], comparison,
+                        _rewrite_arithmetic(column[1], tokens[following][1], tokens[end][1], comparison)
+                    ))
+                continue
+            
+            # column LIKE '%...'
+            if following + 1 < len(tokens) and tokens[following][1] == 'like' \
+                    and tokens[following + 1][0] == 'string' and tokens[following + 1][1].startswith("'%"):
+                findings.append(self._finding(
+                    'non_sargable', 'medium', column[0],
+                    f"LIKE {tokens[following + 1][1]} on indexed column {column[1]} starts with a wildcard, "
+                    "so the index can't be used",
+                    "Anchor the pattern at the start (LIKE 'abc%'), or use an FTS5 full-text table "
+                    "for substring search",
+                    *self._sargable_saving(context, column, 'range')
+                ))
+        return findings
+    
+    def _non_sargable_finding(self, context: Dict[str, Any], column: Tuple[str, str],
+                              expression: List[Tuple[str, str]], comparison: Tuple[str, str],
+                              rewrite: Optional[Tuple[str, str]]) -> Dict[str, Any]:
+        """Describe an indexed column hidden inside an expression."""
+        table, column_name = column
+        expression_sql = _render(expression)
+        if rewrite is not None:
+            suggestion, kind = rewrite
+        else:
+            suggestion = (f"Index the expression instead: CREATE INDEX {_index_name(table, [column_name, 'expr'])} "
+                          f"ON {table} ({expression_sql})")
+            kind = 'equality' if comparison[0] in ('=', '==') else 'range'
+        return self._finding(
+            'non_sargable', 'high', table,
+            f"{expression_sql} {comparison[0]} {comparison[1]} wraps indexed column {column_name}, "
+            "so its index can't be used",
+            suggestion, *self._sargable_saving(context, column, kind)
+        )
+    
+    def _sargable_saving(self, context: Dict[str, Any], column: Tuple[str, str],
+                         kind: str) -> Tuple[Optional[float], str]:
+        """Saving (and its note) from turning a full scan of the column's table into an index search."""
+        table, column_name = column
+        estimate = context['estimate']
+        for scan in estimate['full_scans']:
+            if context['aliases'].get(scan['table'].lower()) == table:
+                condition = f"{column_name}=?" if kind == 'equality' else f"{column_name}>?"
+                saving = self._what_if_saving(context, scan['detail'],
+                                              f"SEARCH {scan['table']} USING INDEX what_if ({condition})")
+                return saving, f"~{saving:.0%} of the estimated cost with an index search"
+        return None, f"the plan already reaches {table} another way; gains depend on the other predicates"
+    
+    def _indexed_column(self, context: Dict[str, Any], tokens: List[Tuple[str, str]],
+                        start: int, end: int) -> Optional[Tuple[str, str]]:
+        """Find an indexed column (table, name) among tokens[start:end]."""
+        for j in range(start, end):
+            kind, value = tokens[j]
+            if kind != 'name' or (j + 1 < len(tokens) and tokens[j + 1][1] in ('(', '.')):
+                continue
+            qualifier = tokens[j - 2][1] if j >= 2 and tokens[j - 1][1] == '.' else None
+            tables = [context['aliases'][qualifier]] if qualifier in context['aliases'] else \
+                list(context['table_columns']) if qualifier is None else []
+            for table in tables:
+                columns = {col.lower(): col for col in context['table_columns'][table]}
+                if value in columns and value in context['indexed'][table]:
+                    return table, columns[value]
+        return None
+    
+    def _what_if_saving(self, context: Dict[str, Any], detail: str, replacement: Optional[str]) -> float:
+        """Re-estimate the plan with one step replaced (or removed, for None); return the fraction saved."""
+        estimate = context['estimate']
+        if not estimate['cost']:
+            return 0.0
+        plan = []
+        replaced = False
+        for row in estimate['plan']:
+            if not replaced and row['detail'] == detail:
+                replaced = True
+                if replacement is None:
+                    continue
+                row = dict(row, detail=replacement)
+            plan.append(row)
+        cost = estimate_plan_cost(plan, context['table_rows'])['cost']
+        return max(0.0, 1.0 - cost / estimate['cost'])
+    
+    def _finding(self, rule: str, severity: str, table: Optional[str], message: str,
+                 suggestion: str, saving: Optional[float], saving_note: str) -> Dict[str, Any]:
+        """Build one finding."""
+        return {
+            'rule': rule,
+            'severity': severity,
+            'message': message,
+            'suggestion': suggestion,
+            'estimated_saving': saving,
+            'saving_note': saving_note,
+            'table': table
+        }
+
+
+def _filter_positions(tokens: List[Tuple[str, str]]) -> set:
+    """Indexes of the tokens inside WHERE, HAVING and ON conditions."""
+    positions = set()
+    clause = None
+    clause_stack = []
+    for i, (kind, value) in enumerate(tokens):
+        if kind == 'symbol':
+            if value == '(':
+                clause_stack.append(clause)
+            elif value == ')' and clause_stack:
+                clause = clause_stack.pop()
+        elif kind == 'name':
+            if value in ('where', 'having', 'on'):
+                clause = 'filter'
+                continue
+            if value in ('select', 'from', 'join', 'group', 'order', 'limit', 'union', 'except', 'intersect'):
+                clause = None
+        if clause == 'filter':
+            positions.add(i)
+    return positions
+
+
+def _closing_paren(tokens: List[Tuple[str, str]], start: int) -> Optional[int]:
+    """Find the ')' matching the '(' at tokens[start]."""
+    depth = 0
+    for j in range(start, len(tokens)):
+        if tokens[j][1] == '(':
+            depth += 1
+        elif tokens[j][1] == ')':
+            depth -= 1
+            if depth == 0:
+                return j
+    return None
+
+
+def _bare_column(tokens: List[Tuple[str, str]], start: int, end: int) -> Optional[str]:
+    """Find the first plain column name (the last part of a dotted name) among tokens[start:end]."""
+    for j in range(start, end):
+        kind, value = tokens[j]
+        if kind == 'name' and not (j + 1 < len(tokens) and tokens[j + 1][1] in ('(', '.')) \
+                and value not in ('as', 'distinct'):
+            return value
+    return None
+
+
+def _comparison_after(tokens: List[Tuple[str, str]], index: int) -> Optional[Tuple[str, str]]:
+    """Get (operator, literal) when tokens[index] compares against a string or number literal."""
+    if index + 1 >= len(tokens) or tokens[index][1] not in _COMPARISONS:
+        return None
+    kind, value = tokens[index + 1]
+    if kind == 'string' or re.fullmatch(r'\d+(?:\.\d+)?', value):
+        return tokens[index][1], value
+    return None
+
+
+def _rewrite_function(function: str, arguments: List[Tuple[str, str]], column: str,
+                      comparison: Tuple[str, str]) -> Optional[Tuple[str, str]]:
+    """Rewrite date-bucket and case-folding predicates on a column into sargable ones.
+    
+    Returns (suggestion, 'equality' | 'range') or None when there is no
+    direct rewrite.
+    """
+    operator, literal = comparison
+    values = [value for kind, value in arguments if kind == 'string']
+    period = None
+    if function == 'strftime' and values and values[0] in ("'%Y'", "'%Y-%m'", "'%Y-%m-%d'"):
+        period = _period_bounds(values[0], literal)
+    elif function == 'date' and len(arguments) == 1:
+        period = _period_bounds("'%Y-%m-%d'", literal)
+    if period is not None:
+        start, end = period
+        predicate = {
+            '=': f"{column} >= '{start}' AND {column} < '{end}'",
+            '==': f"{column} >= '{start}' AND {column} < '{end}'",
+            '>=': f"{column} >= '{start}'",
+            '>': f"{column} >= '{end}'",
+            '<': f"{column} < '{start}'",
+            '<=': f"{column} < '{end}'"
+        }.get(operator)
+        if predicate is not None:
+            return f"Compare the column to a range instead: {predicate}", 'range'
+    
+    if function in ('lower', 'upper') and operator in ('=', '=='):
+        return (f"Compare case-insensitively without a function: {column} = {literal} COLLATE NOCASE, "
+                f"with an index declared on ({column} COLLATE NOCASE)"), 'equality'
+    return None
+
+
+def _rewrite_arithmetic(column: str, operator: str, operand: str,
+                        comparison: Tuple[str, str]) -> Optional[Tuple[str, str]]:
+    """Move a constant from the column's side of a comparison to the literal's side."""
+    compare, literal = comparison
+    if operator not in ('+', '-') or not re.fullmatch(r'\d+(?:\.\d+)?', operand) \
+            or not re.fullmatch(r'\d+(?:\.\d+)?', literal):
+        return None
+    value = float(literal) - float(operand) if operator == '+' else float(literal) + float(operand)
+    value_sql = str(int(value)) if value.is_integer() else repr(value)
+    kind = 'equality' if compare in ('=', '==') else 'range'
+    return f"Keep the column bare: {column} {compare} {value_sql}", kind
+
+
+def _period_bounds(format_literal: str, literal: str) -> Optional[Tuple[str, str]]:
+    """Get the [start, end) date strings of the year, month or day a bucket value names."""
+    text = literal.strip("'")
+    try:
+        if format_literal == "'%Y'" and re.fullmatch(r'\d{4}', text):
+            return f"{text}-01-01", f"{int(text) + 1}-01-01"
+        if format_literal == "'%Y-%m'" and re.fullmatch(r'\d{4}-\d{2}', text):
+            year, month = int(text[:4]), int(text[5:])
+            end_year, end_month = (year + 1, 1) if month == 12 else (year, month + 1)
+            return f"{year:04d}-{month:02d}-01", f"{end_year:04d}-{end_month:02d}-01"
+        if format_literal == "'%Y-%m-%d'" and re.fullmatch(r'\d{4}-\d{2}-\d{2}', text):
+            day = date.fromisoformat(text)
+            return day.isoformat(), (day + timedelta(days=1)).isoformat()
+    except ValueError:
+        return None
+    return None
+
+
+def _render(tokens: List[Tuple[str, str]]) -> str:
+    """Turn tokens back into SQL text."""
+    parts = []
+    for kind, value in tokens:
+        if kind == 'name' and not _IDENTIFIER.fullmatch(value):
+            value = '"' + value.replace('"', '""') + '"'
+        parts.append(value)
+    text = ' '.join(parts)
+    return re.sub(r'\s*([(),.])\s*', lambda match: match.group(1) + (' ' if match.group(1) == ',' else ''), text)
+
+
+def _index_name(table: str, columns: List[str]) -> str:
+    """Name a suggested index after its table and columns."""
+    return re.sub(r'\W+', '_', f"idx_{table}_{'_'.join(columns)}").lower()
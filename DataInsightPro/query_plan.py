@@ -0,0 +1,147 @@
+import math
+import re
+from typing import List, Dict, Any, Optional
+
+# Rough selectivities used when the plan doesn't tell how many rows a step yields
+EQUALITY_SELECTIVITY = 0.05
+RANGE_SELECTIVITY = 0.25
+
+# Row count assumed for anything whose size isn't known (e.g. unknown tables)
+DEFAULT_TABLE_ROWS = 1000
+
+_LOOP_PATTERN = re.compile(r'^(SCAN|SEARCH)(?: TABLE)? (\S+)(?: AS (\S+))?(.*)$')
+_SUBQUERY_PATTERN = re.compile(r'^(CORRELATED )?(SCALAR|LIST) SUBQUERY')
+_NAMED_SUBQUERY_PATTERN = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE) (.+)$')
+
+
+def build_plan_tree(plan_rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Nest flat EXPLAIN QUERY PLAN rows (id, parent, detail) into a tree of nodes."""
+    nodes = {row['id']: dict(row, children=[]) for row in plan_rows}
+    roots = []
+    for row in plan_rows:
+        node = nodes[row['id']]
+        parent = nodes.get(row['parent'])
+        if parent is not None and row['parent'] != row['id']:
+            parent['children'].append(node)
+        else:
+            roots.append(node)
+    return roots
+
+
+def estimate_plan_cost(plan_rows: List[Dict[str, Any]], table_rows: Dict[str, int],
+                       subquery_aliases: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Estimate the cost of a query plan in rows visited.
+    
+    table_rows maps every name the plan may use for a table (table names and
+    aliases) to its row count. subquery_aliases maps aliases of CTEs to the
+    CTE names, so a scan of a materialized CTE under an alias is priced by
+    the rows the CTE produces. Consecutive SCAN/SEARCH steps are treated as
+    nested loops, temp B-trees as sorts of the rows flowing into them and
+    correlated subqueries as re-run once per outer row. The figure is only
+    meant for comparing plans and setting thresholds, not as a time estimate.
+    """
+    table_rows = {name.lower(): rows for name, rows in table_rows.items()}
+    summary = {'full_scans': [], 'searches': [], 'temp_btrees': [], 'correlated_subqueries': 0,
+               'automatic_indexes': []}
+    subquery_aliases = {alias.lower(): name.lower() for alias, name in (subquery_aliases or {}).items()}
+    cost, rows = _estimate_nodes(build_plan_tree(plan_rows), table_rows, summary, subquery_aliases)
+    summary['cost'] = cost
+    summary['rows'] = rows
+    return summary
+
+
+def _estimate_nodes(nodes: List[Dict[str, Any]], table_rows: Dict[str, int],
+                    summary: Dict[str, Any], subquery_aliases: Dict[str, str]) -> tuple:
+    """Estimate (cost, output rows) of sibling plan nodes executed as nested loops."""
+    cost = 0.0
+    loop_rows = 1.0
+    
+    for node in nodes:
+        detail = node['detail']
+        loop = _LOOP_PATTERN.match(detail)
+        
+        if loop:
+            operation, name, alias, rest = loop.groups()
+            names = [(alias or name).lower(), name.lower()]
+            names += [subquery_aliases[key] for key in names if key in subquery_aliases]
+            table_size = float(next((table_rows[key] for key in names if key in table_rows), DEFAULT_TABLE_ROWS))
+            
+            if operation == 'SCAN':
+                step_cost = table_size
+                step_rows = table_size
+                summary['full_scans'].append({'table': name, 'rows': table_size, 'detail': detail})
+            else:
+                step_rows = _search_rows(rest, table_size)
+                step_cost = math.log2(table_size + 1) + step_rows
+                summary['searches'].append({'table': name, 'rows': step_rows, 'detail': detail})
+                if 'AUTOMATIC' in rest:
+                    # SQLite builds a throwaway index over the whole table first
+                    cost += table_size * math.log2(table_size + 1)
+                    summary['automatic_indexes'].append({'table': name, 'detail': detail})
+            
+            cost += loop_rows * step_cost
+            loop_rows *= max(step_rows, 1.0)
+            continue
+        
+        if detail.startswith('USE TEMP B-TREE'):
+            cost += loop_rows * math.log2(loop_rows + 1)
+            summary['temp_btrees'].append({'rows': loop_rows, 'detail': detail})
+            continue
+        
+        child_cost, child_rows = _estimate_nodes(node['children'], table_rows, summary, subquery_aliases)
+        
+        subquery = _SUBQUERY_PATTERN.match(detail)
+        if subquery and subquery.group(1):
+            summary['correlated_subqueries'] += 1
+            cost += loop_rows * child_cost
+            continue
+        
+        named = _NAMED_SUBQUERY_PATTERN.match(detail)
+        if named:
+            # Later "SCAN (subquery-1)" steps read the rows this subquery produces
+            table_rows[named.group(1).lower()] = child_rows
+            cost += child_cost
+            continue
+        
+        cost += child_cost
+        if not subquery:
+            # Compound query parts and similar wrappers produce their children's rows
+            loop_rows = max(loop_rows, child_rows)
+    
+    return cost, loop_rows
+
+
+def _search_rows(rest: str, table_size: float) -> float:
+    """Estimate the rows an index lookup returns from its constraint list."""
+    constraints = re.search(r'\((.*)\)\s*$', rest)
+    if not constraints:
+        return table_size * RANGE_SELECTIVITY
+    
+    terms = constraints.group(1).split(' AND ')
+    is_range = ['<' in term or '>' in term for term in terms]
+    if 'PRIMARY KEY' in rest and not any(is_range):
+        return 1.0
+    
+    selectivity = 1.0
+    for term_is_range in is_range:
+        selectivity *= RANGE_SELECTIVITY if term_is_range else EQUALITY_SELECTIVITY
+    return max(table_size * selectivity, 1.0)
+
+
+def plan_uses_index(plan_rows: List[Dict[str, Any]], index_name: str) -> bool:
+    """Check whether any step of a plan reads through the given index."""
+    pattern = re.compile(rf'INDEX {re.escape(index_name)}\b')
+    return any(pattern.search(row['detail']) for row in plan_rows)
+
+
+def format_plan(plan_rows: List[Dict[str, Any]]) -> List[str]:
+    """Render plan rows as indented text lines, as the sqlite3 shell does."""
+    lines = []
+    
+    def render(nodes, depth):
+        for node in nodes:
+            lines.append("  " * depth + node['detail'])
+            render(node['children'], depth + 1)
+    
+    render(build_plan_tree(plan_rows), 0)
+    return lines
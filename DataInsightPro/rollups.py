@@ -0,0 +1,383 @@
+import re
+import json
+from typing import List, Dict, Any, Optional, Tuple
+from sql_parser import format_condition
+
+class RollupManager:
+    """Builds materialised rollup tables for a table and routes aggregate queries to them.
+    
+    At ingestion, low-cardinality text columns become dimensions and ISO date
+    columns contribute day, month and year buckets. Each rollup stores, per
+    combination of its dimensions, the row count plus SUM, COUNT, MIN and MAX
+    of every numeric column. rewrite() turns a matching aggregate query into
+    an equivalent query over the smallest rollup that has every column it
+    needs; rollups are dropped whenever their base table is replaced and
+    extended in place when rows are only appended to it.
+    """
+    
+    ROLLUP_PREFIX = "_di_rollup_"
+    CATALOG_TABLE = "_di_rollups"
+    
+    # Distinct values allowed for a text column (or a date column at day
+    # grain) to serve as a rollup dimension
+    MAX_DIMENSION_CARDINALITY = 200
+    MAX_DATE_CARDINALITY = 5000
+    
+    # A rollup is kept only if it is at most this fraction of the base table's rows
+    MAX_ROLLUP_RATIO = 0.25
+    
+    _ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?$')
+    
+    def __init__(self, db_manager):
+        """Initialize the manager and load rollup definitions persisted in the database."""
+        self.db_manager = db_manager
+        self._rollups: Dict[str, List[Dict[str, Any]]] = {}
+        
+        with db_manager._write_lock:
+            connection = db_manager.connection
+            connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.CATALOG_TABLE} ("
+                "rollup_name TEXT PRIMARY KEY, table_name TEXT NOT NULL, definition TEXT NOT NULL)"
+            )
+            connection.commit()
+            for table_name, definition in connection.execute(
+                f"SELECT table_name, definition FROM {self.CATALOG_TABLE} ORDER BY rollup_name"
+            ):
+                self._rollups.setdefault(table_name, []).append(json.loads(definition))
+    
+    def get_rollups(self, table_name: str) -> List[Dict[str, Any]]:
+        """Get a table's rollups, smallest first."""
+        return sorted(self._rollups.get(table_name, []), key=lambda rollup: rollup['row_count'])
+    
+    def build(self, table_name: str) -> List[Dict[str, Any]]:
+        """Detect dimensions and build the table's rollups, replacing any existing ones.
+        
+        Tries a day-grain, a month-grain and a date-free rollup. When one
+        would exceed MAX_ROLLUP_RATIO of the table's rows, its
+        highest-cardinality dimension is dropped and the build retried.
+        """
+        try:
+            with self.db_manager._write_lock:
+                self.drop_table_rollups(table_name)
+                
+                row_count = self.db_manager.get_table_info(table_name)['row_count']
+                dimensions, date_columns, measures = self.detect_dimensions(table_name)
+                day_columns = [col for col, fits_day in date_columns if fits_day]
+                month_columns = [col for col, _ in date_columns]
+                
+                candidates = [
+                    (day_columns, month_columns),
+                    ([], month_columns),
+                    ([], [])
+                ]
+                built = []
+                seen = set()
+                for dates, buckets in candidates:
+                    dims = list(dimensions)
+                    while True:
+                        grouping = dims + dates
+                        key = (tuple(grouping), tuple(buckets))
+                        if not grouping and not buckets or key in seen:
+                            break
+                        seen.add(key)
+                        
+                        source = self._source_rollup(built, dims + dates, buckets)
+                        rollup = self._create_rollup(table_name, len(built), dims, dates, buckets, measures, source)
+                        if rollup['row_count'] <= row_count * self.MAX_ROLLUP_RATIO:
+                            built.append(rollup)
+                            break
+                        self._drop_rollup_table(rollup['name'])
+                        if not dims:
+                            break
+                        dims.pop()  # dimensions are ordered by cardinality
+                
+                self._rollups[table_name] = built
+                self.db_manager.connection.executemany(
+                    f"INSERT INTO {self.CATALOG_TABLE} VALUES (?, ?, ?)",
+                    [(rollup['name'], table_name, json.dumps(rollup)) for rollup in built]
+                )
+                self.db_manager.connection.commit()
+                return built
+        except Exception as e:
+            raise Exception(f"Error building rollups: {str(e)}")
+    
+    def drop_table_rollups(self, table_name: str) -> None:
+        """Drop every rollup of a table (called whenever the table is replaced)."""
+        with self.db_manager._write_lock:
+            connection = self.db_manager.connection
+            names = [row[0] for row in connection.execute(
+                f"SELECT rollup_name FROM {self.CATALOG_TABLE} WHERE table_name = ?", (table_name,)
+            )]
+            for name in names:
+                self._drop_rollup_table(name)
+            connection.execute(f"DELETE FROM {self.CATALOG_TABLE} WHERE table_name = ?", (table_name,))
+            self._rollups.pop(table_name, None)
+    
+    def append_rows(self, table_name: str, after_rowid: int) -> List[Dict[str, Any]]:
+        """Fold rows appended to a table (rowid above after_rowid) into its rollups.
+        
+        The new rows' aggregates are added as extra rollup rows; rewritten
+        queries always re-aggregate, so groups split across rows still
+        combine correctly. Only valid when existing rows were not changed.
+        """
+        try:
+            with self.db_manager._write_lock:
+                connection = self.db_manager.connection
+                appended = f"(SELECT * FROM {table_name} WHERE rowid > {int(after_rowid)})"
+                for rollup in self._rollups.get(table_name, []):
+                    connection.execute(
+                        f"INSERT INTO {rollup['name']} "
+                        + self._aggregate_query(rollup['dimensions'], rollup['buckets'], rollup['measures'],
+                                                False, appended)
+                    )
+                    rollup['row_count'] = connection.execute(f"SELECT COUNT(*) FROM {rollup['name']}").fetchone()[0]
+                    connection.execute(
+                        f"UPDATE {self.CATALOG_TABLE} SET definition = ? WHERE rollup_name = ?",
+                        (json.dumps(rollup), rollup['name'])
+                    )
+                return self.get_rollups(table_name)
+        except Exception as e:
+            raise Exception(f"Error updating rollups: {str(e)}")
+    
+    def rewrite(self, plan: Dict[str, Any], table_name: str,
+                column_names: List[str]) -> Optional[Tuple[str, str]]:
+        """Rewrite a parsed aggregate query to read a rollup instead of the table.
+        
+        plan comes from sql_parser.parse_simple_select() and column_names are
+        the names SQLite gives the query's result columns, which the rewrite
+        reuses as aliases. Returns (sql, rollup_name), or None when no rollup
+        can give the same answer.
+        """
+        rollups = self.get_rollups(table_name)
+        if not rollups:
+            return None
+        if not plan['group_by'] and not any(item['function'] for item in plan['items']):
+            return None
+        
+        columns = {col.lower(): col for col in self.db_manager.get_table_columns(table_name)}
+        
+        def resolve(column_name, bucket=None):
+            if column_name not in columns:
+                raise _NoRollup()
+            return (columns[column_name], bucket)
+        
+        try:
+            groups = []
+            for reference in plan['group_by']:
+                item = plan['items'][reference['item']] if 'item' in reference else reference
+                if 'item' not in reference and reference['column'] not in columns and reference['bucket'] is None:
+                    # SQLite falls back to a result alias when no column has the name
+                    aliased = [item for item in plan['items'] if item['alias'] == reference['column']]
+                    if len(aliased) == 1:
+                        item = aliased[0]
+                if item.get('function'):
+                    raise _NoRollup()
+                groups.append(resolve(item['column'], item['bucket']))
+            
+            needed = set(groups)
+            for item in plan['items']:
+                if item['column'] == '*':
+                    raise _NoRollup()
+                if item['function'] is None:
+                    if resolve(item['column'], item['bucket']) not in groups:
+                        raise _NoRollup()  # bare columns take an arbitrary row's value
+                elif item['column'] is not None:
+                    resolve(item['column'])
+            for condition in plan['where']:
+                needed.add(resolve(condition['column']))
+            for term in plan['order_by']:
+                if 'item' not in term and resolve(term['column'], term['bucket']) not in groups:
+                    raise _NoRollup()
+        except _NoRollup:
+            return None
+        
+        for rollup in rollups:
+            available = self._available_columns(rollup)
+            if not needed <= set(available):
+                continue
+            aggregates = [
+                self._aggregate_expression(item, columns, rollup, available)
+                for item in plan['items'] if item['function']
+            ]
+            if None in aggregates:
+                continue
+            return self._render(plan, rollup, available, groups, columns, column_names, aggregates), rollup['name']
+        return None
+    
+    def detect_dimensions(self, table_name: str) -> Tuple[List[str], List[Tuple[str, bool]], List[str]]:
+        """Split a table's columns into text dimensions, ISO date columns and numeric measures.
+        
+        Dimensions are ordered by cardinality, lowest first. Date columns come
+        with whether they are also low-cardinality enough to group by day.
+        """
+        info = self.db_manager.get_table_info(table_name)
+        dimensions = []
+        date_columns = []
+        measures = []
+        for column in info['columns']:
+            data_types = set(column['data_types']) - {'null'}
+            if not data_types:
+                continue
+            if data_types <= {'integer', 'real'}:
+                measures.append(column['name'])
+                continue
+            if data_types != {'text'}:
+                continue
+            
+            values = [column['min'], column['max']] + list(column['sample_values'])
+            if all(isinstance(value, str) and self._ISO_DATE.match(value) for value in values):
+                cardinality = self._distinct_count(table_name, column['name'], self.MAX_DATE_CARDINALITY)
+                date_columns.append((column['name'], cardinality <= self.MAX_DATE_CARDINALITY))
+                continue
+            
+            cardinality = self._distinct_count(table_name, column['name'], self.MAX_DIMENSION_CARDINALITY)
+            if cardinality <= self.MAX_DIMENSION_CARDINALITY:
+                dimensions.append((cardinality, column['name']))
+        
+        return [name for _, name in sorted(dimensions)], date_columns, measures
+    
+    def _distinct_count(self, table_name: str, column_name: str, limit: int) -> int:
+        """Count a column's distinct values, stopping once more than limit are seen."""
+        quoted = self.db_manager._quote_identifier(column_name)
+        return self.db_manager.connection.execute(
+            f"SELECT COUNT(*) FROM (SELECT DISTINCT {quoted} FROM {table_name} LIMIT {limit + 1})"
+        ).fetchone()[0]
+    
+    def _create_rollup(self, table_name: str, index: int, dimensions: List[str], dates: List[str],
+                       buckets: List[str], measures: List[str],
+                       source: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Materialise one rollup table and return its definition.
+        
+        With a source rollup that has every needed column, the rollup is
+        aggregated from that (much smaller) rollup instead of the base table.
+        """
+        name = f"{self.ROLLUP_PREFIX}{table_name}_{index}"
+        self._drop_rollup_table(name)
+        self.db_manager.connection.execute(
+            f"CREATE TABLE {name} AS "
+            + self._aggregate_query(dimensions + dates, buckets, measures, source is not None,
+                                    table_name if source is None else source['name'])
+        )
+        row_count = self.db_manager.connection.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+        
+        return {
+            'name': name,
+            'table_name': table_name,
+            'dimensions': dimensions + dates,
+            'buckets': buckets,
+            'measures': measures,
+            'row_count': row_count
+        }
+    
+    def _aggregate_query(self, dimensions: List[str], buckets: List[str], measures: List[str],
+                         from_rollup: bool, source: str) -> str:
+        """Build the SELECT computing a rollup's rows from the base table or a finer rollup."""
+        quote = self.db_manager._quote_identifier
+        group_expressions = [quote(col) for col in dimensions]
+        for col in buckets:
+            if not from_rollup:
+                group_expressions.append(f"strftime('%Y-%m', {quote(col)}) AS {quote(col + '__month')}")
+                group_expressions.append(f"strftime('%Y', {quote(col)}) AS {quote(col + '__year')}")
+            else:
+                group_expressions.extend([quote(col + '__month'), quote(col + '__year')])
+        
+        select_list = list(group_expressions)
+        if not from_rollup:
+            select_list.append("COUNT(*) AS __rows")
+            for col in measures:
+                for function in ('sum', 'count', 'min', 'max'):
+                    select_list.append(f"{function.upper()}({quote(col)}) AS {quote(f'{col}__{function}')}")
+        else:
+            select_list.append("SUM(__rows) AS __rows")
+            for col in measures:
+                # Sums and counts of partial aggregates add up; extremes take the extreme
+                for function, combine in (('sum', 'SUM'), ('count', 'SUM'), ('min', 'MIN'), ('max', 'MAX')):
+                    stored = quote(f'{col}__{function}')
+                    select_list.append(f"{combine}({stored}) AS {stored}")
+        group_by = ", ".join(str(i + 1) for i in range(len(group_expressions)))
+        
+        return f"SELECT {', '.join(select_list)} FROM {source}" + (f" GROUP BY {group_by}" if group_by else "")
+    
+    def _source_rollup(self, built: List[Dict[str, Any]], dimensions: List[str],
+                       buckets: List[str]) -> Optional[Dict[str, Any]]:
+        """Find the smallest already-built rollup a coarser rollup can be aggregated from."""
+        for rollup in sorted(built, key=lambda rollup: rollup['row_count']):
+            if set(dimensions) <= set(rollup['dimensions']) and set(buckets) <= set(rollup['buckets']):
+                return rollup
+        return None
+    
+    def _drop_rollup_table(self, name: str) -> None:
+        """Drop a rollup table if it exists."""
+        self.db_manager.connection.execute(f"DROP TABLE IF EXISTS {name}")
+    
+    def _available_columns(self, rollup: Dict[str, Any]) -> Dict[Tuple[str, Optional[str]], str]:
+        """Map the (column, bucket) pairs a rollup can group or filter on to its column names."""
+        available = {(col, None): col for col in rollup['dimensions']}
+        for col in rollup['buckets']:
+            available[(col, 'month')] = f"{col}__month"
+            available[(col, 'year')] = f"{col}__year"
+        return available
+    
+    def _aggregate_expression(self, item: Dict[str, Any], columns: Dict[str, str],
+                              rollup: Dict[str, Any], available: Dict[Tuple[str, Optional[str]], str]) -> Optional[str]:
+        """Express an aggregate over the base table in terms of a rollup's columns."""
+        quote = self.db_manager._quote_identifier
+        function = item['function']
+        if item['column'] is None:
+            return "COALESCE(SUM(__rows), 0)"
+        
+        column = columns[item['column']]
+        if column in rollup['measures']:
+            if function == 'count':
+                return f"COALESCE(SUM({quote(column + '__count')}), 0)"
+            if function == 'avg':
+                # AVG divides the running sum by the non-NULL count, as SQLite does
+                return f"CAST(SUM({quote(column + '__sum')}) AS REAL) / SUM({quote(column + '__count')})"
+            return f"{function.upper()}({quote(f'{column}__{function}')})"
+        
+        if (column, None) in available:
+            if function in ('min', 'max'):
+                return f"{function.upper()}({quote(column)})"
+            if function == 'count':
+                return f"COALESCE(SUM(CASE WHEN {quote(column)} IS NOT NULL THEN __rows END), 0)"
+        return None
+    
+    def _render(self, plan: Dict[str, Any], rollup: Dict[str, Any],
+                available: Dict[Tuple[str, Optional[str]], str], groups: List[Tuple[str, Optional[str]]],
+                columns: Dict[str, str], column_names: List[str], aggregates: List[str]) -> str:
+        """Build the rewritten SQL, keeping the original result column names and order."""
+        quote = self.db_manager._quote_identifier
+        
+        select_list = []
+        aggregate_expressions = iter(aggregates)
+        for item, name in zip(plan['items'], column_names):
+            if item['function']:
+                expression = next(aggregate_expressions)
+            else:
+                expression = quote(available[(columns[item['column']], item['bucket'])])
+            select_list.append(f"{expression} AS {quote(name)}")
+        sql = f"SELECT {', '.join(select_list)} FROM {rollup['name']}"
+        
+        if plan['where']:
+            sql += " WHERE " + " AND ".join(
+                format_condition(condition, quote(columns[condition['column']]))
+                for condition in plan['where']
+            )
+        if groups:
+            sql += " GROUP BY " + ", ".join(quote(available[group]) for group in groups)
+        if plan['order_by']:
+            terms = []
+            for term in plan['order_by']:
+                if 'item' in term:
+                    expression = str(term['item'] + 1)
+                else:
+                    expression = quote(available[(columns[term['column']], term['bucket'])])
+                terms.append(expression + (" DESC" if term['descending'] else ""))
+            sql += " ORDER BY " + ", ".join(terms)
+        if plan['limit'] is not None:
+            sql += f" LIMIT {plan['limit']} OFFSET {plan['offset']}"
+        return sql
+
+
+class _NoRollup(Exception):
+    """Raised inside RollupManager.rewrite() when a query can't be answered from rollups."""
@@ -0,0 +1,388 @@
+import json
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sql_parser import format_condition
+
+class SampleManager:
+    """Maintains stratified samples of large tables and answers aggregates approximately from them.
+    
+    Each sample is a Poisson sample stratified on up to MAX_STRATA_COLUMNS
+    low-cardinality dimensions: every row of stratum h is kept independently
+    with probability p_h, at least SAMPLE_FRACTION and high enough to expect
+    MIN_STRATUM_ROWS rows, so small groups stay well represented. Kept rows
+    carry their weight 1/p_h in a __weight column. COUNT, SUM and AVG are
+    scaled back up with Horvitz-Thompson estimators (AVG as their ratio) and
+    reported with 95% error bounds from the estimators' variance. Rows
+    appended to a table are sampled into its existing sample.
+    """
+    
+    SAMPLE_PREFIX = "_di_sample_"
+    CATALOG_TABLE = "_di_samples"
+    STRATA_TABLE = "_di_sample_strata"
+    
+    # Tables smaller than this are fast enough to query exactly and get no sample
+    MIN_TABLE_ROWS = 100000
+    SAMPLE_FRACTION = 0.01
+    MIN_STRATUM_ROWS = 200
+    MAX_STRATA = 1000
+    MAX_STRATA_COLUMNS = 2
+    
+    # Normal quantile for the reported two-sided 95% error bounds
+    CONFIDENCE = 0.95
+    CONFIDENCE_Z = 1.96
+    
+    def __init__(self, db_manager):
+        """Initialize the manager and load sample definitions persisted in the database."""
+        self.db_manager = db_manager
+        self._samples: Dict[str, Dict[str, Any]] = {}
+        
+        with db_manager._write_lock:
+            connection = db_manager.connection
+            connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.CATALOG_TABLE} ("
+                "table_name TEXT PRIMARY KEY, definition TEXT NOT NULL)"
+            )
+            connection.commit()
+            for table_name, definition in connection.execute(
+                f"SELECT table_name, definition FROM {self.CATALOG_TABLE}"
+            ):
+                self._samples[table_name] = json.loads(definition)
+    
+    def get_sample(self, table_name: str) -> Optional[Dict[str, Any]]:
+        """Get the definition of a table's sample, or None if it has none."""
+        return self._samples.get(table_name)
+    
+    def build(self, table_name: str) -> Optional[Dict[str, Any]]:
+        """Draw a fresh stratified sample of a table, replacing any existing one.
+        
+        Returns the sample definition, or None for tables below MIN_TABLE_ROWS.
+        """
+        try:
+            with self.db_manager._write_lock:
+                self.drop_table_sample(table_name)
+                
+                row_count = self.db_manager.get_table_info(table_name)['row_count']
+                if row_count < self.MIN_TABLE_ROWS:
+                    return None
+                
+                strata_columns, strata = self._choose_strata(table_name)
+                if strata_columns:
+                    probabilities = [stratum[:-1] + (self._inclusion_probability(stratum[-1]),) for stratum in strata]
+                else:
+                    probabilities = [(self._inclusion_probability(row_count),)]
+                name = f"{self.SAMPLE_PREFIX}{table_name}"
+                self._draw_sample(table_name, name, strata_columns, probabilities)
+                
+                connection = self.db_manager.connection
+                sample_rows = connection.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+                sample = {
+                    'name': name,
+                    'table_name': table_name,
+                    'strata_columns': strata_columns,
+                    'strata': len(strata),
+                    'sample_rows': sample_rows,
+                    'table_rows': row_count
+                }
+                connection.execute(
+                    f"INSERT INTO {self.CATALOG_TABLE} VALUES (?, ?)", (table_name, json.dumps(sample))
+                )
+                connection.commit()
+                self._samples[table_name] = sample
+                return sample
+        except Exception as e:
+            raise Exception(f"Error building sample: {str(e)}")
+    
+    def append_rows(self, table_name: str, after_rowid: int) -> Optional[Dict[str, Any]]:
+        """Sample rows appended to a table (rowid above after_rowid) into its sample.
+        
+        Appended rows in a known stratum are kept with that stratum's
+        probability; rows in new strata get a probability for the number
+        of appended rows in them. Only valid when existing rows were not
+        changed. Returns the updated definition, or None without a sample.
+        """
+        sample = self.get_sample(table_name)
+        if sample is None:
+            return None
+        
+        try:
+            with self.db_manager._write_lock:
+                connection = self.db_manager.connection
+                quote = self.db_manager._quote_identifier
+                strata_columns = sample['strata_columns']
+                group_list = ", ".join(quote(col) for col in strata_columns)
+                
+                if strata_columns:
+                    known = {row[:-1]: row[-1] for row in connection.execute(
+                        f"SELECT {group_list}, 1.0 / MIN(__weight) FROM {sample['name']} GROUP BY {group_list}"
+                    )}
+                    appended = connection.execute(
+                        f"SELECT {group_list}, COUNT(*) FROM {table_name} "
+                        f"WHERE rowid > {int(after_rowid)} GROUP BY {group_list}"
+                    ).fetchall()
+                    probabilities = [
+                        row[:-1] + (known.get(row[:-1]) or self._inclusion_probability(row[-1]),)
+                        for row in appended
+                    ]
+                    appended_rows = sum(row[-1] for row in appended)
+                    sample['strata'] = len(set(known) | {row[:-1] for row in appended})
+                else:
+                    weight = connection.execute(f"SELECT MIN(__weight) FROM {sample['name']}").fetchone()[0]
+                    appended_rows = connection.execute(
+                        f"SELECT COUNT(*) FROM {table_name} WHERE rowid > {int(after_rowid)}"
+                    ).fetchone()[0]
+                    probabilities = [(1.0 / weight if weight else self._inclusion_probability(appended_rows),)]
+                
+                if appended_rows:
+                    self._draw_sample(table_name, sample['name'], strata_columns, probabilities, after_rowid)
+                sample['sample_rows'] = connection.execute(f"SELECT COUNT(*) FROM {sample['name']}").fetchone()[0]
+                sample['table_rows'] += appended_rows
+                connection.execute(
+                    f"UPDATE {self.CATALOG_TABLE} SET definition = ? WHERE table_name = ?",
+                    (json.dumps(sample), table_name)
+                )
+                return sample
+        except Exception as e:
+            raise Exception(f"Error updating sample: {str(e)}")
+    
+    def drop_table_sample(self, table_name: str) -> None:
+        """Drop a table's sample (called whenever the table is replaced)."""
+        with self.db_manager._write_lock:
+            connection = self.db_manager.connection
+            connection.execute(f"DROP TABLE IF EXISTS {self.SAMPLE_PREFIX}{table_name}")
+            connection.execute(f"DELETE FROM {self.CATALOG_TABLE} WHERE table_name = ?", (table_name,))
+            self._samples.pop(table_name, None)
+    
+    def estimate(self, plan: Dict[str, Any], table_name: str, column_names: List[str],
+                 timeout: Optional[float] = None) -> Optional[pd.DataFrame]:
+        """Answer a parsed aggregate query approximately from the table's sample.
+        
+        plan comes from sql_parser.parse_simple_select() and column_names are
+        the names SQLite gives the exact query's result columns. Returns None
+        when the table has no sample or the query needs more than COUNT, SUM
+        and AVG over bare columns, date buckets and simple filters. The
+        result's attrs['approximate'] holds the sample size and, per
+        estimated column, the 95% error bound of every row.
+        """
+        sample = self.get_sample(table_name)
+        if sample is None:
+            return None
+        
+        spec = self._estimation_query(plan, table_name, sample)
+        if spec is None:
+            return None
+        sql, groups = spec
+        
+        raw = self.db_manager.execute_query(sql, use_cache=False, timeout=timeout)
+        
+        result = pd.DataFrame(index=raw.index)
+        error_bounds = {}
+        for i, (item, name) in enumerate(zip(plan['items'], column_names)):
+            if item['function'] is None:
+                result[name] = raw[f"g{groups.index(self._group_key(item))}"]
+                continue
+            estimate, bound = self._estimate_item(item['function'], raw, f"a{i}_")
+            result[name] = estimate
+            error_bounds[name] = bound
+        
+        result = self._order_and_page(result, raw, plan, groups, column_names, error_bounds)
+        result.attrs['approximate'] = {
+            'sample_table': sample['name'],
+            'sample_rows': sample['sample_rows'],
+            'table_rows': sample['table_rows'],
+            'confidence': self.CONFIDENCE,
+            'error_bounds': {name: bound.tolist() for name, bound in error_bounds.items()}
+        }
+        return result
+    
+    def _choose_strata(self, table_name: str) -> Tuple[List[str], List[Tuple[Any, ...]]]:
+        """Pick strata columns among the lowest-cardinality dimensions; return them with (values..., rows) per stratum."""
+        dimensions = self.db_manager.rollups.detect_dimensions(table_name)[0]
+        quote = self.db_manager._quote_identifier
+        
+        strata_columns = []
+        strata = []
+        for column in dimensions[:self.MAX_STRATA_COLUMNS]:
+            candidate = strata_columns + [column]
+            group_list = ", ".join(quote(col) for col in candidate)
+            rows = self.db_manager.connection.execute(
+                f"SELECT {group_list}, COUNT(*) FROM {table_name} GROUP BY {group_list}"
+            ).fetchall()
+            if len(rows) > self.MAX_STRATA:
+                break
+            strata_columns, strata = candidate, rows
+        return strata_columns, strata
+    
+    def _draw_sample(self, table_name: str, name: str, strata_columns: List[str],
+                     probabilities: List[Tuple[Any, ...]], after_rowid: Optional[int] = None) -> None:
+        """Materialise the Poisson sample with each row's inclusion weight.
+        
+        probabilities holds (stratum values..., p) per stratum, or just (p,)
+        without strata columns. With after_rowid, only the table's rows past
+        it are sampled and added to the existing sample.
+        """
+        connection = self.db_manager.connection
+        quote = self.db_manager._quote_identifier
+        # random() spans the signed 64-bit range; this maps it onto [0, 1)
+        uniform = "(random() / 18446744073709551616.0 + 0.5)"
+        statement = f"CREATE TABLE {name} AS" if after_rowid is None else f"INSERT INTO {name}"
+        appended = "" if after_rowid is None else f" AND t.rowid > {int(after_rowid)}"
+        
+        if not strata_columns:
+            probability = probabilities[0][0]
+            connection.execute(
+                f"{statement} SELECT t.*, {1.0 / probability!r} AS __weight "
+                f"FROM {table_name} AS t WHERE {uniform} < {probability!r}{appended}"
+            )
+            return
+        
+        keys = [f"k{i}" for i in range(len(strata_columns))]
+        connection.execute(f"DROP TABLE IF EXISTS temp.{self.STRATA_TABLE}")
+        connection.execute(f"CREATE TEMP TABLE {self.STRATA_TABLE} ({', '.join(keys)}, p REAL)")
+        connection.executemany(
+            f"INSERT INTO temp.{self.STRATA_TABLE} VALUES ({', '.join('?' for _ in keys)}, ?)", probabilities
+        )
+        connection.execute(f"CREATE UNIQUE INDEX temp.{self.STRATA_TABLE}_keys ON {self.STRATA_TABLE} ({', '.join(keys)})")
+        
+        # IS matches NULL stratum values too
+        join_on = " AND ".join(f"s.{key} IS t.{quote(col)}" for key, col in zip(keys, strata_columns))
+        try:
+            connection.execute(
+                f"{statement} SELECT t.*, 1.0 / s.p AS __weight "
+                f"FROM {table_name} AS t JOIN temp.{self.STRATA_TABLE} AS s ON {join_on} "
+                f"WHERE {uniform} < s.p{appended}"
+            )
+        finally:
+            connection.execute(f"DROP TABLE IF EXISTS temp.{self.STRATA_TABLE}")
+    
+    def _inclusion_probability(self, stratum_rows: int) -> float:
+        """Get the sampling probability for a stratum of the given size."""
+        if stratum_rows <= 0:
+            return 1.0
+        return min(1.0, max(self.SAMPLE_FRACTION, self.MIN_STRATUM_ROWS / stratum_rows))
+    
+    def _group_key(self, item: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+        return (item['column'], item['bucket'])
+    
+    def _estimation_query(self, plan: Dict[str, Any], table_name: str,
+                          sample: Dict[str, Any]) -> Optional[Tuple[str, List[Tuple[str, Optional[str]]]]]:
+        """Build the SQL computing each group's weighted sums over the sample.
+        
+        Returns (sql, group keys) or None if the query can't be estimated.
+        """
+        quote = self.db_manager._quote_identifier
+        columns = {col.lower(): col for col in self.db_manager.get_table_columns(table_name)}
+        if not plan['group_by'] and not any(item['function'] for item in plan['items']):
+            return None
+        
+        groups = []
+        for reference in plan['group_by']:
+            item = plan['items'][reference['item']] if 'item' in reference else reference
+            if 'item' not in reference and reference['column'] not in columns and reference['bucket'] is None:
+                # SQLite falls back to a result alias when no column has the name
+                aliased = [item for item in plan['items'] if item['alias'] == reference['column']]
+                if len(aliased) == 1:
+                    item = aliased[0]
+            if item.get('function') or item['column'] not in columns:
+                return None
+            groups.append(self._group_key(item))
+        
+        def column_sql(column_name, bucket=None):
+            quoted = quote(columns[column_name])
+            if bucket == 'month':
+                return f"strftime('%Y-%m', {quoted})"
+            if bucket == 'year':
+                return f"strftime('%Y', {quoted})"
+            return quoted
+        
+        select_list = [f"{column_sql(*group)} AS g{i}" for i, group in enumerate(groups)]
+        for i, item in enumerate(plan['items']):
+            if item['column'] == '*':
+                return None
+            if item['function'] is None:
+                if self._group_key(item) not in groups:
+                    return None  # bare columns take an arbitrary row's value
+                continue
+            if item['function'] not in ('count', 'sum', 'avg'):
+                return None  # extremes can't be scaled up from a sample
+            if item['column'] is not None and item['column'] not in columns:
+                return None
+            
+            value = "1" if item['column'] is None else column_sql(item['column'])
+            present = "1" if item['column'] is None else f"({value} IS NOT NULL)"
+            components = {
+                'w': f"SUM(__weight * {present})",
+                'v_w': f"SUM(__weight * (__weight - 1) * {present})",
+                'wy': f"SUM(__weight * {value})",
+                'v_y': f"SUM(__weight * (__weight - 1) * {value})",
+                'v_yy': f"SUM(__weight * (__weight - 1) * {value} * {value})"
+            }
+            select_list.extend(f"{expression} AS a{i}_{key}" for key, expression in components.items())
+        
+        for term in plan['order_by']:
+            if 'item' not in term and self._group_key(term) not in groups:
+                return None
+        for condition in plan['where']:
+            if condition['column'] not in columns:
+                return None
+        
+        sql = f"SELECT {', '.join(select_list)} FROM {sample['name']}"
+        if plan['where']:
+            sql += " WHERE " + " AND ".join(
+                format_condition(condition, column_sql(condition['column'])) for condition in plan['where']
+            )
+        if groups:
+            sql += " GROUP BY " + ", ".join(f"g{i}" for i in range(len(groups)))
+        return sql, groups
+    
+    def _estimate_item(self, function: str, raw: pd.DataFrame, prefix: str) -> Tuple[pd.Series, np.ndarray]:
+        """Scale one aggregate's weighted sums up to an estimate and its error bound."""
+        def component(key):
+            return raw[prefix + key].astype('float64').fillna(0.0).to_numpy()
+        
+        weight, weight_variance = component('w'), component('v_w')
+        total, total_variance = component('wy'), component('v_yy')
+        
+        if function == 'count':
+            estimate = pd.Series(np.rint(weight).astype('int64'), index=raw.index)
+            variance = weight_variance
+        elif function == 'sum':
+            estimate = pd.Series(np.where(weight > 0, total, np.nan), index=raw.index)
+            variance = total_variance
+        else:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                ratio = total / weight
+                # Linearised variance of the ratio estimator sum(w*y) / sum(w)
+                variance = (total_variance - 2 * ratio * component('v_y')
+                            + ratio ** 2 * weight_variance) / weight ** 2
+            estimate = pd.Series(np.where(weight > 0, ratio, np.nan), index=raw.index)
+        
+        bound = self.CONFIDENCE_Z * np.sqrt(np.clip(np.nan_to_num(variance), 0.0, None))
+        return estimate, bound
+    
+    def _order_and_page(self, result: pd.DataFrame, raw: pd.DataFrame, plan: Dict[str, Any],
+                        groups: List[Tuple[str, Optional[str]]], column_names: List[str],
+                        error_bounds: Dict[str, np.ndarray]) -> pd.DataFrame:
+        """Apply ORDER BY, OFFSET and LIMIT to the estimates, keeping error bounds aligned."""
+        positions = np.arange(len(result))
+        if plan['order_by']:
+            keys = pd.DataFrame(index=result.index)
+            ascending = []
+            for i, term in enumerate(plan['order_by']):
+                if 'item' in term:
+                    keys[f"o{i}"] = result[column_names[term['item']]]
+                else:
+                    keys[f"o{i}"] = raw[f"g{groups.index(self._group_key(term))}"]
+                ascending.append(not term['descending'])
+            # SQLite sorts NULLs first ascending and last descending
+            order = keys.sort_values(
+                list(keys.columns), ascending=ascending, kind='stable',
+                na_position='first' if ascending[0] else 'last'
+            )
+            positions = result.index.get_indexer(order.index)
+        
+        end = None if plan['limit'] is None else plan['offset'] + plan['limit']
+        positions = positions[plan['offset']:end]
+        for name in error_bounds:
+            error_bounds[name] = error_bounds[name][positions]
+        return result.iloc[positions].reset_index(drop=True)
@@ -0,0 +1,456 @@
+import math
+from typing import Dict, Any, Optional, Iterable, List, Tuple
+import numpy as np
+import pandas as pd
+
+class HyperLogLog:
+    """Mergeable distinct-count sketch over 64-bit value hashes.
+    
+    2**precision one-byte registers give a relative standard error of about
+    1.04 / sqrt(2**precision) (0.8% at the default precision of 14).
+    """
+    
+    def __init__(self, precision: int = 14):
+        """Initialize empty registers (precision 11 to 16)."""
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+    
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        """Add an array of uint64 hashes."""
+        if len(hashes) == 0:
+            return
+        hashes = hashes.astype(np.uint64, copy=False)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        remainder = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        # The remainder has under 53 bits, so float conversion is exact and
+        # frexp's exponent is its bit length
+        bit_length = np.frexp(remainder.astype(np.float64))[1]
+        rank = (64 - self.precision) - bit_length + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+    
+    def merge(self, other: 'HyperLogLog') -> None:
+        """Fold another sketch of the same precision into this one."""
+        np.maximum(self.registers, other.registers, out=self.registers)
+    
+    def count(self) -> int:
+        """Estimate the number of distinct values added."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are empty
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class SpaceSaving:
+    """Mergeable heavy-hitter sketch keeping at most `capacity` counters.
+    
+    Counts are over-estimates: a value's true count lies between
+    count - error and count. Values not tracked occurred at most
+    min_count() times.
+    """
+    
+    def __init__(self, capacity: int = 100):
+        """Initialize an empty summary."""
+        self.capacity = capacity
+        self.counts: Dict[Any, int] = {}
+        self.errors: Dict[Any, int] = {}
+        self._floor = 0
+    
+    def add_counts(self, value_counts: pd.Series) -> None:
+        """Merge exact counts for a chunk of values (e.g. Series.value_counts())."""
+        chunk = SpaceSaving(self.capacity)
+        top = value_counts.nlargest(self.capacity)
+        chunk.counts = {value: int(count) for value, count in top.items()}
+        chunk.errors = {value: 0 for value in chunk.counts}
+        # Values cut from the chunk occurred at most as often as the smallest kept one
+        chunk._floor = int(top.iloc[-1]) if len(value_counts) > self.capacity else 0
+        self.merge(chunk)
+    
+    def merge(self, other: 'SpaceSaving') -> None:
+        """Fold another summary into this one, then keep the largest counters."""
+        own_floor, other_floor = self.min_count(), other.min_count()
+        merged_counts = {}
+        merged_errors = {}
+        for value in set(self.counts) | set(other.counts):
+            merged_counts[value] = self.counts.get(value, own_floor) + other.counts.get(value, other_floor)
+            merged_errors[value] = self.errors.get(value, own_floor) + other.errors.get(value, other_floor)
+        
+        kept = sorted(merged_counts, key=merged_counts.get, reverse=True)
+        floor = own_floor + other_floor
+        if len(kept) > self.capacity:
+            floor = max(floor, merged_counts[kept[self.capacity]])
+            kept = kept[:self.capacity]
+        self.counts = {value: merged_counts[value] for value in kept}
+        self.errors = {value: merged_errors[value] for value in kept}
+        self._floor = floor
+    
+    def min_count(self) -> int:
+        """Upper bound on the count of any value that isn't tracked."""
+        return self._floor
+    
+    def top(self, n: int = 10) -> List[Tuple[Any, int, int]]:
+        """Return up to n (value, estimated count, error bound) tuples, most frequent first."""
+        ranked = sorted(self.counts, key=self.counts.get, reverse=True)[:n]
+        return [(value, self.counts[value], self.errors[value]) for value in ranked]
+
+
+class DuplicateEstimator:
+    """Estimates duplicate rows from row hashes with adaptive hash sampling.
+    
+    Only hashes in the lowest 1/2**level of the hash space are kept (with
+    their counts), so all copies of a row are kept or dropped together.
+    Whenever more than `capacity` distinct hashes are kept, the level goes
+    up and half of them are dropped. Duplicates seen in the kept slice,
+    scaled by 2**level, estimate the total; the count is exact while the
+    table has at most `capacity` distinct rows.
+    """
+    
+    def __init__(self, capacity: int = 1000000):
+        """Initialize with the most distinct hashes to keep."""
+        self.capacity = capacity
+        self.level = 0
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self._pending: List[np.ndarray] = []
+        self._pending_size = 0
+    
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        """Add an array of uint64 row hashes."""
+        kept = self._in_slice(hashes.astype(np.uint64, copy=False))
+        self._pending.append(kept)
+        self._pending_size += len(kept)
+        if self._pending_size > self.capacity:
+            self._compact()
+    
+    def merge(self, other: 'DuplicateEstimator') -> None:
+        """Fold another estimator into this one."""
+        other._compact()
+        self._compact()
+        self.level = max(self.level, other.level)
+        self._combine([self.hashes, other.hashes], [self.counts, other.counts])
+    
+    def estimate(self) -> int:
+        """Estimate the number of rows that repeat an earlier row."""
+        self._compact()
+        repeats = int(self.counts.sum()) - len(self.hashes)
+        return repeats << self.level
+    
+    def _in_slice(self, hashes: np.ndarray) -> np.ndarray:
+        """Keep the hashes that fall in the current slice of the hash space."""
+        if self.level == 0:
+            return hashes
+        return hashes[hashes < np.uint64(1 << (64 - self.level))]
+    
+    def _compact(self) -> None:
+        """Fold pending hashes into the (hash, count) table, raising the level if it is too big."""
+        if self._pending:
+            pending = np.concatenate(self._pending)
+            self._pending = []
+            self._pending_size = 0
+            self._combine([self.hashes, pending], [self.counts, np.ones(len(pending), dtype=np.int64)])
+        else:
+            self._combine([self.hashes], [self.counts])
+    
+    def _combine(self, hash_arrays: List[np.ndarray], count_arrays: List[np.ndarray]) -> None:
+        """Merge (hash, count) arrays, keeping only the current slice within capacity."""
+        hashes = np.concatenate(hash_arrays)
+        counts = np.concatenate(count_arrays)
+        while True:
+            in_slice = hashes < np.uint64(1 << (64 - self.level)) if self.level else np.ones(len(hashes), dtype=bool)
+            hashes, counts = hashes[in_slice], counts[in_slice]
+            order = np.argsort(hashes, kind='stable')
+            hashes, counts = hashes[order], counts[order]
+            starts = np.flatnonzero(np.r_[True, hashes[1:] != hashes[:-1]]) if len(hashes) else np.empty(0, dtype=np.int64)
+            hashes, counts = hashes[starts], np.add.reduceat(counts, starts) if len(starts) else counts[:0]
+            if len(hashes) <= self.capacity:
+                break
+            self.level += 1
+        self.hashes, self.counts = hashes, counts
+
+
+class KllSketch:
+    """Mergeable quantile sketch (KLL) for numeric values.
+    
+    Values are kept in levels of compactors; level h items each stand for
+    2**h inputs. A full level is sorted and every other item (from a random
+    offset) is promoted, so memory stays O(k log n) and rank error is about
+    1.7 / k of the total count.
+    """
+    
+    def __init__(self, k: int = 400, seed: int = 0):
+        """Initialize an empty sketch with accuracy parameter k."""
+        self.k = k
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self.count = 0
+        self.min_value = None
+        self.max_value = None
+        self._rng = np.random.default_rng(seed)
+    
+    def add(self, values: np.ndarray) -> None:
+        """Add an array of finite float values."""
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        low, high = float(values.min()), float(values.max())
+        self.min_value = low if self.min_value is None else min(self.min_value, low)
+        self.max_value = high if self.max_value is None else max(self.max_value, high)
+        self.levels[0] = np.concatenate([self.levels[0], values.astype(np.float64)])
+        self._compress()
+    
+    def merge(self, other: 'KllSketch') -> None:
+        """Fold another sketch into this one."""
+        if other.count == 0:
+            return
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self.count += other.count
+        self.min_value = other.min_value if self.min_value is None else min(self.min_value, other.min_value)
+        self.max_value = other.max_value if self.max_value is None else max(self.max_value, other.max_value)
+        self._compress()
+    
+    def quantiles(self, fractions: List[float]) -> List[Optional[float]]:
+        """Estimate the values at the given fractions (0..1) of the distribution."""
+        if self.count == 0:
+            return [None for _ in fractions]
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items_h), 2.0 ** h) for h, items_h in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, cumulative = items[order], np.cumsum(weights[order])
+        results = []
+        for fraction in fractions:
+            if fraction <= 0:
+                results.append(self.min_value)
+            elif fraction >= 1:
+                results.append(self.max_value)
+            else:
+                position = np.searchsorted(cumulative, fraction * cumulative[-1])
+                results.append(float(items[min(position, len(items) - 1)]))
+        return results
+    
+    def _capacity(self, level: int) -> int:
+        """Items a level may hold; lower levels get geometrically less room."""
+        depth = len(self.levels) - 1 - level
+        return max(2, int(math.ceil(self.k * (2.0 / 3.0) ** depth)))
+    
+    def _compress(self) -> None:
+        """Compact levels until each is within its capacity."""
+        h = 0
+        while h < len(self.levels):
+            items = self.levels[h]
+            if len(items) > self._capacity(h):
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays at this level
+                keep = items[-1:] if len(items) % 2 else items[:0]
+                paired = items[:len(items) - len(keep)]
+                promoted = paired[int(self._rng.integers(2))::2]
+                self.levels[h] = keep
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+                # Capacities depend on the level count; start over
+                h = 0
+                continue
+            h += 1
+
+
+SUMMARY_QUANTILES = [0.25, 0.5, 0.75]
+
+def summarize_frames(frames: Iterable[pd.DataFrame], top_n: int = 10,
+                     heavy_hitters: int = 100, precision: int = 14) -> Dict[str, Any]:
+    """Summarize data arriving in chunks with one pass of mergeable sketches.
+    
+    Returns the same keys as utils.get_data_summary: shape, columns, dtypes,
+    missing_values, memory_usage and duplicate_rows, numeric_summary (count,
+    mean, std, min, quartiles, max) and categorical_summary (unique_values,
+    most_common). Distinct counts come from HyperLogLog, most common values
+    from Space-Saving, quartiles from KLL and duplicate rows from hash
+    sampling of row hashes; counts, means and extremes are exact. Extra keys:
+    'top_values' per column and 'approximate': True.
+    """
+    rows = 0
+    memory = 0
+    columns = None
+    dtypes = {}
+    states = {}
+    duplicates = DuplicateEstimator()
+    
+    for chunk in frames:
+        if columns is None:
+            columns = list(chunk.columns)
+            dtypes = chunk.dtypes.to_dict()
+            states = {col: _ColumnState(heavy_hitters, precision) for col in columns}
+        if chunk.empty:
+            continue
+        rows += len(chunk)
+        memory += _estimate_memory(chunk)
+        
+        row_hashes = np.zeros(len(chunk), dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            for col in columns:
+                column_hashes = states[col].add(chunk[col])
+                row_hashes = row_hashes * np.uint64(1000003) + column_hashes
+        duplicates.add_hashes(row_hashes)
+    
+    columns = columns or []
+    summary = {
+        'shape': (rows, len(columns)),
+        'columns': columns,
+        'dtypes': dtypes,
+        'missing_values': {col: states[col].nulls for col in columns},
+        'memory_usage': memory,
+        'duplicate_rows': duplicates.estimate(),
+        'top_values': {col: states[col].heavy.top(top_n) for col in columns},
+        'approximate': True
+    }
+    
+    numeric_summary = {}
+    categorical_summary = {}
+    for col in columns:
+        state = states[col]
+        if state.kind == 'numeric':
+            numeric_summary[col] = state.numeric_summary()
+        elif state.kind == 'categorical':
+            top = state.heavy.top(1)
+            categorical_summary[col] = {
+                'unique_values': state.distinct.count(),
+                'most_common': top[0][0] if top else None
+            }
+    if numeric_summary:
+        summary['numeric_summary'] = numeric_summary
+    if categorical_summary:
+        summary['categorical_summary'] = categorical_summary
+    return summary
+
+
+class _ColumnState:
+    """Running sketches and moments for one column."""
+    
+    def __init__(self, heavy_hitters: int, precision: int):
+        self.nulls = 0
+        self.kind = None
+        self.distinct = HyperLogLog(precision)
+        self.heavy = SpaceSaving(heavy_hitters)
+        self.quantiles = KllSketch()
+        self.total = 0.0
+        self.total_squares = 0.0
+    
+    def add(self, series: pd.Series) -> np.ndarray:
+        """Add a chunk of the column; return per-row hashes (NULLs hash to a constant)."""
+        null_mask = series.isna().to_numpy()
+        self.nulls += int(null_mask.sum())
+        values = series[~null_mask]
+        
+        kind = self._chunk_kind(series)
+        if len(values) and self.kind is None:
+            self.kind = kind
+        elif len(values) and kind != self.kind:
+            # SQLite columns can mix numbers and text; treat them as text
+            self.kind = 'categorical'
+        
+        hashes = np.full(len(series), np.uint64(0x9E3779B97F4A7C15), dtype=np.uint64)
+        if len(values) == 0:
+            return hashes
+        if kind == 'numeric':
+            # Integers and floats hash alike, so 1 and 1.0 count as one value
+            numbers = values.to_numpy(dtype=np.float64)
+            value_hashes = pd.util.hash_array(numbers)
+            finite = numbers[np.isfinite(numbers)]
+            self.quantiles.add(finite)
+            self.total += float(finite.sum())
+            self.total_squares += float(np.square(finite).sum())
+        else:
+            # Most common values are only reported for text columns
+            value_hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+            self.heavy.add_counts(values.value_counts(sort=False))
+        self.distinct.add_hashes(value_hashes)
+        hashes[~null_mask] = value_hashes
+        return hashes
+    
+    def numeric_summary(self) -> Dict[str, Optional[float]]:
+        """describe()-style statistics from exact moments and KLL quartiles."""
+        count = self.quantiles.count
+        mean = self.total / count if count else None
+        std = None
+        if count > 1:
+            variance = (self.total_squares - count * mean * mean) / (count - 1)
+            std = math.sqrt(max(variance, 0.0))
+        q1, median, q3 = self.quantiles.quantiles(SUMMARY_QUANTILES)
+        return {'count': float(count), 'mean': mean, 'std': std, 'min': self.quantiles.min_value,
+                '25%': q1, '50%': median, '75%': q3, 'max': self.quantiles.max_value}
+    
+    def _chunk_kind(self, series: pd.Series) -> str:
+        """Classify a chunk like get_data_summary does: numeric, categorical or other."""
+        if pd.api.types.is_bool_dtype(series.dtype):
+            return 'other'
+        if pd.api.types.is_numeric_dtype(series.dtype):
+            return 'numeric'
+        if (pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype)
+                or isinstance(series.dtype, pd.CategoricalDtype)):
+            return 'categorical'
+        return 'other'
+
+
+def _estimate_memory(chunk: pd.DataFrame, sample_rows: int = 1000) -> int:
+    """Approximate deep memory use, measuring text columns on a sample of rows."""
+    total = int(chunk.memory_usage(index=False, deep=False).sum())
+    sample = chunk.head(sample_rows)
+    for col in chunk.columns:
+        if pd.api.types.is_object_dtype(chunk[col].dtype):
+            deep = sample[col].memory_usage(index=False, deep=True) - sample[col].memory_usage(index=False, deep=False)
+            total += int(deep * len(chunk) / max(len(sample), 1))
+    return total
+
+
+class TableSummarizer:
+    """Summarizes database tables with sketches, cached per table generation.
+    
+    A summary is built in one chunked pass over the table (see
+    summarize_frames) and reused until the table is replaced or appended to.
+    exact=True, and tables small enough for get_data_summary's exact path,
+    instead load the table and compute exact statistics.
+    """
+    
+    CHUNK_SIZE = 100000
+    
+    def __init__(self, db_manager):
+        """Initialize with the database whose tables are summarized."""
+        self.db_manager = db_manager
+        self._cache: Dict[str, Tuple[int, Dict[bool, Dict[str, Any]]]] = {}
+    
+    def summarize(self, table_name: str, exact: bool = False) -> Dict[str, Any]:
+        """Return a summary of a table (see utils.get_data_summary for its keys)."""
+        try:
+            cached = self.get_cached(table_name, exact)
+            if cached is not None:
+                return cached
+            
+            generation = self.db_manager.get_table_generation(table_name)
+            from utils import get_data_summary, SKETCH_SUMMARY_MIN_ROWS
+            scan_exactly = exact or self.db_manager.get_table_info(table_name)['row_count'] < SKETCH_SUMMARY_MIN_ROWS
+            with self.db_manager.stream_query(
+                f"SELECT * FROM {table_name}",
+                chunk_size=self.CHUNK_SIZE, max_rows=None, max_bytes=None, use_cache=False, timeout=None
+            ) as stream:
+                if scan_exactly:
+                    summary = get_data_summary(stream.to_dataframe(), exact=True)
+                else:
+                    summary = summarize_frames(stream)
+            
+            if table_name not in self._cache or self._cache[table_name][0] != generation:
+                self._cache[table_name] = (generation, {})
+            self._cache[table_name][1][exact] = summary
+            return summary
+        except Exception as e:
+            raise Exception(f"Error summarizing table: {str(e)}")
+    
+    def get_cached(self, table_name: str, exact: bool = False) -> Optional[Dict[str, Any]]:
+        """Return the cached summary if it is for the table's current contents."""
+        entry = self._cache.get(table_name)
+        if entry is None or entry[0] != self.db_manager.get_table_generation(table_name):
+            return None
+        return entry[1].get(exact)
@@ -0,0 +1,542 @@
+import re
+from typing import List, Iterable, Dict, Tuple, Optional, Any
+
+# Matches string literals, quoted identifiers and comments so they can be
+# skipped (or preserved verbatim) when scanning SQL text
+_QUOTED_OR_COMMENT = re.compile(
+    r"'(?:[^']|'')*'"          # 'string literal'
+    r'|"(?:[^"]|"")*"'         # "quoted identifier"
+    r"|`[^`]*`"                # `quoted identifier`
+    r"|\[[^\]]*\]"             # [quoted identifier]
+    r"|--[^\n]*"               # -- line comment
+    r"|/\*.*?\*/",             # /* block comment */
+    re.DOTALL
+)
+
+_IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+# Functions and keywords whose result changes between executions of the same
+# SQL text; CURRENT_DATE/TIME/TIMESTAMP are bare keywords, not calls
+_NON_DETERMINISTIC = re.compile(
+    r"\b(random|randomblob|changes|last_insert_rowid|total_changes)\s*\("
+    r"|\bcurrent_(date|time|timestamp)\b|'now'",
+    re.IGNORECASE
+)
+
+
+def _split_sql(query: str):
+    """Yield (text, is_quoted) segments of a SQL string."""
+    position = 0
+    for match in _QUOTED_OR_COMMENT.finditer(query):
+        if match.start() > position:
+            yield query[position:match.start()], False
+        yield match.group(0), True
+        position = match.end()
+    if position < len(query):
+        yield query[position:], False
+
+
+def normalize_sql(query: str) -> str:
+    """Normalise SQL text so trivially different spellings of a query compare equal.
+    
+    Comments are dropped, whitespace is collapsed and everything outside
+    string literals and quoted identifiers is lower-cased (SQLite keywords
+    and identifiers are case-insensitive). Trailing semicolons are removed.
+    """
+    parts = []
+    unquoted = []
+    for text, is_quoted in _split_sql(query):
+        if is_quoted and not text.startswith(('--', '/*')):
+            parts.append(re.sub(r'\s+', ' ', ''.join(unquoted)).lower())
+            parts.append(text)
+            unquoted = []
+        else:
+            unquoted.append(' ' if is_quoted else text)
+    parts.append(re.sub(r'\s+', ' ', ''.join(unquoted)).lower())
+    
+    return ''.join(parts).strip().rstrip(';').strip()
+
+
+def extract_identifiers(query: str) -> List[str]:
+    """Get the bare and quoted identifiers appearing in a query, lower-cased."""
+    identifiers = []
+    for text, is_quoted in _split_sql(query):
+        if not is_quoted:
+            identifiers.extend(name.lower() for name in _IDENTIFIER.findall(text))
+        elif text[0] in '"`[':
+            identifiers.append(text[1:-1].replace('""', '"').lower())
+    return identifiers
+
+
+def referenced_tables(query: str, known_tables: Iterable[str]) -> List[str]:
+    """Get the known tables a query mentions, in sorted order."""
+    identifiers = set(extract_identifiers(query))
+    return sorted(table for table in known_tables if table.lower() in identifiers)
+
+
+def is_deterministic(query: str) -> bool:
+    """Check whether a query can be expected to return the same result when re-run."""
+    return not any(
+        _NON_DETERMINISTIC.search(text) for text, is_quoted in _split_sql(query)
+        if not is_quoted or text.lower().startswith("'now'")
+    )
+
+
+_TOKEN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+(?:\.\d+)?|<=|>=|<>|!=|==|\|\||\S")
+
+# Words that end a FROM/JOIN item, so they are never taken for table aliases
+_CLAUSE_WORDS = {
+    'where', 'join', 'inner', 'left', 'right', 'full', 'cross', 'natural', 'outer',
+    'on', 'using', 'group', 'order', 'limit', 'having', 'window', 'union', 'except',
+    'intersect', 'offset', 'select', 'from', 'as', 'by', 'and', 'or', 'not'
+}
+
+_EQUALITY_OPERATORS = {'=', '==', 'is', 'in'}
+_RANGE_OPERATORS = {'<', '>', '<=', '>=', 'between', 'like', 'glob'}
+
+
+def tokenize_sql(query: str) -> List[Tuple[str, str]]:
+    """Split SQL into (kind, value) tokens; kind is 'name', 'string' or 'symbol'.
+    
+    Names are lower-cased with any identifier quoting removed; comments are dropped.
+    """
+    tokens = []
+    for text, is_quoted in _split_sql(query):
+        if is_quoted:
+            if text.startswith(('--', '/*')):
+                continue
+            if text[0] == "'":
+                tokens.append(('string', text))
+            else:
+                tokens.append(('name', text[1:-1].replace('""', '"').lower()))
+            continue
+        for token in _TOKEN.findall(text):
+            if _IDENTIFIER.fullmatch(token):
+                tokens.append(('name', token.lower()))
+            else:
+                tokens.append(('symbol', token.lower()))
+    return tokens
+
+
+def extract_table_aliases(query: str, known_tables: Iterable[str]) -> Dict[str, str]:
+    """Map every name a query uses for a known table (the table itself or its alias) to the table."""
+    tables = {table.lower(): table for table in known_tables}
+    tokens = tokenize_sql(query)
+    aliases = {}
+    
+    for i, (kind, value) in enumerate(tokens):
+        if kind != 'name' or value not in tables:
+            continue
+        # A table reference follows FROM, JOIN or a comma in a FROM list
+        if i == 0 or tokens[i - 1][1] not in ('from', 'join', ','):
+            continue
+        
+        table = tables[value]
+        aliases[value] = table
+        
+        j = i + 1
+        if j < len(tokens) and tokens[j][1] == 'as':
+            j += 1
+        if j < len(tokens) and tokens[j][0] == 'name' and tokens[j][1] not in _CLAUSE_WORDS:
+            aliases[tokens[j][1]] = table
+    
+    return aliases
+
+
+def extract_cte_names(query: str) -> List[str]:
+    """Get the names a query's WITH clause defines, in order."""
+    tokens = tokenize_sql(query)
+    names = []
+    for i, (kind, value) in enumerate(tokens[:-2]):
+        if kind != 'name' or tokens[i + 1][1] != 'as':
+            continue
+        # name AS [NOT] [MATERIALIZED] (SELECT ...
+        j = i + 2
+        while j < len(tokens) and tokens[j][1] in ('not', 'materialized'):
+            j += 1
+        if j + 1 < len(tokens) and tokens[j][1] == '(' and tokens[j + 1][1] in ('select', 'values', 'with'):
+            names.append(value)
+    return names
+
+
+def extract_column_usage(query: str, table_columns: Dict[str, List[str]]) -> Dict[str, Dict[str, List[str]]]:
+    """Find the columns a query filters, joins, groups and orders on, per table.
+    
+    table_columns maps each known table to its column names. The result maps
+    every referenced table to lists of columns under 'equality' and 'range'
+    (WHERE/HAVING predicates), 'join' (ON conditions), 'group' and 'order'.
+    This is a token-level scan rather than a full parse, so it is meant for
+    workload mining and heuristics, not for rewriting queries.
+    """
+    aliases = extract_table_aliases(query, table_columns)
+    referenced = set(aliases.values())
+    columns_by_table = {
+        table: {col.lower(): col for col in table_columns[table]} for table in referenced
+    }
+    usage = {
+        table: {'equality': [], 'range': [], 'join': [], 'group': [], 'order': []}
+        for table in referenced
+    }
+    
+    tokens = tokenize_sql(query)
+    clause = None
+    clause_stack = []
+    
+    for i, (kind, value) in enumerate(tokens):
+        if kind == 'symbol':
+            if value == '(':
+                clause_stack.append(clause)
+            elif value == ')' and clause_stack:
+                clause = clause_stack.pop()
+            continue
+        if kind != 'name':
+            continue
+        
+        if value in ('where', 'having'):
+            clause = 'filter'
+            continue
+        if value == 'on':
+            clause = 'join'
+            continue
+        if value == 'by' and i > 0 and tokens[i - 1][1] in ('group', 'order'):
+            clause = tokens[i - 1][1]
+            continue
+        if value in ('select', 'from', 'join', 'limit', 'union', 'except', 'intersect'):
+            clause = None
+            continue
+        if clause is None:
+            continue
+        
+        # Skip qualifiers; the column after the dot is resolved through the alias
+        if i + 1 < len(tokens) and tokens[i + 1][1] == '.':
+            continue
+        if i + 1 < len(tokens) and tokens[i + 1][1] == '(':
+            continue  # function call
+        
+        qualifier = tokens[i - 2][1] if i >= 2 and tokens[i - 1][1] == '.' else None
+        if qualifier is not None:
+            candidate_tables = [aliases[qualifier]] if qualifier in aliases else []
+        else:
+            candidate_tables = [table for table in referenced if value in columns_by_table[table]]
+        
+        for table in candidate_tables:
+            column = columns_by_table[table].get(value)
+            if column is None:
+                continue
+            
+            if clause == 'filter':
+                category = _predicate_category(tokens, i)
+                if category is None:
+                    continue
+            else:
+                category = clause
+            
+            if column not in usage[table][category]:
+                usage[table][category].append(column)
+    
+    return usage
+
+
+def _predicate_category(tokens: List[Tuple[str, str]], index: int) -> Optional[str]:
+    """Classify how a column token is compared: 'equality', 'range' or None."""
+    following = tokens[index + 1][1] if index + 1 < len(tokens) else None
+    if following == 'not' and index + 2 < len(tokens):
+        following = tokens[index + 2][1]
+    preceding = tokens[index - 1][1] if index > 0 else None
+    
+    for operator in (following, preceding):
+        if operator in _EQUALITY_OPERATORS:
+            return 'equality'
+        if operator in _RANGE_OPERATORS:
+            return 'range'
+    return None
+
+
+_AGGREGATE_FUNCTIONS = {'count', 'sum', 'avg', 'min', 'max'}
+
+# strftime() formats recognised as date buckets of a column
+_DATE_BUCKET_FORMATS = {"'%Y-%m'": 'month', "'%Y'": 'year'}
+_COMPARISON_OPERATORS = {'=': '=', '==': '=', '!=': '!=', '<>': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>='}
+
+# Keywords that can never be a bare column name in a simple SELECT
+_RESERVED_WORDS = _CLAUSE_WORDS | {
+    'distinct', 'all', 'case', 'when', 'then', 'else', 'end', 'in', 'is', 'null',
+    'between', 'like', 'glob', 'asc', 'desc', 'cast', 'exists', 'collate', 'escape'
+}
+
+
+def parse_simple_select(query: str) -> Optional[Dict[str, Any]]:
+    """Parse a single-table SELECT limited to bare columns and plain aggregates.
+    
+    Recognises:
+        
+        SELECT item, ... FROM table [[AS] alias]
+        [WHERE column <op> literal [AND ...]]
+        [GROUP BY ref, ...] [ORDER BY ref [ASC|DESC], ...] [LIMIT n [OFFSET m]]
+    
+    where an item is a column, a strftime('%Y-%m' or '%Y', column) date
+    bucket, * or COUNT/SUM/AVG/MIN/MAX over a column (COUNT also over *),
+    optionally aliased, and a condition compares a
+    column with =, !=, <, <=, >, >=, BETWEEN, IN or IS [NOT] NULL against
+    literals. Returns None for anything else. Names are lower-cased; the
+    result is a dict with 'table', 'items', 'where', 'group_by', 'order_by',
+    'limit' and 'offset'. Items carry 'function', 'column', 'bucket' and
+    'alias'; group and order references are resolved to {'item': index} or
+    {'column': name, 'bucket': bucket}.
+    """
+    return _SimpleSelectParser(tokenize_sql(query)).parse()
+
+
+def format_condition(condition: Dict[str, Any], column_sql: str) -> str:
+    """Render a WHERE condition parsed by parse_simple_select() against a column expression."""
+    op = condition['op']
+    values = [format_literal(value) for value in condition['values']]
+    if op in ('is null', 'is not null'):
+        return f"{column_sql} {op.upper()}"
+    if op == 'between':
+        return f"{column_sql} BETWEEN {values[0]} AND {values[1]}"
+    if op == 'in':
+        return f"{column_sql} IN ({', '.join(values)})"
+    return f"{column_sql} {op} {values[0]}"
+
+
+def format_literal(value: Any) -> str:
+    """Render a string or number as a SQL literal."""
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return repr(value)
+
+
+class _SimpleSelectParser:
+    """Recursive-descent parser behind parse_simple_select()."""
+    
+    def __init__(self, tokens: List[Tuple[str, str]]):
+        self.tokens = tokens
+        self.position = 0
+        self.qualifiers = set()
+    
+    def parse(self) -> Optional[Dict[str, Any]]:
+        try:
+            return self._parse_select()
+        except _NotSimple:
+            return None
+    
+    def _parse_select(self) -> Dict[str, Any]:
+        self._expect('select')
+        items = [self._parse_item()]
+        while self._accept(','):
+            items.append(self._parse_item())
+        
+        self._expect('from')
+        table = self._name()
+        table_names = {table}
+        if self._accept('as'):
+            table_names.add(self._name())
+        elif self._peek_kind() == 'name' and self._peek() not in _RESERVED_WORDS:
+            table_names.add(self._name())
+        
+        where = []
+        if self._accept('where'):
+            where.append(self._parse_condition())
+            while self._accept('and'):
+                where.append(self._parse_condition())
+        
+        group_by = []
+        if self._accept('group'):
+            self._expect('by')
+            group_by.append(self._parse_reference(items, allow_alias=False))
+            while self._accept(','):
+                group_by.append(self._parse_reference(items, allow_alias=False))
+        
+        order_by = []
+        if self._accept('order'):
+            self._expect('by')
+            order_by.append(self._parse_order_term(items))
+            while self._accept(','):
+                order_by.append(self._parse_order_term(items))
+        
+        limit = None
+        offset = 0
+        if self._accept('limit'):
+            limit = self._integer()
+            if self._accept('offset'):
+                offset = self._integer()
+        
+        while self._accept(';'):
+            pass
+        if self.position != len(self.tokens):
+            raise _NotSimple()
+        if not self.qualifiers <= table_names:
+            raise _NotSimple()
+        
+        return {
+            'table': table,
+            'items': items,
+            'where': where,
+            'group_by': group_by,
+            'order_by': order_by,
+            'limit': limit,
+            'offset': offset
+        }
+    
+    def _parse_item(self) -> Dict[str, Any]:
+        if self._accept('*'):
+            return {'function': None, 'column': '*', 'bucket': None, 'alias': None}
+        
+        function, column, bucket = self._parse_expression()
+        alias = None
+        if self._accept('as'):
+            alias = self._name()
+        elif self._peek_kind() == 'name' and self._peek() not in _RESERVED_WORDS:
+            alias = self._name()
+        return {'function': function, 'column': column, 'bucket': bucket, 'alias': alias}
+    
+    def _parse_expression(self) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """Parse a column, date bucket or aggregate call; return (function, column, bucket).
+        
+        column is None for COUNT(*).
+        """
+        if self._peek() == 'strftime' and self._peek(1) == '(':
+            self.position += 2
+            kind, value = self._next()
+            bucket = _DATE_BUCKET_FORMATS.get(value) if kind == 'string' else None
+            if bucket is None:
+                raise _NotSimple()
+            self._expect(',')
+            column = self._column()
+            self._expect(')')
+            return None, column, bucket
+        
+        if self._peek() in _AGGREGATE_FUNCTIONS and self._peek(1) == '(':
+            function = self._name()
+            self._expect('(')
+            if function == 'count' and self._accept('*'):
+                column = None
+            else:
+                column = self._column()
+            self._expect(')')
+            return function, column, None
+        return None, self._column(), None
+    
+    def _parse_condition(self) -> Dict[str, Any]:
+        column = self._column()
+        
+        if self._accept('is'):
+            negated = self._accept('not')
+            self._expect('null')
+            return {'column': column, 'op': 'is not null' if negated else 'is null', 'values': []}
+        if self._accept('between'):
+            low = self._literal()
+            self._expect('and')
+            return {'column': column, 'op': 'between', 'values': [low, self._literal()]}
+        if self._accept('in'):
+            self._expect('(')
+            values = [self._literal()]
+            while self._accept(','):
+                values.append(self._literal())
+            self._expect(')')
+            return {'column': column, 'op': 'in', 'values': values}
+        
+        operator = _COMPARISON_OPERATORS.get(self._peek())
+        if operator is None:
+            raise _NotSimple()
+        self.position += 1
+        return {'column': column, 'op': operator, 'values': [self._literal()]}
+    
+    def _parse_reference(self, items: List[Dict[str, Any]], allow_alias: bool = True) -> Dict[str, Any]:
+        """Parse a GROUP BY/ORDER BY term: a position, an item alias, a column or an aggregate.
+        
+        Like SQLite, ORDER BY prefers an item alias over a column of the same
+        name while GROUP BY resolves names as columns.
+        """
+        if self._peek_kind() == 'symbol' and self._peek().isdigit():
+            index = self._integer() - 1
+            if not 0 <= index < len(items) or items[index]['column'] == '*':
+                raise _NotSimple()
+            return {'item': index}
+        
+        if allow_alias and self._peek_kind() == 'name' and self._peek(1) not in ('(', '.'):
+            for index, item in enumerate(items):
+                if item['alias'] == self._peek():
+                    self.position += 1
+                    return {'item': index}
+        
+        function, column, bucket = self._parse_expression()
+        if function is None:
+            return {'column': column, 'bucket': bucket}
+        for index, item in enumerate(items):
+            if item['function'] == function and item['column'] == column:
+                return {'item': index}
+        raise _NotSimple()
+    
+    def _parse_order_term(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        term = self._parse_reference(items)
+        descending = False
+        if self._accept('desc'):
+            descending = True
+        else:
+            self._accept('asc')
+        term['descending'] = descending
+        return term
+    
+    def _column(self) -> str:
+        name = self._name()
+        if self._accept('.'):
+            self.qualifiers.add(name)
+            name = self._name()
+        if name in _RESERVED_WORDS:
+            raise _NotSimple()
+        return name
+    
+    def _literal(self) -> Any:
+        kind, value = self._next()
+        if kind == 'string':
+            return value[1:-1].replace("''", "'")
+        
+        sign = 1
+        if value == '-':
+            sign = -1
+            kind, value = self._next()
+        if kind != 'symbol' or not value[:1].isdigit():
+            raise _NotSimple()
+        return sign * (float(value) if '.' in value else int(value))
+    
+    def _integer(self) -> int:
+        kind, value = self._next()
+        if kind != 'symbol' or not value.isdigit():
+            raise _NotSimple()
+        return int(value)
+    
+    def _name(self) -> str:
+        kind, value = self._next()
+        if kind != 'name':
+            raise _NotSimple()
+        return value
+    
+    def _next(self) -> Tuple[str, str]:
+        if self.position >= len(self.tokens):
+            raise _NotSimple()
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+    
+    def _peek(self, offset: int = 0) -> Optional[str]:
+        position = self.position + offset
+        return self.tokens[position][1] if position < len(self.tokens) else None
+    
+    def _peek_kind(self) -> Optional[str]:
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+    
+    def _accept(self, value: str) -> bool:
+        if self._peek() == value and self._peek_kind() != 'string':
+            self.position += 1
+            return True
+        return False
+    
+    def _expect(self, value: str) -> None:
+        if not self._accept(value):
+            raise _NotSimple()
+
+
+class _NotSimple(Exception):
+    """Raised inside _SimpleSelectParser when a query falls outside the supported shape."""
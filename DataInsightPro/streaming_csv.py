@@ -0,0 +1,222 @@
+import warnings
+from typing import Dict, Any, Optional, Callable, Iterator, Tuple
+import pandas as pd
+from utils import clean_dataframe
+
+# Declared SQLite type of each column kind. Columns whose kind is still
+# unknown (all NULL in the sample) are declared without a type, so SQLite
+# keeps their values as they are read
+KIND_SQLITE_TYPES = {
+    'integer': 'INTEGER',
+    'boolean': 'INTEGER',
+    'float': 'REAL',
+    'datetime': 'TIMESTAMP',
+    'text': 'TEXT'
+}
+
+_BOOLEAN_TEXT = {'true': True, 'false': False}
+
+def infer_column_kinds(sample: pd.DataFrame) -> Dict[str, Optional[str]]:
+    """Name each column's kind from a cleaned sample frame.
+    
+    Kinds are integer, float, datetime, boolean, text, or None when the
+    sample is all NULL and the type is still unknown.
+    """
+    kinds = {}
+    for col in sample.columns:
+        series = sample[col]
+        if series.isna().all():
+            kinds[col] = None
+        elif pd.api.types.is_bool_dtype(series.dtype):
+            kinds[col] = 'boolean'
+        elif pd.api.types.is_integer_dtype(series.dtype):
+            kinds[col] = 'integer'
+        elif pd.api.types.is_float_dtype(series.dtype):
+            kinds[col] = 'float'
+        elif pd.api.types.is_datetime64_any_dtype(series.dtype):
+            kinds[col] = 'datetime'
+        else:
+            kinds[col] = 'text'
+    return kinds
+
+def conform_column(series: pd.Series, kind: Optional[str]) -> Optional[pd.Series]:
+    """Convert a chunk's column to an inferred kind; None if some values don't fit."""
+    if kind in ('integer', 'float'):
+        converted = series
+        if not pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+            converted = pd.to_numeric(series, errors='coerce')
+            if (converted.isna() & series.notna()).any():
+                return None
+        if kind == 'float':
+            return converted.astype('float64')
+        values = converted.dropna()
+        if pd.api.types.is_float_dtype(converted.dtype) and not (values == values.round()).all():
+            return None
+        return converted.astype('Int64')
+    if kind == 'datetime':
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)
+            converted = pd.to_datetime(series, errors='coerce')
+        if (converted.isna() & series.notna()).any():
+            return None
+        return converted
+    return series
+
+def conform_values(series: pd.Series, kind: Optional[str]) -> Tuple[pd.Series, int]:
+    """Convert a chunk's column to an inferred kind value by value.
+    
+    Values that don't fit the kind are kept as read, so SQLite stores them
+    as text next to the converted ones. Returns the column and how many
+    values didn't fit.
+    """
+    converted = conform_column(series, kind)
+    if converted is not None and kind != 'boolean':
+        return converted, 0
+    
+    if kind in ('integer', 'float'):
+        numbers = pd.to_numeric(series, errors='coerce')
+        fits = numbers.notna()
+        if kind == 'integer':
+            fits &= numbers == numbers.round()
+        fitted = numbers[fits].astype('int64' if kind == 'integer' else 'float64')
+    elif kind == 'datetime':
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)
+            dates = pd.to_datetime(series, errors='coerce')
+        fits = dates.notna()
+        fitted = _datetime_text(dates[fits])
+    else:
+        if pd.api.types.is_bool_dtype(series.dtype):
+            return series, 0
+        flags = series.map(lambda value: value if isinstance(value, bool)
+                           else _BOOLEAN_TEXT.get(str(value).strip().lower()))
+        fits = flags.notna()
+        fitted = flags[fits]
+    
+    values = series.astype(object)
+    values[fits] = fitted.astype(object)
+    return values, int((~fits & series.notna()).sum())
+
+def conform_chunk(chunk: pd.DataFrame, kinds: Dict[str, Optional[str]],
+                  mismatches: Dict[str, int]) -> pd.DataFrame:
+    """Convert every column of a chunk to its kind, counting values that don't fit in mismatches.
+    
+    A column whose kind is still None takes the kind of the first chunk in
+    which it has values (kinds is updated), and later chunks are held to it.
+    """
+    for col in kinds:
+        if kinds[col] is None:
+            if chunk[col].isna().all():
+                continue
+            kinds[col] = infer_column_kinds(clean_dataframe(chunk[[col]]))[col]
+        chunk[col], bad_values = conform_values(chunk[col], kinds[col])
+        if bad_values:
+            mismatches[col] = mismatches.get(col, 0) + bad_values
+    return chunk
+
+def column_types_for_kinds(kinds: Dict[str, Optional[str]]) -> Dict[str, str]:
+    """Get the declared SQLite type of each column from its inferred kind."""
+    return {col: KIND_SQLITE_TYPES.get(kind, '') for col, kind in kinds.items()}
+
+def _datetime_text(dates: pd.Series) -> pd.Series:
+    """Render timestamps the way DatabaseManager stores datetime columns."""
+    text = dates.dt.strftime('%Y-%m-%d %H:%M:%S')
+    has_fraction = dates.dt.microsecond != 0
+    if has_fraction.any():
+        text[has_fraction] = dates[has_fraction].dt.strftime('%Y-%m-%d %H:%M:%S.%f')
+    return text
+
+class StreamingCsvLoader:
+    """Loads a CSV into SQLite in two passes with memory bounded by the chunk size.
+    
+    The first pass reads a sample of rows to infer the cleaned column names
+    and each column's type. The table is created with those types, and the
+    second pass re-reads the file in chunks with an explicit dtype map and
+    streams every chunk into DatabaseManager.bulk_load_frames(), so the
+    whole file is never held as a DataFrame.
+    """
+    
+    SAMPLE_ROWS = 50000
+    CHUNK_SIZE = 100000
+    
+    def __init__(self, db_manager, sample_rows: Optional[int] = None, chunk_size: Optional[int] = None):
+        """Initialize with the database to load into and the sample/chunk sizes in rows."""
+        self.db_manager = db_manager
+        self.sample_rows = sample_rows or self.SAMPLE_ROWS
+        self.chunk_size = chunk_size or self.CHUNK_SIZE
+    
+    def infer_schema(self, source) -> Dict[str, Any]:
+        """First pass: infer cleaned column names and types from the file's first rows.
+        
+        Returns the column names, each column's kind (see
+        infer_column_kinds) and the cleaned sample frame, which can stand in
+        for the data in previews.
+        """
+        try:
+            self._rewind(source)
+            raw_sample = pd.read_csv(source, nrows=self.sample_rows)
+            sample = clean_dataframe(raw_sample)
+            return {
+                'columns': list(sample.columns),
+                'source_columns': len(raw_sample.columns),
+                'kinds': infer_column_kinds(sample),
+                'sample': sample
+            }
+        except Exception as e:
+            raise Exception(f"Error inferring CSV schema: {str(e)}")
+    
+    def load(self, source, table_name: str, schema: Optional[Dict[str, Any]] = None,
+             progress_callback: Optional[Callable[[int, Optional[int]], None]] = None,
+             build_rollups: bool = False, build_sample: bool = False) -> Dict[str, Any]:
+        """Second pass: stream the file into a table in chunks.
+        
+        Uses the schema from infer_schema() (inferred here when not given).
+        Returns the bulk load statistics plus 'type_mismatches', the number
+        of values per column that didn't fit the inferred type and were
+        stored as text.
+        """
+        try:
+            schema = schema or self.infer_schema(source)
+            mismatches = {}
+            self._rewind(source)
+            load_stats = self.db_manager.bulk_load_frames(
+                self._conformed_chunks(source, schema, mismatches), table_name,
+                progress_callback=progress_callback,
+                build_rollups=build_rollups, build_sample=build_sample,
+                column_types=column_types_for_kinds(schema['kinds'])
+            )
+            load_stats['type_mismatches'] = mismatches
+            return load_stats
+        except Exception as e:
+            raise Exception(f"Error streaming CSV into table: {str(e)}")
+    
+    def _conformed_chunks(self, source, schema: Dict[str, Any],
+                          mismatches: Dict[str, int]) -> Iterator[pd.DataFrame]:
+        """Read the file chunk by chunk, converting each chunk to the inferred types."""
+        if len(schema['columns']) != schema['source_columns']:
+            raise ValueError("Column count differs from the inferred schema")
+        
+        # Text and date columns are read as strings so a chunk of digit-only
+        # codes (e.g. ZIP codes) can't turn numeric; numbers parse natively
+        dtype = {
+            col: str for col, kind in schema['kinds'].items()
+            if kind in ('text', 'datetime')
+        }
+        reader = pd.read_csv(
+            source, header=0, names=schema['columns'], dtype=dtype, chunksize=self.chunk_size
+        )
+        kinds = dict(schema['kinds'])
+        with reader:
+            while True:
+                with warnings.catch_warnings():
+                    # Values that don't fit a column are counted in mismatches instead
+                    warnings.simplefilter('ignore', pd.errors.DtypeWarning)
+                    chunk = next(reader, None)
+                if chunk is None:
+                    break
+                yield conform_chunk(chunk, kinds, mismatches)
+    
+    def _rewind(self, source) -> None:
+        """Move a file-like source back to its start for the next pass."""
+        if hasattr(source, 'seek'):
+            source.seek(0)
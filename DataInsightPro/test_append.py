@@ -0,0 +1,235 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from database import DatabaseManager
+from ingestion import DirectoryWatcher
+from sampling import SampleManager
+
+
+def build_orders(rows: int, start: int = 0, seed: int = 1) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'id': np.arange(start, start + rows),
+        'region': rng.choice(['North', 'South', 'East'], rows),
+        'qty': rng.integers(1, 50, rows),
+        'price': np.round(rng.uniform(1, 100, rows), 2)
+    })
+
+
+def table_frame(db: DatabaseManager, table: str = 'orders') -> pd.DataFrame:
+    return db.execute_query(f"SELECT * FROM {table} ORDER BY id", use_cache=False)
+
+
+@pytest.fixture
+def db():
+    db = DatabaseManager(columnar_max_bytes=0)
+    db.create_table_from_dataframe(build_orders(100), 'orders')
+    return db
+
+
+def test_append_with_matching_schema_adds_every_row(db):
+    new_rows = build_orders(50, start=100, seed=2)
+    stats = db.append_dataframe(new_rows, 'orders')
+    
+    assert (stats['rows_inserted'], stats['rows_updated'], stats['rows_skipped']) == (50, 0, 0)
+    expected = pd.concat([build_orders(100), new_rows], ignore_index=True)
+    pd.testing.assert_frame_equal(table_frame(db), expected, check_dtype=False)
+
+
+def test_append_accepts_a_subset_of_columns_in_any_case(db):
+    db.append_dataframe(pd.DataFrame({'QTY': [7], 'id': [500]}), 'orders')
+    row = db.execute_query("SELECT * FROM orders WHERE id = 500", use_cache=False).iloc[0]
+    assert row['qty'] == 7 and row['region'] is None and pd.isna(row['price'])
+
+
+@pytest.mark.parametrize('frame, message', [
+    (pd.DataFrame({'id': [1], 'colour': ['red']}), 'Columns not in table'),
+    (pd.DataFrame({'id': [1], 'qty': ['many']}), 'INTEGER column'),
+    (pd.DataFrame({'id': [1], 'qty': [2.5]}), 'fractional values'),
+    (pd.DataFrame({'id': [1], 'price': [pd.Timestamp('2024-01-01')]}), 'REAL column'),
+])
+def test_append_with_mismatched_schema_is_rejected(db, frame, message):
+    before = table_frame(db)
+    with pytest.raises(Exception, match=message):
+        db.append_dataframe(frame, 'orders')
+    pd.testing.assert_frame_equal(table_frame(db), before)
+
+
+def test_key_columns_must_be_in_the_new_data(db):
+    with pytest.raises(Exception, match='Key columns missing'):
+        db.append_dataframe(pd.DataFrame({'qty': [1]}), 'orders', key_columns=['id'])
+    with pytest.raises(ValueError, match='key columns'):
+        db.append_dataframe(build_orders(1), 'orders', upsert=True)
+
+
+def test_key_columns_skip_rows_already_loaded(db):
+    changed = build_orders(20, start=90, seed=3)
+    stats = db.append_dataframe(changed, 'orders', key_columns=['id'])
+    
+    assert (stats['rows_inserted'], stats['rows_updated'], stats['rows_skipped']) == (10, 0, 10)
+    result = table_frame(db)
+    assert len(result) == 110
+    # Existing rows keep their values
+    pd.testing.assert_frame_equal(result.iloc[:100], build_orders(100), check_dtype=False)
+
+
+def test_upsert_updates_existing_rows_and_inserts_new_ones(db):
+    changed = build_orders(20, start=90, seed=3)
+    # A key repeated in the frame takes its last row
+    repeated = changed.iloc[[0]].assign(qty=999)
+    stats = db.append_dataframe(pd.concat([changed, repeated]), 'orders', key_columns=['id'], upsert=True)
+    
+    assert (stats['rows_inserted'], stats['rows_updated'], stats['rows_skipped']) == (10, 10, 0)
+    expected = pd.concat([build_orders(100).iloc[:90], changed], ignore_index=True)
+    expected.loc[90, 'qty'] = 999
+    pd.testing.assert_frame_equal(table_frame(db), expected, check_dtype=False)
+
+
+def test_upsert_on_composite_keys(db):
+    db.create_table_from_dataframe(pd.DataFrame({
+        'region': ['North', 'North', 'South'], 'day': ['2024-01-01', '2024-01-02', '2024-01-01'], 'qty': [1, 2, 3]
+    }), 'daily')
+    stats = db.append_dataframe(pd.DataFrame({
+        'region': ['North', 'South'], 'day': ['2024-01-02', '2024-01-02'], 'qty': [20, 30]
+    }), 'daily', key_columns=['region', 'day'], upsert=True)
+    
+    assert (stats['rows_inserted'], stats['rows_updated']) == (1, 1)
+    result = db.execute_query("SELECT * FROM daily ORDER BY region, day", use_cache=False)
+    assert result['qty'].tolist() == [1, 20, 3, 30]
+
+
+def test_null_keys_match_each_other(db):
+    db.create_table_from_dataframe(pd.DataFrame({'code': ['a', None], 'qty': [1, 2]}), 'codes')
+    
+    stats = db.append_dataframe(pd.DataFrame({'code': [None, 'b'], 'qty': [5, 6]}), 'codes', key_columns=['code'])
+    assert (stats['rows_inserted'], stats['rows_skipped']) == (1, 1)
+    
+    stats = db.append_dataframe(pd.DataFrame({'code': [None], 'qty': [9]}), 'codes',
+                                key_columns=['code'], upsert=True)
+    assert stats['rows_updated'] == 1
+    result = db.execute_query("SELECT code, qty FROM codes ORDER BY code", use_cache=False)
+    assert result['qty'].tolist() == [9, 1, 6]
+    assert result['code'].isna().sum() == 1
+
+
+def test_append_to_a_missing_table_creates_it(db):
+    stats = db.append_dataframe(build_orders(5), 'fresh')
+    assert stats['rows_inserted'] == 5
+    assert len(table_frame(db, 'fresh')) == 5
+
+
+def test_append_invalidates_cached_results(db):
+    query = "SELECT COUNT(*) AS n FROM orders"
+    generation = db.get_table_generation('orders')
+    assert db.execute_query(query)['n'].iloc[0] == 100
+    db.append_dataframe(build_orders(10, start=100), 'orders')
+    
+    assert db.get_table_generation('orders') == generation + 1
+    hits = db.result_cache.hits
+    assert db.execute_query(query)['n'].iloc[0] == 110
+    assert db.result_cache.hits == hits
+
+
+def test_append_extends_rollups_and_upsert_rebuilds_them():
+    db = DatabaseManager(columnar_max_bytes=0)
+    db.create_table_from_dataframe(build_orders(5000), 'orders', build_rollups=True)
+    query = "SELECT region, SUM(qty) AS total, COUNT(*) AS n FROM orders GROUP BY region ORDER BY region"
+    assert db._route_query(query)['engine'] == 'rollup'
+    
+    stats = db.append_dataframe(build_orders(500, start=5000, seed=2), 'orders')
+    assert stats['rollups']
+    exact = db.execute_query(query.replace('FROM orders', 'FROM (SELECT * FROM orders)'), use_cache=False)
+    assert db._route_query(query)['engine'] == 'rollup'
+    pd.testing.assert_frame_equal(db.execute_query(query, use_cache=False), exact, check_dtype=False)
+    
+    # Updated rows can't be folded in, so the rollups are rebuilt
+    stats = db.append_dataframe(build_orders(100, start=4950, seed=4), 'orders', key_columns=['id'], upsert=True)
+    assert stats['rows_updated'] == 100 and stats['rollups']
+    exact = db.execute_query(query.replace('FROM orders', 'FROM (SELECT * FROM orders)'), use_cache=False)
+    pd.testing.assert_frame_equal(db.execute_query(query, use_cache=False), exact, check_dtype=False)
+
+
+def test_append_extends_the_sample_and_upsert_redraws_it(monkeypatch):
+    monkeypatch.setattr(SampleManager, 'MIN_TABLE_ROWS', 1000)
+    db = DatabaseManager(columnar_max_bytes=0)
+    db.create_table_from_dataframe(build_orders(20000), 'orders', build_sample=True)
+    sample_rows = db.samples.get_sample('orders')['sample_rows']
+    
+    stats = db.append_dataframe(build_orders(20000, start=20000, seed=2), 'orders')
+    assert stats['sample']['table_rows'] == 40000
+    assert stats['sample']['sample_rows'] > sample_rows
+    estimate = db.execute_approximate_query("SELECT COUNT(*) AS n FROM orders")
+    assert abs(estimate['n'].iloc[0] - 40000) <= 3 * estimate.attrs['approximate']['error_bounds']['n'][0]
+    
+    stats = db.append_dataframe(build_orders(10, seed=5), 'orders', key_columns=['id'], upsert=True)
+    assert stats['rows_updated'] == 10
+    assert stats['sample']['table_rows'] == 40000
+
+
+@pytest.fixture
+def watched(tmp_path, monkeypatch):
+    monkeypatch.setattr(DirectoryWatcher, 'SETTLE_SECONDS', 0)
+    return tmp_path
+
+
+def write_csv(path, lines, mode='w'):
+    with open(path, mode) as handle:
+        handle.write("\n".join(lines) + "\n")
+    # Let the next write change the modification time
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime - 10))
+
+
+def test_watcher_appends_only_new_csv_lines(watched):
+    db = DatabaseManager(columnar_max_bytes=0)
+    path = watched / 'orders.csv'
+    write_csv(path, ["id,qty"] + [f"{i},{i * 2}" for i in range(5)])
+    watcher = DirectoryWatcher(db, str(watched), 'orders')
+    
+    events = watcher.scan()
+    assert [(event['file'], event['rows'], event['error']) for event in events] == [('orders.csv', 5, None)]
+    assert watcher.scan() == []
+    
+    write_csv(path, [f"{i},{i * 2}" for i in range(5, 8)], mode='a')
+    events = watcher.scan()
+    assert events[0]['rows'] == 3
+    result = table_frame(db)
+    assert result['id'].tolist() == list(range(8))
+    assert set(result['source_file']) == {'orders.csv'}
+    
+    # A new watcher on the same table resumes from the recorded offset
+    write_csv(path, ["8,16"], mode='a')
+    assert DirectoryWatcher(db, str(watched), 'orders').scan()[0]['rows'] == 1
+    assert len(table_frame(db)) == 9
+
+
+def test_watcher_rereads_changed_files_by_key(watched):
+    db = DatabaseManager(columnar_max_bytes=0)
+    path = watched / 'orders.csv'
+    write_csv(path, ["id,qty", "1,10", "2,20"])
+    DirectoryWatcher(db, str(watched), 'orders', add_source_column=False).scan()
+    
+    # Rewritten in place: without key columns the change is reported, not reloaded
+    write_csv(path, ["id,qty", "1,11", "3,30"])
+    events = DirectoryWatcher(db, str(watched), 'orders', add_source_column=False).scan()
+    assert 'key columns' in events[0]['error']
+    assert table_frame(db)['qty'].tolist() == [10, 20]
+    
+    # Not longer than before, so it is re-read in full rather than from the last offset
+    write_csv(path, ["id,qty", "1,12", "3,30"])
+    watcher = DirectoryWatcher(db, str(watched), 'orders', key_columns=['id'], upsert=True, add_source_column=False)
+    events = watcher.scan()
+    assert (events[0]['rows'], events[0]['updated'], events[0]['error']) == (1, 1, None)
+    assert table_frame(db)['qty'].tolist() == [12, 20, 30]
+
+
+def test_watcher_reports_incompatible_files(watched):
+    db = DatabaseManager(columnar_max_bytes=0)
+    write_csv(watched / 'a.csv', ["id,qty", "1,10"])
+    write_csv(watched / 'b.csv', ["id,qty", "2,lots"])
+    events = DirectoryWatcher(db, str(watched), 'orders', add_source_column=False).scan()
+    
+    assert events[0]['error'] is None
+    assert 'INTEGER column' in events[1]['error']
+    assert table_frame(db)['id'].tolist() == [1]
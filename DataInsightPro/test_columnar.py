@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+import pytest
+from database import DatabaseManager
+
+COLUMNAR_BYTES = 64 * 1024 * 1024
+
+QUERIES = [
+    "SELECT region, SUM(qty), AVG(price), COUNT(*), COUNT(price), MIN(price), MAX(qty) FROM sales GROUP BY region",
+    "SELECT product, SUM(price) AS s FROM sales WHERE qty >= 10 AND region = 'North' "
+    "GROUP BY product ORDER BY s DESC LIMIT 5",
+    "SELECT COUNT(*), SUM(qty), MAX(price) FROM sales WHERE day BETWEEN '2024-03-01' AND '2024-06-30'",
+    "SELECT region, product, COUNT(*) FROM sales WHERE price IS NOT NULL GROUP BY region, product",
+    "SELECT region, COUNT(*) FROM sales WHERE product IN ('P1', 'P2') GROUP BY region ORDER BY region",
+    "SELECT * FROM sales ORDER BY amount DESC LIMIT 20",
+    "SELECT id, qty FROM sales WHERE region != 'East' ORDER BY amount LIMIT 50 OFFSET 10",
+]
+
+
+def build_sales_data(rows: int = 5000, seed: int = 7) -> pd.DataFrame:
+    """Sales-like rows with NULLs in a dimension and a measure; amount has no ties."""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range('2024-01-01', periods=366).strftime('%Y-%m-%d').to_numpy()
+    df = pd.DataFrame({
+        'id': np.arange(rows),
+        'region': rng.choice(['North', 'South', 'East', 'West'], rows),
+        'product': rng.choice([f'P{i}' for i in range(30)], rows),
+        'qty': rng.integers(1, 50, rows),
+        'price': np.round(rng.uniform(1, 100, rows), 2),
+        'amount': rng.permutation(rows) * 1.25,
+        'day': days[rng.integers(0, len(days), rows)]
+    })
+    df.loc[rng.random(rows) < 0.05, 'price'] = np.nan
+    df.loc[rng.random(rows) < 0.03, 'region'] = None
+    return df
+
+
+def assert_same_result(actual: pd.DataFrame, expected: pd.DataFrame, ordered: bool) -> None:
+    """Compare two results, ignoring row order unless the query fixes it."""
+    assert list(actual.columns) == list(expected.columns)
+    if not ordered:
+        actual = actual.sort_values(list(actual.columns), na_position='first').reset_index(drop=True)
+        expected = expected.sort_values(list(expected.columns), na_position='first').reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, rtol=1e-9)
+
+
+@pytest.fixture(scope='module')
+def databases():
+    df = build_sales_data()
+    columnar_db = DatabaseManager(columnar_max_bytes=COLUMNAR_BYTES)
+    sqlite_db = DatabaseManager(columnar_max_bytes=0)
+    for db in (columnar_db, sqlite_db):
+        db.create_table_from_dataframe(df, 'sales')
+    assert columnar_db.load_columnar_table('sales')
+    return columnar_db, sqlite_db
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_columnar_matches_sqlite(databases, query):
+    columnar_db, sqlite_db = databases
+    assert columnar_db._route_query(query)['engine'] == 'columnar'
+    
+    assert_same_result(
+        columnar_db.execute_query(query, use_cache=False),
+        sqlite_db.execute_query(query, use_cache=False),
+        ordered='ORDER BY' in query
+    )
+
+
+def test_unsupported_query_falls_back_to_sqlite(databases):
+    columnar_db, sqlite_db = databases
+    query = "SELECT strftime('%Y-%m', day) AS m, SUM(qty) FROM sales GROUP BY m"
+    assert columnar_db._route_query(query)['engine'] == 'sqlite'
+    
+    assert_same_result(
+        columnar_db.execute_query(query, use_cache=False),
+        sqlite_db.execute_query(query, use_cache=False),
+        ordered=False
+    )
+
+
+def test_replaced_table_is_not_answered_from_stale_snapshot():
+    db = DatabaseManager(columnar_max_bytes=COLUMNAR_BYTES)
+    db.create_table_from_dataframe(build_sales_data(rows=500, seed=1), 'sales')
+    assert db.load_columnar_table('sales')
+    db.create_table_from_dataframe(build_sales_data(rows=300, seed=2), 'sales')
+    
+    assert db.execute_query("SELECT COUNT(*) AS n FROM sales", use_cache=False)['n'].iloc[0] == 300
+
+
+def test_engine_is_off_by_default():
+    db = DatabaseManager()
+    db.create_table_from_dataframe(build_sales_data(rows=100), 'sales')
+    assert db.columnar is None
+    assert not db.load_columnar_table('sales')
+
+
+def test_chunked_snapshot_matches_single_read(databases):
+    columnar_db, sqlite_db = databases
+    db = DatabaseManager(columnar_max_bytes=COLUMNAR_BYTES)
+    db.COLUMNAR_LOAD_CHUNK_ROWS = 333
+    db.create_table_from_dataframe(build_sales_data(), 'sales')
+    assert db.load_columnar_table('sales')
+    
+    chunked = db.columnar.get_table('sales', db.get_table_generation('sales'))
+    whole = columnar_db.columnar.get_table('sales', columnar_db.get_table_generation('sales'))
+    assert chunked.size_bytes == whole.size_bytes
+    for name, column in whole.columns.items():
+        assert chunked.columns[name]['kind'] == column['kind']
+        np.testing.assert_array_equal(chunked.columns[name]['valid'], column['valid'])
+        if column['kind'] is not None:
+            np.testing.assert_array_equal(chunked.columns[name]['values'], column['values'])
+    for query in QUERIES:
+        assert_same_result(db.execute_query(query, use_cache=False),
+                           sqlite_db.execute_query(query, use_cache=False), ordered='ORDER BY' in query)
+
+
+def test_table_over_budget_by_estimate_is_never_read(monkeypatch):
+    db = DatabaseManager(columnar_max_bytes=10000)
+    db.create_table_from_dataframe(build_sales_data(rows=5000), 'sales')
+    monkeypatch.setattr(pd.DataFrame, 'from_records', lambda *args, **kwargs: pytest.fail('table was read'))
+    
+    assert db._estimate_columnar_bytes('sales') > 10000
+    assert not db.load_columnar_table('sales')
+    assert not db.columnar.accepts('sales', db.get_table_generation('sales'))
+
+
+def test_load_stops_once_snapshot_outgrows_budget():
+    df = pd.DataFrame({'id': np.arange(20000), 'name': [f'name {i}' for i in range(20000)]})
+    db = DatabaseManager(columnar_max_bytes=300000)
+    db.COLUMNAR_LOAD_CHUNK_ROWS = 1000
+    db.create_table_from_dataframe(df, 'people')
+    # 14 bytes per row by estimate fits; the distinct names don't
+    assert db._estimate_columnar_bytes('people') <= 300000
+    
+    assert not db.load_columnar_table('people')
+    assert db.columnar.get_stats()['current_bytes'] == 0
+    assert not db.columnar.accepts('people', db.get_table_generation('people'))
+
+
+def test_file_backed_snapshot_matches_table(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'data.db'), columnar_max_bytes=COLUMNAR_BYTES)
+    db.COLUMNAR_LOAD_CHUNK_ROWS = 700
+    db.create_table_from_dataframe(build_sales_data(rows=2000), 'sales')
+    assert db.load_columnar_table('sales')
+    
+    query = QUERIES[0]
+    assert db._route_query(query)['engine'] == 'columnar'
+    assert_same_result(db.execute_query(query, use_cache=False),
+                       pd.read_sql_query(query, db.connection), ordered=False)
+    db.close()
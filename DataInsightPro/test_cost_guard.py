@@ -0,0 +1,127 @@
+import math
+import numpy as np
+import pandas as pd
+import pytest
+from database import DatabaseManager
+from cost_guard import QueryCostGuard, QueryCostError, estimate_limited_cost
+from query_plan import estimate_plan_cost, DEFAULT_TABLE_ROWS
+
+ORDER_ROWS = 20000
+CUSTOMER_ROWS = 500
+
+
+@pytest.fixture(scope='module')
+def db():
+    db = DatabaseManager(columnar_max_bytes=0)
+    db.create_table_from_dataframe(pd.DataFrame({
+        'id': np.arange(ORDER_ROWS),
+        'cust': np.arange(ORDER_ROWS) % CUSTOMER_ROWS,
+        'amt': np.arange(ORDER_ROWS) * 0.5
+    }), 'orders')
+    db.create_table_from_dataframe(pd.DataFrame({
+        'cust': np.arange(CUSTOMER_ROWS),
+        'name': [f'customer {i}' for i in range(CUSTOMER_ROWS)]
+    }), 'customers')
+    db.connection.execute("CREATE INDEX ix_orders_id ON orders (id)")
+    return db
+
+
+def guard(db: DatabaseManager, on_exceed: str = 'reject') -> QueryCostGuard:
+    # The orders table stands in for a large one: a full scan of it is over the limit
+    return QueryCostGuard(db, max_cost=ORDER_ROWS / 4, on_exceed=on_exceed, auto_limit=1000)
+
+
+def test_full_scan_of_a_large_table_is_rejected(db):
+    decision = guard(db).check("SELECT * FROM orders WHERE amt > 10")
+    assert decision['action'] == 'reject'
+    assert decision['estimated_cost'] == ORDER_ROWS
+    assert decision['reasons'] == [f"full scan of orders ({ORDER_ROWS:,} rows, no usable index)"]
+    with pytest.raises(QueryCostError, match='full scan of orders'):
+        guard(db).enforce("SELECT * FROM orders WHERE amt > 10")
+
+
+def test_same_query_with_a_limit_runs(db):
+    decision = guard(db).enforce("SELECT * FROM orders WHERE amt > 10 LIMIT 100")
+    assert decision['action'] == 'run'
+    assert decision['estimated_cost'] == pytest.approx(100)
+    # OFFSET rows are read too
+    decision = guard(db).check("SELECT * FROM orders LIMIT 100 OFFSET 9900")
+    assert decision['estimated_cost'] == pytest.approx(10000) and decision['action'] == 'reject'
+
+
+def test_limit_action_adds_a_limit_that_fits(db):
+    decision = guard(db, on_exceed='limit').enforce("SELECT * FROM orders WHERE amt > 10;")
+    assert decision['action'] == 'limit'
+    assert decision['query'].endswith("LIMIT 1000")
+    assert decision['limited_cost'] == pytest.approx(1000)
+    assert len(db.execute_query(decision['query'], use_cache=False)) == 1000
+
+
+def test_limit_does_not_help_queries_that_read_everything_first(db):
+    query = "SELECT cust, SUM(amt) AS total FROM orders GROUP BY cust LIMIT 10"
+    estimate = db.estimate_query_cost(query)
+    assert estimate_limited_cost(query, estimate, 10) is None
+    assert guard(db, on_exceed='limit').check(query)['action'] == 'reject'
+    # Sorting needs every row before the first one comes out
+    assert estimate_limited_cost("SELECT * FROM orders ORDER BY amt", db.estimate_query_cost(
+        "SELECT * FROM orders ORDER BY amt"), 10) is None
+
+
+@pytest.mark.parametrize('query', [
+    "SELECT * FROM orders WHERE id = 42",
+    "SELECT * FROM orders WHERE rowid = 42",
+])
+def test_indexed_point_lookups_run(db, query):
+    decision = guard(db).enforce(query)
+    assert decision['action'] == 'run'
+    assert decision['estimated_cost'] < ORDER_ROWS / 10
+    estimate = db.estimate_query_cost(query)
+    assert estimate['full_scans'] == [] and len(estimate['searches']) == 1
+
+
+def test_correlated_subquery_runs_once_per_outer_row(db):
+    query = "SELECT c.name, (SELECT SUM(o.amt) FROM orders o WHERE o.cust = c.cust) FROM customers c"
+    estimate = db.estimate_query_cost(query)
+    assert [row['detail'] for row in estimate['plan']] == [
+        'SCAN c', 'CORRELATED SCALAR SUBQUERY 1', 'SCAN o'
+    ]
+    assert estimate['correlated_subqueries'] == 1
+    assert estimate['cost'] == CUSTOMER_ROWS + CUSTOMER_ROWS * ORDER_ROWS
+    decision = QueryCostGuard(db, max_cost=10 * ORDER_ROWS).check(query)
+    assert decision['action'] == 'reject'
+    assert any('correlated subquery' in reason for reason in decision['reasons'])
+
+
+def test_materialized_cte_is_priced_by_its_rows_under_any_alias(db):
+    query = ("WITH totals AS MATERIALIZED (SELECT cust, SUM(amt) AS total FROM orders GROUP BY cust) "
+             "SELECT * FROM totals a JOIN totals b ON a.cust = b.cust")
+    estimate = db.estimate_query_cost(query)
+    details = [row['detail'] for row in estimate['plan']]
+    assert details[0] == 'MATERIALIZE totals' and 'SCAN b' in details
+    # The alias resolves to the CTE's output, not to the default size of an unknown table
+    scans = {scan['table']: scan['rows'] for scan in estimate['full_scans']}
+    assert scans == {'orders': ORDER_ROWS, 'b': ORDER_ROWS}
+
+
+def test_co_routine_rows_feed_the_outer_query(db):
+    query = "SELECT * FROM (SELECT * FROM orders ORDER BY amt LIMIT 10) x ORDER BY id"
+    estimate = db.estimate_query_cost(query)
+    assert [row['detail'] for row in estimate['plan']] == [
+        'CO-ROUTINE x', 'SCAN orders', 'USE TEMP B-TREE FOR ORDER BY', 'SCAN x', 'USE TEMP B-TREE FOR ORDER BY'
+    ]
+    sort = ORDER_ROWS * math.log2(ORDER_ROWS + 1)
+    assert estimate['cost'] == pytest.approx(2 * (ORDER_ROWS + sort))
+    assert len(estimate['temp_btrees']) == 2
+
+
+def test_plan_cost_reads_older_plan_text_and_unknown_tables():
+    plan = [
+        {'id': 2, 'parent': 0, 'detail': 'SCAN TABLE customers AS c'},
+        {'id': 5, 'parent': 0, 'detail': 'SEARCH TABLE orders AS o USING INDEX ix_cust (cust=?)'},
+        {'id': 9, 'parent': 0, 'detail': 'SCAN TABLE mystery'},
+    ]
+    estimate = estimate_plan_cost(plan, {'customers': 100, 'c': 100, 'orders': 10000, 'o': 10000})
+    per_customer = math.log2(10001) + 10000 * 0.05
+    assert estimate['cost'] == pytest.approx(100 + 100 * per_customer + 100 * 500 * DEFAULT_TABLE_ROWS)
+    assert [scan['rows'] for scan in estimate['full_scans']] == [100, DEFAULT_TABLE_ROWS]
+    assert estimate['rows'] == 100 * 500 * DEFAULT_TABLE_ROWS
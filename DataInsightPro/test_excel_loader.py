@@ -0,0 +1,67 @@
+import sqlite3
+from datetime import datetime
+import pytest
+from openpyxl import Workbook
+from database import DatabaseManager
+from excel_loader import ExcelWorkbookLoader, load_sheet
+
+
+@pytest.fixture
+def workbook_path(tmp_path):
+    """A workbook whose Data sheet has odd values after the sample and an empty sheet."""
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = 'Data'
+    sheet.append(['id', 'amount', 'when', 'late', 'flag'])
+    for i in range(300):
+        sheet.append([
+            i,
+            'abc' if i == 250 else i,
+            'soon' if i == 270 else datetime(2024, 1, i % 28 + 1),
+            None if i < 150 else ('x' if i == 280 else i * 1.5),
+            'maybe' if i == 290 else i % 2 == 0
+        ])
+    workbook.create_sheet('Empty').append(['a', 'b'])
+    path = tmp_path / 'book.xlsx'
+    workbook.save(path)
+    return str(path)
+
+
+def storage_types(connection: sqlite3.Connection, table: str, column: str) -> dict:
+    """Count the values of a column by SQLite storage class."""
+    return dict(connection.execute(f'SELECT typeof("{column}"), COUNT(*) FROM {table} GROUP BY 1').fetchall())
+
+
+def test_sheet_values_after_the_sample_keep_their_types(workbook_path, tmp_path):
+    db_path = str(tmp_path / 'sheet.db')
+    result = load_sheet(workbook_path, 'Data', 't', db_path, sample_rows=100, chunk_size=100)
+    
+    assert result['error'] is None
+    assert result['rows'] == 300
+    assert result['type_mismatches'] == {'amount': 1, 'when': 1, 'late': 1, 'flag': 1}
+    
+    connection = sqlite3.connect(db_path)
+    try:
+        declared = {row[1]: row[2] for row in connection.execute("PRAGMA table_info(t)")}
+        assert declared == {'id': 'INTEGER', 'amount': 'INTEGER', 'when': 'TIMESTAMP', 'late': '', 'flag': 'INTEGER'}
+        assert storage_types(connection, 't', 'amount') == {'integer': 299, 'text': 1}
+        assert storage_types(connection, 't', 'late') == {'null': 150, 'real': 149, 'text': 1}
+        assert storage_types(connection, 't', 'flag') == {'integer': 299, 'text': 1}
+        assert connection.execute('SELECT "when" FROM t WHERE id = 3').fetchone()[0] == '2024-01-04 00:00:00'
+        assert connection.execute('SELECT "when" FROM t WHERE id = 270').fetchone()[0] == 'soon'
+    finally:
+        connection.close()
+
+
+def test_workbook_loads_every_sheet_with_a_report(workbook_path):
+    db = DatabaseManager(columnar_max_bytes=0)
+    out = ExcelWorkbookLoader(db, max_workers=2).load(workbook_path, 'book.xlsx')
+    
+    assert out['tables'] == ['book_data', 'book_empty']
+    sheets = {sheet['sheet']: sheet for sheet in out['sheets']}
+    assert sheets['Data']['error'] is None and sheets['Data']['rows'] == 300
+    assert sheets['Empty']['rows'] == 0
+    assert db.execute_query("SELECT COUNT(*) AS n FROM book_data", use_cache=False)['n'].iloc[0] == 300
+    # The default sample covers the whole sheet, so the odd values decide the kinds up front
+    assert sheets['Data']['type_mismatches'] == {}
+    assert db.execute_query("SELECT amount FROM book_data WHERE id = 250", use_cache=False)['amount'].iloc[0] == 'abc'
@@ -0,0 +1,131 @@
+import gzip
+import io
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+from database import DatabaseManager
+from exporters import QueryExporter, ExportFile, write_frames
+
+
+def build_frame(rows: int = 1000) -> pd.DataFrame:
+    rng = np.random.default_rng(4)
+    df = pd.DataFrame({
+        'id': np.arange(rows),
+        'name': [f'item {i}' for i in range(rows)],
+        'price': np.round(rng.uniform(1, 100, rows), 2),
+        'qty': rng.integers(1, 50, rows)
+    })
+    df.loc[::7, 'price'] = np.nan
+    return df
+
+
+def split_rows(df: pd.DataFrame, size: int) -> list:
+    return [df.iloc[start:start + size] for start in range(0, len(df), size)]
+
+
+def read_back(data: bytes, file_format: str) -> pd.DataFrame:
+    """Read an export written by write_frames back into a frame."""
+    if file_format == 'csv':
+        return pd.read_csv(io.BytesIO(data))
+    if file_format == 'csv.gz':
+        return pd.read_csv(io.BytesIO(gzip.decompress(data)))
+    if file_format == 'xlsx':
+        return pd.read_excel(io.BytesIO(data))
+    if file_format == 'parquet':
+        return pd.read_parquet(io.BytesIO(data))
+    import pyarrow.ipc as ipc
+    return ipc.open_file(io.BytesIO(data)).read_pandas()
+
+
+@pytest.mark.parametrize('file_format', ['csv', 'csv.gz', 'xlsx', 'parquet', 'arrow'])
+def test_chunked_frames_round_trip(file_format):
+    if file_format in ('parquet', 'arrow'):
+        pytest.importorskip('pyarrow')
+    df = build_frame()
+    destination = io.BytesIO()
+    stats = write_frames(split_rows(df, 128), destination, file_format)
+    
+    assert stats['rows'] == len(df)
+    assert stats['chunks'] == 8
+    assert stats['bytes'] == len(destination.getvalue())
+    pd.testing.assert_frame_equal(read_back(destination.getvalue(), file_format), df, check_dtype=False)
+
+
+@pytest.mark.parametrize('file_format', ['csv', 'xlsx', 'arrow'])
+def test_empty_result_keeps_its_columns(file_format):
+    if file_format == 'arrow':
+        pytest.importorskip('pyarrow')
+    
+    class EmptyStream(list):
+        columns = ['id', 'name']
+    
+    destination = io.BytesIO()
+    stats = write_frames(EmptyStream(), destination, file_format)
+    assert stats['rows'] == 0
+    result = read_back(destination.getvalue(), file_format)
+    assert list(result.columns) == ['id', 'name'] and result.empty
+
+
+def test_arrow_schema_holds_columns_null_in_the_first_chunk():
+    pytest.importorskip('pyarrow')
+    first = pd.DataFrame({'id': [1, 2], 'note': [None, None]})
+    second = pd.DataFrame({'id': [3, 4], 'note': ['a', 5]})
+    destination = io.BytesIO()
+    write_frames([first, second], destination, 'parquet')
+    
+    result = read_back(destination.getvalue(), 'parquet')
+    assert result['id'].tolist() == [1, 2, 3, 4]
+    assert result['note'].tolist()[2:] == ['a', '5']
+
+
+def test_excel_results_continue_on_further_sheets(monkeypatch):
+    from exporters import _ExcelChunkWriter
+    monkeypatch.setattr(_ExcelChunkWriter, 'MAX_SHEET_ROWS', 300)
+    df = build_frame()
+    destination = io.BytesIO()
+    write_frames(split_rows(df, 128), destination, 'xlsx')
+    
+    workbook = load_workbook(io.BytesIO(destination.getvalue()), read_only=True)
+    assert workbook.sheetnames == ['Data', 'Data 2', 'Data 3', 'Data 4']
+    sheets = pd.read_excel(io.BytesIO(destination.getvalue()), sheet_name=None)
+    pd.testing.assert_frame_equal(pd.concat(sheets.values(), ignore_index=True), df, check_dtype=False)
+
+
+def test_query_export_to_file_streams_the_full_result():
+    db = DatabaseManager()
+    df = build_frame(5000)
+    db.create_table_from_dataframe(df, 'items')
+    export_file = QueryExporter(db).export_to_file("SELECT * FROM items ORDER BY id", 'csv.gz', chunk_size=1000)
+    try:
+        assert export_file.stats['rows'] == 5000 and export_file.stats['chunks'] == 5
+        assert export_file.size == export_file.stats['bytes'] and export_file.downloadable()
+        with open(export_file.path, 'rb') as handle:
+            pd.testing.assert_frame_equal(read_back(handle.read(), 'csv.gz'), df, check_dtype=False)
+    finally:
+        export_file.remove()
+    assert not os.path.exists(export_file.path)
+
+
+def test_export_file_is_removed_on_failure_and_when_collected(monkeypatch):
+    import exporters
+    created = []
+    
+    class RecordedExportFile(ExportFile):
+        def __init__(self, file_format):
+            super().__init__(file_format)
+            created.append(self.path)
+    
+    monkeypatch.setattr(exporters, 'ExportFile', RecordedExportFile)
+    db = DatabaseManager()
+    db.create_table_from_dataframe(build_frame(10), 'items')
+    with pytest.raises(Exception):
+        QueryExporter(db).export_to_file("SELECT * FROM missing_table", 'csv')
+    assert len(created) == 1 and not os.path.exists(created[0])
+    
+    export_file = QueryExporter(db).export_to_file("SELECT * FROM items", 'csv')
+    path = export_file.path
+    assert os.path.exists(path)
+    del export_file
+    assert not os.path.exists(path)
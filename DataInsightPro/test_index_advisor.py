@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import pytest
+from database import DatabaseManager
+from index_advisor import IndexAdvisor
+
+ROWS = 20000
+POINT_QUERY = "SELECT * FROM orders WHERE cust = 17"
+RANGE_QUERY = "SELECT id, amt FROM orders WHERE day BETWEEN '2024-02-01' AND '2024-02-03'"
+
+
+@pytest.fixture
+def db():
+    rng = np.random.default_rng(8)
+    days = pd.date_range('2024-01-01', periods=365).strftime('%Y-%m-%d').to_numpy()
+    db = DatabaseManager(columnar_max_bytes=0)
+    db.create_table_from_dataframe(pd.DataFrame({
+        'id': np.arange(ROWS),
+        'cust': rng.integers(0, 2000, ROWS),
+        'amt': rng.uniform(1, 100, ROWS),
+        'day': days[rng.integers(0, len(days), ROWS)]
+    }), 'orders')
+    return db
+
+
+def advisor_for(db: DatabaseManager, queries: list, **options) -> IndexAdvisor:
+    advisor = IndexAdvisor(db, auto_tune_every=0, **options)
+    for query in queries:
+        advisor.observe(query)
+    return advisor
+
+
+def index_names(db: DatabaseManager) -> set:
+    return {index['name'] for index in db.get_indexes('orders')}
+
+
+def try_candidate(advisor: IndexAdvisor, db: DatabaseManager, columns: list, queries: list,
+                  used_bytes: int = 0) -> int:
+    plans = {query: db.explain_query_plan(query) for query in queries}
+    candidate = {'table': 'orders', 'columns': columns, 'queries': queries}
+    return advisor._try_candidate(candidate, plans, {'orders': ROWS}, used_bytes)
+
+
+def test_beneficial_index_is_kept(db):
+    advisor = advisor_for(db, [POINT_QUERY])
+    added = try_candidate(advisor, db, ['cust'], [POINT_QUERY])
+    
+    assert added > 0
+    assert 'di_auto_orders_cust' in index_names(db)
+    assert 'USING INDEX di_auto_orders_cust' in db.explain_query_plan(POINT_QUERY)[0]['detail']
+    report = advisor.get_report()
+    assert [item['name'] for item in report] == ['di_auto_orders_cust']
+    assert report[0]['size_bytes'] == added
+    query_report = report[0]['queries'][0]
+    assert query_report['sql'] == POINT_QUERY and query_report['cost_after'] < query_report['cost_before']
+
+
+def test_index_that_no_query_uses_is_dropped(db):
+    advisor = advisor_for(db, [POINT_QUERY])
+    assert try_candidate(advisor, db, ['amt'], [POINT_QUERY]) == 0
+    assert index_names(db) == set()
+    assert advisor.get_report() == []
+
+
+def test_index_below_the_required_improvement_is_dropped(db):
+    # The cust index helps, but nowhere near the 100% improvement demanded
+    advisor = advisor_for(db, [POINT_QUERY], min_improvement=1.0)
+    assert try_candidate(advisor, db, ['cust'], [POINT_QUERY]) == 0
+    assert index_names(db) == set()
+
+
+def test_small_tables_and_covered_columns_are_skipped(db):
+    advisor = advisor_for(db, [POINT_QUERY])
+    plans = {POINT_QUERY: db.explain_query_plan(POINT_QUERY)}
+    candidate = {'table': 'orders', 'columns': ['cust'], 'queries': [POINT_QUERY]}
+    assert advisor._try_candidate(candidate, plans, {'orders': 500}, 0) == 0
+    assert index_names(db) == set()
+    
+    db.create_index('orders', ['cust', 'amt'], 'ix_orders_cust_amt')
+    assert try_candidate(advisor, db, ['cust'], [POINT_QUERY]) == 0
+    assert index_names(db) == {'ix_orders_cust_amt'}
+
+
+def test_space_budget_is_respected(db):
+    estimate = IndexAdvisor(db)._estimate_index_size('orders', ['cust'])
+    advisor = advisor_for(db, [POINT_QUERY], space_budget_bytes=estimate - 1)
+    assert try_candidate(advisor, db, ['cust'], [POINT_QUERY]) == 0
+    assert index_names(db) == set()
+    
+    # Room for one index only: the space already used counts against the budget
+    advisor = advisor_for(db, [POINT_QUERY, RANGE_QUERY], space_budget_bytes=int(estimate * 1.5))
+    report = advisor.tune()
+    assert len(report) == 1
+    assert advisor.get_space_used() <= advisor.space_budget_bytes
+    assert try_candidate(advisor, db, ['day'], [RANGE_QUERY], used_bytes=advisor.get_space_used()) == 0
+
+
+def test_tune_builds_then_drops_indexes_as_the_workload_changes(db):
+    advisor = advisor_for(db, [POINT_QUERY, RANGE_QUERY])
+    report = advisor.tune()
+    assert {item['name'] for item in report} == {'di_auto_orders_cust', 'di_auto_orders_day'}
+    
+    # Once only the range query is left, the cust index has no use
+    advisor.workload.clear()
+    advisor.observe(RANGE_QUERY)
+    report = advisor.tune()
+    assert [item['name'] for item in report] == ['di_auto_orders_day']
+    assert index_names(db) == {'di_auto_orders_day'}
+
+
+def test_indexes_without_the_prefix_are_never_touched(db):
+    db.create_index('orders', ['amt'], 'ix_orders_amt')
+    db.create_index('orders', ['cust'], 'auto_orders_cust')
+    advisor = advisor_for(db, [RANGE_QUERY])
+    advisor.tune()
+    
+    # Neither index serves the workload, yet both survive tuning
+    assert {'ix_orders_amt', 'auto_orders_cust'} <= index_names(db)
+    assert all(item['name'].startswith(IndexAdvisor.INDEX_PREFIX) for item in advisor.get_report())
+    advisor.workload.clear()
+    advisor.tune()
+    assert index_names(db) == {'ix_orders_amt', 'auto_orders_cust'}
@@ -0,0 +1,91 @@
+import io
+import zipfile
+import pandas as pd
+import pytest
+from database import DatabaseManager
+from ingestion import MultiFileIngester
+
+
+class Upload(io.BytesIO):
+    """An in-memory file with a name, like Streamlit's UploadedFile."""
+    
+    def __init__(self, name: str, data: bytes):
+        super().__init__(data)
+        self.name = name
+
+
+def csv_bytes(rows: range, label: str) -> bytes:
+    return pd.DataFrame({'id': list(rows), 'label': label}).to_csv(index=False).encode()
+
+
+def zip_upload(name: str, members: dict) -> Upload:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for member_name, data in members.items():
+            archive.writestr(member_name, data)
+    return Upload(name, buffer.getvalue())
+
+
+@pytest.fixture
+def uploads():
+    excel = io.BytesIO()
+    pd.DataFrame({'id': [1, 2], 'label': 'excel'}).to_excel(excel, index=False)
+    return [
+        Upload('data.csv', csv_bytes(range(3), 'top')),
+        zip_upload('batch.zip', {
+            'a/data.csv': csv_bytes(range(4), 'a'),
+            'b/data.csv': csv_bytes(range(5), 'b'),
+            'notes.txt': b'not data',
+            '__MACOSX/a/._data.csv': b'resource fork',
+            'c/': b''
+        }),
+        Upload('Data.xlsx', excel.getvalue()),
+        Upload('broken.zip', b'not a zip')
+    ]
+
+
+def test_colliding_member_names_are_kept_apart(uploads):
+    files, skipped = MultiFileIngester(None).expand_files(uploads)
+    assert [name for name, _ in files] == ['data.csv', 'a/data.csv', 'b/data.csv', 'Data.xlsx']
+    assert [(entry['file'], entry['error'].split(':')[0]) for entry in skipped] == [
+        ('notes.txt', 'Unsupported file format'), ('broken.zip', 'Invalid ZIP archive')
+    ]
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_each_file_gets_its_own_table(uploads, max_workers):
+    db = DatabaseManager(columnar_max_bytes=0)
+    out = MultiFileIngester(db, max_workers=max_workers).ingest(uploads)
+    
+    # data.csv and Data.xlsx both map to "data"; the second one is numbered
+    assert out['tables'] == ['data', 'a_data', 'b_data', 'data_2']
+    counts = {table: db.execute_query(f"SELECT COUNT(*) AS n FROM {table}", use_cache=False)['n'].iloc[0]
+              for table in out['tables']}
+    assert counts == {'data': 3, 'a_data': 4, 'b_data': 5, 'data_2': 2}
+    loaded = {entry['file']: entry['table'] for entry in out['files'] if entry['error'] is None}
+    assert loaded == {'data.csv': 'data', 'a/data.csv': 'a_data', 'b/data.csv': 'b_data', 'Data.xlsx': 'data_2'}
+    assert len(out['files']) == 6
+
+
+def test_union_tags_rows_with_distinct_sources(uploads):
+    db = DatabaseManager(columnar_max_bytes=0)
+    out = MultiFileIngester(db, max_workers=1).ingest(uploads, union=True, table_name='combined')
+    
+    assert out['tables'] == ['combined']
+    sources = db.execute_query(
+        "SELECT source_file, label, COUNT(*) AS n FROM combined GROUP BY 1, 2 ORDER BY 1", use_cache=False
+    )
+    assert sources.values.tolist() == [
+        ['Data.xlsx', 'excel', 2], ['a/data.csv', 'a', 4], ['b/data.csv', 'b', 5], ['data.csv', 'top', 3]
+    ]
+
+
+def test_a_bad_file_does_not_stop_the_batch():
+    db = DatabaseManager(columnar_max_bytes=0)
+    out = MultiFileIngester(db, max_workers=1).ingest([
+        Upload('good.csv', csv_bytes(range(3), 'ok')),
+        Upload('bad.xlsx', b'not a workbook')
+    ])
+    assert out['tables'] == ['good']
+    errors = {entry['file']: entry['error'] for entry in out['files']}
+    assert errors['good.csv'] is None and errors['bad.xlsx']
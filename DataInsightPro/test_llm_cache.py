@@ -0,0 +1,193 @@
+import os
+from types import SimpleNamespace
+import pandas as pd
+import pytest
+import llm_cache
+from database import DatabaseManager
+from llm_cache import LLMResponseCache, open_llm_cache, normalize_question, fingerprint
+from nl_to_sql import NLToSQLConverter
+
+
+class Clock:
+    """Stands in for time.time() so expiry and recency don't depend on the wall clock."""
+    
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / 'llm.db'))
+    yield cache
+    cache.connection.close()
+
+
+def test_put_then_get_hits(cache):
+    assert cache.get('key') is None
+    cache.put('key', 'sql', "SELECT 1", latency_ms=250)
+    assert cache.get('key') == "SELECT 1"
+    cache.put('list', 'suggestions', ["a", "b"])
+    assert cache.get('list') == ["a", "b"]
+    
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 1, 2)
+    assert stats['saved_ms'] == 250
+    assert stats['entries_by_kind'] == {'sql': 1, 'suggestions': 1}
+
+
+def test_entries_survive_reopening_the_file(tmp_path):
+    path = str(tmp_path / 'llm.db')
+    first = LLMResponseCache(path)
+    first.put('key', 'sql', "SELECT 1")
+    first.connection.close()
+    second = LLMResponseCache(path)
+    assert second.get('key') == "SELECT 1"
+    second.connection.close()
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = LLMResponseCache(str(tmp_path / 'llm.db'), ttl_seconds=60)
+    cache.put('key', 'sql', "SELECT 1")
+    clock.now += 59
+    assert cache.get('key') == "SELECT 1"
+    
+    # Reading an entry doesn't extend its lifetime
+    clock.now += 2
+    assert cache.get('key') is None
+    stats = cache.get_stats()
+    assert stats['expired'] == 1 and stats['entries'] == 0
+    
+    # Expired entries are also swept on the next put
+    cache.put('old', 'sql', "SELECT 2")
+    clock.now += 61
+    cache.put('new', 'sql', "SELECT 3")
+    assert cache.get_stats()['entries'] == 1
+    cache.connection.close()
+
+
+def test_least_recently_used_entries_are_evicted_past_max_bytes(tmp_path, clock):
+    value = "x" * 98  # 100 bytes once JSON-encoded
+    cache = LLMResponseCache(str(tmp_path / 'llm.db'), max_bytes=300)
+    for key in ('a', 'b', 'c'):
+        clock.now += 1
+        cache.put(key, 'sql', value)
+    # Reading 'a' makes 'b' the least recently used
+    clock.now += 1
+    assert cache.get('a') == value
+    
+    clock.now += 1
+    cache.put('d', 'sql', value)
+    assert cache.get('b') is None
+    for key in ('a', 'c', 'd'):
+        clock.now += 1
+        assert cache.get(key) == value
+    stats = cache.get_stats()
+    assert stats['evictions'] == 1 and stats['bytes'] == 300
+    
+    # A large entry pushes out as many old ones as it needs
+    clock.now += 1
+    cache.put('big', 'sql', "y" * 198)
+    assert cache.get_stats()['bytes'] <= 300
+    assert cache.get('a') is None and cache.get('c') is None
+    assert cache.get('big') is not None and cache.get('d') is not None
+    cache.connection.close()
+
+
+def test_unwritable_cache_path_falls_back_to_memory(tmp_path):
+    blocked = tmp_path / 'not_a_dir'
+    blocked.write_text('')
+    cache = open_llm_cache(str(blocked / 'llm.db'))
+    assert cache.cache_path == ':memory:'
+    cache.put('key', 'sql', "SELECT 1")
+    assert cache.get('key') == "SELECT 1"
+    
+    # A usable path is still opened on disk
+    path = str(tmp_path / 'llm.db')
+    assert open_llm_cache(path).cache_path == path and os.path.exists(path)
+
+
+def test_questions_are_normalised():
+    assert normalize_question("  Top 10   Products?") == normalize_question("top 10 products")
+    assert normalize_question("top 10 products") != normalize_question("top 20 products")
+    assert fingerprint('a', {'x': 1, 'y': 2}) == fingerprint('a', {'y': 2, 'x': 1})
+
+
+class FakeCompletions:
+    """Records chat completion requests and answers each with a fixed SQL query."""
+    
+    def __init__(self):
+        self.requests = []
+    
+    def create(self, **request):
+        self.requests.append(request)
+        message = SimpleNamespace(content=f"SELECT {len(self.requests)} FROM sales")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+@pytest.fixture
+def converter(monkeypatch, cache):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-key')
+    converter = NLToSQLConverter(cache=cache)
+    converter.completions = FakeCompletions()
+    converter.client = SimpleNamespace(chat=SimpleNamespace(completions=converter.completions))
+    return converter
+
+
+def sales_schema(columns: dict, generation: int = 1) -> dict:
+    return {
+        'generation': generation,
+        'columns': [{'name': name, 'type': kind, 'primary_key': False, 'not_null': False}
+                    for name, kind in columns.items()]
+    }
+
+
+def test_cache_key_changes_with_schema_and_model_parameters(converter):
+    request = {'model': 'gpt-4o', 'messages': [{'role': 'system', 'content': 'Write SQL'}], 'temperature': 0.1}
+    key = converter._cache_key('sql', 'top products', 'Table name: sales', request)
+    
+    assert converter._cache_key('sql', 'top products', 'Table name: sales', dict(request)) == key
+    assert converter._cache_key('sql', 'top products', 'Table name: sales\n- region', request) != key
+    assert converter._cache_key('sql', 'top products', 'Table name: sales', dict(request, model='gpt-4o-mini')) != key
+    assert converter._cache_key('sql', 'top products', 'Table name: sales', dict(request, temperature=0.5)) != key
+    assert converter._cache_key('sql', 'top products', 'Table name: sales', dict(
+        request, messages=[{'role': 'system', 'content': 'Write PostgreSQL'}])) != key
+    assert converter._cache_key('suggestions', 'top products', 'Table name: sales', request) != key
+    
+    converter.PROMPT_VERSION += 1
+    assert converter._cache_key('sql', 'top products', 'Table name: sales', request) != key
+
+
+def test_repeated_question_skips_the_api_until_the_schema_changes(converter):
+    schema = sales_schema({'region': 'TEXT', 'amount': 'REAL'})
+    first = converter.convert_to_sql("Total amount by region?", 'sales', schema)
+    again = converter.convert_to_sql("total amount  by region", 'sales', schema)
+    assert again == first
+    assert converter.last_call_stats['cached'] is True
+    assert len(converter.completions.requests) == 1
+    
+    changed = sales_schema({'region': 'TEXT', 'amount': 'REAL', 'channel': 'TEXT'}, generation=2)
+    assert converter.convert_to_sql("Total amount by region?", 'sales', changed) != first
+    assert len(converter.completions.requests) == 2
+
+
+def test_table_schema_generation_feeds_the_key(converter):
+    db = DatabaseManager(columnar_max_bytes=0)
+    db.create_table_from_dataframe(pd.DataFrame({'region': ['a'], 'amount': [1.0]}), 'sales')
+    converter.convert_to_sql("total amount", 'sales', db.get_table_schema('sales'))
+    converter.convert_to_sql("total amount", 'sales', db.get_table_schema('sales'))
+    assert len(converter.completions.requests) == 1
+    
+    # Reloading with other columns changes the context sent to the model
+    db.create_table_from_dataframe(pd.DataFrame({'region': ['a'], 'total': [1.0]}), 'sales')
+    converter.convert_to_sql("total amount", 'sales', db.get_table_schema('sales'))
+    assert len(converter.completions.requests) == 2
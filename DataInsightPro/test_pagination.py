@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+from database import DatabaseManager
+from pagination import QueryPaginator
+
+
+@pytest.fixture(scope='module')
+def db():
+    rng = np.random.default_rng(11)
+    rows = 2345
+    df = pd.DataFrame({
+        'id': np.arange(rows),
+        'region': rng.choice(['North', 'South', 'East', 'West'], rows),
+        'qty': rng.integers(1, 50, rows),
+        'amount': rng.permutation(rows) * 0.5
+    })
+    db = DatabaseManager(columnar_max_bytes=0)
+    db.create_table_from_dataframe(df, 'sales')
+    return db
+
+
+def read_all_pages(paginator: QueryPaginator) -> pd.DataFrame:
+    """Fetch every page in order and stack them."""
+    pages = [paginator.get_page(page) for page in range(paginator.page_count())]
+    return pd.concat(pages, ignore_index=True)
+
+
+@pytest.mark.parametrize('query, keyset', [
+    ("SELECT * FROM sales", True),
+    ("SELECT id, qty FROM sales WHERE qty > 10 AND region != 'East'", True),
+    ("SELECT * FROM sales ORDER BY amount DESC", False),
+    ("SELECT region, SUM(qty) AS total FROM sales GROUP BY region ORDER BY region", False),
+])
+def test_pages_match_full_result(db, query, keyset):
+    paginator = QueryPaginator(db, query, page_size=100)
+    assert paginator.keyset == keyset
+    
+    expected = db.execute_query(query, use_cache=False)
+    assert paginator.total_rows() == len(expected)
+    assert paginator.page_count() == max(1, -(-len(expected) // 100))
+    pd.testing.assert_frame_equal(read_all_pages(paginator), expected, check_dtype=False)
+
+
+def test_pages_can_be_fetched_out_of_order(db):
+    query = "SELECT id, amount FROM sales WHERE region = 'North'"
+    paginator = QueryPaginator(db, query, page_size=50)
+    expected = db.execute_query(query, use_cache=False)
+    
+    last = paginator.page_count() - 1
+    for page in (3, 0, last, 1):
+        page_df = paginator.get_page(page)
+        assert page_df.attrs['page']['first_row'] == page * 50
+        pd.testing.assert_frame_equal(
+            page_df, expected.iloc[page * 50:(page + 1) * 50].reset_index(drop=True), check_dtype=False
+        )
+
+
+def test_empty_result_has_one_empty_page(db):
+    paginator = QueryPaginator(db, "SELECT * FROM sales WHERE qty > 1000", page_size=100)
+    assert paginator.total_rows() == 0
+    assert paginator.page_count() == 1
+    assert paginator.get_page(0).empty
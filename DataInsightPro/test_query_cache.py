@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import pytest
+from database import DatabaseManager
+from query_cache import QueryResultCache
+
+
+@pytest.fixture
+def db():
+    db = DatabaseManager(columnar_max_bytes=0)
+    db.create_table_from_dataframe(pd.DataFrame({'id': range(100), 'qty': range(100)}), 'items')
+    db.create_table_from_dataframe(pd.DataFrame({'id': range(10)}), 'other')
+    return db
+
+
+def lookups(db: DatabaseManager) -> tuple:
+    stats = db.result_cache.get_stats()
+    return stats['hits'], stats['misses']
+
+
+def test_repeated_query_is_served_from_the_cache(db):
+    first = db.execute_query("SELECT SUM(qty) AS s FROM items")
+    assert lookups(db) == (0, 1)
+    # Case, whitespace and comments don't change the key
+    second = db.execute_query("select  sum(qty) as s\nfrom ITEMS -- again\n;")
+    assert lookups(db) == (1, 1)
+    pd.testing.assert_frame_equal(first, second)
+    
+    # Callers get copies they can change freely
+    second.loc[0, 's'] = -1
+    assert db.execute_query("SELECT SUM(qty) AS s FROM items")['s'].iloc[0] == 4950
+
+
+def test_literals_are_part_of_the_key(db):
+    db.execute_query("SELECT COUNT(*) AS n FROM items WHERE qty > 10")
+    assert db.execute_query("SELECT COUNT(*) AS n FROM items WHERE qty > 20")['n'].iloc[0] == 79
+    assert db.execute_query("SELECT 'A' AS v FROM other LIMIT 1")['v'].iloc[0] == 'A'
+    assert db.execute_query("SELECT 'a' AS v FROM other LIMIT 1")['v'].iloc[0] == 'a'
+    assert lookups(db) == (0, 4)
+
+
+@pytest.mark.parametrize('change', ['replace', 'append', 'upsert'])
+def test_writing_a_table_makes_its_queries_miss(db, change):
+    query = "SELECT COUNT(*) AS n, SUM(qty) AS s FROM items"
+    other_query = "SELECT COUNT(*) AS n FROM other"
+    db.execute_query(query)
+    db.execute_query(other_query)
+    
+    new_rows = pd.DataFrame({'id': [5, 500], 'qty': [1000, 1000]})
+    if change == 'replace':
+        db.create_table_from_dataframe(new_rows, 'items')
+        expected = (2, 2000)
+    elif change == 'append':
+        db.append_dataframe(new_rows, 'items')
+        expected = (102, 4950 + 2000)
+    else:
+        db.append_dataframe(new_rows, 'items', key_columns=['id'], upsert=True)
+        expected = (101, 4950 - 5 + 2000)
+    
+    hits, misses = lookups(db)
+    result = db.execute_query(query)
+    assert tuple(result.iloc[0]) == expected
+    assert lookups(db) == (hits, misses + 1)
+    # Queries over other tables stay cached
+    db.execute_query(other_query)
+    assert lookups(db) == (hits + 1, misses + 1)
+
+
+@pytest.mark.parametrize('query', [
+    "SELECT id, random() AS r FROM items LIMIT 3",
+    "SELECT * FROM items ORDER BY RANDOM() LIMIT 3",
+    "SELECT id, CURRENT_TIMESTAMP AS ts FROM items LIMIT 3",
+    "SELECT id, current_date AS d FROM items LIMIT 3",
+    "SELECT id, datetime('now') AS ts FROM items LIMIT 3",
+    "SELECT id, date('NOW', '-1 day') AS d FROM items LIMIT 3",
+])
+def test_non_deterministic_queries_are_never_cached(db, query):
+    assert db._result_cache_key(query) is None
+    db.execute_query(query)
+    db.execute_query(query)
+    assert lookups(db) == (0, 0)
+    assert db.result_cache.get_stats()['entries'] == 0
+
+
+def test_now_inside_other_strings_does_not_block_caching(db):
+    query = "SELECT id FROM items WHERE 'nowhere' <> 'random()' LIMIT 3"
+    assert db._result_cache_key(query) is not None
+
+
+def test_byte_budget_evicts_least_recently_used_results():
+    frame = pd.DataFrame({'value': np.arange(1000, dtype='int64')})
+    size = int(frame.memory_usage(deep=True).sum())
+    cache = QueryResultCache(max_bytes=3 * size)
+    for key in ('a', 'b', 'c'):
+        assert cache.put((key,), frame, ['t'])
+    # Reading 'a' makes 'b' the least recently used
+    assert cache.get(('a',)) is not None
+    
+    assert cache.put(('d',), frame, ['t'])
+    assert cache.get(('b',)) is None
+    assert all(cache.get((key,)) is not None for key in ('a', 'c', 'd'))
+    stats = cache.get_stats()
+    assert stats['evictions'] == 1 and stats['entries'] == 3 and stats['bytes'] == 3 * size
+    
+    # A result larger than the whole budget is refused without evicting anything
+    assert not cache.put(('huge',), pd.concat([frame] * 4), ['t'])
+    assert cache.get_stats()['entries'] == 3
+    
+    assert cache.invalidate_table('t') == 3
+    assert cache.get_stats()['bytes'] == 0
+
+
+def test_database_cache_respects_its_budget():
+    db = DatabaseManager(result_cache_bytes=20000, columnar_max_bytes=0)
+    db.create_table_from_dataframe(pd.DataFrame({'id': range(5000)}), 'items')
+    for limit in range(1000, 1005):
+        db.execute_query(f"SELECT id FROM items LIMIT {limit}")
+    stats = db.result_cache.get_stats()
+    assert stats['bytes'] <= 20000
+    assert stats['evictions'] >= 3
+    db.execute_query("SELECT id FROM items LIMIT 1004")
+    assert db.result_cache.get_stats()['hits'] == 1
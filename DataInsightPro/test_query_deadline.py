@@ -0,0 +1,88 @@
+import threading
+import time
+import pandas as pd
+import pytest
+from database import DatabaseManager, QueryCancelledError
+
+# Counts far enough that only a deadline or a cancel stops it
+ENDLESS_QUERY = (
+    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 1000000000) "
+    "SELECT SUM(i) AS total FROM n"
+)
+
+
+def wait_until_running(db: DatabaseManager, query_ids: list, seconds: float = 5.0) -> None:
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        running = {query['query_id'] for query in db.get_running_queries()}
+        if set(query_ids) <= running:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"Queries never started: {query_ids}")
+
+
+def test_long_recursive_query_stops_at_its_deadline():
+    db = DatabaseManager(columnar_max_bytes=0)
+    started = time.monotonic()
+    with pytest.raises(QueryCancelledError, match='deadline'):
+        db.execute_query(ENDLESS_QUERY, timeout=0.2)
+    assert time.monotonic() - started < 5
+    assert db.get_running_queries() == []
+    # The connection is usable afterwards
+    assert db.execute_query("SELECT 1 AS one", use_cache=False)['one'].iloc[0] == 1
+
+
+def test_streamed_query_stops_at_its_deadline(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'data.db'), columnar_max_bytes=0)
+    with pytest.raises(QueryCancelledError, match='deadline'):
+        with db.stream_query(ENDLESS_QUERY, timeout=0.2) as stream:
+            list(stream)
+
+
+def test_deadline_leaves_an_outer_write_transaction_open():
+    db = DatabaseManager(columnar_max_bytes=0)
+    db.create_table_from_dataframe(pd.DataFrame({'id': [1, 2]}), 'items')
+    with db._write_lock:
+        db.connection.execute("INSERT INTO items VALUES (3)")
+        assert db.connection.in_transaction
+        
+        with pytest.raises(QueryCancelledError):
+            db.execute_query(ENDLESS_QUERY, timeout=0.2)
+        
+        # The timed-out read didn't roll back the caller's insert
+        assert db.connection.in_transaction
+        db.connection.commit()
+    assert db.execute_query("SELECT id FROM items ORDER BY id", use_cache=False)['id'].tolist() == [1, 2, 3]
+
+
+def test_cancel_interrupts_only_the_matching_query(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'data.db'), columnar_max_bytes=0)
+    errors = {}
+    
+    def run(query_id):
+        try:
+            db.execute_query(ENDLESS_QUERY, use_cache=False, timeout=30, query_id=query_id)
+        except Exception as e:
+            errors[query_id] = e
+    
+    threads = {query_id: threading.Thread(target=run, args=(query_id,)) for query_id in ('first', 'second')}
+    for thread in threads.values():
+        thread.start()
+    try:
+        wait_until_running(db, ['first', 'second'])
+        assert db.cancel_query('first')
+        threads['first'].join(5)
+        assert not threads['first'].is_alive()
+        assert isinstance(errors['first'], QueryCancelledError)
+        assert 'cancelled' in str(errors['first'])
+        
+        # The other query keeps running
+        time.sleep(0.2)
+        assert threads['second'].is_alive()
+        assert [query['query_id'] for query in db.get_running_queries()] == ['second']
+    finally:
+        db.cancel_all_queries()
+        for thread in threads.values():
+            thread.join(5)
+    assert isinstance(errors['second'], QueryCancelledError)
+    assert not db.cancel_query('first')
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+from database import DatabaseManager
+
+QUERIES = [
+    "SELECT region, SUM(qty), AVG(price), COUNT(*), COUNT(price), MIN(price), MAX(qty) FROM sales GROUP BY region",
+    "SELECT product, SUM(price) AS s FROM sales WHERE region = 'North' GROUP BY product ORDER BY s DESC LIMIT 5",
+    "SELECT strftime('%Y-%m', day) AS m, SUM(qty), AVG(qty) FROM sales GROUP BY m",
+    "SELECT COUNT(*), SUM(qty) FROM sales WHERE day BETWEEN '2024-03-01' AND '2024-06-30'",
+    "SELECT region, product, MIN(price), MAX(price) FROM sales WHERE region IN ('East', 'West') "
+    "GROUP BY region, product",
+    "SELECT strftime('%Y', day), region, COUNT(*) FROM sales GROUP BY 1, 2",
+]
+
+
+def build_sales_data(rows: int = 20000, seed: int = 7) -> pd.DataFrame:
+    """Sales-like rows with low-cardinality dimensions, ISO dates and NULL prices."""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range('2024-01-01', periods=366).strftime('%Y-%m-%d').to_numpy()
+    df = pd.DataFrame({
+        'region': rng.choice(['North', 'South', 'East', 'West'], rows),
+        'product': rng.choice([f'P{i}' for i in range(12)], rows),
+        'qty': rng.integers(1, 50, rows),
+        'price': rng.uniform(1, 100, rows),
+        'day': days[rng.integers(0, len(days), rows)]
+    })
+    df.loc[rng.random(rows) < 0.05, 'price'] = np.nan
+    return df
+
+
+def assert_same_result(actual: pd.DataFrame, expected: pd.DataFrame, ordered: bool) -> None:
+    """Compare two results, ignoring row order unless the query fixes it."""
+    assert list(actual.columns) == list(expected.columns)
+    if not ordered:
+        actual = actual.sort_values(list(actual.columns)).reset_index(drop=True)
+        expected = expected.sort_values(list(expected.columns)).reset_index(drop=True)
+    # Rollups re-aggregate partial sums, so REAL sums may differ in the last bits
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, rtol=1e-9)
+
+
+@pytest.fixture(scope='module')
+def databases():
+    df = build_sales_data()
+    rollup_db = DatabaseManager(columnar_max_bytes=0)
+    sqlite_db = DatabaseManager(columnar_max_bytes=0)
+    rollup_db.create_table_from_dataframe(df, 'sales', build_rollups=True)
+    sqlite_db.create_table_from_dataframe(df, 'sales')
+    assert rollup_db.rollups.get_rollups('sales')
+    return rollup_db, sqlite_db
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_rollup_matches_base_table(databases, query):
+    rollup_db, sqlite_db = databases
+    assert rollup_db._route_query(query)['engine'] == 'rollup'
+    
+    assert_same_result(
+        rollup_db.execute_query(query, use_cache=False),
+        sqlite_db.execute_query(query, use_cache=False),
+        ordered='ORDER BY' in query
+    )
+
+
+def test_rollup_is_not_used_for_columns_it_lacks(databases):
+    rollup_db, _ = databases
+    assert rollup_db._route_query("SELECT qty, COUNT(*) FROM sales GROUP BY qty")['engine'] == 'sqlite'
+
+
+def test_appended_rows_are_folded_into_rollups():
+    df = build_sales_data()
+    extra = build_sales_data(rows=3000, seed=8)
+    rollup_db = DatabaseManager(columnar_max_bytes=0)
+    sqlite_db = DatabaseManager(columnar_max_bytes=0)
+    rollup_db.create_table_from_dataframe(df, 'sales', build_rollups=True)
+    sqlite_db.create_table_from_dataframe(df, 'sales')
+    rollup_db.append_dataframe(extra, 'sales')
+    sqlite_db.append_dataframe(extra, 'sales')
+    
+    query = QUERIES[0]
+    assert rollup_db._route_query(query)['engine'] == 'rollup'
+    assert_same_result(
+        rollup_db.execute_query(query, use_cache=False),
+        sqlite_db.execute_query(query, use_cache=False),
+        ordered=False
+    )
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+from database import DatabaseManager
+
+QUERIES = [
+    "SELECT region, COUNT(*), SUM(price), AVG(price) FROM sales GROUP BY region ORDER BY region",
+    "SELECT COUNT(*), SUM(qty), AVG(qty) FROM sales WHERE price > 20",
+    "SELECT region, channel, SUM(qty) AS total FROM sales GROUP BY region, channel ORDER BY region, channel",
+]
+
+
+@pytest.fixture(scope='module')
+def db():
+    rng = np.random.default_rng(3)
+    rows = 150000
+    df = pd.DataFrame({
+        # Central is a small stratum; stratified sampling must still cover it
+        'region': rng.choice(['North', 'South', 'East', 'West', 'Central'], rows, p=[.4, .3, .2, .09, .01]),
+        'channel': rng.choice(['web', 'store'], rows),
+        'qty': rng.integers(1, 50, rows),
+        'price': rng.lognormal(3, 1, rows)
+    })
+    db = DatabaseManager(columnar_max_bytes=0)
+    db.create_table_from_dataframe(df, 'sales', build_sample=True)
+    return db
+
+
+def test_sample_is_stratified_and_small(db):
+    sample = db.samples.get_sample('sales')
+    assert sample['table_rows'] == 150000
+    assert 'region' in sample['strata_columns']
+    assert sample['sample_rows'] < 0.05 * sample['table_rows']
+    central = db.execute_query(f"SELECT COUNT(*) AS n FROM {sample['name']} WHERE region = 'Central'",
+                               use_cache=False)['n'].iloc[0]
+    assert central >= 0.5 * db.samples.MIN_STRATUM_ROWS
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_estimates_fall_within_error_bounds(db, query):
+    estimate = db.execute_approximate_query(query)
+    exact = db.execute_query(query, use_cache=False)
+    assert estimate is not None
+    assert list(estimate.columns) == list(exact.columns)
+    assert len(estimate) == len(exact)
+    
+    bounds = estimate.attrs['approximate']['error_bounds']
+    assert bounds
+    for column, column_bounds in bounds.items():
+        for estimated, actual, bound in zip(estimate[column], exact[column], column_bounds):
+            assert bound > 0
+            # The bounds are 95% intervals; three times the bound makes a miss vanishingly rare
+            assert abs(estimated - actual) <= 3 * bound
+            # ...while staying tight enough to be useful
+            assert bound <= 0.25 * abs(actual)
+
+
+def test_unsupported_queries_are_not_estimated(db):
+    assert db.execute_approximate_query("SELECT region, MIN(price) FROM sales GROUP BY region") is None
+    assert db.execute_approximate_query("SELECT * FROM sales LIMIT 5") is None
+    
+    small = DatabaseManager(columnar_max_bytes=0)
+    small.create_table_from_dataframe(pd.DataFrame({'qty': range(100)}), 'sales', build_sample=True)
+    assert small.samples.get_sample('sales') is None
+    assert small.execute_approximate_query("SELECT SUM(qty) FROM sales") is None
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sketches import HyperLogLog, SpaceSaving, DuplicateEstimator, KllSketch, summarize_frames
+
+
+def hash_values(values: np.ndarray) -> np.ndarray:
+    """64-bit hashes of the values, as the summarizer feeds the sketches."""
+    return pd.util.hash_array(values)
+
+
+def split_rows(data, parts: int) -> list:
+    """Split a Series or DataFrame into row chunks."""
+    bounds = np.linspace(0, len(data), parts + 1).astype(int)
+    return [data.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+@pytest.mark.parametrize('distinct', [100, 5000, 200000])
+def test_hyperloglog_count_within_error_bound(distinct):
+    rng = np.random.default_rng(distinct)
+    values = rng.permutation(np.repeat(np.arange(distinct), 3))
+    sketch = HyperLogLog(precision=14)
+    for chunk in np.array_split(values, 7):
+        sketch.add_hashes(hash_values(chunk))
+    
+    # Four standard errors of 1.04 / sqrt(2**14)
+    assert abs(sketch.count() - distinct) <= 4 * 1.04 / np.sqrt(2 ** 14) * distinct + 1
+
+
+def test_hyperloglog_merge_equals_single_sketch():
+    values = np.arange(50000)
+    whole, left, right = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    whole.add_hashes(hash_values(values))
+    left.add_hashes(hash_values(values[:30000]))
+    right.add_hashes(hash_values(values[20000:]))
+    left.merge(right)
+    assert left.count() == whole.count()
+
+
+def test_space_saving_bounds_hold():
+    rng = np.random.default_rng(5)
+    values = pd.Series(rng.zipf(1.3, 200000) % 5000)
+    exact = values.value_counts()
+    sketch = SpaceSaving(capacity=50)
+    for chunk in split_rows(values, 20):
+        sketch.add_counts(chunk.value_counts())
+    
+    tracked = sketch.top(50)
+    for value, count, error in tracked:
+        assert count - error <= exact[value] <= count
+    untracked = exact.drop([value for value, _, _ in tracked])
+    assert untracked.max() <= sketch.min_count()
+    # The true top values are reported first
+    assert [value for value, _, _ in sketch.top(3)] == list(exact.index[:3])
+
+
+def test_duplicate_estimate_exact_within_capacity_and_close_beyond():
+    rng = np.random.default_rng(9)
+    values = rng.integers(0, 40000, 100000)
+    duplicates = len(values) - len(np.unique(values))
+    
+    exact = DuplicateEstimator()
+    exact.add_hashes(hash_values(values))
+    assert exact.estimate() == duplicates
+    
+    sampled = DuplicateEstimator(capacity=5000)
+    for chunk in np.array_split(values, 10):
+        sampled.add_hashes(hash_values(chunk))
+    assert sampled.level > 0
+    assert abs(sampled.estimate() - duplicates) <= 0.1 * duplicates
+
+
+@pytest.mark.parametrize('k', [100, 400])
+def test_kll_quantile_rank_error_within_bound(k):
+    rng = np.random.default_rng(k)
+    values = rng.lognormal(3, 1, 300000)
+    left, right = KllSketch(k=k, seed=1), KllSketch(k=k, seed=2)
+    for i, chunk in enumerate(np.array_split(values, 30)):
+        (left if i % 2 else right).add(chunk)
+    left.merge(right)
+    assert left.count == len(values)
+    
+    ordered = np.sort(values)
+    fractions = [0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+    for fraction, estimate in zip(fractions, left.quantiles(fractions)):
+        rank = np.searchsorted(ordered, estimate) / len(values)
+        # Three times the sketch's nominal rank error of 1.7 / k
+        assert abs(rank - fraction) <= 3 * 1.7 / k
+    assert left.quantiles([0.0, 1.0]) == [values.min(), values.max()]
+
+
+def test_summarize_frames_matches_exact_summary():
+    rng = np.random.default_rng(2)
+    rows = 60000
+    city_weights = 1.0 / np.arange(1, 701)
+    df = pd.DataFrame({
+        'amount': rng.normal(100, 15, rows),
+        'city': rng.choice([f'city_{i}' for i in range(700)], rows, p=city_weights / city_weights.sum()),
+        'code': rng.integers(0, 20000, rows)
+    })
+    df.loc[rng.random(rows) < 0.02, 'amount'] = np.nan
+    df = pd.concat([df, df.iloc[:500]], ignore_index=True)
+    
+    summary = summarize_frames(split_rows(df, 12))
+    assert summary['shape'] == df.shape
+    assert summary['missing_values'] == df.isna().sum().to_dict()
+    assert summary['duplicate_rows'] == int(df.duplicated().sum())
+    
+    amount = summary['numeric_summary']['amount']
+    assert amount['count'] == df['amount'].count()
+    assert amount['mean'] == pytest.approx(df['amount'].mean())
+    assert amount['min'] == df['amount'].min() and amount['max'] == df['amount'].max()
+    ordered = np.sort(df['amount'].dropna().to_numpy())
+    for key, fraction in (('25%', 0.25), ('50%', 0.5), ('75%', 0.75)):
+        rank = np.searchsorted(ordered, amount[key]) / len(ordered)
+        assert abs(rank - fraction) <= 0.02
+    
+    city = summary['categorical_summary']['city']
+    assert abs(city['unique_values'] - df['city'].nunique()) <= 0.04 * df['city'].nunique()
+    assert city['most_common'] == df['city'].value_counts().index[0]
@@ -0,0 +1,67 @@
+import io
+import pytest
+from database import DatabaseManager
+from streaming_csv import StreamingCsvLoader
+
+
+def mixed_csv(rows: int = 300) -> bytes:
+    """A CSV whose odd values arrive after the sample and whose last column is empty at first."""
+    lines = ["id,amount,price,day,note,late"]
+    for i in range(rows):
+        amount = 'abc' if i == 250 else str(i)
+        day = 'someday' if i == 270 else f"2024-01-{i % 28 + 1:02d}"
+        late = '' if i < 150 else ('x' if i == 280 else str(i))
+        lines.append(f"{i},{amount},{i}.5,{day},note {i},{late}")
+    return "\n".join(lines).encode()
+
+
+def storage_types(db: DatabaseManager, column: str) -> dict:
+    """Count the values of a column by SQLite storage class."""
+    return dict(db.connection.execute(f'SELECT typeof("{column}"), COUNT(*) FROM t GROUP BY 1').fetchall())
+
+
+def declared_types(db: DatabaseManager) -> dict:
+    return {row[1]: row[2] for row in db.connection.execute("PRAGMA table_info(t)")}
+
+
+@pytest.mark.parametrize('chunk_size', [100, 1000])
+def test_mixed_values_keep_the_inferred_types(chunk_size):
+    db = DatabaseManager(columnar_max_bytes=0)
+    stats = StreamingCsvLoader(db, sample_rows=100, chunk_size=chunk_size).load(io.BytesIO(mixed_csv()), 't')
+    
+    assert stats['rows'] == 300
+    types = declared_types(db)
+    assert types['id'] == 'INTEGER' and types['amount'] == 'INTEGER'
+    assert types['price'] == 'REAL' and types['day'] == 'TIMESTAMP' and types['note'] == 'TEXT'
+    # All NULL in the sample: no declared type
+    assert types['late'] == ''
+    
+    # Values that don't fit are kept as text and reported, the rest keep their type
+    assert storage_types(db, 'amount') == {'integer': 299, 'text': 1}
+    assert db.execute_query("SELECT amount FROM t WHERE id = 250", use_cache=False)['amount'].iloc[0] == 'abc'
+    assert storage_types(db, 'price') == {'real': 300}
+    assert db.execute_query("SELECT day FROM t WHERE id = 270", use_cache=False)['day'].iloc[0] == 'someday'
+    assert stats['type_mismatches']['amount'] == 1
+    assert stats['type_mismatches']['day'] == 1
+
+
+def test_late_column_takes_the_kind_of_its_first_values():
+    db = DatabaseManager(columnar_max_bytes=0)
+    stats = StreamingCsvLoader(db, sample_rows=100, chunk_size=100).load(io.BytesIO(mixed_csv()), 't')
+    
+    # The first chunk with values also has NULLs, so pandas reads the numbers as floats
+    assert storage_types(db, 'late') == {'null': 150, 'real': 149, 'text': 1}
+    assert stats['type_mismatches']['late'] == 1
+    assert db.execute_query("SELECT SUM(late) AS s FROM t WHERE typeof(late) = 'real'",
+                            use_cache=False)['s'].iloc[0] == sum(i for i in range(150, 300) if i != 280)
+
+
+def test_clean_csv_reports_no_mismatches():
+    lines = ["id,flag,amount"] + [f"{i},{'true' if i % 2 else 'false'},{i * 0.25}" for i in range(500)]
+    db = DatabaseManager(columnar_max_bytes=0)
+    stats = StreamingCsvLoader(db, sample_rows=50, chunk_size=64).load(io.BytesIO("\n".join(lines).encode()), 't')
+    
+    assert stats['type_mismatches'] == {}
+    assert storage_types(db, 'flag') == {'integer': 500}
+    assert storage_types(db, 'amount') == {'real': 500}
+    assert db.execute_query("SELECT SUM(flag) AS s FROM t", use_cache=False)['s'].iloc[0] == 250
@@ -0,0 +1,58 @@
+import io
+import numpy as np
+import pandas as pd
+from utils import optimize_data_types, clean_dataframe, read_data_file
+
+
+def small_counts(rows: int = 500) -> pd.DataFrame:
+    """Columns whose values would fit in int8, as numbers and as text."""
+    return pd.DataFrame({
+        'qty': np.arange(rows) % 120,
+        'qty_text': [str(i % 120) for i in range(rows)],
+        'spare': [None if i % 10 == 0 else str(i % 100) for i in range(rows)]
+    })
+
+
+def test_small_integers_are_not_narrowed_below_int32():
+    df = optimize_data_types(small_counts())
+    assert df['qty'].dtype == 'int32'
+    assert df['qty_text'].dtype == 'int32'
+    # Text integers with gaps become nullable integers of the same width
+    assert df['spare'].dtype == 'Int32'
+    report = {entry['column']: entry for entry in df.attrs['type_report']}
+    assert report['qty']['to'] == 'int32' and report['qty']['bytes_saved'] > 0
+
+
+def test_arithmetic_on_optimized_columns_does_not_overflow():
+    raw = small_counts()
+    df = optimize_data_types(small_counts())
+    
+    # With int8 storage each of these would wrap around past 127
+    assert (df['qty'] + df['qty_text']).max() == 238
+    assert (df['qty'] * 1000).max() == 119000
+    assert (df['qty'] * df['qty_text']).tolist() == (raw['qty'] * raw['qty']).tolist()
+    assert (df['spare'] + df['spare']).max() == 198
+    assert df['qty'].cumsum().iloc[-1] == raw['qty'].sum()
+    assert df.groupby(df['qty'] % 2)['qty'].sum().sum() == raw['qty'].sum()
+
+
+def test_wide_integers_and_lossy_floats_keep_their_width():
+    df = optimize_data_types(pd.DataFrame({
+        'big': [0, 2 ** 40],
+        'exact': [0.5, 1.25],
+        'precise': [0.1, 1.0 / 3]
+    }))
+    assert df['big'].dtype == 'int64'
+    assert df['exact'].dtype == 'float32'
+    assert df['precise'].dtype == 'float64'
+
+
+def test_cleaned_csv_sums_match_the_raw_values():
+    lines = ["Order ID,Qty,Unit Price"] + [f"{i},{i % 100},{i % 7}.5" for i in range(1000)]
+    raw = pd.read_csv(io.StringIO("\n".join(lines)))
+    df = clean_dataframe(read_data_file(io.BytesIO("\n".join(lines).encode()), 'csv'))
+    
+    assert list(df.columns) == ['order_id', 'qty', 'unit_price']
+    assert df['qty'].dtype == 'int32'
+    assert (df['qty'] * df['qty']).sum() == (raw['Qty'] ** 2).sum()
+    assert (df['qty'] * df['unit_price']).sum() == (raw['Qty'] * raw['Unit Price']).sum()
@@ -1,8 +1,14 @@
 import pandas as pd
+import numpy as np
 import re
+import warnings
 import io
-from typing import Tuple, Any
+import json
+import hashlib
+from typing import Tuple, Any, Dict, Optional
 import streamlit as st
+from sketches import summarize_frames
+from query_linter import QueryLinter
 
 def process_uploaded_file(uploaded_file) -> Tuple[pd.DataFrame, str]:
     """Process uploaded CSV or Excel file and return DataFrame and table name."""
@@ -14,21 +20,109 @@ def process_uploaded_file(uploaded_file) -> Tuple[pd.DataFrame, str]:
         table_name = generate_table_name(file_name)
         
         # Read file based on extension
-        if file_extension == 'csv':
-            df = pd.read_csv(uploaded_file)
-        elif file_extension in ['xlsx', 'xls']:
-            df = pd.read_excel(uploaded_file)
-        else:
-            raise ValueError(f"Unsupported file format: {file_extension}")
+        df = read_data_file(uploaded_file, file_extension)
         
         # Clean and validate DataFrame
-        df = clean_dataframe(df)
+        df = clean_dataframe(df, infer_types=file_extension not in TYPED_FILE_EXTENSIONS)
         
         return df, table_name
         
     except Exception as e:
         raise Exception(f"Error processing file: {str(e)}")
 
+# Formats that store column types, so uploads skip type inference
+TYPED_FILE_EXTENSIONS = ('parquet', 'feather', 'arrow')
+
+def read_data_file(source, file_extension: str) -> pd.DataFrame:
+    """Read a CSV, Excel, Parquet or Arrow file (path or file-like object) into a DataFrame."""
+    if file_extension == 'csv':
+        return pd.read_csv(source)
+    elif file_extension in ['xlsx', 'xls']:
+        return pd.read_excel(source)
+    elif file_extension in TYPED_FILE_EXTENSIONS:
+        return read_arrow_file(source, file_extension)
+    else:
+        raise ValueError(f"Unsupported file format: {file_extension}")
+
+def require_pyarrow():
+    """Import pyarrow, which Parquet and Arrow files need."""
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("Parquet and Arrow files need pyarrow; install the 'arrow' extra (pip install pyarrow)")
+    return pyarrow
+
+def read_arrow_file(source, file_extension: str) -> pd.DataFrame:
+    """Read a Parquet or Arrow IPC (file or stream format) file, keeping its column types."""
+    pa = require_pyarrow()
+    if file_extension == 'parquet':
+        import pyarrow.parquet as pq
+        return arrow_table_to_dataframe(pq.read_table(source))
+    
+    import pyarrow.feather as feather
+    import pyarrow.ipc as ipc
+    try:
+        return arrow_table_to_dataframe(feather.read_table(source))
+    except pa.ArrowInvalid:
+        # Not the IPC file format; try the streaming format
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return arrow_table_to_dataframe(ipc.open_stream(source).read_all())
+
+def arrow_table_to_dataframe(table) -> pd.DataFrame:
+    """Convert an Arrow table to a DataFrame of types SQLite can store.
+    
+    Integers and booleans become nullable pandas types instead of floats,
+    decimals become floats, dates and times become ISO text and nested
+    values become JSON text.
+    """
+    pa = require_pyarrow()
+    columns = []
+    for column in table.columns:
+        column_type = column.type
+        if pa.types.is_decimal(column_type):
+            column = column.cast(pa.float64())
+        elif pa.types.is_date(column_type) or pa.types.is_time(column_type):
+            column = column.cast(pa.string())
+        elif pa.types.is_duration(column_type):
+            column = column.cast(pa.int64())
+        elif pa.types.is_nested(column_type):
+            column = pa.array(
+                [None if value is None else json.dumps(value, default=str) for value in column.to_pylist()],
+                type=pa.string()
+            )
+        columns.append(column)
+    
+    def nullable_type(arrow_type):
+        if pa.types.is_integer(arrow_type):
+            return pd.Int64Dtype()
+        if pa.types.is_boolean(arrow_type):
+            return pd.BooleanDtype()
+        return None
+    
+    return pa.table(columns, names=table.column_names).to_pandas(types_mapper=nullable_type)
+
+def compute_upload_fingerprint(uploaded_file, options: Optional[Dict[str, Any]] = None) -> str:
+    """Hash an uploaded file's name, contents and ingestion options.
+    
+    Two uploads with the same fingerprint produce the same table, so the
+    app can skip re-parsing and re-loading a file it has already ingested.
+    """
+    digest = hashlib.sha256()
+    digest.update(uploaded_file.name.encode('utf-8'))
+    digest.update(json.dumps(options or {}, sort_keys=True, default=str).encode('utf-8'))
+    
+    if hasattr(uploaded_file, 'getbuffer'):
+        digest.update(uploaded_file.getbuffer())
+    else:
+        position = uploaded_file.tell()
+        uploaded_file.seek(0)
+        for block in iter(lambda: uploaded_file.read(1024 * 1024), b''):
+            digest.update(block)
+        uploaded_file.seek(position)
+    
+    return digest.hexdigest()
+
 def generate_table_name(file_name: str) -> str:
     """Generate a SQL-safe table name from file name."""
     # Remove file extension
@@ -53,8 +147,12 @@ def generate_table_name(file_name: str) -> str:
     
     return table_name.lower()
 
-def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
-    """Clean and prepare DataFrame for database storage."""
+def clean_dataframe(df: pd.DataFrame, infer_types: bool = True) -> pd.DataFrame:
+    """Clean and prepare DataFrame for database storage.
+    
+    Pass infer_types=False for frames read from typed formats (Parquet,
+    Arrow) whose column types are already right.
+    """
     # Make a copy to avoid modifying the original
     df_clean = df.copy()
     
@@ -65,7 +163,8 @@ def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     df_clean = handle_duplicate_columns(df_clean)
     
     # Convert data types appropriately
-    df_clean = optimize_data_types(df_clean)
+    if infer_types:
+        df_clean = optimize_data_types(df_clean)
     
     # Handle missing values
     df_clean = handle_missing_values(df_clean)
@@ -109,39 +208,125 @@ def handle_duplicate_columns(df: pd.DataFrame) -> pd.DataFrame:
     df.columns = new_columns
     return df
 
+# Type inference decides a column's type from a bounded sample, then
+# verifies the choice over the whole column with vectorized checks
+INFERENCE_SAMPLE_SIZE = 1000
+CATEGORY_MAX_RATIO = 0.5
+DATE_PATTERN = r'\s*(\d{4}-\d{2}-\d{2}|\d{2}/\d{2}/\d{4}|\d{2}-\d{2}-\d{4}|\d{4}/\d{2}/\d{2})'
+# int8/int16 are left out: arithmetic on a column keeps its width, so
+# qty * 1000 or a + b on them would silently wrap around
+INTEGER_TYPES = ('int32', 'int64')
+
 def optimize_data_types(df: pd.DataFrame) -> pd.DataFrame:
-    """Optimize data types for better performance and storage."""
+    """Infer column types, downcast numerics and encode low-cardinality text.
+    
+    Text columns become numbers or timestamps only when every non-null value
+    converts. Integers are stored as int32 when their range fits, floats
+    become float32 only when that is lossless, and remaining text columns
+    become categoricals when that uses less memory. The per-column memory
+    report is stored in df.attrs['type_report'].
+    """
+    report = []
     for col in df.columns:
-        # Skip if column is empty
-        if df[col].isnull().all():
+        series = df[col]
+        optimized = infer_column_type(series)
+        if optimized is series:
             continue
         
-        # Try to convert to datetime
-        if df[col].dtype == 'object':
-            try:
-                # Check if it looks like a date
-                sample_values = df[col].dropna().head(10)
-                if any(is_date_like(str(val)) for val in sample_values):
-                    df[col] = pd.to_datetime(df[col], errors='coerce')
-            except:
-                pass
-        
-        # Try to convert to numeric
-        if df[col].dtype == 'object':
-            try:
-                # Try integer conversion first
-                converted = pd.to_numeric(df[col], errors='coerce')
-                if not converted.isnull().all():
-                    # Check if all values are integers
-                    if converted.dropna().apply(lambda x: x.is_integer()).all():
-                        df[col] = converted.astype('Int64')  # Nullable integer
-                    else:
-                        df[col] = converted
-            except:
-                pass
-    
+        bytes_before = int(series.memory_usage(index=False, deep=True))
+        bytes_after = int(optimized.memory_usage(index=False, deep=True))
+        df[col] = optimized
+        report.append({
+            'column': col,
+            'from': str(series.dtype),
+            'to': str(optimized.dtype),
+            'bytes_before': bytes_before,
+            'bytes_after': bytes_after,
+            'bytes_saved': bytes_before - bytes_after
+        })
+    
+    df.attrs['type_report'] = report
     return df
 
+def infer_column_type(series: pd.Series) -> pd.Series:
+    """Return the column converted to its inferred type (or the column itself if unchanged)."""
+    non_null = series.dropna()
+    if non_null.empty or pd.api.types.is_bool_dtype(series.dtype):
+        return series
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return downcast_integers(series)
+    if pd.api.types.is_float_dtype(series.dtype):
+        return downcast_floats(series)
+    if not (pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype)):
+        return series
+    
+    sample = _inference_sample(non_null)
+    if pd.to_numeric(sample, errors='coerce').notna().all():
+        converted = pd.to_numeric(series, errors='coerce')
+        # Accept only if no value failed to convert
+        if not (converted.isna() & series.notna()).any():
+            return _integers_or_floats(converted)
+    
+    text_sample = sample.astype(str)
+    if text_sample.str.match(DATE_PATTERN).all():
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)
+            converted = pd.to_datetime(series, errors='coerce')
+        if not (converted.isna() & series.notna()).any():
+            return converted
+    
+    # Decide on a categorical from the sample's cardinality, then check it saves memory
+    if text_sample.nunique() <= len(text_sample) * CATEGORY_MAX_RATIO:
+        converted = series.astype('category')
+        if (len(converted.cat.categories) <= len(non_null) * CATEGORY_MAX_RATIO
+                and converted.memory_usage(index=False, deep=True) < series.memory_usage(index=False, deep=True)):
+            return converted
+    return series
+
+def downcast_integers(series: pd.Series) -> pd.Series:
+    """Store integers as int32 when their range fits, else as int64."""
+    values = series.dropna()
+    if values.empty:
+        return series
+    low, high = int(values.min()), int(values.max())
+    nullable = series.hasnans or isinstance(series.dtype, pd.api.extensions.ExtensionDtype)
+    for name in INTEGER_TYPES:
+        info = np.iinfo(name)
+        if info.min <= low and high <= info.max:
+            target = name.capitalize() if nullable else name
+            return series if str(series.dtype) == target else series.astype(target)
+    return series
+
+def downcast_floats(series: pd.Series) -> pd.Series:
+    """Store floats as float32 when every value survives the round trip."""
+    if series.dtype != np.float64:
+        return series
+    values = series.to_numpy()
+    with np.errstate(over='ignore'):
+        narrowed = values.astype(np.float32)
+    if np.array_equal(narrowed.astype(np.float64), values, equal_nan=True):
+        return pd.Series(narrowed, index=series.index, name=series.name)
+    return series
+
+def _integers_or_floats(converted: pd.Series) -> pd.Series:
+    """Downcast a converted numeric column, turning integral floats into nullable integers."""
+    if pd.api.types.is_integer_dtype(converted.dtype):
+        return downcast_integers(converted)
+    if not pd.api.types.is_float_dtype(converted.dtype):
+        return converted
+    values = converted.dropna().to_numpy(dtype='float64')
+    if (np.isfinite(values).all() and np.array_equal(np.floor(values), values)
+            and np.abs(values).max() < 2.0 ** 63):
+        return downcast_integers(converted.astype('Int64'))
+    return downcast_floats(converted)
+
+def _inference_sample(non_null: pd.Series) -> pd.Series:
+    """Pick up to INFERENCE_SAMPLE_SIZE values spread evenly through a column."""
+    if len(non_null) <= INFERENCE_SAMPLE_SIZE:
+        return non_null
+    positions = np.linspace(0, len(non_null) - 1, INFERENCE_SAMPLE_SIZE).astype('int64')
+    return non_null.iloc[positions]
+
 def handle_missing_values(df: pd.DataFrame) -> pd.DataFrame:
     """Handle missing values appropriately."""
     # For now, keep missing values as is - let the user decide how to handle them
@@ -153,15 +338,8 @@ def is_date_like(value: str) -> bool:
     if not isinstance(value, str):
         return False
     
-    # Common date patterns
-    date_patterns = [
-        r'\d{4}-\d{2}-\d{2}',  # YYYY-MM-DD
-        r'\d{2}/\d{2}/\d{4}',  # MM/DD/YYYY
-        r'\d{2}-\d{2}-\d{4}',  # MM-DD-YYYY
-        r'\d{4}/\d{2}/\d{2}',  # YYYY/MM/DD
-    ]
-    
-    return any(re.match(pattern, value.strip()) for pattern in date_patterns)
+    # Common date patterns: YYYY-MM-DD, MM/DD/YYYY, MM-DD-YYYY, YYYY/MM/DD
+    return re.match(DATE_PATTERN, value) is not None
 
 def validate_sql_query(query: str) -> bool:
     """Basic SQL query validation."""
@@ -201,8 +379,27 @@ def format_query_result(df: pd.DataFrame) -> pd.DataFrame:
     
     return df
 
-def get_data_summary(df: pd.DataFrame) -> dict:
-    """Get a comprehensive summary of the DataFrame."""
+# Frames with at least this many rows are summarized with sketches
+SKETCH_SUMMARY_MIN_ROWS = 100000
+SKETCH_SUMMARY_CHUNK_SIZE = 100000
+
+# Rows per slice when export_dataframe writes a frame
+EXPORT_SLICE_ROWS = 50000
+
+def get_data_summary(df: pd.DataFrame, exact: bool = False) -> dict:
+    """Get a comprehensive summary of the DataFrame.
+    
+    Large frames are summarized in one chunked pass of mergeable sketches
+    (see sketches.summarize_frames): distinct counts, most common values,
+    quartiles and duplicate rows are then estimates and the summary has
+    'approximate': True. Pass exact=True to compute everything exactly.
+    """
+    if not exact and len(df) >= SKETCH_SUMMARY_MIN_ROWS:
+        return summarize_frames(
+            df.iloc[start:start + SKETCH_SUMMARY_CHUNK_SIZE]
+            for start in range(0, len(df), SKETCH_SUMMARY_CHUNK_SIZE)
+        )
+    
     summary = {
         'shape': df.shape,
         'columns': df.columns.tolist(),
@@ -228,36 +425,37 @@ def get_data_summary(df: pd.DataFrame) -> dict:
             }
         summary['categorical_summary'] = categorical_summary
     
+    summary['approximate'] = False
     return summary
 
 def export_dataframe(df: pd.DataFrame, filename: str, format: str = 'csv') -> bytes:
-    """Export DataFrame to specified format."""
-    if format.lower() == 'csv':
-        return df.to_csv(index=False).encode('utf-8')
-    elif format.lower() == 'excel':
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Data')
-        return output.getvalue()
-    else:
-        raise ValueError(f"Unsupported export format: {format}")
-
-def suggest_query_improvements(query: str) -> list:
-    """Suggest improvements for SQL queries."""
-    suggestions = []
-    
-    query_upper = query.upper()
+    """Export DataFrame to specified format.
     
-    # Check for LIMIT clause
-    if 'LIMIT' not in query_upper:
-        suggestions.append("Consider adding a LIMIT clause to prevent large result sets")
+    Formats are those of exporters.EXPORT_FORMATS ('excel' means xlsx); the
+    frame is written in slices through the same chunk writers as query
+    exports.
+    """
+    from exporters import write_frames, EXPORT_FORMATS
     
-    # Check for WHERE clause
-    if 'WHERE' not in query_upper and 'SELECT *' in query_upper:
-        suggestions.append("Consider adding a WHERE clause to filter results")
-    
-    # Check for ORDER BY
-    if 'ORDER BY' not in query_upper and ('TOP' in query_upper or 'LIMIT' in query_upper):
-        suggestions.append("Consider adding ORDER BY clause when using LIMIT or TOP")
+    file_format = 'xlsx' if format.lower() == 'excel' else format.lower()
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {format}")
     
-    return suggestions
+    output = io.BytesIO()
+    frames = (df.iloc[start:start + EXPORT_SLICE_ROWS] for start in range(0, max(len(df), 1), EXPORT_SLICE_ROWS))
+    write_frames(frames, output, file_format)
+    return output.getvalue()
+
+def suggest_query_improvements(query: str, db_manager=None) -> list:
+    """Suggest improvements for SQL queries.
+    
+    With a database, runs the plan-aware QueryLinter against it; without
+    one, only the rules that need no plan. Returns one line per finding:
+    the problem, the suggested rewrite and the estimated saving.
+    """
+    linter = QueryLinter(db_manager)
+    findings = linter.lint(query) if db_manager is not None else linter.lint_text(query)
+    return [
+        f"{finding['message']}. {finding['suggestion']} ({finding['saving_note']})"
+        for finding in findings
+    ]